@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Async ASGI entry point for the Patient Alert System API
+
+Under gunicorn's default sync workers every OpenAI call, SMTP send and Mongo
+query holds a whole worker for its full duration, so a handful of slow LLM
+calls starves every other route. This entry point serves the I/O-bound routes
+natively on an asyncio event loop, where a request waiting on the network
+costs a coroutine instead of a worker:
+
+    POST /symptoms/assist                          app_simple's stage graph, in a thread
+    POST /send-otp                                 aiosmtplib
+    GET  /symptoms/get-symptom-history/<id>        motor
+    GET  /medication/get-medication-history/<id>   motor
+    GET  /kick-count/get-kick-history/<id>         motor
+
+Every other route (including OCR uploads, which are CPU-bound) is passed to
+the regular Flask app from app_simple, running on the event loop's thread
+pool, so this is a drop-in replacement for ``gunicorn app_simple:app``:
+
+    hypercorn --workers 2 --bind 0.0.0.0:$PORT app_async:app
+    uvicorn --workers 2 --host 0.0.0.0 --port $PORT app_async:app
+
+The native routes return the same bodies, status codes and ETags as their
+Flask counterparts and share their helpers (history pipelines, the symptom stage graph,
+email message, OTP store, rate limits, metrics).
+
+    ASYNC_SYNC_THREADS    threads for the Flask fallback and blocking helpers (default 64)
+    ASYNC_MONGO_POOL      motor connection pool size (default 200)
+    ASYNC_MAX_BODY_MB     request body limit for the Flask fallback (default 32)
+    SMTP_HOST / SMTP_PORT mail server (default smtp.gmail.com:587)
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import wraps
+
+import aiosmtplib
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+from quart import Quart, Response, g, request
+
+import app_simple as sync_app
+from utils.admission import AdmissionRejected
+from utils.conditional_get import VERSION_FIELD, version_etag
+from utils.history_query import HistoryQueryError, aquery_history, parse_history_params
+from utils.json_provider import dumps_bytes
+from utils.logging_config import get_logger
+from utils.metrics import METRICS_ENABLED, REQUEST_DURATION, REQUESTS_TOTAL, RESPONSE_SIZE, timed
+from utils.otp_store import PATIENT_SIGNUP
+
+logger = get_logger('app_async')
+
+ASYNC_SYNC_THREADS = int(os.getenv('ASYNC_SYNC_THREADS', '64'))
+ASYNC_MONGO_POOL = int(os.getenv('ASYNC_MONGO_POOL', '200'))
+ASYNC_MAX_BODY_MB = int(os.getenv('ASYNC_MAX_BODY_MB', '32'))
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+
+async_app = Quart(__name__, static_folder=None)
+
+
+class _AsyncClients:
+    """Event-loop bound clients, created when the server starts serving."""
+    mongo = None
+    patients = None
+    activities = None
+
+
+clients = _AsyncClients()
+
+
+@async_app.before_serving
+async def _start_clients():
+    loop = asyncio.get_running_loop()
+    # Flask fallback requests and asyncio.to_thread helpers share this pool
+    loop.set_default_executor(ThreadPoolExecutor(ASYNC_SYNC_THREADS, thread_name_prefix='wsgi'))
+    clients.mongo = AsyncIOMotorClient(
+        os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+        maxPoolSize=ASYNC_MONGO_POOL,
+        serverSelectionTimeoutMS=10000,
+    )
+    database = clients.mongo[os.getenv("DB_NAME", "patients_db")]
+    clients.patients = database["Patient_test"]
+    clients.activities = database["user_activities"]
+    print(f"⚡ Async app serving (motor pool {ASYNC_MONGO_POOL}, {ASYNC_SYNC_THREADS} fallback threads)")
+
+
+@async_app.after_serving
+async def _stop_clients():
+    if clients.mongo is not None:
+        clients.mongo.close()
+
+
+# ==================== RESPONSES, CORS, METRICS ====================
+
+def json_response(body, status: int = 200) -> Response:
+    return Response(dumps_bytes(body), status=status, mimetype='application/json')
+
+
+@async_app.before_request
+async def _start_request_timer():
+    g.metrics_started = time.perf_counter()
+
+
+@async_app.after_request
+async def _finish_request(response):
+    # Same CORS behaviour as flask_cors' CORS(app) defaults on the sync app
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    if request.method == 'OPTIONS':
+        response.headers['Access-Control-Allow-Methods'] = 'DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT'
+        requested_headers = request.headers.get('Access-Control-Request-Headers')
+        if requested_headers:
+            response.headers['Access-Control-Allow-Headers'] = requested_headers
+
+    started = g.pop('metrics_started', None)
+    if METRICS_ENABLED and started is not None:
+        labels = (request.endpoint or 'unmatched', request.method)
+        REQUEST_DURATION.observe(labels, time.perf_counter() - started)
+        REQUESTS_TOTAL.inc(labels + (str(response.status_code),))
+        if response.content_length is not None:
+            RESPONSE_SIZE.observe(labels, response.content_length)
+    return response
+
+
+def async_patient_etag(etag_suffix=None):
+    """Async counterpart of app_simple.patient_etag (ETag from the patient's version field)"""
+    def decorator(f):
+        @wraps(f)
+        async def decorated(patient_id):
+            try:
+                doc = await clients.patients.find_one({"patient_id": patient_id}, {'_id': 0, VERSION_FIELD: 1})
+                version = None if doc is None else int(doc.get(VERSION_FIELD, 0) or 0)
+            except Exception as e:
+                print(f"⚠️ Version lookup failed, serving without ETag: {e}")
+                version = None
+
+            if version is None:
+                return await f(patient_id)
+
+            etag = version_etag(version, etag_suffix() if etag_suffix else '')
+            if request.if_none_match.contains_weak(etag):
+                response = Response('', status=304)
+                response.set_etag(etag)
+                return response
+
+            response = await f(patient_id)
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+# ==================== HISTORY (motor) ====================
+
+@async_app.route('/symptoms/get-symptom-history/<patient_id>', methods=['GET'])
+@async_patient_etag()
+async def get_symptom_history(patient_id):
+    """Get symptom history for a specific patient"""
+    try:
+        try:
+            params = parse_history_params(request.args, key_type='date')
+        except HistoryQueryError as e:
+            return json_response({'success': False, 'message': str(e)}, 400)
+
+        page = await aquery_history(clients.patients, {"patient_id": patient_id}, 'symptom_logs', 'createdAt', params)
+        if page is None:
+            return json_response({'success': False, 'message': f'Patient not found with ID: {patient_id}'}, 404)
+
+        symptom_logs = page['entries']
+        return json_response({
+            'success': True,
+            'patientId': patient_id,
+            'symptom_logs': symptom_logs,
+            'totalEntries': len(symptom_logs),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
+        })
+    except Exception as e:
+        print(f"Error getting symptom history: {e}")
+        return json_response({'success': False, 'message': f'Error: {str(e)}'}, 500)
+
+
+@async_app.route('/medication/get-medication-history/<patient_id>', methods=['GET'])
+@async_patient_etag()
+async def get_medication_history(patient_id):
+    """Get medication history for a patient"""
+    try:
+        try:
+            params = parse_history_params(request.args, key_type='date')
+        except HistoryQueryError as e:
+            return json_response({'success': False, 'message': str(e)}, 400)
+
+        page = await aquery_history(clients.patients, {"patient_id": patient_id}, 'medication_logs', 'createdAt', params)
+        if page is None:
+            return json_response({'success': False, 'message': f'Patient not found with ID: {patient_id}'}, 404)
+
+        medication_logs = page['entries']
+        return json_response({
+            'success': True,
+            'patientId': patient_id,
+            'medication_logs': medication_logs,
+            'totalEntries': len(medication_logs),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
+        })
+    except Exception as e:
+        print(f"Error getting medication history: {e}")
+        return json_response({'success': False, 'message': f'Error: {str(e)}'}, 500)
+
+
+@async_app.route('/kick-count/get-kick-history/<patient_id>', methods=['GET'])
+@async_patient_etag(etag_suffix=lambda: datetime.now().strftime('%Y%m%d'))  # default window is the last 30 days
+async def get_kick_count_history(patient_id):
+    """Get kick count history for a patient"""
+    try:
+        try:
+            params = parse_history_params(request.args, default_limit=50)
+        except HistoryQueryError as e:
+            return json_response({'error': str(e)}, 400)
+        days = request.args.get('days', 30, type=int)
+
+        if days > 0 and params['since'] is None:
+            params['since'] = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        page = await aquery_history(
+            clients.patients,
+            {"patient_id": patient_id},
+            'kick_count_logs',
+            {'$concat': [{'$ifNull': ['$$e.date', '']}, ' ', {'$ifNull': ['$$e.time', '']}]},
+            params
+        )
+        if page is None:
+            return json_response({'error': 'Patient not found'}, 404)
+
+        kick_logs = page['entries']
+        return json_response({
+            'kick_logs': kick_logs,
+            'total_entries': len(kick_logs),
+            'total_matching': page['total'],
+            'has_more': page['has_more'],
+            'next_cursor': page['next_cursor'],
+            'patient_id': patient_id,
+            'success': True
+        })
+    except Exception as e:
+        print(f"❌ Error getting kick count history: {str(e)}")
+        return json_response({'error': f'Failed to get kick count history: {str(e)}'}, 500)
+
+
+# ==================== SYMPTOM ASSISTANCE ====================
+
+async def _log_activity(user_email, activity_type, activity_data):
+    """Async counterpart of UserActivityTracker.log_activity"""
+    session = await clients.activities.find_one({"user_email": user_email, "is_active": True}, {"session_id": 1})
+    if not session:
+        print(f"⚠️ No active session found for user {user_email}")
+        return None
+    activity_id = str(uuid.uuid4())
+    await clients.activities.update_one(
+        {"session_id": session["session_id"]},
+        {"$push": {"activities": {
+            "activity_id": activity_id,
+            "timestamp": datetime.now(),
+            "activity_type": activity_type,
+            "activity_data": activity_data,
+            "ip_address": request.remote_addr or "unknown",
+        }}}
+    )
+    return activity_id
+
+
+@async_app.route('/symptoms/assist', methods=['POST'])
+async def get_symptom_assistance():
+    """Get pregnancy symptom assistance using quantum vector search and LLM analysis"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data:
+            return json_response({'success': False, 'message': 'No data provided'}, 400)
+
+        symptom_text = data.get('text', '').strip()
+        weeks_pregnant = data.get('weeks_pregnant', 1)
+        patient_id = data.get('patient_id')
+
+        if not symptom_text:
+            return json_response({'success': False, 'message': 'Symptom description is required'}, 400)
+
+        # Same stage graph as the Flask route; its scheduler blocks, so it runs in a thread
+        try:
+            body, results = await asyncio.to_thread(
+                sync_app.answer_symptom_query, symptom_text, weeks_pregnant, patient_id, request.headers)
+        except AdmissionRejected as e:
+            print(f"🚦 llm pool rejected /symptoms/assist ({e.ticket.outcome}, retry in {e.ticket.retry_after}s)")
+            return _rate_limited(e.ticket.retry_after, 'Server is busy with similar requests, please try again shortly')
+
+        if patient_id:
+            try:
+                patient = results['patient']
+                await _log_activity(
+                    user_email=patient.get('email') if patient else None,
+                    activity_type="symptom_consultation",
+                    activity_data=sync_app.symptom_activity_data(body, patient_id)
+                )
+            except Exception as e:
+                print(f"⚠️ Warning: Could not log symptom consultation activity: {e}")
+
+        response = json_response(body)
+        response.headers['Server-Timing'] = results.server_timing()
+        return response
+    except Exception as e:
+        print(f"Error getting symptom assistance: {e}")
+        return json_response({'success': False, 'message': f'Error: {str(e)}'}, 500)
+
+
+# ==================== EMAIL (aiosmtplib) ====================
+
+async def send_email_async(to_email: str, subject: str, body: str) -> bool:
+    """Async counterpart of app_simple.send_email"""
+    sender_email = os.getenv("SENDER_EMAIL")
+    sender_password = os.getenv("SENDER_PASSWORD")
+    if not sender_email or not sender_password:
+        logger.error("❌ Email configuration missing - SENDER_EMAIL and SENDER_PASSWORD not set")
+        return False
+
+    msg = sync_app.build_email_message(sender_email, to_email, subject, body)
+    try:
+        with timed('smtp', 'sendmail'):
+            refused, _ = await aiosmtplib.send(
+                msg,
+                hostname=SMTP_HOST,
+                port=SMTP_PORT,
+                start_tls=True,
+                username=sender_email,
+                password=sender_password,
+                timeout=30,
+            )
+        if refused:
+            logger.warning("⚠️ Some recipients were refused: %s", refused)
+        logger.info("✅ Email sent successfully to: %s", to_email)
+        return True
+    except aiosmtplib.SMTPAuthenticationError as e:
+        logger.error("❌ SMTP Authentication failed (check the email and app password): %s", e)
+        return False
+    except aiosmtplib.SMTPRecipientsRefused as e:
+        logger.error("❌ Recipient email refused for %s: %s", to_email, e)
+        return False
+    except Exception as e:
+        logger.error("❌ Email sending failed (%s): %s", type(e).__name__, e)
+        return False
+
+
+def _rate_limited(retry_after: int, message: str) -> Response:
+    response = json_response({'success': False, 'error': message, 'retry_after': retry_after}, 429)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+@async_app.route('/send-otp', methods=['POST'])
+async def send_otp():
+    """Send OTP to email for verification"""
+    try:
+        if sync_app.db.patients_collection is None:
+            return json_response({"error": "Database not connected"}, 500)
+
+        data = await request.get_json(silent=True) or {}
+        email = data.get('email', '').strip()
+        if not email:
+            return json_response({"error": "Email is required"}, 400)
+
+        # Same buckets as OTPRateLimiter.check; the shared buckets live in Mongo
+        limiter = sync_app.otp_rate_limiter
+        ip = request.access_route[-1] if request.access_route else (request.remote_addr or 'unknown')
+        allowed, retry_after = await asyncio.to_thread(limiter.by_ip.take, ip)
+        if not allowed:
+            print(f"🚫 OTP rate limit hit for IP {ip}")
+            return _rate_limited(retry_after, 'Too many OTP requests from this network, please try again later')
+        allowed, retry_after = await asyncio.to_thread(limiter.by_email.take, email.lower())
+        if not allowed:
+            print(f"🚫 OTP rate limit hit for {email}")
+            return _rate_limited(retry_after, 'Too many OTP requests for this email, please try again later')
+
+        otp = await asyncio.to_thread(sync_app.otp_store.reissue, email, PATIENT_SIGNUP)
+        if otp is None:
+            return json_response({"error": "No pending signup found for this email"}, 404)
+
+        if await send_email_async(email, sync_app.OTP_EMAIL_SUBJECT, sync_app.otp_email_body(otp)):
+            return json_response({"message": "OTP sent successfully", "email": email})
+        return json_response({"error": "Failed to send OTP email"}, 500)
+    except Exception as e:
+        return json_response({"error": f"OTP sending failed: {str(e)}"}, 500)
+
+
+# ==================== ASGI DISPATCH ====================
+
+class AsyncFirstDispatcher:
+    """Send requests the async app routes natively to Quart, everything else to the Flask app."""
+
+    def __init__(self, asgi_app: Quart, wsgi_app, max_body_size: int):
+        self.asgi_app = asgi_app
+        self.wsgi_app = AsyncioWSGIMiddleware(wsgi_app, max_body_size=max_body_size)
+        self._routes = asgi_app.url_map.bind('localhost')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self._routes.test(scope['path'], scope['method']):
+            return await self.wsgi_app(scope, receive, send)
+        # Native routes, plus the lifespan events that open and close the async clients
+        return await self.asgi_app(scope, receive, send)
+
+
+app = AsyncFirstDispatcher(async_app, sync_app.app, max_body_size=ASYNC_MAX_BODY_MB * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    import hypercorn.asyncio
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f"0.0.0.0:{os.getenv('PORT', '5000')}"]
+    print("🚀 Starting Patient Alert System async API...")
+    asyncio.run(hypercorn.asyncio.serve(app, config))
@@ -35,10 +35,27 @@ from services.email_service import EmailService
 from services.jwt_service import JWTService
 from utils.validators import Validators
 from utils.helpers import Helpers
+from utils.json_provider import MongoJSONProvider
+from utils.conditional_get import patient_conditional_get
+from utils.id_generator import claim_node_id, set_node_id_source
+from utils.token_cache import set_revocation_collection
+from utils.query_profiler import init_query_profiler
+from utils.metrics import init_metrics, register_mongo_listener
+from utils.request_profiler import init_request_profiler
+from utils.health_monitor import HealthMonitor
+from utils.admission import admission_controlled
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = MongoJSONProvider(app)
 CORS(app)
+# Per-route latency histograms and dependency timers on /metrics
+init_metrics(app)
+register_mongo_listener()
+# Slow-query / query-plan report per query shape on /admin/query-profile
+init_query_profiler(app, lambda: db.client)
+# On-demand per-request sampling profiler (off unless REQUEST_PROFILER_ENABLED)
+init_request_profiler(app)
 
 # Configuration
 class Config:
@@ -56,6 +73,20 @@ db = Database()
 # Ensure database connection is established
 db.connect()
 
+# Dependencies are probed in the background; /health reads the cached status
+def _probe_mongodb():
+    if db.client is None:
+        raise ConnectionError('MongoDB client not initialized')
+    return db.client.admin.command('ping')
+
+health_monitor = HealthMonitor(service='Doctor Patient Management API')
+health_monitor.add_check('mongodb', _probe_mongodb, critical=True)
+health_monitor.start()
+# Each process claims an ID generator node id once, on its first new ID
+set_node_id_source(lambda: claim_node_id(db.counters_collection))
+# Logout revocations are shared across processes through Mongo
+set_revocation_collection(lambda: db.revoked_tokens_collection)
+
 email_service = EmailService()
 jwt_service = JWTService()
 # voice_service = VoiceService()  # Removed voice functionality
@@ -66,6 +97,8 @@ helpers = Helpers()
 doctor_model = DoctorModel(db)
 patient_model = PatientModel(db)
 otp_model = OTPModel(db)
+doctor_model.ensure_search_index()
+patient_model.ensure_search_index()
 
 # Initialize controllers
 auth_controller = AuthController(doctor_model, patient_model, otp_model, jwt_service, email_service, validators)
@@ -74,6 +107,14 @@ patient_controller = PatientController()
 otp_controller = OTPController(otp_model, jwt_service, email_service, validators)
 # voice_controller = VoiceController()  # Removed voice functionality
 
+def patient_etag(etag_suffix=None):
+    """Decorator for ETag / If-None-Match support keyed on the patient document version"""
+    return patient_conditional_get(
+        lambda: db.patients_collection,
+        lambda kwargs: {"patient_id": kwargs["patient_id"]},
+        etag_suffix=etag_suffix
+    )
+
 # Routes
 @app.route('/', methods=['GET'])
 def root_endpoint():
@@ -96,12 +137,15 @@ def root_endpoint():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
-    })
+    """Health check endpoint (cached dependency status, no I/O)"""
+    return health_monitor.response()
+
+@app.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    """JSON Web Key Set of the JWT verification keys (empty in HS256 mode)"""
+    response = jsonify(jwt_service.codec.jwks())
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
 
 # Debug endpoints for OpenAI configuration
 @app.route('/debug/openai-config', methods=['GET'])
@@ -266,6 +310,11 @@ def search_doctors():
     """Search doctors with filters for patient selection"""
     return doctor_controller.get_all_doctors(request)
 
+@app.route('/doctors/autocomplete', methods=['GET'])
+def autocomplete_doctors():
+    """Ranked prefix suggestions for the doctor picker"""
+    return doctor_controller.autocomplete_doctors(request)
+
 @app.route('/doctors/<doctor_id>', methods=['GET'])
 def get_public_doctor_profile(doctor_id):
     """Get public doctor profile for patient selection"""
@@ -308,16 +357,19 @@ def get_doctor_patients():
     return doctor_controller.get_patients(request)
 
 @app.route('/doctor/patient/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_doctor_patient_details(patient_id):
     """Get detailed patient information for doctor"""
     return doctor_controller.get_patient_details(request, patient_id)
 
 @app.route('/doctor/patient/<patient_id>/full-details', methods=['GET'])
+@patient_etag()
 def get_patient_full_details(patient_id):
     """Get complete patient details with all health data"""
     return doctor_controller.get_patient_full_details(request, patient_id)
 
 @app.route('/doctor/patient/<patient_id>/ai-summary', methods=['GET'])
+@admission_controlled('llm')
 def get_patient_ai_summary(patient_id):
     """Get AI-powered medical summary for a patient"""
     return doctor_controller.get_patient_ai_summary(request, patient_id)
@@ -354,46 +406,55 @@ def get_doctor_dashboard_stats():
 
 # Patient Health Data Endpoints
 @app.route('/medication/get-medication-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_medication_history(patient_id):
     """Get medication history for patient"""
     return doctor_controller.get_medication_history(request, patient_id)
 
 @app.route('/symptoms/get-analysis-reports/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_symptom_analysis_reports(patient_id):
     """Get symptom analysis reports for patient"""
     return doctor_controller.get_symptom_analysis_reports(request, patient_id)
 
 @app.route('/nutrition/get-food-entries/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_food_entries(patient_id):
     """Get food entries for patient"""
     return doctor_controller.get_food_entries(request, patient_id)
 
 @app.route('/medication/get-tablet-tracking-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_tablet_tracking_history(patient_id):
     """Get tablet tracking history for patient"""
     return doctor_controller.get_tablet_tracking_history(request, patient_id)
 
 @app.route('/profile/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_patient_profile(patient_id):
     """Get patient profile"""
     return doctor_controller.get_patient_profile(request, patient_id)
 
 @app.route('/kick-count/get-kick-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_kick_count_history(patient_id):
     """Get kick count history for patient"""
     return doctor_controller.get_kick_count_history(request, patient_id)
 
 @app.route('/mental-health/history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_mental_health_history(patient_id):
     """Get mental health history for patient"""
     return doctor_controller.get_mental_health_history(request, patient_id)
 
 @app.route('/prescription/documents/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_prescription_documents(patient_id):
     """Get prescription documents for patient"""
     return doctor_controller.get_prescription_documents(request, patient_id)
 
 @app.route('/vital-signs/history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_vital_signs_history(patient_id):
     """Get vital signs history for patient"""
     return doctor_controller.get_vital_signs_history(request, patient_id)
@@ -421,6 +482,7 @@ def get_all_patients():
     return patient_controller.get_all_patients(request)
 
 @app.route('/patients/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_patient(patient_id):
     """Get patient by ID"""
     return patient_controller.get_patient(request, patient_id)
@@ -450,6 +512,11 @@ def doctor_login():
     """Doctor-only login endpoint"""
     return auth_controller.doctor_login(request)
 
+@app.route('/logout', methods=['POST'])
+def logout():
+    """Revoke the bearer token"""
+    return auth_controller.logout(request)
+
 # Voice Dictation Routes - REMOVED (voice functionality disabled)
 # All voice-related endpoints have been removed to fix deployment issues
 
@@ -1,26 +1,56 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import pymongo
-import bcrypt
 import os
 import uuid
 import json
+import logging
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 from dotenv import load_dotenv
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import random
-import string
 import re
 import jwt
 from functools import wraps
 from bson import ObjectId
 import asyncio
 
+# Load environment variables before the project modules below are imported:
+# several read their settings at import time (logging, JWT keys, metrics, pools)
+load_dotenv()
+
 # Import JWT OTP utilities
 from jwt_otp_utils import generate_otp_jwt, verify_otp_jwt, create_access_token, create_refresh_token, verify_access_token
+from utils.history_query import HistoryQueryError, parse_history_params, query_history
+from utils.section_projection import SectionProjectionError, parse_sections, fetch_sections
+from utils.json_provider import MongoJSONProvider
+from utils.conditional_get import patient_conditional_get
+from utils.delta_sync import next_sync_seq, parse_sync_params, query_changes, stamp, tombstone
+from utils.log_batch import LogBatchError, apply_log_batch, validate_batch
+from utils.idempotency import ensure_idempotency_indexes, idempotent
+from utils.search_index import doctor_search_fields, patient_search_fields, refresh_doctor_search_fields
+from utils.id_generator import claim_node_id, new_doctor_id, new_patient_id, set_node_id_source
+from utils.jwt_keys import token_codec
+from utils.query_profiler import init_query_profiler
+from utils.metrics import init_metrics, register_mongo_listener, timed
+from utils.request_profiler import init_request_profiler
+from utils.health_monitor import HEALTH_PROBE_TIMEOUT_S, HealthMonitor
+from utils.admission import AdmissionRejected, admission_controlled, get_pool, request_budget
+from utils.stage_graph import StageGraph
+from utils.text_rules import get_text_rules
+from utils.logging_config import get_logger, log_payload
+from utils.otp_store import (
+    DOCTOR_PASSWORD_RESET, PATIENT_PASSWORD_RESET, PATIENT_SIGNUP, OTPRateLimiter, OTPStore, ensure_otp_indexes
+)
+from utils.rate_limit import ensure_rate_limit_indexes, rate_limited_response
+from utils.token_cache import (
+    VerifiedTokenCache, ensure_revocation_indexes, revoke_claims, set_revocation_collection
+)
+from utils.password_hashing import (
+    PasswordHasherBusy, hash_password, password_busy_response, verify_and_rehash
+)
 import base64
 import tempfile
 # OCR and Document Processing imports
@@ -70,8 +100,7 @@ except ImportError:
     OPENAI_AVAILABLE = False
     print("⚠️ OpenAI client not available. Install with: pip install openai")
 
-# Load environment variables
-load_dotenv()
+logger = get_logger('app_simple')
 
 # Type hints for Python 3.9+ compatibility
 from typing import List, Dict, Any, Optional
@@ -141,6 +170,14 @@ LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
 TOP_K = int(os.getenv("TOP_K", "5"))
 RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.70"))
 
+# /symptoms/assist pipeline: per-stage timeouts, when to start the LLM fallback
+# speculatively if vector search is slow, and the overall budget (seconds)
+SYMPTOM_STAGE_TIMEOUT_DB = float(os.getenv("SYMPTOM_STAGE_TIMEOUT_DB", "2"))
+SYMPTOM_STAGE_TIMEOUT_SEARCH = float(os.getenv("SYMPTOM_STAGE_TIMEOUT_SEARCH", "5"))
+SYMPTOM_STAGE_TIMEOUT_LLM = float(os.getenv("SYMPTOM_STAGE_TIMEOUT_LLM", "20"))
+SYMPTOM_SPECULATIVE_FALLBACK_AFTER = float(os.getenv("SYMPTOM_SPECULATIVE_FALLBACK_AFTER", "1.5"))
+SYMPTOM_ASSIST_DEADLINE = float(os.getenv("SYMPTOM_ASSIST_DEADLINE", "25"))
+
 # User-visible text and prompts (dynamic via env)
 DISCLAIMER_TEXT = os.getenv(
     "DISCLAIMER_TEXT",
@@ -164,7 +201,15 @@ SUMMARY_SYSTEM_PROMPT = os.getenv(
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = MongoJSONProvider(app)
 CORS(app)
+# Per-route latency histograms and dependency timers on /metrics
+init_metrics(app)
+register_mongo_listener()
+# Slow-query / query-plan report per query shape on /admin/query-profile
+init_query_profiler(app, lambda: db.client)
+# On-demand per-request sampling profiler (off unless REQUEST_PROFILER_ENABLED)
+init_request_profiler(app)
 
 # Database connection
 class Database:
@@ -210,6 +255,11 @@ class Database:
                 self.doctors_collection = db["doctor_v2"]
                 self.appointments_collection = db["appointments"]
                 self.temp_otp_collection = db["temp_otp_data"]  # Temporary OTP storage
+                self.idempotency_collection = db["idempotency_keys"]  # Stored responses for Idempotency-Key retries
+                self.counters_collection = db["counters"]  # ID generator node ids
+                self.revoked_tokens_collection = db["revoked_tokens"]  # Revoked JWT ids (logout)
+                self.otp_challenges_collection = db["otp_challenges"]  # Hashed OTPs (TTL)
+                self.rate_limits_collection = db["rate_limits"]  # Token buckets for OTP sends
                 
                 # Test collections exist and are accessible
                 print(f"🔍 Testing collections...")
@@ -279,6 +329,27 @@ class Database:
                 except Exception as e:
                     print(f"⚠️ doctor email index creation failed: {e}")
                 
+                try:
+                    ensure_idempotency_indexes(self.idempotency_collection)
+                    print("✅ idempotency_keys TTL index created")
+                except Exception as e:
+                    print(f"⚠️ idempotency_keys TTL index creation failed: {e}")
+                
+                try:
+                    ensure_revocation_indexes(self.revoked_tokens_collection)
+                    print("✅ revoked_tokens TTL index created")
+                except Exception as e:
+                    print(f"⚠️ revoked_tokens TTL index creation failed: {e}")
+                
+                try:
+                    ensure_otp_indexes(self.otp_challenges_collection)
+                    ensure_rate_limit_indexes(self.rate_limits_collection)
+                    # Pending doctor signups expire on their own instead of lingering
+                    self.temp_otp_collection.create_index("expires_at", expireAfterSeconds=0)
+                    print("✅ otp_challenges / rate_limits / temp_otp_data TTL indexes created")
+                except Exception as e:
+                    print(f"⚠️ OTP TTL index creation failed: {e}")
+                
                 print("✅ Connected to MongoDB successfully")
                 print(f"✅ Database: {db_name}")
                 print(f"✅ Collections: patients_v2, mental_health_logs, doctor_v2, appointments")
@@ -297,6 +368,11 @@ class Database:
                     self.doctors_collection = None
                     self.appointments_collection = None
                     self.temp_otp_collection = None
+                    self.idempotency_collection = None
+                    self.counters_collection = None
+                    self.revoked_tokens_collection = None
+                    self.otp_challenges_collection = None
+                    self.rate_limits_collection = None
                 else:
                     print(f"🔄 Retrying in 2 seconds...")
                     import time
@@ -328,6 +404,15 @@ class Database:
 # Initialize database
 db = Database()
 
+# Each process claims an ID generator node id once, on its first new ID
+set_node_id_source(lambda: claim_node_id(db.counters_collection))
+# Logout revocations are shared across processes through Mongo
+set_revocation_collection(lambda: db.revoked_tokens_collection)
+
+# OTP challenges (hashed, TTL-expired) and per-email / per-IP send limits
+otp_store = OTPStore(lambda: db.otp_challenges_collection)
+otp_rate_limiter = OTPRateLimiter(lambda: db.rate_limits_collection)
+
 # ==================== MOCK N8N WEBHOOK SERVICE ====================
 
 class MockN8NService:
@@ -369,41 +454,28 @@ class MockN8NService:
     
     def _simulate_ai_processing(self, text):
         """Simulate AI extraction of prescription fields"""
-        text_lower = text.lower()
-        
-        # Extract medication information using pattern matching
-        extracted_fields = {}
-        
-        # Medication name patterns
-        if 'amoxicillin' in text_lower:
-            extracted_fields['medication_name'] = 'Amoxicillin'
-            extracted_fields['dosage'] = '500mg'
-            extracted_fields['frequency'] = 'Three times daily'
-            extracted_fields['duration'] = '7 days'
-        elif 'paracetamol' in text_lower:
-            extracted_fields['medication_name'] = 'Paracetamol'
-            extracted_fields['dosage'] = '500mg'
-            extracted_fields['frequency'] = 'Every 4-6 hours'
-            extracted_fields['duration'] = 'As needed'
-        elif 'vitamin' in text_lower:
-            extracted_fields['medication_name'] = 'Vitamin Supplement'
-            extracted_fields['dosage'] = '1 tablet'
-            extracted_fields['frequency'] = 'Once daily'
-            extracted_fields['duration'] = 'Ongoing'
+        matches = get_text_rules().scan(text)
+        
+        # Medication name patterns (first matching rule in the rules file wins)
+        medication = matches.first('medications')
+        if medication:
+            extracted_fields = dict(medication['fields'])
         else:
-            extracted_fields['medication_name'] = 'Unknown Medication'
-            extracted_fields['dosage'] = 'As prescribed'
-            extracted_fields['frequency'] = 'As prescribed'
-            extracted_fields['duration'] = 'As prescribed'
+            extracted_fields = {
+                'medication_name': 'Unknown Medication',
+                'dosage': 'As prescribed',
+                'frequency': 'As prescribed',
+                'duration': 'As prescribed',
+            }
         
         # Extract doctor information
-        if 'dr.' in text_lower or 'doctor' in text_lower:
+        if matches.has('prescription_markers', 'prescriber'):
             extracted_fields['prescribed_by'] = 'Dr. Smith'
         else:
             extracted_fields['prescribed_by'] = 'Unknown'
         
         # Extract patient information
-        if 'patient:' in text_lower:
+        if matches.has('prescription_markers', 'patient_label'):
             extracted_fields['patient_name'] = 'Jane Doe'
         
         # Generate AI analysis
@@ -653,6 +725,8 @@ class OCRService:
 
 # Initialize services
 ocr_service = OCRService()
+# Compile the keyword rules at startup so a bad rules file fails the deploy, not a request
+get_text_rules()
 mock_n8n_service = MockN8NService()
 
 # ==================== QUANTUM & LLM SERVICES ====================
@@ -693,7 +767,8 @@ class QuantumVectorService:
             return False
         
         try:
-            collections = self.client.get_collections().collections
+            with timed('qdrant', 'get_collections'):
+                collections = self.client.get_collections().collections
             names = {c.name for c in collections}
             
             if QDRANT_COLLECTION not in names:
@@ -727,7 +802,8 @@ class QuantumVectorService:
             return []
         
         try:
-            vector = self.embedding_model.encode([text], normalize_embeddings=True)
+            with timed('embedding', 'encode'):
+                vector = self.embedding_model.encode([text], normalize_embeddings=True)
             return vector[0].tolist()
         except Exception as e:
             print(f"❌ Text embedding failed: {e}")
@@ -761,18 +837,30 @@ class QuantumVectorService:
             if not query_vector:
                 return []
             
+            return self.search_vector(query_vector, weeks_pregnant)
+        except Exception as e:
+            print(f"❌ Knowledge search failed: {e}")
+            return []
+    
+    def search_vector(self, query_vector: list, weeks_pregnant: int) -> list:
+        """Search the knowledge base with an already computed query embedding"""
+        if not self.client or not query_vector:
+            return []
+        
+        try:
             # Build trimester filter
             trimester_filter = self.build_trimester_filter(weeks_pregnant)
             
             # Search Qdrant
-            results = self.client.search(
-                collection_name=QDRANT_COLLECTION,
-                query_vector=query_vector,
-                limit=TOP_K,
-                query_filter=trimester_filter,
-                with_payload=True,
-                score_threshold=RETRIEVAL_MIN_SCORE
-            )
+            with timed('qdrant', 'search'):
+                results = self.client.search(
+                    collection_name=QDRANT_COLLECTION,
+                    query_vector=query_vector,
+                    limit=TOP_K,
+                    query_filter=trimester_filter,
+                    with_payload=True,
+                    score_threshold=RETRIEVAL_MIN_SCORE
+                )
             
             # Format results
             suggestions = []
@@ -815,22 +903,8 @@ class LLMService:
             print("⚠️ OpenAI not available - using fallback responses")
     
     def detect_red_flags(self, text: str) -> list:
-        """Detect red flag symptoms in text"""
-        flags = []
-        lower_text = text.lower()
-        
-        if any(k in lower_text for k in ["bleeding", "spotting", "blood"]):
-            flags.append("vaginal bleeding")
-        if any(k in lower_text for k in ["severe pain", "sharp pain", "worst pain"]):
-            flags.append("severe pain")
-        if any(k in lower_text for k in ["vision", "blurry", "flashing lights"]):
-            flags.append("vision changes")
-        if any(k in lower_text for k in ["fever", "temperature", "high temp"]):
-            flags.append("fever")
-        if any(k in lower_text for k in ["reduced movement", "less movement", "not moving"]):
-            flags.append("reduced fetal movement")
-        
-        return flags
+        """Detect red flag symptoms in text (rules: red_flags in the text rules file)"""
+        return get_text_rules().scan(text).ids('red_flags')
     
     def generate_llm_fallback(self, symptom_text: str, weeks_pregnant: int) -> dict:
         """Generate LLM-powered fallback response"""
@@ -838,16 +912,12 @@ class LLMService:
         
         if self.client:
             try:
-                trimester = "first" if weeks_pregnant <= 13 else ("second" if weeks_pregnant <= 27 else "third")
-                
-                response = self.client.chat.completions.create(
-                    model=LLM_MODEL,
-                    messages=[
-                        {"role": "system", "content": FALLBACK_SYSTEM_PROMPT},
-                        {"role": "user", "content": f"User symptom text: '{symptom_text}'. Weeks pregnant: {weeks_pregnant} (trimester: {trimester}). If any red flags, state them and advise urgent care."}
-                    ],
-                    temperature=0.2,
-                )
+                with timed('openai', 'chat.completions'):
+                    response = self.client.chat.completions.create(
+                        model=LLM_MODEL,
+                        messages=self.fallback_messages(symptom_text, weeks_pregnant),
+                        temperature=0.2,
+                    )
                 content = response.choices[0].message.content.strip()
             except Exception as e:
                 print(f"⚠️ LLM fallback failed: {e}")
@@ -855,6 +925,22 @@ class LLMService:
         else:
             content = FALLBACK_STATIC_TEXT
         
+        return self.fallback_result(content, red_flags)
+    
+    @staticmethod
+    def _trimester_name(weeks_pregnant: int) -> str:
+        return "first" if weeks_pregnant <= 13 else ("second" if weeks_pregnant <= 27 else "third")
+    
+    def fallback_messages(self, symptom_text: str, weeks_pregnant: int) -> list:
+        """Chat messages for the no-evidence fallback (shared with the async app)"""
+        trimester = self._trimester_name(weeks_pregnant)
+        return [
+            {"role": "system", "content": FALLBACK_SYSTEM_PROMPT},
+            {"role": "user", "content": f"User symptom text: '{symptom_text}'. Weeks pregnant: {weeks_pregnant} (trimester: {trimester}). If any red flags, state them and advise urgent care."}
+        ]
+    
+    def fallback_result(self, content: str, red_flags: list) -> dict:
+        """Wrap fallback text (LLM or static) with the red-flag safety suggestion"""
         suggestions = [
             {
                 "id": "fallback-1",
@@ -881,41 +967,49 @@ class LLMService:
             "red_flags": red_flags
         }
     
+    def summary_messages(self, symptom_text: str, weeks_pregnant: int, top_suggestions: list) -> list:
+        """Chat messages asking the LLM to summarize retrieved evidence (shared with the async app)"""
+        trimester = self._trimester_name(weeks_pregnant)
+        evidence = "\n".join(
+            f"- [triage: {s.get('metadata', {}).get('triage', 'unspecified')}] {s.get('text', '')}"
+            for s in top_suggestions
+        )
+        return [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"User symptom text: '{symptom_text}'. Weeks pregnant: {weeks_pregnant} (trimester: {trimester}). Evidence bullets (use ONLY these):\n{evidence}"}
+        ]
+    
+    @staticmethod
+    def summary_result(content: str, top_suggestions: list) -> dict:
+        return {
+            "id": "synthesis-1",
+            "text": content,
+            "metadata": {
+                "source": "LLM-summary",
+                "evidence_ids": [s.get("id") for s in top_suggestions],
+                "triage": "summary",
+            },
+            "score": None,
+        }
+    
     def summarize_retrieval(self, symptom_text: str, weeks_pregnant: int, suggestions: list) -> dict:
         """Summarize retrieved suggestions using LLM"""
         if not suggestions or not self.client:
             return None
         
         try:
-            trimester = "first" if weeks_pregnant <= 13 else ("second" if weeks_pregnant <= 27 else "third")
-            
             # Build evidence from top suggestions
             top_suggestions = suggestions[:3]
-            evidence = "\n".join(
-                f"- [triage: {s.get('metadata', {}).get('triage', 'unspecified')}] {s.get('text', '')}"
-                for s in top_suggestions
-            )
             
-            response = self.client.chat.completions.create(
-                model=LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
-                    {"role": "user", "content": f"User symptom text: '{symptom_text}'. Weeks pregnant: {weeks_pregnant} (trimester: {trimester}). Evidence bullets (use ONLY these):\n{evidence}"}
-                ],
-                temperature=0.2,
-            )
+            with timed('openai', 'chat.completions'):
+                response = self.client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self.summary_messages(symptom_text, weeks_pregnant, top_suggestions),
+                    temperature=0.2,
+                )
             content = response.choices[0].message.content.strip()
             
-            return {
-                "id": "synthesis-1",
-                "text": content,
-                "metadata": {
-                    "source": "LLM-summary",
-                    "evidence_ids": [s.get("id") for s in top_suggestions],
-                    "triage": "summary",
-                },
-                "score": None,
-            }
+            return self.summary_result(content, top_suggestions)
         except Exception as e:
             print(f"⚠️ LLM summarization failed: {e}")
             return None
@@ -924,6 +1018,34 @@ class LLMService:
 quantum_service = QuantumVectorService()
 llm_service = LLMService()
 
+# Dependencies are probed in the background; /health and request handlers read the cached status
+health_monitor = HealthMonitor(service='Pregnancy AI API')
+
+def _probe_mongodb():
+    if db.client is None:
+        raise ConnectionError('MongoDB client not initialized')
+    return db.client.admin.command('ping')
+
+def _probe_qdrant():
+    if quantum_service.client is None:
+        return None
+    return quantum_service.client.get_collections()
+
+def _probe_openai():
+    if llm_service.client is None:
+        return None
+    return llm_service.client.with_options(timeout=HEALTH_PROBE_TIMEOUT_S, max_retries=0).models.list()
+
+health_monitor.add_check('mongodb', _probe_mongodb, critical=True)
+health_monitor.add_check('qdrant', _probe_qdrant)
+health_monitor.add_check('embedding_model', lambda: True if quantum_service.embedding_model is not None else None, interval=300)
+health_monitor.add_check('openai', _probe_openai, interval=300)
+health_monitor.start()
+
+def database_available() -> bool:
+    """Cached database status for request handlers (no ping on the request path)"""
+    return db.patients_collection is not None and health_monitor.is_up('mongodb')
+
 # User Activity Tracking System
 class UserActivityTracker:
     """Track all user activities from login to logout"""
@@ -1057,7 +1179,9 @@ activity_tracker = UserActivityTracker(db)
 
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
-JWT_ALGORITHM = "HS256"
+# HS256 by default; JWT_ALGORITHM=RS256/ES256 signs with JWT_PRIVATE_KEY_FILE (utils/jwt_keys.py)
+jwt_codec = token_codec(JWT_SECRET_KEY)
+JWT_ALGORITHM = jwt_codec.algorithm
 JWT_EXPIRATION_HOURS = 24  # Token expires in 24 hours
 
 def generate_jwt_token(user_data, user_type="patient"):
@@ -1066,6 +1190,7 @@ def generate_jwt_token(user_data, user_type="patient"):
         "user_id": str(user_data.get("_id")) if user_data.get("_id") else None,
         "email": user_data.get("email"),
         "user_type": user_type,
+        "jti": uuid.uuid4().hex,  # Lets logout revoke this token
         "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
         "iat": datetime.utcnow()
     }
@@ -1082,13 +1207,18 @@ def generate_jwt_token(user_data, user_type="patient"):
             "username": user_data.get("username")
         })
     
-    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return jwt_codec.encode(payload)
+
+# Verified claims by token hash, so repeat requests skip the signature check
+jwt_token_cache = VerifiedTokenCache()
+
+def _decode_jwt_token(token):
+    return jwt_codec.decode(token)
 
 def verify_jwt_token(token):
-    """Verify JWT token and return user data"""
+    """Verify JWT token and return user data (None if invalid, expired or revoked)"""
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
+        return jwt_token_cache.verify(token, _decode_jwt_token)
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
@@ -1122,127 +1252,87 @@ def token_required(f):
     
     return decorated
 
+# Idempotency-Key support for save-* routes
+save_idempotent = idempotent(lambda: db.idempotency_collection)
+
+def patient_etag(field='patient_id', arg='patient_id', etag_suffix=None):
+    """Decorator for ETag / If-None-Match support keyed on the patient document version"""
+    return patient_conditional_get(
+        lambda: db.patients_collection,
+        lambda kwargs: {field: kwargs[arg]},
+        etag_suffix=etag_suffix
+    )
+
 # Utility functions
 def generate_patient_id():
-    """Generate unique patient ID with timestamp and random component"""
-    import time
-    timestamp = int(time.time())
-    random_component = uuid.uuid4().hex[:6].upper()
-    return f"PAT{timestamp}{random_component}"
+    """Generate a unique, time-ordered patient ID (no database lookups needed)"""
+    return new_patient_id()
 
 def generate_unique_doctor_id():
-    """Generate a unique doctor ID with format DR + 5 digits."""
-    while True:
-        # Generate DR + 5 random digits
-        doctor_id = "DR" + ''.join(random.choices(string.digits, k=5))
-        
-        # Check if this ID already exists
-        if db.doctors_collection is not None:
-            existing_doctor = db.doctors_collection.find_one({'doctor_id': doctor_id})
-            if not existing_doctor:
-                return doctor_id
-        else:
-            return doctor_id
+    """Generate a unique, time-ordered doctor ID (no database lookups needed)"""
+    return new_doctor_id()
 
 def generate_unique_patient_id():
-    """Generate a unique patient ID that doesn't exist in database"""
-    max_attempts = 10
-    for attempt in range(max_attempts):
-        patient_id = generate_patient_id()
-        
-        # Check if this patient ID already exists
-        if db.patients_collection is not None:
-            existing_patient = db.patients_collection.find_one({"patient_id": patient_id})
-            if existing_patient is None:
-                return patient_id
-        
-        # If we've tried too many times, add a random suffix
-        if attempt == max_attempts - 1:
-            extra_random = uuid.uuid4().hex[:4].upper()
-            patient_id = f"{patient_id}{extra_random}"
-            return patient_id
-    
-    # Fallback: use timestamp with more random components
-    timestamp = int(time.time() * 1000)  # Use milliseconds
-    random_component = uuid.uuid4().hex[:8].upper()
-    return f"PAT{timestamp}{random_component}"
-
-def generate_otp():
-    """Generate 6-digit OTP"""
-    return ''.join(random.choices(string.digits, k=6))
+    """Generate a unique patient ID; IDs from utils.id_generator never collide, so no existence check"""
+    return generate_patient_id()
+
+def build_email_message(sender_email: str, to_email: str, subject: str, body: str) -> MIMEMultipart:
+    """Plain-text email with the headers every outgoing message uses"""
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg['Reply-To'] = sender_email
+    msg['X-Mailer'] = 'Patient Alert System'
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    return msg
 
 def send_email(to_email: str, subject: str, body: str) -> bool:
-    """Send email using Gmail SMTP with detailed debugging"""
+    """Send email using Gmail SMTP"""
     try:
         sender_email = os.getenv("SENDER_EMAIL")
         sender_password = os.getenv("SENDER_PASSWORD")
         
         if not sender_email or not sender_password:
-            print("❌ Email configuration missing - SENDER_EMAIL and SENDER_PASSWORD not set")
-            print("📧 To fix: Set environment variables SENDER_EMAIL and SENDER_PASSWORD")
-            print("📧 For now, OTP will be displayed in the response for testing")
+            logger.error("❌ Email configuration missing - SENDER_EMAIL and SENDER_PASSWORD not set")
             return False
         
-        print(f"📧 EMAIL DEBUG INFO:")
-        print(f"   To: {to_email}")
-        print(f"   From: {sender_email}")
-        print(f"   Subject: {subject}")
-        print(f"   Body length: {len(body)} characters")
-        
-        # Create message with proper headers
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg['Reply-To'] = sender_email
-        msg['X-Mailer'] = 'Patient Alert System'
-        
-        # Add body
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
+        logger.debug("📧 Sending email to=%s subject=%r body_length=%d", to_email, subject, len(body))
         
-        print(f"📧 Connecting to Gmail SMTP...")
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.set_debuglevel(1)  # Enable debug output
+        msg = build_email_message(sender_email, to_email, subject, body)
         
-        print(f"📧 Starting TLS...")
-        server.starttls()
+        with timed('smtp', 'sendmail'):
+            server = smtplib.SMTP('smtp.gmail.com', 587)
+            # smtplib's protocol trace goes straight to stderr; only with LOG_LEVEL=DEBUG
+            server.set_debuglevel(1 if logger.isEnabledFor(logging.DEBUG) else 0)
+            server.starttls()
+            server.login(sender_email, sender_password)
+            result = server.sendmail(sender_email, to_email, msg.as_string())
+            server.quit()
         
-        print(f"📧 Logging in...")
-        server.login(sender_email, sender_password)
-        
-        print(f"📧 Sending email...")
-        text = msg.as_string()
-        result = server.sendmail(sender_email, to_email, text)
-        
-        print(f"📧 Server response: {result}")
-        server.quit()
-        
-        print(f"✅ Email sent successfully to: {to_email}")
-        print(f"📧 Check your email in 1-2 minutes")
+        if result:
+            logger.warning("⚠️ Some recipients were refused: %s", result)
+        logger.info("✅ Email sent successfully to: %s", to_email)
         return True
         
     except smtplib.SMTPAuthenticationError as e:
-        print(f"❌ SMTP Authentication failed: {e}")
-        print(f"📧 Check your email and app password")
+        logger.error("❌ SMTP Authentication failed (check the email and app password): %s", e)
         return False
     except smtplib.SMTPRecipientsRefused as e:
-        print(f"❌ Recipient email refused: {e}")
-        print(f"📧 Check if email address is valid: {to_email}")
+        logger.error("❌ Recipient email refused for %s: %s", to_email, e)
         return False
     except smtplib.SMTPServerDisconnected as e:
-        print(f"❌ SMTP server disconnected: {e}")
-        print(f"📧 Check your internet connection")
+        logger.error("❌ SMTP server disconnected: %s", e)
         return False
     except Exception as e:
-        print(f"❌ Email sending failed: {e}")
-        print(f"📧 Error type: {type(e).__name__}")
-        print(f"📧 Error details: {str(e)}")
+        logger.error("❌ Email sending failed (%s): %s", type(e).__name__, e)
         return False
 
-def send_otp_email(email: str, otp: str) -> bool:
-    """Send OTP email with multiple delivery methods"""
-    subject = "Patient Alert System - OTP Verification"
-    body = f"""
+OTP_EMAIL_SUBJECT = "Patient Alert System - OTP Verification"
+
+def otp_email_body(otp: str) -> str:
+    """Plain-text body of the OTP verification email"""
+    return f"""
     Hello!
     
     Your OTP for Patient Alert System is: {otp}
@@ -1254,6 +1344,11 @@ def send_otp_email(email: str, otp: str) -> bool:
     Best regards,
     Patient Alert System Team
     """
+
+def send_otp_email(email: str, otp: str) -> bool:
+    """Send OTP email with multiple delivery methods"""
+    subject = OTP_EMAIL_SUBJECT
+    body = otp_email_body(otp)
     
     # Try primary email method
     print(f"📧 Attempting to send OTP email to: {email}")
@@ -1263,12 +1358,8 @@ def send_otp_email(email: str, otp: str) -> bool:
         print(f"✅ Primary email method successful")
         return True
     else:
-        print(f"❌ Primary email method failed, trying alternative...")
-        # Try alternative method (for now, just log the OTP)
-        print(f"📧 ALTERNATIVE DELIVERY:")
-        print(f"   Email: {email}")
-        print(f"   OTP: {otp}")
-        print(f"   Please use this OTP for verification")
+        # The OTP itself is never logged; the caller reports the failed delivery
+        logger.warning("❌ OTP email to %s could not be delivered", email)
         return False
 
 def send_patient_id_email(email: str, patient_id: str, username: str) -> bool:
@@ -1391,28 +1482,6 @@ def check_and_send_medication_reminders():
         print(f"❌ Error in medication reminder service: {e}")
         return 0
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash"""
-    try:
-        # Ensure password is string and encode it
-        if isinstance(password, bytes):
-            password = password.decode('utf-8')
-        password_bytes = password.encode('utf-8')
-        
-        # Ensure hashed is string and encode it
-        if isinstance(hashed, bytes):
-            hashed = hashed.decode('utf-8')
-        hashed_bytes = hashed.encode('utf-8')
-        
-        return bcrypt.checkpw(password_bytes, hashed_bytes)
-    except Exception as e:
-        print(f"Password verification error: {e}")
-        return False
-
 def validate_email(email: str) -> bool:
     """Validate email format"""
     email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -1538,24 +1607,20 @@ def signup():
         if db.patients_collection.find_one({"mobile": mobile}):
             return jsonify({"error": "Mobile number already exists"}), 400
         
-        # Generate OTP
-        otp = generate_otp()
+        limited = otp_rate_limiter.check(email)
+        if limited:
+            return limited
         
-        # Store temporary signup data (not a real account yet)
-        temp_signup_data = {
+        # Keep the pending signup with its OTP challenge (not a real account yet);
+        # the patient document is created once the OTP is verified
+        pending_signup = {
             "username": username,
             "email": email,
             "mobile": mobile,
             "password_hash": hash_password(password),
-            "otp": otp,
-            "otp_created_at": datetime.now(),
-            "otp_expires_at": datetime.now() + timedelta(minutes=10),
-            "status": "temp_signup",
             "created_at": datetime.now()
         }
-        
-        # Store in temporary collection or with temp status
-        db.patients_collection.insert_one(temp_signup_data)
+        otp = otp_store.issue(email, PATIENT_SIGNUP, data=pending_signup)
         
         # Send OTP email
         if send_otp_email(email, otp):
@@ -1565,10 +1630,12 @@ def signup():
                 "message": "Please check your email for OTP verification."
             }), 200
         else:
-            # Remove temporary data if email failed
-            db.patients_collection.delete_one({"email": email, "status": "temp_signup"})
+            # Remove the pending signup if email failed
+            otp_store.discard(email, PATIENT_SIGNUP)
             return jsonify({"error": "Failed to send OTP email"}), 500
     
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
 
@@ -1668,25 +1735,14 @@ def send_otp():
         if not email:
             return jsonify({"error": "Email is required"}), 400
         
-        # Check if user exists
-        user = db.patients_collection.find_one({"email": email})
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-        
-        # Generate OTP
-        otp = generate_otp()
+        limited = otp_rate_limiter.check(email)
+        if limited:
+            return limited
         
-        # Store OTP in database (with expiration)
-        db.patients_collection.update_one(
-            {"email": email},
-            {
-                "$set": {
-                    "otp": otp,
-                    "otp_created_at": datetime.now(),
-                    "otp_expires_at": datetime.now() + timedelta(minutes=10)
-                }
-            }
-        )
+        # New OTP for the pending signup (replaces the previous one)
+        otp = otp_store.reissue(email, PATIENT_SIGNUP)
+        if otp is None:
+            return jsonify({"error": "No pending signup found for this email"}), 404
         
         # Send OTP email
         if send_otp_email(email, otp):
@@ -1714,6 +1770,10 @@ def doctor_send_otp():
         if not email:
             return jsonify({"error": "Email is required"}), 400
         
+        limited = otp_rate_limiter.check(email)
+        if limited:
+            return limited
+        
         if purpose == 'signup':
             # Check if there's a pending signup for this email
             pending_signup = db.temp_otp_collection.find_one({'email': email})
@@ -1732,8 +1792,7 @@ def doctor_send_otp():
             # Generate JWT-based OTP with original signup data
             try:
                 otp, jwt_token = generate_otp_jwt(email, 'doctor_signup', signup_data)
-                print(f"🔐 Generated JWT OTP: {otp} for email: {email}")
-                print(f"🔐 JWT Token: {jwt_token[:50]}...")
+                logger.info("🔐 Generated JWT OTP for email: %s", email)
             except Exception as e:
                 return jsonify({
                     "error": f"Failed to generate OTP: {str(e)}"
@@ -1763,31 +1822,16 @@ def doctor_send_otp():
             if not doctor:
                 return jsonify({'error': 'Doctor not found'}), 404
             
-            # Generate and send OTP for password reset
-            otp = generate_otp()
+            # Generate and send OTP for password reset (checked by /doctor-reset-password)
+            otp = otp_store.issue(doctor['email'], DOCTOR_PASSWORD_RESET)
             if send_otp_email(email, otp):
-                # Store OTP for password reset
-                otp_document = {
-                    'email': email,
-                    'otp': otp,
-                    'otp_purpose': 'password_reset',
-                    'otp_created_at': datetime.utcnow(),
-                    'otp_expires_at': datetime.utcnow() + timedelta(minutes=10),
-                    'is_otp_document': True
-                }
-                
-                # Remove any existing OTPs for this email and purpose
-                db.doctors_collection.delete_many({'email': email, 'otp_purpose': purpose})
-                
-                # Store new OTP
-                db.doctors_collection.insert_one(otp_document)
-                
                 return jsonify({
                     'success': True,
                     'message': 'OTP sent successfully for password reset',
                     'email': email
                 }), 200
             else:
+                otp_store.discard(doctor['email'], DOCTOR_PASSWORD_RESET)
                 return jsonify({'error': 'Failed to send OTP'}), 500
         else:
             return jsonify({'error': 'Invalid purpose. Use "signup" or "password_reset"'}), 400
@@ -1815,39 +1859,31 @@ def verify_otp():
         if db.patients_collection is None:
             return jsonify({"error": "Database not connected"}), 500
         
-        # Find temporary signup data by email
-        temp_user = db.patients_collection.find_one({"email": email, "status": "temp_signup"})
-        if not temp_user:
-            return jsonify({"error": "No pending signup found for this email"}), 404
-        
-        # Check OTP
-        if temp_user.get("otp") != otp:
-            return jsonify({"error": "Invalid OTP"}), 400
-        
-        # Check if OTP expired
-        if temp_user.get("otp_expires_at") < datetime.now():
-            return jsonify({"error": "OTP has expired"}), 400
+        # Check the OTP against the pending signup (consumes it on success)
+        verification = otp_store.verify(email, PATIENT_SIGNUP, otp)
+        if not verification['success']:
+            if verification['code'] == 'NOT_FOUND':
+                return jsonify({"error": "No pending signup found for this email"}), 404
+            return jsonify({"error": verification['error'], "code": verification['code']}), 400
+        temp_user = verification['data']
         
         # Generate unique patient ID for actual account
         patient_id = generate_unique_patient_id()
         
-        # Create actual account by updating the temporary data
-        db.patients_collection.update_one(
-            {"email": email, "status": "temp_signup"},
-            {
-                "$set": {
-                    "patient_id": patient_id,
-                    "status": "active",
-                    "email_verified": True,
-                    "verified_at": datetime.now()
-                },
-                "$unset": {
-                    "otp": "",
-                    "otp_created_at": "",
-                    "otp_expires_at": ""
-                }
-            }
-        )
+        # Create the actual account from the pending signup
+        patient_document = {
+            **temp_user,
+            "patient_id": patient_id,
+            "status": "active",
+            "email_verified": True,
+            "verified_at": datetime.now(),
+            "version": 1
+        }
+        patient_document.update(patient_search_fields(patient_document))
+        try:
+            db.patients_collection.insert_one(patient_document)
+        except pymongo.errors.DuplicateKeyError:
+            return jsonify({"error": "Email or mobile number already exists"}), 400
         
         # Send Patient ID email
         send_patient_id_email(email, patient_id, temp_user["username"])
@@ -1889,12 +1925,11 @@ def doctor_verify_otp():
         if not jwt_token:
             return jsonify({"error": "JWT token is required"}), 400
         
-        print(f"🔍 Verifying JWT OTP for email: {email}, OTP: {otp}")
-        print(f"🔍 JWT Token: {jwt_token[:50]}...")
+        logger.info("🔍 Verifying JWT OTP for email: %s", email)
         
         # Verify JWT OTP
         verification_result = verify_otp_jwt(jwt_token, otp, email)
-        print(f"🔍 JWT Verification Result: {verification_result}")
+        print(f"🔍 JWT Verification success: {verification_result['success']}")
         
         if not verification_result['success']:
             return jsonify({
@@ -1908,18 +1943,10 @@ def doctor_verify_otp():
             return jsonify({"error": "Signup data not found in JWT"}), 400
         
         # Hash password
-        hashed_password = bcrypt.hashpw(signup_data['password'].encode('utf-8'), bcrypt.gensalt())
+        hashed_password = hash_password(signup_data['password'])
         
         # Generate unique doctor_id
-        import random
-        timestamp = int(time.time())
-        random_suffix = random.randint(1000, 9999)
-        doctor_id = f"D{timestamp}{random_suffix}"
-        
-        # Ensure doctor_id is unique
-        while db.doctors_collection.find_one({"doctor_id": doctor_id}):
-            random_suffix = random.randint(1000, 9999)
-            doctor_id = f"D{timestamp}{random_suffix}"
+        doctor_id = generate_unique_doctor_id()
         
         # Create new doctor account
         doctor_document = {
@@ -1935,6 +1962,7 @@ def doctor_verify_otp():
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        doctor_document.update(doctor_search_fields(doctor_document))
         
         # Insert new doctor document
         result = db.doctors_collection.insert_one(doctor_document)
@@ -1973,6 +2001,8 @@ def doctor_verify_otp():
         else:
             return jsonify({'error': 'Failed to create doctor account'}), 500
         
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
@@ -1989,6 +2019,10 @@ def resend_otp():
         
         print(f"🔍 Resend OTP request for email: {email}, role: {role}")
         
+        limited = otp_rate_limiter.check(email)
+        if limited:
+            return limited
+        
         # Check if there's a pending signup for this email
         pending_signup = db.temp_otp_collection.find_one({'email': email})
         
@@ -2012,7 +2046,7 @@ def resend_otp():
                 "error": f"Failed to generate OTP: {str(e)}"
             }), 500
         
-        print(f"🔐 Generated new OTP: {otp} for email: {email}")
+        logger.info("🔐 Generated new OTP for email: %s", email)
         
         # Send OTP email
         email_sent = send_otp_email(email, otp)
@@ -2109,6 +2143,7 @@ def doctor_complete_profile():
         )
         
         if result.modified_count > 0:
+            refresh_doctor_search_fields(db.doctors_collection, doctor_id)
             # Generate final JWT token
             doctor_data = {
                 'doctor_id': doctor_id,
@@ -2249,6 +2284,7 @@ def update_doctor_profile(doctor_id):
         )
         
         if result.modified_count > 0:
+            refresh_doctor_search_fields(db.doctors_collection, doctor_id)
             # Get updated doctor data
             updated_doctor = db.doctors_collection.find_one({'doctor_id': doctor_id})
             
@@ -2368,10 +2404,11 @@ def login():
         
         # Otherwise, proceed with patient login
         # Check database connection and attempt reconnection if needed
-        if not db.is_connected():
+        if not database_available():
             print("⚠️ Database not connected during login, attempting reconnection...")
             if not db.reconnect():
                 return jsonify({"error": "Database connection error - unable to reconnect"}), 503
+            health_monitor.refresh('mongodb')
         
         if db.patients_collection is None:
             return jsonify({"error": "Database not connected"}), 500
@@ -2388,9 +2425,12 @@ def login():
         if user.get("status") != "active":
             return jsonify({"error": "Account not activated. Please verify your email."}), 401
         
-        # Verify password
-        if not verify_password(password, user["password_hash"]):
+        # Verify password (upgrading the stored hash if its bcrypt cost is outdated)
+        password_ok, new_password_hash = verify_and_rehash(password, user["password_hash"])
+        if not password_ok:
             return jsonify({"error": "Invalid credentials"}), 401
+        if new_password_hash:
+            db.patients_collection.update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_password_hash}})
         
         # Check profile completion
         profile_complete = is_profile_complete(user)
@@ -2438,6 +2478,8 @@ def login():
             "message": "Login successful" if profile_complete else "Login successful. Please complete your profile."
         }), 200
     
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": f"Login failed: {str(e)}"}), 500
 
@@ -2446,10 +2488,11 @@ def doctor_login():
     """Login doctor with email and password"""
     try:
         # Check database connection and attempt reconnection if needed
-        if not db.is_connected():
+        if not database_available():
             print("⚠️ Database not connected during doctor login, attempting reconnection...")
             if not db.reconnect():
                 return jsonify({"error": "Database connection error - unable to reconnect"}), 503
+            health_monitor.refresh('mongodb')
         
         if db.doctors_collection is None:
             return jsonify({"error": "Database not connected"}), 500
@@ -2477,9 +2520,12 @@ def doctor_login():
         if doctor.get("status") != "active":
             return jsonify({"error": "Account not activated. Please contact admin."}), 401
         
-        # Verify password
-        if not verify_password(password, doctor["password_hash"]):
+        # Verify password (upgrading the stored hash if its bcrypt cost is outdated)
+        password_ok, new_password_hash = verify_and_rehash(password, doctor["password_hash"])
+        if not password_ok:
             return jsonify({"error": "Invalid credentials"}), 401
+        if new_password_hash:
+            db.doctors_collection.update_one({"_id": doctor["_id"]}, {"$set": {"password_hash": new_password_hash}})
         
         # Debug logging
         print(f"🔍 Doctor Login Debug - Doctor Data:")
@@ -2524,6 +2570,8 @@ def doctor_login():
             "message": "Doctor login successful"
         }), 200
     
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": f"Doctor login failed: {str(e)}"}), 500
 
@@ -2646,6 +2694,7 @@ def get_doctor_dashboard_stats():
 
 @app.route('/doctor/patient/<patient_id>', methods=['GET'])
 @token_required
+@patient_etag()
 def get_patient_details_for_doctor(patient_id):
     """Get detailed patient information for doctor"""
     try:
@@ -2812,7 +2861,7 @@ def create_appointment():
         # Add appointment to patient's appointments array
         result = db.patients_collection.update_one(
             {"patient_id": data["patient_id"]},
-            {"$push": {"appointments": appointment}}
+            {"$push": {"appointments": stamp(appointment)}, "$inc": {"version": 1}}
         )
         
         if result.modified_count > 0:
@@ -2854,11 +2903,12 @@ def update_appointment(appointment_id):
         
         if update_fields:
             update_fields["appointments.$.updated_at"] = datetime.now().isoformat()
+            update_fields["appointments.$.sync_seq"] = next_sync_seq()
             
             # Update the specific appointment in the array
             result = db.patients_collection.update_one(
                 {"appointments.appointment_id": appointment_id},
-                {"$set": update_fields}
+                {"$set": update_fields, "$inc": {"version": 1}}
             )
             
             if result.modified_count > 0:
@@ -2893,7 +2943,11 @@ def delete_appointment(appointment_id):
         # HARD DELETE - completely remove the appointment from the array
         result = db.patients_collection.update_one(
             {"appointments.appointment_id": appointment_id},
-            {"$pull": {"appointments": {"appointment_id": appointment_id}}}
+            {
+                "$pull": {"appointments": {"appointment_id": appointment_id}},
+                "$push": {"sync_tombstones": tombstone("appointments", appointment_id)},
+                "$inc": {"version": 1}
+            }
         )
         
         if result.modified_count > 0:
@@ -2931,10 +2985,19 @@ def logout():
         # End user session
         ended_sessions = activity_tracker.end_user_session(user_email, session_id)
         
+        # Revoke the bearer token so cached verifications stop accepting it
+        token_revoked = False
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            payload = verify_jwt_token(auth_header[len('Bearer '):].strip())
+            if payload:
+                token_revoked = revoke_claims(payload)
+        
         return jsonify({
             "success": True,
             "message": "Logout successful",
-            "ended_sessions": ended_sessions
+            "ended_sessions": ended_sessions,
+            "token_revoked": token_revoked
         }), 200
         
     except Exception as e:
@@ -2969,20 +3032,12 @@ def forgot_password():
         
         email = user["email"]
         
-        # Generate OTP
-        otp = generate_otp()
+        limited = otp_rate_limiter.check(email)
+        if limited:
+            return limited
         
-        # Store OTP
-        db.patients_collection.update_one(
-            {"_id": user["_id"]},
-            {
-                "$set": {
-                    "reset_otp": otp,
-                    "reset_otp_created_at": datetime.now(),
-                    "reset_otp_expires_at": datetime.now() + timedelta(minutes=10)
-                }
-            }
-        )
+        # Generate OTP (stored hashed in otp_challenges, not on the patient document)
+        otp = otp_store.issue(email, PATIENT_PASSWORD_RESET)
         
         # Send OTP email
         if send_otp_email(email, otp):
@@ -2991,6 +3046,7 @@ def forgot_password():
                 "email": email
             }), 200
         else:
+            otp_store.discard(email, PATIENT_PASSWORD_RESET)
             return jsonify({"error": "Failed to send OTP email"}), 500
     
     except Exception as e:
@@ -3037,23 +3093,12 @@ def doctor_forgot_password():
                     }), 500
                 return jsonify({"error": "Doctor not found"}), 404
         
-        # Generate and send OTP for password reset
-        otp = generate_otp()
-        
-        # Update the existing doctor document with OTP information
-        update_result = db.doctors_collection.update_one(
-            {'email': doctor['email']},
-            {'$set': {
-                'reset_otp': otp,
-                'reset_otp_purpose': 'password_reset',
-                'reset_otp_created_at': datetime.utcnow(),
-                'reset_otp_expires_at': datetime.utcnow() + timedelta(minutes=10),
-                'updated_at': datetime.utcnow()
-            }}
-        )
+        limited = otp_rate_limiter.check(doctor['email'])
+        if limited:
+            return limited
         
-        if update_result.modified_count == 0:
-            return jsonify({"error": "Failed to update doctor record"}), 500
+        # Generate and send OTP for password reset (stored hashed in otp_challenges)
+        otp = otp_store.issue(doctor['email'], DOCTOR_PASSWORD_RESET)
         
         # Send OTP email
         if send_otp_email(doctor['email'], otp):
@@ -3063,6 +3108,7 @@ def doctor_forgot_password():
                 'email': doctor['email']
             }), 200
         else:
+            otp_store.discard(doctor['email'], DOCTOR_PASSWORD_RESET)
             return jsonify({"error": "Failed to send OTP email"}), 500
         
     except Exception as e:
@@ -3088,13 +3134,10 @@ def reset_password():
         if not user:
             return jsonify({"error": "User not found"}), 404
         
-        # Check OTP
-        if user.get("reset_otp") != otp:
-            return jsonify({"error": "Invalid OTP"}), 400
-        
-        # Check if OTP expired
-        if user.get("reset_otp_expires_at") < datetime.now():
-            return jsonify({"error": "OTP has expired"}), 400
+        # Check OTP (consumed on success)
+        verification = otp_store.verify(user["email"], PATIENT_PASSWORD_RESET, otp)
+        if not verification['success']:
+            return jsonify({"error": verification['error'], "code": verification['code']}), 400
         
         # Hash new password
         new_hashed_password = hash_password(new_password)
@@ -3111,7 +3154,8 @@ def reset_password():
                     "reset_otp": "",
                     "reset_otp_created_at": "",
                     "reset_otp_expires_at": ""
-                }
+                },
+                "$inc": {"version": 1}
             }
         )
         
@@ -3124,6 +3168,8 @@ def reset_password():
             "message": "Password reset successfully"
         }), 200
     
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": f"Password reset failed: {str(e)}"}), 500
 
@@ -3170,16 +3216,13 @@ def doctor_reset_password():
                     }), 500
                 return jsonify({"error": "Doctor not found"}), 404
         
-        # Check if OTP matches and is valid
-        if doctor.get('reset_otp') != otp:
-            return jsonify({"error": "Invalid OTP"}), 400
-        
-        # Check if OTP has expired
-        if datetime.utcnow() > doctor.get('reset_otp_expires_at', datetime.min):
-            return jsonify({"error": "OTP has expired"}), 400
+        # Check OTP (consumed on success)
+        verification = otp_store.verify(doctor['email'], DOCTOR_PASSWORD_RESET, otp)
+        if not verification['success']:
+            return jsonify({"error": verification['error'], "code": verification['code']}), 400
         
         # Hash new password
-        hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = hash_password(new_password)
         
         # Update password and clean up OTP fields in doctor document
         result = db.doctors_collection.update_one(
@@ -3208,6 +3251,8 @@ def doctor_reset_password():
         else:
             return jsonify({"error": "Failed to reset password"}), 500
         
+    except PasswordHasherBusy as e:
+        return password_busy_response(e)
     except Exception as e:
         return jsonify({"error": f"Password reset failed: {str(e)}"}), 500
 
@@ -3293,15 +3338,17 @@ def complete_profile():
             "pregnancy_week": calculated_pregnancy_week if is_pregnant else None,
             "expected_delivery_date": calculated_expected_delivery if is_pregnant else None,
             "emergency_contact": emergency_contact,
-            "profile_completed_at": datetime.now()
+            "profile_completed_at": datetime.now(),
+            "profile_sync_seq": next_sync_seq()
         }
         
         # Remove None values
         update_data = {k: v for k, v in update_data.items() if v is not None}
+        update_data.update(patient_search_fields({**user, **update_data}))
         
         db.patients_collection.update_one(
             {"patient_id": patient_id},
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"version": 1}}
         )
         
         return jsonify({
@@ -3338,6 +3385,7 @@ def verify_token():
         return jsonify({"error": f"Token verification failed: {str(e)}"}), 500
 
 @app.route('/profile/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_profile(patient_id):
     """Get patient profile information"""
     try:
@@ -3369,13 +3417,14 @@ def get_profile(patient_id):
         return jsonify({"error": f"Failed to get profile: {str(e)}"}), 500
 
 @app.route('/save-sleep-log', methods=['POST'])
+@save_idempotent
 def save_sleep_log():
     """Save sleep log data to MongoDB"""
     try:
         data = request.get_json()
         
         # Debug logging
-        print(f"🔍 Received sleep log data: {json.dumps(data, indent=2)}")
+        log_payload(logger, "🔍 Received sleep log data", data)
         
         # Validate required fields
         required_fields = ['userId', 'userRole', 'startTime', 'endTime', 'totalSleep', 'sleepRating']
@@ -3465,8 +3514,9 @@ def save_sleep_log():
             result = db.patients_collection.update_one(
                 {"patient_id": patient_id},
                 {
-                    "$push": {"sleep_logs": sleep_log_entry},
-                    "$set": {"last_updated": datetime.now()}
+                    "$push": {"sleep_logs": stamp(sleep_log_entry)},
+                    "$set": {"last_updated": datetime.now()},
+                    "$inc": {"version": 1}
                 }
             )
             
@@ -3536,6 +3586,7 @@ def get_sleep_logs(username):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/get-sleep-logs-by-email/<email>', methods=['GET'])
+@patient_etag('email', 'email')
 def get_sleep_logs_by_email(email):
     """Get sleep logs for a specific user by email"""
     try:
@@ -3575,51 +3626,52 @@ def get_sleep_logs_by_email(email):
         print(f"Error retrieving sleep logs by email: {e}")
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
+COMPLETE_PROFILE_FIELDS = [
+    'patient_id', 'username', 'email', 'mobile', 'first_name', 'last_name', 'age',
+    'blood_type', 'weight', 'height', 'is_pregnant', 'last_period_date', 'pregnancy_week',
+    'expected_delivery_date', 'emergency_contact', 'preferences', 'profile_completed_at',
+    'last_updated'
+]
+COMPLETE_PROFILE_SECTIONS = [
+    'sleep_logs', 'food_logs', 'medication_logs', 'symptom_logs', 'mental_health_logs', 'kick_count_logs'
+]
+
 @app.route('/patient-complete-profile/<email>', methods=['GET'])
+@patient_etag('email', 'email')
 def get_patient_complete_profile(email):
-    """Get complete patient profile including all health data"""
+    """Get complete patient profile including all health data
+    
+    Optional ``include`` (or ``fields``) query parameter selects which health
+    arrays are returned, e.g. ``include=sleep_logs,food_logs``. Use
+    ``include=summary`` to get only the per-array counts.
+    """
     try:
-        # Find patient by email
-        patient = db.patients_collection.find_one({"email": email})
+        try:
+            sections = parse_sections(request.args, COMPLETE_PROFILE_SECTIONS)
+        except SectionProjectionError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        # Find patient by email, projecting only the requested arrays
+        patient = fetch_sections(
+            db.patients_collection, {"email": email},
+            COMPLETE_PROFILE_FIELDS, COMPLETE_PROFILE_SECTIONS, sections
+        )
         if not patient:
             return jsonify({'success': False, 'message': 'Patient not found with this email'}), 404
         
-        # Return complete patient profile with all data
-        complete_profile = {
-            'success': True,
-            'patient_id': patient.get('patient_id'),
-            'username': patient.get('username'),
-            'email': patient.get('email'),
-            'mobile': patient.get('mobile'),
-            'first_name': patient.get('first_name'),
-            'last_name': patient.get('last_name'),
-            'age': patient.get('age'),
-            'blood_type': patient.get('blood_type'),
-            'weight': patient.get('weight'),
-            'height': patient.get('height'),
-            'is_pregnant': patient.get('is_pregnant'),
-            'last_period_date': patient.get('last_period_date'),
-            'pregnancy_week': patient.get('pregnancy_week'),
-            'expected_delivery_date': patient.get('expected_delivery_date'),
-            'emergency_contact': patient.get('emergency_contact'),
-            'preferences': patient.get('preferences'),
-            'profile_completed_at': patient.get('profile_completed_at'),
-            'last_updated': patient.get('last_updated'),
-            'health_data': {
-                'sleep_logs': patient.get('sleep_logs', []),
-                'sleep_logs_count': len(patient.get('sleep_logs', [])),
-                'food_logs': patient.get('food_logs', []),
-                'food_logs_count': len(patient.get('food_logs', [])),
-                'medication_logs': patient.get('medication_logs', []),
-                'medication_logs_count': len(patient.get('medication_logs', [])),
-                'symptom_logs': patient.get('symptom_logs', []),
-                'symptom_logs_count': len(patient.get('symptom_logs', [])),
-                'mental_health_logs': patient.get('mental_health_logs', []),
-                'mental_health_logs_count': len(patient.get('mental_health_logs', [])),
-                'kick_count_logs': patient.get('kick_count_logs', []),
-                'kick_count_logs_count': len(patient.get('kick_count_logs', [])),
-            }
-        }
+        counts = patient.get('_counts', {})
+        health_data = {}
+        for section in COMPLETE_PROFILE_SECTIONS:
+            if section in sections:
+                health_data[section] = patient.get(section, [])
+            health_data[f'{section}_count'] = counts.get(section, 0)
+        
+        # Return complete patient profile with the requested data
+        complete_profile = {'success': True}
+        for field in COMPLETE_PROFILE_FIELDS:
+            complete_profile[field] = patient.get(field)
+        complete_profile['health_data'] = health_data
+        complete_profile['included_sections'] = [name for name in COMPLETE_PROFILE_SECTIONS if name in sections]
         
         return jsonify(complete_profile), 200
         
@@ -3627,6 +3679,57 @@ def get_patient_complete_profile(email):
         print(f"Error retrieving complete patient profile: {e}")
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
+SYNC_SECTIONS = [
+    'sleep_logs', 'kick_count_logs', 'food_logs', 'food_data', 'symptom_logs', 'symptom_analysis_reports',
+    'medication_logs', 'tablet_tracking', 'medication_daily_tracking', 'prescriptions',
+    'mental_health_logs', 'appointments'
+]
+
+@app.route('/sync', methods=['GET'])
+@token_required
+def sync_patient_data():
+    """Return the patient's log entries, profile fields and appointments changed since a sync token
+
+    Query parameters:
+        since - ``next_token`` from the previous sync (omit for a full sync)
+        limit - maximum number of changes per page (default 100)
+
+    Keep calling with the returned ``next_token`` while ``has_more`` is true,
+    then store it for the next sync.
+    """
+    try:
+        if db.patients_collection is None:
+            return jsonify({'success': False, 'message': 'Database not connected'}), 500
+
+        patient_id = request.user_data.get('patient_id')
+        if not patient_id:
+            return jsonify({'success': False, 'message': 'Patient ID not found in token'}), 400
+
+        try:
+            params = parse_sync_params(request.args)
+        except HistoryQueryError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        result = query_changes(
+            db.patients_collection, {"patient_id": patient_id},
+            SYNC_SECTIONS, COMPLETE_PROFILE_FIELDS, params
+        )
+        if result is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+
+        print(f"🔄 Sync for {patient_id}: {result['change_count']} changes, has_more={result['has_more']}")
+
+        return jsonify({
+            'success': True,
+            'patient_id': patient_id,
+            'full_sync': not request.args.get('since'),
+            **result
+        }), 200
+
+    except Exception as e:
+        print(f"Error syncing patient data: {e}")
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+
 # User Activity Management Endpoints
 @app.route('/user-activities/<email>', methods=['GET'])
 def get_user_activities(email):
@@ -3722,14 +3825,63 @@ def get_active_sessions(email):
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
+@app.route('/patient/<patient_id>/logs:batch', methods=['POST'])
+@save_idempotent
+def save_logs_batch(patient_id):
+    """Save a mixed batch of sleep, kick, food, tablet and mood entries in one update
+
+    Body: {"items": [{"type": "sleep|kick|food|tablet|mood", "idempotency_key": "...", "data": {...}}]}
+    ``data`` takes the same fields as the matching single-entry route. Items
+    whose idempotency_key is already stored come back as ``duplicate``, so an
+    offline replay can safely resend the whole batch.
+    """
+    try:
+        if db.patients_collection is None:
+            return jsonify({'success': False, 'message': 'Database not connected'}), 500
+
+        data = request.get_json(silent=True) or {}
+        try:
+            prepared = validate_batch(data.get('items'))
+        except LogBatchError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+
+        outcome = apply_log_batch(db.patients_collection, db.mental_health_collection, patient_id, prepared)
+        if outcome is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+
+        results = outcome['results']
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        print(f"📦 Log batch for {patient_id}: {counts}")
+
+        if outcome['created']:
+            activity_tracker.log_activity(
+                user_email=outcome['email'],
+                activity_type="log_batch_saved",
+                activity_data={"patient_id": patient_id, "counts": counts}
+            )
+
+        return jsonify({
+            'success': counts.get('invalid', 0) == 0 and counts.get('conflict', 0) == 0,
+            'patientId': patient_id,
+            'results': results,
+            'counts': counts
+        }), 200
+
+    except Exception as e:
+        print(f"Error saving log batch: {e}")
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+
 @app.route('/save-kick-session', methods=['POST'])
+@save_idempotent
 def save_kick_session():
     """Save kick session data to MongoDB"""
     try:
         data = request.get_json()
         
         # Debug logging
-        print(f"🔍 Received kick session data: {json.dumps(data, indent=2)}")
+        log_payload(logger, "🔍 Received kick session data", data)
         
         # Validate required fields
         required_fields = ['userId', 'userRole', 'kickCount', 'sessionDuration']
@@ -3774,8 +3926,9 @@ def save_kick_session():
         result = db.patients_collection.update_one(
             {"patient_id": patient_id},
             {
-                "$push": {"kick_count_logs": kick_session_entry},
-                "$set": {"last_updated": datetime.now()}
+                "$push": {"kick_count_logs": stamp(kick_session_entry)},
+                "$set": {"last_updated": datetime.now()},
+                "$inc": {"version": 1}
             }
         )
         
@@ -3809,26 +3962,23 @@ def save_kick_session():
 # Removed duplicate kick count endpoint - using the new organized one at /kick-count/get-kick-history/
 
 @app.route('/get-food-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_food_history(patient_id):
     """Get food history for a specific patient"""
     try:
         print(f"🔍 Getting food history for patient ID: {patient_id}")
         
-        # Find patient by Patient ID
-        patient = db.patients_collection.find_one({"patient_id": patient_id})
-        if not patient:
-            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
-        
-        # Get food logs from patient document
-        food_logs = patient.get('food_logs', [])
+        try:
+            params = parse_history_params(request.args, key_type='date')
+        except HistoryQueryError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Sort by newest first
-        food_logs.sort(key=lambda x: x.get('createdAt', datetime.min), reverse=True)
+        # Get food logs from patient document, newest first, sliced in Mongo
+        page = query_history(db.patients_collection, {"patient_id": patient_id}, 'food_logs', 'createdAt', params)
+        if page is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
         
-        # Convert datetime objects to strings for JSON serialization
-        for entry in food_logs:
-            if 'createdAt' in entry:
-                entry['createdAt'] = entry['createdAt'].isoformat()
+        food_logs = page['entries']
         
         print(f"✅ Retrieved {len(food_logs)} food entries for patient: {patient_id}")
         
@@ -3836,7 +3986,10 @@ def get_food_history(patient_id):
             'success': True,
             'patientId': patient_id,
             'food_logs': food_logs,
-            'totalEntries': len(food_logs)
+            'totalEntries': len(food_logs),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
         }), 200
         
     except Exception as e:
@@ -3932,97 +4085,27 @@ def get_symptom_assistance():
                 'message': 'Symptom description is required'
             }), 400
         
-        # Auto-fetch pregnancy week from patient profile if not provided
-        if not weeks_pregnant and patient_id:
-            try:
-                patient = db.patients_collection.find_one({"patient_id": patient_id})
-                if patient and patient.get('pregnancy_week'):
-                    weeks_pregnant = patient['pregnancy_week']
-                    print(f"✅ Auto-fetched pregnancy week: {weeks_pregnant}")
-            except Exception as e:
-                print(f"⚠️ Error fetching pregnancy week: {e}")
-        
-        # Determine trimester
-        if weeks_pregnant <= 12:
-            trimester = "First Trimester"
-        elif weeks_pregnant <= 26:
-            trimester = "Second Trimester"
-        else:
-            trimester = "Third Trimester"
-            
-        print(f"🔍 Analyzing symptoms: '{symptom_text}' for week {weeks_pregnant} ({trimester})")
-        
-        # Step 1: Try quantum vector search for knowledge base retrieval
-        suggestions = []
-        if quantum_service.client and quantum_service.embedding_model:
-            print("🔬 Using quantum vector search...")
-            suggestions = quantum_service.search_knowledge(symptom_text, weeks_pregnant)
-            print(f"✅ Found {len(suggestions)} suggestions from knowledge base")
-        else:
-            print("⚠️ Quantum vector search not available")
-        
-        # Step 2: Generate response based on search results
-        if suggestions:
-            # Use LLM to synthesize a summary from retrieved suggestions
-            print("🤖 Using LLM to synthesize recommendations...")
-            summary = llm_service.summarize_retrieval(symptom_text, weeks_pregnant, suggestions)
-            
-            if summary:
-                # Return synthesized summary
-                response_text = summary.get("text", "")
-                response_source = "quantum_llm_synthesis"
-                print("✅ LLM synthesis successful")
-            else:
-                # Fallback to safe guidance
-                print("⚠️ LLM synthesis failed, using safe fallback")
-                fallback = llm_service.generate_llm_fallback(symptom_text, weeks_pregnant)
-                response_text = fallback.get("suggestions", [{}])[0].get("text", "")
-                response_source = "quantum_safe_fallback"
-        else:
-            # No suggestions found, use LLM fallback
-            print("⚠️ No knowledge base suggestions, using LLM fallback")
-            fallback = llm_service.generate_llm_fallback(symptom_text, weeks_pregnant)
-            response_text = fallback.get("suggestions", [{}])[0].get("text", "")
-            response_source = "llm_fallback"
-        
-        # Step 3: Detect red flags for safety
-        red_flags = llm_service.detect_red_flags(symptom_text)
-        
-        # Step 4: Generate additional recommendations
-        additional_recommendations = generate_symptom_recommendations(symptom_text, weeks_pregnant, trimester)
+        try:
+            body, results = answer_symptom_query(symptom_text, weeks_pregnant, patient_id, request.headers)
+        except AdmissionRejected as e:
+            print(f"🚦 llm pool rejected /symptoms/assist ({e.ticket.outcome}, retry in {e.ticket.retry_after}s)")
+            return rate_limited_response(e.ticket.retry_after, 'Server is busy with similar requests, please try again shortly')
         
         # Log the symptom consultation
         if patient_id:
             try:
+                patient = results['patient']
                 activity_tracker.log_activity(
                     user_email=patient.get('email') if patient else None,
                     activity_type="symptom_consultation",
-                    activity_data={
-                        "symptom_text": symptom_text,
-                        "pregnancy_week": weeks_pregnant,
-                        "trimester": trimester,
-                        "patient_id": patient_id,
-                        "analysis_method": response_source,
-                        "red_flags_detected": red_flags,
-                        "suggestions_count": len(suggestions)
-                    }
+                    activity_data=symptom_activity_data(body, patient_id)
                 )
             except Exception as e:
                 print(f"⚠️ Warning: Could not log symptom consultation activity: {e}")
         
-        return jsonify({
-            'success': True,
-            'symptom_text': symptom_text,
-            'pregnancy_week': weeks_pregnant,
-            'trimester': trimester,
-            'analysis_method': response_source,
-            'primary_recommendation': response_text,
-            'additional_recommendations': additional_recommendations,
-            'red_flags_detected': red_flags,
-            'knowledge_base_suggestions': len(suggestions),
-            'disclaimer': DISCLAIMER_TEXT,
-            'timestamp': datetime.now().isoformat()
-        }), 200
+        response = jsonify(body)
+        response.headers['Server-Timing'] = results.server_timing()
+        return response, 200
         
     except Exception as e:
         print(f"Error getting symptom assistance: {e}")
@@ -4031,65 +4114,176 @@ def get_symptom_assistance():
             'message': f'Error: {str(e)}'
         }), 500
 
-def generate_symptom_recommendations(symptom_text, weeks_pregnant, trimester):
-    """Generate symptom-specific recommendations based on pregnancy week and trimester"""
-    symptom_lower = symptom_text.lower()
-    recommendations = []
+def answer_symptom_query(symptom_text, weeks_pregnant, patient_id, headers=None):
+    """
+    Run the symptom pipeline and build the /symptoms/assist response body.
     
-    # Common pregnancy symptoms and recommendations
-    if any(word in symptom_lower for word in ['nausea', 'morning sickness', 'vomiting']):
-        recommendations.extend([
-            "Eat small, frequent meals throughout the day",
-            "Avoid spicy, greasy, or strong-smelling foods",
-            "Try ginger tea or ginger candies",
-            "Stay hydrated with small sips of water",
-            "Eat crackers or dry toast before getting out of bed"
-        ])
+    The answer is the LLM synthesis of the knowledge base hits, else the LLM
+    fallback, else static guidance when neither arrived within the deadline.
+    Shared by this route and app_async, which calls it in a thread.
     
-    if any(word in symptom_lower for word in ['fatigue', 'tired', 'exhausted']):
-        recommendations.extend([
-            "Get plenty of rest and sleep",
-            "Take short naps during the day",
-            "Maintain a regular sleep schedule",
-            "Stay hydrated and eat nutritious foods",
-            "Listen to your body and rest when needed"
-        ])
+    Returns (body, stage results). Raises AdmissionRejected when there is no
+    answer because the llm pool refused the LLM stages.
+    """
+    # Independent steps run concurrently; the LLM fallback starts speculatively
+    # when vector search is slow, and the first valid answer is returned.
+    # The LLM stages take their own llm admission slots (see run_symptom_pipeline).
+    results, rejected = run_symptom_pipeline(symptom_text, weeks_pregnant, patient_id, headers)
+    weeks_pregnant, trimester = results['context']
+    suggestions = results['search']
     
-    if any(word in symptom_lower for word in ['back pain', 'backache', 'lower back']):
-        recommendations.extend([
-            "Practice good posture",
-            "Use proper body mechanics when lifting",
-            "Try gentle stretching exercises",
-            "Consider prenatal yoga or swimming",
-            "Use a pregnancy pillow for support while sleeping"
-        ])
+    synthesis = results['synthesis']
+    if synthesis and (not results.ok('fallback') or results.finished_before('synthesis', 'fallback')):
+        response_text = synthesis.get("text", "")
+        response_source = "quantum_llm_synthesis"
+        print("✅ LLM synthesis successful")
+    elif results.ok('fallback'):
+        response_text = results['fallback'].get("suggestions", [{}])[0].get("text", "")
+        response_source = "quantum_safe_fallback" if suggestions else "llm_fallback"
+        print(f"⚠️ Answered with LLM fallback ({len(suggestions)} knowledge base suggestions)")
+    elif rejected:
+        raise AdmissionRejected(max(rejected, key=lambda ticket: ticket.retry_after))
+    else:
+        # Neither answer arrived within the budget
+        response_text = FALLBACK_STATIC_TEXT
+        response_source = "static_fallback"
+        print("⚠️ No LLM answer within the deadline, using static guidance")
     
-    if any(word in symptom_lower for word in ['heartburn', 'acid reflux', 'indigestion']):
-        recommendations.extend([
-            "Eat smaller, more frequent meals",
-            "Avoid lying down immediately after eating",
-            "Limit spicy, acidic, or fatty foods",
-            "Try eating yogurt or drinking milk",
-            "Elevate your head while sleeping"
-        ])
+    body = {
+        'success': True,
+        'symptom_text': symptom_text,
+        'pregnancy_week': weeks_pregnant,
+        'trimester': trimester,
+        'analysis_method': response_source,
+        'primary_recommendation': response_text,
+        'additional_recommendations': results['recommendations'],
+        'red_flags_detected': results['red_flags'],
+        'knowledge_base_suggestions': len(suggestions),
+        'stage_timings': results.timings(),
+        'disclaimer': DISCLAIMER_TEXT,
+        'timestamp': datetime.now().isoformat()
+    }
+    return body, results
+
+def symptom_activity_data(body, patient_id):
+    """activity_data of the symptom_consultation activity for a /symptoms/assist response body"""
+    return {
+        "symptom_text": body['symptom_text'],
+        "pregnancy_week": body['pregnancy_week'],
+        "trimester": body['trimester'],
+        "patient_id": patient_id,
+        "analysis_method": body['analysis_method'],
+        "red_flags_detected": body['red_flags_detected'],
+        "suggestions_count": body['knowledge_base_suggestions']
+    }
+
+def _symptom_trimester(weeks_pregnant):
+    if not weeks_pregnant or weeks_pregnant <= 12:
+        return "First Trimester"
+    if weeks_pregnant <= 26:
+        return "Second Trimester"
+    return "Third Trimester"
+
+def run_symptom_pipeline(symptom_text, weeks_pregnant, patient_id, headers=None):
+    """
+    Run the /symptoms/assist steps as a stage graph:
     
-    if any(word in symptom_lower for word in ['swelling', 'edema', 'water retention']):
-        recommendations.extend([
-            "Elevate your feet when possible",
-            "Avoid standing for long periods",
-            "Stay hydrated and limit salt intake",
-            "Wear comfortable, supportive shoes",
-            "Consider compression stockings if recommended by your doctor"
-        ])
+        patient ─> context ─> recommendations
+                   context ─> fallback (speculative)
+        embedding + context ─> search ─> synthesis
+        red_flags
     
-    if any(word in symptom_lower for word in ['constipation', 'bowel', 'digestive']):
-        recommendations.extend([
-            "Increase fiber intake with fruits, vegetables, and whole grains",
-            "Stay hydrated by drinking plenty of water",
-            "Exercise regularly with your doctor's approval",
-            "Consider natural laxatives like prunes or prune juice",
-            "Don't ignore the urge to have a bowel movement"
-        ])
+    The patient lookup only gates the other stages when the pregnancy week has
+    to come from the profile. The LLM fallback starts as soon as search turns
+    up nothing (or synthesis fails), or after SYMPTOM_SPECULATIVE_FALLBACK_AFTER
+    seconds if search is still running; the run ends once red flags,
+    recommendations and one valid answer are in.
+    
+    The two LLM stages each take a slot in the llm admission pool and hold it
+    until their OpenAI call returns, even when the run has already answered
+    (a timed-out synthesis, or a speculative fallback that lost the race), so
+    the pool bounds the real number of OpenAI calls in flight. A stage that
+    only gets its slot after the run answered skips the call.
+    
+    Returns the stage results and the admission tickets of LLM stages that
+    were refused a slot.
+    """
+    def lookup_patient():
+        if not patient_id:
+            return None
+        return db.patients_collection.find_one(
+            {"patient_id": patient_id}, {"_id": 0, "email": 1, "pregnancy_week": 1})
+    
+    def resolve_context(patient=None):
+        weeks = weeks_pregnant
+        if not weeks and patient and patient.get('pregnancy_week'):
+            weeks = patient['pregnancy_week']
+            print(f"✅ Auto-fetched pregnancy week: {weeks}")
+        print(f"🔍 Analyzing symptoms: '{symptom_text}' for week {weeks} ({_symptom_trimester(weeks)})")
+        return weeks, _symptom_trimester(weeks)
+    
+    search_available = bool(quantum_service.client and quantum_service.embedding_model)
+    if not search_available:
+        print("⚠️ Quantum vector search not available")
+    
+    llm_pool = get_pool('llm') if llm_service.client else None
+    llm_budget = request_budget(headers, llm_pool) if llm_pool is not None and headers is not None else None
+    rejected = []
+    
+    def under_llm_slot(call):
+        if llm_pool is None:
+            return call
+        def stage(*args):
+            try:
+                with llm_pool.slot(llm_budget):
+                    if graph.finished.is_set():
+                        return None  # answered while this stage waited for its slot
+                    return call(*args)
+            except AdmissionRejected as e:
+                rejected.append(e.ticket)
+                raise
+        return stage
+    
+    def synthesis_failed(r):
+        return r.settled('search') and (not r['search'] or (r.settled('synthesis') and not r['synthesis']))
+    
+    def answered(r):
+        return (r.settled('red_flags') and r.settled('recommendations')
+                and bool(r['synthesis'] or r.ok('fallback')))
+    
+    graph = StageGraph('symptom_assist')
+    graph.stage('patient', lookup_patient, timeout=SYMPTOM_STAGE_TIMEOUT_DB)
+    # Only wait for the profile when the pregnancy week has to come from it
+    graph.stage('context', resolve_context, deps=() if weeks_pregnant else ('patient',),
+                default=(weeks_pregnant, _symptom_trimester(weeks_pregnant)))
+    graph.stage('red_flags', lambda: llm_service.detect_red_flags(symptom_text), default=[])
+    graph.stage('recommendations',
+                lambda context: generate_symptom_recommendations(symptom_text, *context),
+                deps=('context',), default=[])
+    graph.stage('embedding', lambda: quantum_service.embed_text(symptom_text),
+                timeout=SYMPTOM_STAGE_TIMEOUT_SEARCH, default=[], skip=lambda r: not search_available)
+    graph.stage('search', lambda vector, context: quantum_service.search_vector(vector, context[0]),
+                deps=('embedding', 'context'), timeout=SYMPTOM_STAGE_TIMEOUT_SEARCH, default=[],
+                skip=lambda r: not r['embedding'])
+    graph.stage('synthesis',
+                under_llm_slot(lambda suggestions, context: llm_service.summarize_retrieval(
+                    symptom_text, context[0], suggestions)),
+                deps=('search', 'context'), timeout=SYMPTOM_STAGE_TIMEOUT_LLM,
+                skip=lambda r: not r['search'] or not llm_service.client)
+    graph.stage('fallback', under_llm_slot(lambda context: llm_service.generate_llm_fallback(symptom_text, context[0])),
+                deps=('context',), timeout=SYMPTOM_STAGE_TIMEOUT_LLM,
+                delay=SYMPTOM_SPECULATIVE_FALLBACK_AFTER, trigger=synthesis_failed,
+                skip=lambda r: bool(r['synthesis']))
+    
+    return graph.run(until=answered, deadline=SYMPTOM_ASSIST_DEADLINE), rejected
+
+def generate_symptom_recommendations(symptom_text, weeks_pregnant, trimester):
+    """Generate symptom-specific recommendations based on pregnancy week and trimester"""
+    recommendations = []
+    
+    # Common pregnancy symptoms and recommendations (symptom_categories in the text rules file)
+    for category in get_text_rules().scan(symptom_text).rules('symptom_categories'):
+        recommendations.extend(category.get('recommendations', []))
     
     # Trimester-specific advice
     if trimester == "First Trimester":
@@ -4138,13 +4332,14 @@ def generate_symptom_recommendations(symptom_text, weeks_pregnant, trimester):
     return unique_recommendations
 
 @app.route('/symptoms/save-symptom-log', methods=['POST'])
+@save_idempotent
 def save_symptom_log():
     """Save symptom log to patient profile"""
     try:
         data = request.get_json()
         
         # Debug logging
-        print(f"🔍 Received symptom log data: {json.dumps(data, indent=2)}")
+        log_payload(logger, "🔍 Received symptom log data", data)
         
         if not data:
             return jsonify({
@@ -4198,8 +4393,9 @@ def save_symptom_log():
         result = db.patients_collection.update_one(
             {"patient_id": patient_id},
             {
-                "$push": {"symptom_logs": symptom_log_entry},
-                "$set": {"last_updated": datetime.now()}
+                "$push": {"symptom_logs": stamp(symptom_log_entry)},
+                "$set": {"last_updated": datetime.now()},
+                "$inc": {"version": 1}
             }
         )
         
@@ -4231,13 +4427,14 @@ def save_symptom_log():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/symptoms/save-analysis-report', methods=['POST'])
+@save_idempotent
 def save_symptom_analysis_report():
     """Save complete symptom analysis report including AI recommendations"""
     try:
         data = request.get_json()
         
         # Debug logging
-        print(f"🔍 Received symptom analysis report data: {json.dumps(data, indent=2)}")
+        log_payload(logger, "🔍 Received symptom analysis report data", data)
         
         if not data:
             return jsonify({
@@ -4308,8 +4505,9 @@ def save_symptom_analysis_report():
         result = db.patients_collection.update_one(
                         {"patient_id": patient_id},
             {
-                "$push": {"symptom_analysis_reports": analysis_report},
-                "$set": {"last_updated": datetime.now()}
+                "$push": {"symptom_analysis_reports": stamp(analysis_report)},
+                "$set": {"last_updated": datetime.now()},
+                "$inc": {"version": 1}
             }
                     )
             
@@ -4346,26 +4544,23 @@ def save_symptom_analysis_report():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/symptoms/get-symptom-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_symptom_history(patient_id):
     """Get symptom history for a specific patient"""
     try:
         print(f"🔍 Getting symptom history for patient ID: {patient_id}")
         
-        # Find patient by Patient ID
-        patient = db.patients_collection.find_one({"patient_id": patient_id})
-        if not patient:
-            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
-        
-        # Get symptom logs from patient document
-        symptom_logs = patient.get('symptom_logs', [])
+        try:
+            params = parse_history_params(request.args, key_type='date')
+        except HistoryQueryError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Sort by newest first
-        symptom_logs.sort(key=lambda x: x.get('createdAt', datetime.min), reverse=True)
+        # Get symptom logs from patient document, newest first, sliced in Mongo
+        page = query_history(db.patients_collection, {"patient_id": patient_id}, 'symptom_logs', 'createdAt', params)
+        if page is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
         
-        # Convert datetime objects to strings for JSON serialization
-        for entry in symptom_logs:
-            if 'createdAt' in entry:
-                entry['createdAt'] = entry['createdAt'].isoformat()
+        symptom_logs = page['entries']
         
         print(f"✅ Retrieved {len(symptom_logs)} symptom logs for patient: {patient_id}")
         
@@ -4373,7 +4568,10 @@ def get_symptom_history(patient_id):
             'success': True,
             'patientId': patient_id,
             'symptom_logs': symptom_logs,
-            'totalEntries': len(symptom_logs)
+            'totalEntries': len(symptom_logs),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
         }), 200
         
     except Exception as e:
@@ -4381,6 +4579,7 @@ def get_symptom_history(patient_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/symptoms/get-analysis-reports/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_analysis_reports(patient_id):
     """Get only the AI analysis reports for a patient"""
     try:
@@ -4434,16 +4633,13 @@ def get_analysis_reports(patient_id):
 # ==================== MEDICATION TRACKING ENDPOINTS ====================
 
 @app.route('/medication/save-medication-log', methods=['POST'])
+@save_idempotent
 def save_medication_log():
     """Save medication log to patient profile"""
     try:
         data = request.get_json()
         
-        # Debug logging
-        print(f"🔍 Received medication log data: {json.dumps(data, indent=2)}")
-        print(f"🔍 Data keys: {list(data.keys())}")
-        print(f"🔍 Dosages field: {data.get('dosages', 'NOT_FOUND')}")
-        print(f"🔍 Is prescription mode: {data.get('is_prescription_mode', 'NOT_FOUND')}")
+        log_payload(logger, "🔍 Received medication log data", data)
         
         if not data:
             return jsonify({
@@ -4476,15 +4672,10 @@ def save_medication_log():
         
         # Ensure dosages is always a list
         if not isinstance(dosages, list):
-            print(f"⚠️ Warning: dosages is not a list, converting from {type(dosages)}")
+            logger.warning("⚠️ dosages is not a list (%s), ignoring it", type(dosages).__name__)
             dosages = []
         
-        print(f"🔍 Validation Debug:")
-        print(f"🔍 - Is prescription mode: {is_prescription_mode}")
-        print(f"🔍 - Dosages type: {type(dosages)}")
-        print(f"🔍 - Dosages length: {len(dosages) if isinstance(dosages, list) else 'NOT_A_LIST'}")
-        print(f"🔍 - Dosages content: {dosages}")
-        print(f"🔍 - Prescription details: '{prescription_details}'")
+        logger.debug("🔍 Medication log: prescription_mode=%s dosages=%d", is_prescription_mode, len(dosages))
         
         # Handle backward compatibility with old format
         if not is_prescription_mode and len(dosages) == 0:
@@ -4502,7 +4693,7 @@ def save_medication_log():
                     'next_dose_time': None,
                     'special_instructions': ''
                 }]
-                print(f"🔍 Converted old format to new format: {dosages}")
+                logger.debug("🔍 Converted old single-dosage format")
             else:
                 return jsonify({
                     'success': False,
@@ -4521,15 +4712,11 @@ def save_medication_log():
                 'message': 'At least one dosage is required when not in prescription mode'
             }), 400
         
-        print(f"🔍 Looking for patient with ID: {patient_id}")
-        
         # Find patient by Patient ID
         patient = db.patients_collection.find_one({"patient_id": patient_id})
         if not patient:
             return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
         
-        print(f"🔍 Found patient: {patient.get('username')} ({patient.get('email')})")
-        
         # Create medication log entry
         medication_log_entry = {
             'medication_name': medication_name,
@@ -4552,8 +4739,9 @@ def save_medication_log():
         result = db.patients_collection.update_one(
             {"patient_id": patient_id},
             {
-                "$push": {"medication_logs": medication_log_entry},
-                "$set": {"last_updated": datetime.now()}
+                "$push": {"medication_logs": stamp(medication_log_entry)},
+                "$set": {"last_updated": datetime.now()},
+                "$inc": {"version": 1}
             }
         )
         
@@ -4584,30 +4772,27 @@ def save_medication_log():
             return jsonify({'success': False, 'message': 'Failed to save medication log'}), 500
         
     except Exception as e:
-        print(f"Error saving medication log: {e}")
+        logger.exception("❌ Error saving medication log: %s", e)
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/get-medication-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_medication_history(patient_id):
     """Get medication history for a patient"""
     try:
         print(f"🔍 Getting medication history for patient ID: {patient_id}")
         
-        # Find patient by Patient ID
-        patient = db.patients_collection.find_one({"patient_id": patient_id})
-        if not patient:
-            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
-        
-        # Get medication logs from patient document
-        medication_logs = patient.get('medication_logs', [])
+        try:
+            params = parse_history_params(request.args, key_type='date')
+        except HistoryQueryError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Sort by newest first
-        medication_logs.sort(key=lambda x: x.get('createdAt', datetime.min), reverse=True)
+        # Get medication logs from patient document, newest first, sliced in Mongo
+        page = query_history(db.patients_collection, {"patient_id": patient_id}, 'medication_logs', 'createdAt', params)
+        if page is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
         
-        # Convert datetime objects to strings for JSON serialization
-        for entry in medication_logs:
-            if 'createdAt' in entry:
-                entry['createdAt'] = entry['createdAt'].isoformat()
+        medication_logs = page['entries']
         
         print(f"✅ Retrieved {len(medication_logs)} medication logs for patient: {patient_id}")
         
@@ -4615,7 +4800,10 @@ def get_medication_history(patient_id):
             'success': True,
             'patientId': patient_id,
             'medication_logs': medication_logs,
-            'totalEntries': len(medication_logs)
+            'totalEntries': len(medication_logs),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
         }), 200
         
     except Exception as e:
@@ -4706,6 +4894,7 @@ def get_upcoming_dosages(patient_id):
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/save-tablet-taken', methods=['POST'])
+@save_idempotent
 def save_tablet_taken():
     """Save daily tablet tracking for a patient"""
     try:
@@ -4744,12 +4933,12 @@ def save_tablet_taken():
         if 'tablet_tracking' not in patient:
             patient['tablet_tracking'] = []
         
-        patient['tablet_tracking'].append(tablet_entry)
+        patient['tablet_tracking'].append(stamp(tablet_entry))
         
         # Update patient document
         result = db.patients_collection.update_one(
             {"patient_id": patient_id},
-            {"$set": {"tablet_tracking": patient['tablet_tracking']}}
+            {"$set": {"tablet_tracking": patient['tablet_tracking']}, "$inc": {"version": 1}}
         )
         
         if result.modified_count > 0:
@@ -4767,21 +4956,23 @@ def save_tablet_taken():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/get-tablet-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_tablet_history(patient_id):
     """Get tablet tracking history for a patient"""
     try:
         print(f"🔍 Getting tablet history for patient ID: {patient_id}")
         
-        # Find patient by Patient ID
-        patient = db.patients_collection.find_one({"patient_id": patient_id})
-        if not patient:
-            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+        try:
+            params = parse_history_params(request.args)
+        except HistoryQueryError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Get tablet tracking history
-        tablet_history = patient.get('tablet_tracking', [])
+        # Get tablet tracking history, most recent first, sliced in Mongo
+        page = query_history(db.patients_collection, {"patient_id": patient_id}, 'tablet_tracking', 'timestamp', params)
+        if page is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
         
-        # Sort by timestamp (most recent first)
-        tablet_history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        tablet_history = page['entries']
         
         print(f"✅ Retrieved {len(tablet_history)} tablet tracking entries for patient: {patient_id}")
         
@@ -4789,7 +4980,10 @@ def get_tablet_history(patient_id):
             'success': True,
             'patientId': patient_id,
             'tablet_history': tablet_history,
-            'totalEntries': len(tablet_history)
+            'totalEntries': len(tablet_history),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
         }), 200
         
     except Exception as e:
@@ -4847,12 +5041,12 @@ def upload_prescription():
         if 'prescriptions' not in patient:
             patient['prescriptions'] = []
         
-        patient['prescriptions'].append(prescription_entry)
+        patient['prescriptions'].append(stamp(prescription_entry))
         
         # Update patient document
         result = db.patients_collection.update_one(
             {"patient_id": patient_id},
-            {"$set": {"prescriptions": patient['prescriptions']}}
+            {"$set": {"prescriptions": patient['prescriptions']}, "$inc": {"version": 1}}
         )
         
         if result.modified_count > 0:
@@ -4870,6 +5064,7 @@ def upload_prescription():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/get-prescription-details/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_prescription_details(patient_id):
     """Get prescription details and dosage information for a patient"""
     try:
@@ -4928,8 +5123,10 @@ def update_prescription_status(patient_id, prescription_id):
             {
                 "$set": {
                     "prescriptions.$.status": new_status,
-                    "prescriptions.$.last_updated": datetime.now().isoformat()
-                }
+                    "prescriptions.$.last_updated": datetime.now().isoformat(),
+                    "prescriptions.$.sync_seq": next_sync_seq()
+                },
+                "$inc": {"version": 1}
             }
         )
         
@@ -4952,6 +5149,7 @@ def update_prescription_status(patient_id, prescription_id):
 # ==================== OCR PRESCRIPTION PROCESSING ENDPOINTS ====================
 
 @app.route('/medication/process-prescription-document', methods=['POST'])
+@admission_controlled('ocr')
 def process_prescription_document():
     """Process prescription document using PaddleOCR service from medication folder"""
     try:
@@ -4994,12 +5192,13 @@ def process_prescription_document():
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 
-                ocr_result = loop.run_until_complete(
-                    enhanced_ocr_service.process_file(
-                        file_content=file_content,
-                        filename=file.filename
+                with timed('ocr', 'enhanced_process_file'):
+                    ocr_result = loop.run_until_complete(
+                        enhanced_ocr_service.process_file(
+                            file_content=file_content,
+                            filename=file.filename
+                        )
                     )
-                )
                 
                 loop.close()
                 
@@ -5026,7 +5225,8 @@ def process_prescription_document():
             except Exception as e:
                 print(f"⚠️ Medication folder OCR service error, falling back to basic OCR: {e}")
                 if ocr_service:
-                    ocr_result = ocr_service.process_file(file_content, file.filename)
+                    with timed('ocr', 'process_file'):
+                        ocr_result = ocr_service.process_file(file_content, file.filename)
                 else:
                     return jsonify({'success': False, 'message': 'OCR service not available'}), 503
         elif ocr_service:
@@ -5039,7 +5239,8 @@ def process_prescription_document():
                     'message': f'Unsupported file type: {file.content_type}. Supported types: {list(ocr_service.supported_formats.keys())}'
                 }), 400
             
-            ocr_result = ocr_service.process_file(file_content, file.filename)
+            with timed('ocr', 'process_file'):
+                ocr_result = ocr_service.process_file(file_content, file.filename)
         else:
             return jsonify({'success': False, 'message': 'OCR service not available'}), 503
         
@@ -5083,10 +5284,11 @@ def process_prescription_document():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/process-with-paddleocr', methods=['POST'])
+@admission_controlled('ocr')
 def process_with_paddleocr():
     """Process prescription document using medication folder's PaddleOCR service directly"""
     try:
-        print("🚀 Processing prescription with medication folder PaddleOCR service...")
+        logger.info("🚀 Processing prescription with medication folder PaddleOCR service")
         
         if not enhanced_ocr_service or not OCR_SERVICES_AVAILABLE:
             return jsonify({
@@ -5106,9 +5308,7 @@ def process_with_paddleocr():
         patient_id = request.form.get('patient_id', '')
         medication_name = request.form.get('medication_name', '')
         
-        print(f"🔍 Processing file: {file.filename}")
-        print(f"🔍 Patient ID: {patient_id}")
-        print(f"🔍 Medication Name: {medication_name}")
+        logger.debug("🔍 OCR file=%s patient_id=%s medication=%s", file.filename, patient_id, medication_name)
         
         # Validate file type with enhanced service
         if not enhanced_ocr_service.validate_file_type(file.content_type, file.filename):
@@ -5126,29 +5326,25 @@ def process_with_paddleocr():
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             
-            ocr_result = loop.run_until_complete(
-                enhanced_ocr_service.process_file(
-                    file_content=file_content,
-                    filename=file.filename
+            with timed('ocr', 'enhanced_process_file'):
+                ocr_result = loop.run_until_complete(
+                    enhanced_ocr_service.process_file(
+                        file_content=file_content,
+                        filename=file.filename
+                    )
                 )
-            )
             
             loop.close()
             
-            print("✅ Medication folder OCR processing successful")
-            print(f"🔍 Debug - OCR result keys: {list(ocr_result.keys())}")
-            print(f"🔍 Debug - OCR result success: {ocr_result.get('success')}")
+            logger.info("✅ Medication folder OCR processing finished (success=%s)", ocr_result.get('success'))
             
             # Extract full text content in the format expected by medication folder
             if ocr_result.get('success'):
                 # Get the full text content from the medication folder service
                 full_text_content = ocr_result.get('full_content', '')
-                print(f"🔍 Debug - full_content from OCR: '{full_text_content}'")
-                print(f"🔍 Debug - full_content length: {len(full_text_content)}")
                 
                 # If full_content is not available, extract from results
                 if not full_text_content and ocr_result.get('results'):
-                    print(f"🔍 Debug - Extracting from results: {len(ocr_result['results'])} results")
                     # Extract all text from results and combine them
                     extracted_texts = []
                     for result in ocr_result['results']:
@@ -5158,36 +5354,33 @@ def process_with_paddleocr():
                     
                     # Combine all extracted text into one continuous string
                     full_text_content = ' '.join(extracted_texts)
-                    print(f"🔍 Debug - Combined text from results: '{full_text_content}'")
                     
                     # If still no content, try alternative fields
                     if not full_text_content:
                         full_text_content = ocr_result.get('extracted_text', '')
-                        print(f"🔍 Debug - Trying extracted_text: '{full_text_content}'")
                     
                     # If still no content, try the raw text field
                     if not full_text_content:
                         full_text_content = ocr_result.get('text', '')
-                        print(f"🔍 Debug - Trying text field: '{full_text_content}'")
                 
                 # If we still don't have content, create a fallback
                 if not full_text_content:
                     full_text_content = "No text could be extracted from the document"
-                    print(f"🔍 Debug - Using fallback text")
+                    logger.warning("⚠️ OCR returned no text for %s", file.filename)
                 
                 # Update OCR result with full text content
                 ocr_result['full_text_content'] = full_text_content
                 ocr_result['extracted_text'] = full_text_content  # For backward compatibility
-                print(f"🔍 Debug - Final full_text_content: '{full_text_content}'")
-                print(f"🔍 Debug - Final full_text_content length: {len(full_text_content)}")
+                logger.debug("🔍 OCR extracted %d characters", len(full_text_content))
+                log_payload(logger, "🔍 OCR text", full_text_content)
             else:
-                print(f"🔍 Debug - OCR processing failed: {ocr_result.get('error', 'Unknown error')}")
+                logger.warning("⚠️ OCR processing failed: %s", ocr_result.get('error', 'Unknown error'))
             
             # Send results to webhook if processing was successful
             webhook_results = []
             if ocr_result.get("success") and webhook_service and webhook_service.is_configured():
                 try:
-                    print("🚀 Sending OCR results to webhook using medication folder service...")
+                    logger.info("🚀 Sending OCR results to webhook using medication folder service")
                     
                     # Create new event loop for webhook service
                     webhook_loop = asyncio.new_event_loop()
@@ -5202,12 +5395,12 @@ def process_with_paddleocr():
                     # Log webhook delivery status
                     for webhook_result in webhook_results:
                         if webhook_result["success"]:
-                            print(f"✅ Webhook sent successfully to {webhook_result['config_name']} ({webhook_result['url']})")
+                            logger.info("✅ Webhook sent successfully to %s (%s)", webhook_result['config_name'], webhook_result['url'])
                         else:
-                            print(f"❌ Webhook failed for {webhook_result['config_name']}: {webhook_result.get('error', 'Unknown error')}")
+                            logger.warning("❌ Webhook failed for %s: %s", webhook_result['config_name'], webhook_result.get('error', 'Unknown error'))
                     
                 except Exception as e:
-                    print(f"❌ Error sending webhook: {e}")
+                    logger.error("❌ Error sending webhook: %s", e)
             
             # Return comprehensive result with full text content
             final_response = {
@@ -5225,21 +5418,17 @@ def process_with_paddleocr():
                 'timestamp': datetime.now().isoformat()
             }
             
-            print(f"🔍 Debug - Final response full_text_content: '{final_response['full_text_content']}'")
-            print(f"🔍 Debug - Final response full_text_content length: {len(final_response['full_text_content'])}")
-            print(f"🔍 Debug - Final response keys: {list(final_response.keys())}")
-            
             return jsonify(final_response), 200
         
         except Exception as e:
-            print(f"❌ PaddleOCR processing error: {e}")
+            logger.exception("❌ PaddleOCR processing error: %s", e)
             return jsonify({
                 'success': False,
                 'message': f'PaddleOCR processing failed: {str(e)}'
             }), 500
         
     except Exception as e:
-        print(f"❌ Error in PaddleOCR processing: {e}")
+        logger.exception("❌ Error in PaddleOCR processing: %s", e)
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/process-prescription-text', methods=['POST'])
@@ -5273,32 +5462,15 @@ def process_prescription_text():
             'raw_text': cleaned_text
         }
         
-        # Simple pattern matching for common prescription formats
+        # Simple pattern matching for common prescription formats: the whole text is
+        # scanned once and each line takes the first matching prescription_lines rule
+        # (medication name, dosage, frequency, duration) from the text rules file
         lines = cleaned_text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Look for medication name patterns
-            if any(keyword in line.lower() for keyword in ['tablet', 'capsule', 'syrup', 'injection', 'mg', 'ml']):
-                if not extracted_info['medication_name']:
-                    extracted_info['medication_name'] = line
-            
-            # Look for dosage patterns
-            elif any(keyword in line.lower() for keyword in ['mg', 'ml', 'tablet', 'capsule', 'dose']):
-                if not extracted_info['dosage']:
-                    extracted_info['dosage'] = line
-            
-            # Look for frequency patterns
-            elif any(keyword in line.lower() for keyword in ['daily', 'twice', 'three times', 'every', 'hour']):
-                if not extracted_info['frequency']:
-                    extracted_info['frequency'] = line
-            
-            # Look for duration patterns
-            elif any(keyword in line.lower() for keyword in ['days', 'weeks', 'months', 'until', 'course']):
-                if not extracted_info['duration']:
-                    extracted_info['duration'] = line
+        line_rules = get_text_rules().scan(cleaned_text).by_line('prescription_lines')
+        for line_number, rules in sorted(line_rules.items()):
+            field = rules[0]['id']
+            if not extracted_info.get(field):
+                extracted_info[field] = lines[line_number].strip()
         
         print(f"✅ Successfully processed prescription text")
         
@@ -5435,6 +5607,7 @@ def process_with_mock_n8n():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/process-with-n8n-webhook', methods=['POST'])
+@admission_controlled('ocr')
 def process_with_n8n_webhook():
     """Process prescription with OCR and send directly to N8N webhook using medication folder webhook service"""
     try:
@@ -5555,7 +5728,8 @@ def quantum_collections():
         }), 503
     
     try:
-        collections = quantum_service.client.get_collections().collections
+        with timed('qdrant', 'get_collections'):
+            collections = quantum_service.client.get_collections().collections
         names = [c.name for c in collections]
         return jsonify({
             'success': True,
@@ -5610,6 +5784,7 @@ def llm_health_check():
     })
 
 @app.route('/llm/test', methods=['POST'])
+@admission_controlled('llm')
 def llm_test():
     """Test LLM functionality with a simple prompt"""
     try:
@@ -5622,15 +5797,16 @@ def llm_test():
                 'message': 'LLM service not available'
             }), 503
         
-        response = llm_service.client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant. Respond briefly."},
-                {"role": "user", "content": test_prompt}
-            ],
-            temperature=0.1,
-            max_tokens=50
-        )
+        with timed('openai', 'chat.completions'):
+            response = llm_service.client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant. Respond briefly."},
+                    {"role": "user", "content": test_prompt}
+                ],
+                temperature=0.1,
+                max_tokens=50
+            )
         
         content = response.choices[0].message.content.strip()
         
@@ -5705,10 +5881,11 @@ def add_knowledge():
         quantum_service.ensure_collection()
         
         # Upsert point
-        quantum_service.client.upsert(
-            collection_name=QDRANT_COLLECTION,
-            points=[point]
-        )
+        with timed('qdrant', 'upsert'):
+            quantum_service.client.upsert(
+                collection_name=QDRANT_COLLECTION,
+                points=[point]
+            )
         
         return jsonify({
             'success': True,
@@ -5772,6 +5949,7 @@ def search_knowledge():
         }), 500
 
 @app.route('/get-patient-profile-by-email/<email>', methods=['GET'])
+@patient_etag('email', 'email')
 def get_patient_profile_by_email(email):
     """Get patient profile by email"""
     try:
@@ -5796,6 +5974,7 @@ def get_patient_profile_by_email(email):
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @app.route('/get-patient-profile/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_patient_profile(patient_id):
     """Get patient profile by patient ID (same pattern as kick count)"""
     try:
@@ -5952,13 +6131,14 @@ def test_file_upload():
 
 @app.route('/health/database', methods=['GET'])
 def check_database_health():
-    """Check database connection status"""
+    """Check database connection status (from the health monitor's last probe)"""
     try:
-        if db.is_connected():
+        if database_available():
             return jsonify({
                 'success': True,
                 'message': 'Database is connected and healthy',
                 'status': 'connected',
+                'last_check': health_monitor.snapshot()['checks']['mongodb'],
                 'collections': {
                     'patients': db.patients_collection is not None,
                     'mental_health': db.mental_health_collection is not None
@@ -5967,7 +6147,7 @@ def check_database_health():
         else:
             # Try to reconnect
             print("🔄 Database health check failed, attempting reconnection...")
-            if db.reconnect():
+            if db.reconnect() and health_monitor.refresh('mongodb'):
                 return jsonify({
                     'success': True,
                     'message': 'Database reconnected successfully',
@@ -5997,7 +6177,7 @@ def force_database_reconnect():
     """Force database reconnection"""
     try:
         print("🔄 Force reconnecting to database...")
-        if db.reconnect():
+        if db.reconnect() and health_monitor.refresh('mongodb'):
             return jsonify({
                 'success': True,
                 'message': 'Database reconnected successfully',
@@ -6061,7 +6241,7 @@ def submit_mood_checkin():
             checkin_date = datetime.now().date()
         
         # Check if database is connected
-        if not db.is_connected():
+        if not database_available():
             return jsonify({
                 'success': False,
                 'message': 'Database not connected'
@@ -6115,8 +6295,8 @@ def submit_mood_checkin():
             db.patients_collection.update_one(
                 {"patient_id": patient_id},
                 {
-                    "$push": {"mental_health_logs": mood_entry},
-                    "$inc": {"mental_health_logs_count": 1}
+                    "$push": {"mental_health_logs": stamp(mood_entry)},
+                    "$inc": {"mental_health_logs_count": 1, "version": 1}
                 }
             )
             
@@ -6149,7 +6329,7 @@ def get_mental_health_history(patient_id):
     """Get mental health history for a patient"""
     try:
         # Check if database is connected
-        if not db.is_connected():
+        if not database_available():
             return jsonify({
                 'success': False,
                 'message': 'Database not connected'
@@ -6234,7 +6414,7 @@ def submit_mental_health_assessment():
             assessment_date = datetime.now().date()
         
         # Check if database is connected
-        if not db.is_connected():
+        if not database_available():
             return jsonify({
                 'success': False,
                 'message': 'Database not connected'
@@ -6283,6 +6463,9 @@ def submit_mental_health_assessment():
         if result.inserted_id:
             print(f"✅ Mental health assessment saved for patient {patient_id}: {score}/10")
             
+            # Doctor patient-detail routes list mental health entries under the patient's ETag
+            db.patients_collection.update_one({"patient_id": patient_id}, {"$inc": {"version": 1}})
+            
             return jsonify({
                 'success': True,
                 'message': 'Mental health assessment saved successfully',
@@ -6308,6 +6491,7 @@ def submit_mental_health_assessment():
         }), 500
 
 @app.route('/medication/save-tablet-tracking', methods=['POST'])
+@save_idempotent
 def save_tablet_tracking():
     """Save tablet tracking data in medication_daily_tracking array"""
     try:
@@ -6351,12 +6535,12 @@ def save_tablet_tracking():
         if 'medication_daily_tracking' not in patient:
             patient['medication_daily_tracking'] = []
         
-        patient['medication_daily_tracking'].append(tablet_entry)
+        patient['medication_daily_tracking'].append(stamp(tablet_entry))
         
         # Update patient document
         result = db.patients_collection.update_one(
             {"patient_id": patient_id},
-            {"$set": {"medication_daily_tracking": patient['medication_daily_tracking']}}
+            {"$set": {"medication_daily_tracking": patient['medication_daily_tracking']}, "$inc": {"version": 1}}
         )
         
         if result.modified_count > 0:
@@ -6375,21 +6559,23 @@ def save_tablet_tracking():
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
 @app.route('/medication/get-tablet-tracking-history/<patient_id>', methods=['GET'])
+@patient_etag()
 def get_tablet_tracking_history(patient_id):
     """Get tablet tracking history from medication_daily_tracking array"""
     try:
         print(f"🔍 Getting tablet tracking history from medication_daily_tracking array for patient ID: {patient_id}")
         
-        # Find patient by Patient ID
-        patient = db.patients_collection.find_one({"patient_id": patient_id})
-        if not patient:
-            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+        try:
+            params = parse_history_params(request.args)
+        except HistoryQueryError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        # Get tablet tracking history from medication_daily_tracking array
-        tablet_history = patient.get('medication_daily_tracking', [])
+        # Get tablet tracking history from medication_daily_tracking array, most recent first
+        page = query_history(db.patients_collection, {"patient_id": patient_id}, 'medication_daily_tracking', 'timestamp', params)
+        if page is None:
+            return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
         
-        # Sort by timestamp (most recent first)
-        tablet_history.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        tablet_history = page['entries']
         
         print(f"✅ Retrieved {len(tablet_history)} tablet tracking entries from medication_daily_tracking array for patient: {patient_id}")
         
@@ -6397,7 +6583,10 @@ def get_tablet_tracking_history(patient_id):
             'success': True,
             'patientId': patient_id,
             'tablet_tracking_history': tablet_history,
-            'totalEntries': len(tablet_history)
+            'totalEntries': len(tablet_history),
+            'totalMatching': page['total'],
+            'hasMore': page['has_more'],
+            'nextCursor': page['next_cursor']
         }), 200
         
     except Exception as e:
@@ -6576,6 +6765,7 @@ def nutrition_health_check():
     })
 
 @app.route('/nutrition/transcribe', methods=['POST'])
+@admission_controlled('transcribe')
 def transcribe_audio():
     """Transcribe audio using Whisper AI with Tamil language support"""
     try:
@@ -6630,11 +6820,12 @@ def transcribe_audio():
             
             # Transcribe with Whisper
             with open(temp_file_path, 'rb') as audio_file:
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=language if language != 'auto' else None
-                )
+                with timed('openai', 'audio.transcriptions'):
+                    response = client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file,
+                        language=language if language != 'auto' else None
+                    )
             
             transcription = response.text.strip()
             
@@ -6677,6 +6868,7 @@ def transcribe_audio():
         }), 500
 
 @app.route('/nutrition/analyze-with-gpt4', methods=['POST'])
+@admission_controlled('llm')
 def analyze_food_with_gpt4():
     """Analyze food using GPT-4"""
     try:
@@ -6752,21 +6944,22 @@ def analyze_food_with_gpt4():
         """
         
         # Call GPT-4
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a nutrition expert specializing in pregnancy nutrition. Provide accurate, detailed analysis in the exact JSON format requested."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.3,
-            max_tokens=1500
-        )
+        with timed('openai', 'chat.completions'):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are a nutrition expert specializing in pregnancy nutrition. Provide accurate, detailed analysis in the exact JSON format requested."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=0.3,
+                max_tokens=1500
+            )
         
         # Extract response
         gpt_response = response.choices[0].message.content.strip()
@@ -6799,12 +6992,12 @@ def analyze_food_with_gpt4():
                             'created_at': datetime.now()
                         }
                         
-                        patient['food_data'].append(food_entry)
+                        patient['food_data'].append(stamp(food_entry))
                         
                         # Update patient document
                         db.patients_collection.update_one(
                             {"patient_id": user_id},
-                            {"$set": {"food_data": patient['food_data']}}
+                            {"$set": {"food_data": patient['food_data']}, "$inc": {"version": 1}}
                         )
                         
                         print(f"✅ GPT-4 analysis saved to database for user: {user_id}")
@@ -6869,6 +7062,7 @@ def analyze_food_with_gpt4():
         }), 500
 
 @app.route('/nutrition/save-food-entry', methods=['POST'])
+@save_idempotent
 def save_food_entry():
     """Save basic food entry to patient's food_data array"""
     try:
@@ -6928,12 +7122,12 @@ def save_food_entry():
         }
         
         # Add to food_data array
-        patient['food_data'].append(food_entry)
+        patient['food_data'].append(stamp(food_entry))
         
         # Update patient document
         result = db.patients_collection.update_one(
             {"patient_id": user_id},
-            {"$set": {"food_data": patient['food_data']}}
+            {"$set": {"food_data": patient['food_data']}, "$inc": {"version": 1}}
         )
         
         if result.modified_count > 0:
@@ -6958,24 +7152,29 @@ def save_food_entry():
         }), 500
 
 @app.route('/nutrition/get-food-entries/<user_id>', methods=['GET'])
+@patient_etag('patient_id', 'user_id')
 def get_food_entries(user_id):
     """Get food entries from patient's food_data array"""
     try:
         print(f"🍽️ Getting food entries for user ID: {user_id}")
         
-        # Find patient
-        patient = db.patients_collection.find_one({"patient_id": user_id})
-        if not patient:
+        try:
+            params = parse_history_params(request.args)
+        except HistoryQueryError as e:
+            return jsonify({
+                'success': False,
+                'message': str(e)
+            }), 400
+        
+        # Get food_data array, most recent first, sliced in Mongo
+        page = query_history(db.patients_collection, {"patient_id": user_id}, 'food_data', 'timestamp', params)
+        if page is None:
             return jsonify({
                 'success': False,
                 'message': f'Patient not found with ID: {user_id}'
             }), 404
         
-        # Get food_data array
-        food_data = patient.get('food_data', [])
-        
-        # Sort by timestamp (most recent first)
-        food_data.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        food_data = page['entries']
         
         print(f"✅ Retrieved {len(food_data)} food entries for user: {user_id}")
         
@@ -6983,7 +7182,10 @@ def get_food_entries(user_id):
             'success': True,
             'user_id': user_id,
             'food_data': food_data,
-            'total_entries': len(food_data)
+            'total_entries': len(food_data),
+            'total_matching': page['total'],
+            'has_more': page['has_more'],
+            'next_cursor': page['next_cursor']
         }), 200
         
     except Exception as e:
@@ -7041,32 +7243,26 @@ def debug_food_data(user_id):
             'message': f'Error: {str(e)}'
         }), 500
 
+# Public keys for verifying RS256/ES256 tokens without the signing key
+@app.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    """JSON Web Key Set of the JWT verification keys (empty in HS256 mode)"""
+    response = jsonify(jwt_codec.jwks())
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
 # Health check endpoint for Render deployment
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint for deployment platforms"""
-    try:
-        # Check database connection
-        db.patients.find_one()
-        return jsonify({
-            'status': 'healthy',
-            'message': 'Pregnancy AI API is running',
-            'timestamp': datetime.now().isoformat(),
-            'database': 'connected'
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'message': 'Database connection failed',
-            'timestamp': datetime.now().isoformat(),
-            'error': str(e)
-        }), 503
+    """Health check endpoint for deployment platforms (cached dependency status, no I/O)"""
+    return health_monitor.response()
 
 # ===============================
 # KICK COUNT ENDPOINTS
 # ===============================
 
 @app.route('/kick-count/save-kick-log', methods=['POST'])
+@save_idempotent
 def save_kick_log():
     """Save kick count log to patient document"""
     try:
@@ -7095,7 +7291,7 @@ def save_kick_log():
         # Add kick log to patient document
         result = db.patients_collection.update_one(
             {"patient_id": data['patient_id']},
-            {"$push": {"kick_count_logs": kick_log}}
+            {"$push": {"kick_count_logs": stamp(kick_log)}, "$inc": {"version": 1}}
         )
         
         if result.modified_count > 0:
@@ -7112,41 +7308,45 @@ def save_kick_log():
         return jsonify({'error': f'Failed to save kick count log: {str(e)}'}), 500
 
 @app.route('/kick-count/get-kick-history/<patient_id>', methods=['GET'])
+@patient_etag(etag_suffix=lambda: datetime.now().strftime('%Y%m%d'))  # default window is the last 30 days
 def get_kick_count_history(patient_id):
     """Get kick count history for a patient"""
     try:
         print(f"🦵 Getting kick count history for patient: {patient_id}")
         
         # Get query parameters for filtering
-        limit = request.args.get('limit', 50, type=int)
+        try:
+            params = parse_history_params(request.args, default_limit=50)
+        except HistoryQueryError as e:
+            return jsonify({'error': str(e)}), 400
         days = request.args.get('days', 30, type=int)  # Last N days
         
-        # Find patient
-        patient = db.patients_collection.find_one({"patient_id": patient_id})
-        
-        if not patient:
-            return jsonify({'error': 'Patient not found'}), 404
-        
-        # Get kick count logs
-        kick_logs = patient.get('kick_count_logs', [])
+        # Filter by date if days parameter is provided and no explicit range was sent
+        if days > 0 and params['since'] is None:
+            params['since'] = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
         
-        # Filter by date if days parameter is provided
-        if days > 0:
-            cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
-            kick_logs = [log for log in kick_logs if log.get('date', '') >= cutoff_date]
+        # Sort by date and time (most recent first), sliced in Mongo
+        page = query_history(
+            db.patients_collection,
+            {"patient_id": patient_id},
+            'kick_count_logs',
+            {'$concat': [{'$ifNull': ['$$e.date', '']}, ' ', {'$ifNull': ['$$e.time', '']}]},
+            params
+        )
         
-        # Sort by date and time (most recent first)
-        kick_logs.sort(key=lambda x: f"{x.get('date', '')} {x.get('time', '')}", reverse=True)
+        if page is None:
+            return jsonify({'error': 'Patient not found'}), 404
         
-        # Apply limit
-        if limit > 0:
-            kick_logs = kick_logs[:limit]
+        kick_logs = page['entries']
         
         print(f"✅ Retrieved {len(kick_logs)} kick count logs")
         
         return jsonify({
             'kick_logs': kick_logs,
             'total_entries': len(kick_logs),
+            'total_matching': page['total'],
+            'has_more': page['has_more'],
+            'next_cursor': page['next_cursor'],
             'patient_id': patient_id,
             'success': True
         }), 200
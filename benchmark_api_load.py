@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+"""
+Load-test and benchmark suite for the main API flows of app_simple
+
+Seeds a local Mongo database with synthetic patients built from the bundled
+patient_full_details_*.json template, then drives the main flows with a
+local multi-threaded load generator and reports throughput and p50/p95/p99
+per route, compared against a stored baseline.
+
+    seed     N patients (1k / 10k / 100k), each with --logs entries per
+             history array (symptom, medication, food, kick, sleep, mental
+             health) and a few appointments, plus N/200 doctors
+    drive    login, doctor dashboard stats, patient list, appointments, the
+             history routes and the save-* flows, weighted like real traffic
+    stub     OpenAI (canned completions), SMTP (in-memory) and Qdrant/embeddings
+             (no hits, so /symptoms/assist takes the LLM fallback path), so
+             runs are offline and reproducible
+    compare  --save-baseline writes the results to --baseline; later runs
+             print the change per route and exit 1 if any route's p95 grew
+             by more than --tolerance, or if every request of a scenario
+             got a non-2xx answer (no baseline is saved from such a run)
+
+By default requests go through the Flask test client in this process. With
+--base-url the same mix is sent over HTTP to a running server (which must use
+the seeded database and its own stubs).
+
+The database named by --db-name is dropped and re-seeded with --seed. Only
+names starting with "bench" are accepted, so a real database cannot be wiped
+by accident. --mongomock runs without a mongod if mongomock is installed
+(some aggregation stages used by the history routes are not supported there).
+
+Usage:
+    python benchmark_api_load.py --seed --patients 10000 --logs 30
+    python benchmark_api_load.py --duration 30 --concurrency 16 --save-baseline
+    python benchmark_api_load.py --duration 30 --concurrency 16      # compare
+"""
+
+import argparse
+import contextlib
+import copy
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import types
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+BENCH_PASSWORD = 'Bench-Password-1'
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, 'benchmark_api_baseline.json')
+
+MOODS = ['Happy', 'Calm', 'Tired', 'Anxious', 'Sad', 'Energetic']
+SYMPTOMS = ['mild headache in the evening', 'nausea after breakfast', 'lower back pain', 'swollen ankles',
+            'heartburn after meals', 'trouble sleeping', 'leg cramps at night']
+MEDICATIONS = ['Folic acid', 'Iron supplement', 'Calcium', 'Vitamin D', 'Omega-3']
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# ==================== STUBS ====================
+
+class _FakeCompletions:
+    def create(self, **kwargs):
+        time.sleep(STUB_LATENCY['openai'])
+        message = types.SimpleNamespace(content=(
+            "Urgency level: mild\n"
+            "Rest and stay hydrated.\n"
+            "Track how often the symptom happens.\n"
+            "Seek urgent care for heavy bleeding, severe pain or fever."
+        ))
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=message)],
+            usage=types.SimpleNamespace(total_tokens=120),
+            model=kwargs.get('model', 'stub'),
+        )
+
+
+class FakeOpenAI:
+    """Offline stand-in for openai.OpenAI."""
+
+    def __init__(self, *args, **kwargs):
+        self.chat = types.SimpleNamespace(completions=_FakeCompletions())
+        self.audio = types.SimpleNamespace(transcriptions=types.SimpleNamespace(
+            create=lambda **kwargs: types.SimpleNamespace(text='stub transcription')))
+
+
+class FakeSMTP:
+    """Offline stand-in for smtplib.SMTP; keeps a count of sent messages."""
+
+    sent = 0
+    _lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_debuglevel(self, level):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def _send(self):
+        time.sleep(STUB_LATENCY['smtp'])
+        with FakeSMTP._lock:
+            FakeSMTP.sent += 1
+        return {}
+
+    def sendmail(self, *args, **kwargs):
+        return self._send()
+
+    def send_message(self, *args, **kwargs):
+        return self._send()
+
+    def quit(self):
+        pass
+
+
+class FakeQdrant:
+    """Offline stand-in for QdrantClient: an empty knowledge base."""
+
+    def search(self, **kwargs):
+        time.sleep(STUB_LATENCY['qdrant'])
+        return []
+
+    def get_collections(self):
+        return types.SimpleNamespace(collections=[])
+
+    def create_collection(self, **kwargs):
+        pass
+
+    def upsert(self, **kwargs):
+        pass
+
+
+class _FakeVector(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeEmbedder:
+    def encode(self, texts, normalize_embeddings=True):
+        return [_FakeVector([0.0] * 384) for _ in texts]
+
+
+STUB_LATENCY = {'openai': 0.0, 'smtp': 0.0, 'qdrant': 0.0}
+
+
+def install_stubs(args):
+    """Patch external services before app_simple is imported."""
+    import smtplib
+
+    STUB_LATENCY.update({'openai': args.openai_ms / 1000, 'smtp': args.smtp_ms / 1000, 'qdrant': args.qdrant_ms / 1000})
+    smtplib.SMTP = FakeSMTP
+    openai_module = types.ModuleType('openai')
+    openai_module.OpenAI = FakeOpenAI
+    openai_module.__version__ = 'stub'
+    sys.modules['openai'] = openai_module
+
+    os.environ.update({
+        'OPENAI_API_KEY': 'sk-benchmark-stub',
+        'SENDER_EMAIL': 'bench@example.com',
+        'SENDER_PASSWORD': 'stub',
+        'QDRANT_URL': 'http://127.0.0.1:9',
+        'MONGO_URI': args.mongo_uri,
+        'DB_NAME': args.db_name,
+    })
+    if args.mongomock:
+        import mongomock
+        import pymongo
+
+        pymongo.MongoClient = mongomock.MongoClient
+
+
+def stub_app_services(app_module):
+    """Point the already-created service objects at the stubs."""
+    app_module.llm_service.client = FakeOpenAI()
+    app_module.quantum_service.client = FakeQdrant()
+    app_module.quantum_service.embedding_model = FakeEmbedder()
+    for name in ('Filter', 'FieldCondition', 'MatchValue'):
+        if getattr(app_module, name, None) is None:
+            setattr(app_module, name, lambda **kwargs: kwargs)
+
+
+# ==================== SEEDING ====================
+
+def load_template():
+    paths = sorted(glob.glob(os.path.join(BASE_DIR, 'patient_full_details_*.json')))
+    if not paths:
+        raise SystemExit('❌ patient_full_details_*.json template not found')
+    with open(paths[0], encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _day(rng, days_back: int) -> datetime:
+    return datetime.now() - timedelta(days=rng.randint(0, days_back), minutes=rng.randint(0, 1439))
+
+
+def build_patient(template, index: int, logs: int, password_hash: str, rng: random.Random, doctor_ids):
+    from utils.search_index import patient_search_fields
+
+    info = template['patient_info']
+    health = template['health_data']
+    patient_id = f'PATBENCH{index:07d}'
+    week = rng.randint(4, 40)
+    patient = {
+        'patient_id': patient_id,
+        'username': f'bench_user_{index}',
+        'email': f'bench{index}@example.com',
+        'mobile': f'9{index:09d}',
+        'first_name': 'Bench',
+        'last_name': f'Patient{index}',
+        'password_hash': password_hash,
+        'status': 'active',
+        'email_verified': True,
+        'age': info.get('age', 30),
+        'blood_type': info.get('blood_type', 'O+'),
+        'is_pregnant': True,
+        'pregnancy_week': week,
+        'emergency_contact': copy.deepcopy(info.get('emergency_contact', {})),
+        'created_at': datetime.now() - timedelta(days=300),
+        'version': 1,
+    }
+    patient.update(patient_search_fields(patient))
+
+    def entries(count, make):
+        return sorted((make(rng) for _ in range(count)), key=lambda entry: str(entry.get('timestamp', '')))
+
+    patient['symptom_logs'] = entries(logs, lambda r: (lambda when: {
+        'symptom_text': r.choice(SYMPTOMS), 'severity': r.randint(1, 10), 'category': 'General',
+        'pregnancy_week': week, 'createdAt': when, 'timestamp': when.isoformat(),
+    })(_day(r, 180)))
+    patient['medication_logs'] = entries(logs, lambda r: (lambda when: {
+        'medication_name': r.choice(MEDICATIONS), 'date_taken': when.strftime('%d/%m/%Y'),
+        'dosages': [{'dosage': '400 mcg', 'time': '08:00', 'frequency': 'Daily'}],
+        'createdAt': when, 'timestamp': when.isoformat(),
+    })(_day(r, 180)))
+    food_templates = health.get('food_data') or [{'food_input': 'rice and dal'}]
+    patient['food_data'] = entries(logs, lambda r: (lambda when: dict(
+        copy.deepcopy(r.choice(food_templates)), created_at=when.isoformat(), timestamp=when.isoformat(),
+        pregnancy_week=week,
+    ))(_day(r, 180)))
+    patient['kick_count_logs'] = entries(logs, lambda r: (lambda when: {
+        'kickCount': r.randint(5, 20), 'sessionDuration': r.randint(300, 3600),
+        'date': when.strftime('%Y-%m-%d'), 'time': when.strftime('%H:%M'), 'timestamp': when.isoformat(),
+    })(_day(r, 60)))
+    patient['sleep_logs'] = entries(logs, lambda r: (lambda when: {
+        'startTime': when.isoformat(), 'endTime': (when + timedelta(hours=7)).isoformat(),
+        'totalSleep': '7h', 'sleepRating': str(r.randint(1, 5)), 'timestamp': when.isoformat(),
+    })(_day(r, 90)))
+    patient['mental_health_logs'] = entries(logs, lambda r: (lambda when: {
+        'type': 'mood_checkin', 'mood': r.choice(MOODS), 'note': '', 'patient_id': patient_id,
+        'date': when.strftime('%Y-%m-%d'), 'timestamp': when.isoformat(), 'created_at': when.isoformat(),
+    })(_day(r, 90)))
+    patient['symptom_analysis_reports'] = [
+        dict(copy.deepcopy(report), patient_id=patient_id)
+        for report in health.get('symptom_analysis_reports', [])
+    ]
+    appointment_template = (health.get('appointments') or [{}])[0]
+    patient['appointments'] = [
+        dict(copy.deepcopy(appointment_template),
+             appointment_id=f'APTBENCH{index:07d}{n}',
+             appointment_date=(datetime.now() + timedelta(days=rng.randint(-30, 30))).strftime('%Y-%m-%d'),
+             doctor_id=rng.choice(doctor_ids),
+             status='active')
+        for n in range(rng.randint(1, 3))
+    ]
+    return patient
+
+
+def seed(app_module, args):
+    from utils.password_hashing import hash_password
+
+    if not args.db_name.startswith('bench'):
+        raise SystemExit(f'❌ Refusing to drop and seed "{args.db_name}": the database name must start with "bench"')
+    database = app_module.db.client[args.db_name]
+    print(f"🌱 Seeding {args.patients:,} patients x {args.logs} logs per history into {args.db_name}")
+    for collection in (app_module.db.patients_collection, app_module.db.doctors_collection,
+                       app_module.db.mental_health_collection, app_module.db.appointments_collection):
+        collection.delete_many({})
+
+    template = load_template()
+    rng = random.Random(args.random_seed)
+    # One bcrypt hash shared by every synthetic account keeps seeding fast
+    password_hash = hash_password(BENCH_PASSWORD)
+
+    doctor_count = max(1, args.patients // 200)
+    doctors = [{
+        'doctor_id': f'DRBENCH{i:05d}',
+        'email': f'doctor{i}@bench.example.com',
+        'username': f'bench_doctor_{i}',
+        'name': f'Dr. Bench {i}',
+        'specialization': 'Obstetrics',
+        'password_hash': password_hash,
+        'status': 'active',
+        'created_at': datetime.now(),
+    } for i in range(doctor_count)]
+    app_module.db.doctors_collection.insert_many(doctors)
+    doctor_ids = [doctor['doctor_id'] for doctor in doctors]
+
+    started = time.perf_counter()
+    batch = []
+    for index in range(args.patients):
+        batch.append(build_patient(template, index, args.logs, password_hash, rng, doctor_ids))
+        if len(batch) >= 500:
+            app_module.db.patients_collection.insert_many(batch, ordered=False)
+            batch = []
+            print(f"   {index + 1:,} patients ({time.perf_counter() - started:.0f}s)", end='\r')
+    if batch:
+        app_module.db.patients_collection.insert_many(batch, ordered=False)
+    print(f"\n✅ Seeded {args.patients:,} patients and {doctor_count} doctors "
+          f"in {time.perf_counter() - started:.1f}s ({database.name})")
+
+
+# ==================== LOAD GENERATION ====================
+
+class InProcessTransport:
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body, token):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        import requests
+
+        self._requests = requests
+        self._base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, body, token):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = session.request(method, self._base_url + path, json=body, headers=headers, timeout=60)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        return response.status_code, payload
+
+
+def build_scenarios(patients):
+    """(name, weight, auth, make_request) where make_request(rng) -> (method, path, body)."""
+
+    def patient(rng):
+        return rng.choice(patients)
+
+    def now_iso():
+        return datetime.now().isoformat()
+
+    return [
+        ('POST /login', 1, None, lambda rng: (
+            'POST', '/login', {'login_identifier': patient(rng), 'password': BENCH_PASSWORD})),
+        ('GET /doctor/dashboard-stats', 3, 'doctor', lambda rng: ('GET', '/doctor/dashboard-stats', None)),
+        ('GET /doctor/patients', 3, 'doctor', lambda rng: ('GET', '/doctor/patients', None)),
+        ('GET /doctor/appointments', 2, 'doctor', lambda rng: ('GET', '/doctor/appointments', None)),
+        ('GET /doctor/appointments?patient_id', 2, 'doctor', lambda rng: (
+            'GET', f'/doctor/appointments?patient_id={patient(rng)}', None)),
+        ('GET /symptoms/get-symptom-history', 4, 'patient', lambda rng: (
+            'GET', f'/symptoms/get-symptom-history/{patient(rng)}', None)),
+        ('GET /medication/get-medication-history', 4, 'patient', lambda rng: (
+            'GET', f'/medication/get-medication-history/{patient(rng)}', None)),
+        ('GET /nutrition/get-food-entries', 3, 'patient', lambda rng: (
+            'GET', f'/nutrition/get-food-entries/{patient(rng)}', None)),
+        ('GET /kick-count/get-kick-history', 3, 'patient', lambda rng: (
+            'GET', f'/kick-count/get-kick-history/{patient(rng)}', None)),
+        ('GET /mental-health/history', 3, 'patient', lambda rng: (
+            'GET', f'/mental-health/history/{patient(rng)}', None)),
+        ('POST /save-sleep-log', 2, 'patient', lambda rng: ('POST', '/save-sleep-log', {
+            'userId': patient(rng), 'userRole': 'patient', 'startTime': now_iso(), 'endTime': now_iso(),
+            'totalSleep': '7h 30m', 'sleepRating': '4'})),
+        ('POST /save-kick-session', 2, 'patient', lambda rng: ('POST', '/save-kick-session', {
+            'userId': patient(rng), 'userRole': 'patient', 'kickCount': rng.randint(5, 20),
+            'sessionDuration': rng.randint(300, 3600)})),
+        ('POST /symptoms/save-symptom-log', 2, 'patient', lambda rng: ('POST', '/symptoms/save-symptom-log', {
+            'patient_id': patient(rng), 'symptom_text': rng.choice(SYMPTOMS), 'severity': rng.randint(1, 10),
+            'category': 'General'})),
+        ('POST /medication/save-medication-log', 2, 'patient', lambda rng: ('POST', '/medication/save-medication-log', {
+            'patient_id': patient(rng), 'medication_name': rng.choice(MEDICATIONS),
+            'dosages': [{'dosage': '400 mcg', 'time': '08:00', 'frequency': 'Daily'}]})),
+        ('POST /nutrition/save-food-entry', 2, 'patient', lambda rng: ('POST', '/nutrition/save-food-entry', {
+            'userId': patient(rng), 'food_input': 'rice, dal and spinach', 'pregnancy_week': rng.randint(4, 40)})),
+        ('POST /mental-health/mood-checkin', 1, 'patient', lambda rng: ('POST', '/mental-health/mood-checkin', {
+            'patient_id': patient(rng), 'mood': rng.choice(MOODS),
+            'date': (datetime.now() - timedelta(days=rng.randint(0, 3650))).strftime('%d/%m/%Y')})),
+        ('POST /symptoms/assist', 1, 'patient', lambda rng: ('POST', '/symptoms/assist', {
+            'text': rng.choice(SYMPTOMS), 'weeks_pregnant': rng.randint(4, 40), 'patient_id': patient(rng)})),
+    ]
+
+
+def login_tokens(transport, patient_ids, doctor_login):
+    tokens = {'patient': None, 'doctor': None}
+    status, payload = transport.request('POST', '/login', {'login_identifier': patient_ids[0], 'password': BENCH_PASSWORD}, None)
+    if status != 200 or not payload or not payload.get('token'):
+        raise SystemExit(f'❌ Patient login failed ({status}): {payload}. Was the database seeded (--seed)?')
+    tokens['patient'] = payload['token']
+    status, payload = transport.request('POST', '/doctor-login', {'login_identifier': doctor_login, 'password': BENCH_PASSWORD}, None)
+    if status != 200 or not payload or not (payload.get('token') or payload.get('access_token')):
+        raise SystemExit(f'❌ Doctor login failed ({status}): {payload}')
+    tokens['doctor'] = payload.get('token') or payload.get('access_token')
+    return tokens
+
+
+def run_load(transport, scenarios, tokens, args):
+    names = [scenario[0] for scenario in scenarios]
+    weights = [scenario[1] for scenario in scenarios]
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    stop_at = [0.0]
+    remaining = [args.requests]
+    start_gate = threading.Event()
+
+    def worker(worker_index):
+        rng = random.Random(args.random_seed + worker_index)
+        local_latencies = defaultdict(list)
+        local_statuses = defaultdict(lambda: defaultdict(int))
+        start_gate.wait()
+        while time.perf_counter() < stop_at[0]:
+            if args.requests:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            index = rng.choices(range(len(scenarios)), weights)[0]
+            name, _, auth, make_request = scenarios[index]
+            method, path, body = make_request(rng)
+            started = time.perf_counter()
+            try:
+                status, _ = transport.request(method, path, body, tokens.get(auth) if auth else None)
+            except Exception as e:
+                status = f'exception:{type(e).__name__}'
+            local_latencies[name].append(time.perf_counter() - started)
+            local_statuses[name][str(status)] += 1
+        with lock:
+            for name, values in local_latencies.items():
+                latencies[name].extend(values)
+            for name, counts in local_statuses.items():
+                for status, count in counts.items():
+                    statuses[name][status] += count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    stop_at[0] = started + (args.duration if args.duration else 10 ** 9)
+    start_gate.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        values = latencies.get(name, [])
+        if not values:
+            continue
+        counts = dict(statuses[name])
+        ok = sum(count for status, count in counts.items() if status.startswith('2'))
+        results[name] = {
+            'requests': len(values),
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'error_rate': round(1 - ok / len(values), 4),
+            'statuses': counts,
+        }
+    total = sum(len(values) for values in latencies.values())
+    return elapsed, total, results
+
+
+# ==================== REPORTING ====================
+
+def report(elapsed, total, results, baseline, tolerance):
+    print(f"\n📊 {total:,} requests in {elapsed:.1f}s -> {total / elapsed:,.1f} req/s")
+    header = f"{'route':<42} {'n':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err%':>6}"
+    if baseline:
+        header += f" {'p95 vs base':>12}"
+    print(header)
+    print('-' * len(header))
+    regressions, broken = [], []
+    for name, entry in results.items():
+        line = (f"{name:<42} {entry['requests']:>7,} {entry['rps']:>8.1f} {entry['p50_ms']:>8.1f} "
+                f"{entry['p95_ms']:>8.1f} {entry['p99_ms']:>8.1f} {entry['error_rate'] * 100:>5.1f}%")
+        base = (baseline or {}).get('routes', {}).get(name)
+        if base and base.get('p95_ms'):
+            change = entry['p95_ms'] / base['p95_ms'] - 1
+            flag = ' ⚠️' if change > tolerance else ''
+            line += f" {change * 100:>+10.1f}%{flag}"
+            if change > tolerance:
+                regressions.append((name, base['p95_ms'], entry['p95_ms']))
+        elif baseline:
+            line += f" {'new':>12}"
+        print(line)
+        non_ok = {status: count for status, count in entry['statuses'].items() if not status.startswith('2')}
+        if non_ok:
+            print(f"{'':<42}   non-2xx: {non_ok}")
+        if entry['error_rate'] >= 1:
+            # Every request failed, so the numbers above measure an error path
+            broken.append((name, non_ok))
+    return regressions, broken
+
+
+@contextlib.contextmanager
+def app_output(args):
+    """Silence the app's own prints unless --show-app-output is set."""
+    if args.show_app_output:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--db-name', default='bench_patients_db')
+    parser.add_argument('--mongomock', action='store_true', help='use mongomock instead of a mongod')
+    parser.add_argument('--seed', action='store_true', help='drop and re-seed the benchmark database first')
+    parser.add_argument('--seed-only', action='store_true')
+    parser.add_argument('--patients', type=int, default=1000, help='1000, 10000, 100000, ...')
+    parser.add_argument('--logs', type=int, default=30, help='entries per history array per patient')
+    parser.add_argument('--base-url', help='drive a running server over HTTP instead of in-process')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help='seconds (0 = until --requests are sent)')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests')
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--openai-ms', type=float, default=0, help='simulated OpenAI latency')
+    parser.add_argument('--smtp-ms', type=float, default=0, help='simulated SMTP latency')
+    parser.add_argument('--qdrant-ms', type=float, default=0, help='simulated Qdrant latency')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth before flagging')
+    parser.add_argument('--show-app-output', action='store_true', help="keep the app's own prints")
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error('set --duration or --requests')
+
+    print("🏋️ API load benchmark")
+    print("=" * 60)
+    install_stubs(args)
+    with app_output(args):
+        import app_simple
+        stub_app_services(app_simple)
+    if app_simple.db.patients_collection is None:
+        raise SystemExit(f'❌ Could not connect to {args.mongo_uri}')
+
+    if args.seed or args.seed_only:
+        seed(app_simple, args)
+        if args.seed_only:
+            return
+
+    patient_ids = [f'PATBENCH{i:07d}' for i in range(args.patients)]
+    transport = HTTPTransport(args.base_url) if args.base_url else InProcessTransport(app_simple.app)
+    with app_output(args):
+        tokens = login_tokens(transport, patient_ids, 'doctor0@bench.example.com')
+    scenarios = build_scenarios(patient_ids)
+
+    print(f"target={'HTTP ' + args.base_url if args.base_url else 'in-process'} patients={args.patients:,} "
+          f"concurrency={args.concurrency} duration={args.duration}s requests={args.requests or 'unbounded'}")
+    with app_output(args):
+        elapsed, total, results = run_load(transport, scenarios, tokens, args)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n📏 Baseline: {args.baseline} (commit {baseline.get('commit')}, {baseline.get('recorded_at')})")
+    regressions, broken = report(elapsed, total, results, baseline, args.tolerance)
+
+    if args.save_baseline and broken:
+        print("\n⚠️ Baseline not saved: some scenarios never succeeded")
+    elif args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({
+                'recorded_at': datetime.now().isoformat(timespec='seconds'),
+                'commit': git_revision(),
+                'settings': {key: getattr(args, key) for key in (
+                    'patients', 'logs', 'concurrency', 'duration', 'requests', 'openai_ms', 'smtp_ms', 'qdrant_ms')},
+                'throughput_rps': round(total / elapsed, 2),
+                'routes': results,
+            }, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+    print(f"📧 stub emails sent: {FakeSMTP.sent}")
+    print("=" * 60)
+    for name, non_ok in broken:
+        print(f"❌ Every request in {name} failed ({non_ok}); fix the scenario or the route")
+    for name, before, after in regressions:
+        print(f"❌ p95 regression on {name}: {before:.1f} ms -> {after:.1f} ms")
+    if regressions or broken:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
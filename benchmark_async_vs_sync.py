@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Load-test the sync (gunicorn) and async (ASGI) deployments side by side
+
+Starts both real entry points against the same seeded database and drives
+them with the same mix of slow LLM-backed requests (/symptoms/assist) and
+history reads at increasing concurrency:
+
+    sync    gunicorn --workers W app_simple:app          (default sync workers)
+    async   hypercorn --workers W app_async:app
+
+OpenAI is replaced by a local HTTP server (OPENAI_BASE_URL) that answers chat
+completions after --llm-ms, so both deployments make real, slow network calls
+without an API key. Qdrant points at an unreachable address, so
+/symptoms/assist takes the LLM fallback path.
+
+Seed the database first (see benchmark_api_load.py):
+
+    python benchmark_api_load.py --seed-only --patients 1000 --logs 30
+    python benchmark_async_vs_sync.py --workers 2 --concurrency 50,200,1000 --llm-ms 800
+
+Requires gunicorn, hypercorn, quart, motor, aiosmtplib and httpx.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_fake_openai(port: int, delay: float) -> ThreadingHTTPServer:
+    """Minimal /v1/chat/completions and /v1/models that answer after ``delay`` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._json({'object': 'list', 'data': [{'id': 'gpt-4o-mini', 'object': 'model', 'created': 0, 'owned_by': 'bench'}]})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            self._json({
+                'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()), 'model': 'gpt-4o-mini',
+                'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {
+                    'role': 'assistant',
+                    'content': 'Urgency level: mild\nRest and stay hydrated.\nSeek urgent care for heavy bleeding or severe pain.'}}],
+                'usage': {'prompt_tokens': 50, 'completion_tokens': 30, 'total_tokens': 80},
+            })
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_server(kind: str, port: int, args, env) -> subprocess.Popen:
+    if kind == 'sync':
+        command = ['gunicorn', '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}',
+                   '--timeout', '120', 'app_simple:app']
+    else:
+        command = ['hypercorn', '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}', 'app_async:app']
+    output = None if args.show_server_output else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=output, stderr=output,
+                            start_new_session=True)
+
+
+def wait_until_up(base_url: str, process: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'❌ Server for {base_url} exited with code {process.returncode} (try --show-server-output)')
+        try:
+            httpx.get(f'{base_url}/health', timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise SystemExit(f'❌ {base_url} did not come up within {timeout:.0f}s')
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=20)
+    except Exception:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+async def drive(base_url: str, concurrency: int, duration: float, patients: int, llm_share: float, seed: int):
+    rng = random.Random(seed)
+    latencies = {'llm': [], 'history': []}
+    errors = {'llm': 0, 'history': 0}
+    history_paths = ['/symptoms/get-symptom-history/{}', '/medication/get-medication-history/{}',
+                     '/kick-count/get-kick-history/{}']
+    stop_at = time.perf_counter() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        while time.perf_counter() < stop_at:
+            patient_id = f'PATBENCH{rng.randrange(patients):07d}'
+            if rng.random() < llm_share:
+                kind = 'llm'
+                call = client.post('/symptoms/assist', json={
+                    'text': 'mild headache and nausea since yesterday', 'weeks_pregnant': rng.randint(4, 40),
+                    'patient_id': patient_id})
+            else:
+                kind = 'history'
+                call = client.get(rng.choice(history_paths).format(patient_id) + '?limit=20')
+            started = time.perf_counter()
+            try:
+                response = await call
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies[kind].append(time.perf_counter() - started)
+            if not ok:
+                errors[kind] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--db-name', default='bench_patients_db')
+    parser.add_argument('--patients', type=int, default=1000, help='patients seeded by benchmark_api_load.py')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes for both deployments')
+    parser.add_argument('--concurrency', default='50,200,1000', help='comma-separated client concurrency levels')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per level')
+    parser.add_argument('--llm-ms', type=float, default=800, help='simulated OpenAI latency')
+    parser.add_argument('--llm-share', type=float, default=0.3, help='fraction of requests hitting /symptoms/assist')
+    parser.add_argument('--only', choices=['sync', 'async'])
+    parser.add_argument('--show-server-output', action='store_true')
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    print("⚡ Sync vs async deployment benchmark")
+    print("=" * 60)
+    openai_port, ports = 18900, {'sync': 18901, 'async': 18902}
+    start_fake_openai(openai_port, args.llm_ms / 1000)
+    env = dict(os.environ,
+               MONGO_URI=args.mongo_uri, DB_NAME=args.db_name,
+               OPENAI_API_KEY='sk-benchmark', OPENAI_BASE_URL=f'http://127.0.0.1:{openai_port}/v1',
+               QDRANT_URL='http://127.0.0.1:9', LOG_LEVEL='WARNING',
+               REQUEST_PROFILER_ENABLED='false', QUERY_PROFILER_ENABLED='false')
+    print(f"workers={args.workers} llm={args.llm_ms:g} ms llm_share={args.llm_share} duration={args.duration:g}s/level")
+
+    results = {}
+    for kind in ('sync', 'async'):
+        if args.only and kind != args.only:
+            continue
+        base_url = f"http://127.0.0.1:{ports[kind]}"
+        process = start_server(kind, ports[kind], args, env)
+        try:
+            wait_until_up(base_url, process)
+            for level in levels:
+                elapsed, latencies, errors = asyncio.run(
+                    drive(base_url, level, args.duration, args.patients, args.llm_share, seed=level))
+                results[(kind, level)] = (elapsed, latencies, errors)
+                total = sum(len(values) for values in latencies.values())
+                print(f"\n📊 {kind:<5} concurrency={level:<5} {total / elapsed:8.1f} req/s")
+                for route, values in latencies.items():
+                    print(f"   {route:<8} n={len(values):<7} p50 {percentile(values, 50) * 1000:8.1f} ms   "
+                          f"p95 {percentile(values, 95) * 1000:8.1f} ms   p99 {percentile(values, 99) * 1000:8.1f} ms   "
+                          f"errors {errors[route]}")
+        finally:
+            stop_server(process)
+
+    if not args.only:
+        print("\n📈 async vs sync throughput")
+        for level in levels:
+            sync_elapsed, sync_latencies, _ = results[('sync', level)]
+            async_elapsed, async_latencies, _ = results[('async', level)]
+            sync_rps = sum(map(len, sync_latencies.values())) / sync_elapsed
+            async_rps = sum(map(len, async_latencies.values())) / async_elapsed
+            history_p95 = (percentile(sync_latencies['history'], 95) * 1000, percentile(async_latencies['history'], 95) * 1000)
+            print(f"   concurrency {level:<5} {sync_rps:8.1f} -> {async_rps:8.1f} req/s "
+                  f"({async_rps / sync_rps if sync_rps else 0:.1f}x), "
+                  f"history p95 {history_p95[0]:.0f} -> {history_p95[1]:.0f} ms")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark JSON serialization of the full patient details response
+
+Compares the legacy path (convert_objectid_to_string twice + Flask's default
+JSON provider) with MongoJSONProvider (single pass, orjson when available)
+using the bundled patient_full_details_PAT*.json fixture.
+
+Usage:
+    python benchmark_json_serialization.py [--scale 20] [--iterations 200]
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from utils import json_provider
+from utils.json_provider import MongoJSONProvider
+from utils.objectid_converter import convert_objectid_to_string
+
+OBJECTID_RE = re.compile(r'^[0-9a-f]{24}$')
+ISO_DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}')
+
+
+def hydrate(value):
+    """Turn fixture strings back into the BSON types Mongo would return."""
+    if isinstance(value, dict):
+        return {key: hydrate(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [hydrate(item) for item in value]
+    if isinstance(value, str):
+        if OBJECTID_RE.match(value):
+            return ObjectId(value)
+        if ISO_DATETIME_RE.match(value):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                return value
+    return value
+
+
+def load_patient_document(scale: int) -> dict:
+    """Build a raw patient document from the fixture, with arrays repeated `scale` times."""
+    fixture_path = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'patient_full_details_PAT*.json')))[0]
+    with open(fixture_path) as f:
+        fixture = json.load(f)
+
+    patient = {'_id': ObjectId(), 'patient_id': fixture['patient_id']}
+    patient.update(fixture['patient_info'])
+    for section, entries in fixture['health_data'].items():
+        patient[section] = entries * scale
+    return hydrate(patient)
+
+
+def build_full_details(patient: dict) -> dict:
+    """Same response shape as DoctorController.get_patient_full_details."""
+    sections = ['medication_logs', 'symptom_analysis_reports', 'food_data', 'tablet_logs', 'kick_logs',
+                'mental_health_logs', 'prescription_documents', 'vital_signs_logs', 'appointments']
+    return {
+        'success': True,
+        'patient_id': patient.get('patient_id'),
+        'patient_info': {key: value for key, value in patient.items() if key not in sections},
+        'health_data': {section: patient.get(section, []) for section in sections},
+        'summary': {section: len(patient.get(section, [])) for section in sections},
+    }
+
+
+def legacy_path(app, patient):
+    provider = DefaultJSONProvider(app)
+    converted = convert_objectid_to_string(patient)
+    full_details = convert_objectid_to_string(build_full_details(converted))
+    return provider.response(full_details).get_data()
+
+
+def provider_path(app, patient):
+    return app.json.response(build_full_details(patient)).get_data()
+
+
+def run(label, func, iterations):
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        body = func()
+    elapsed = time.perf_counter() - start
+    per_call_ms = elapsed / iterations * 1000
+    print(f"{label:<40} {per_call_ms:8.3f} ms/response   {len(body):>9} bytes")
+    return per_call_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=20, help='repeat every health array this many times')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.json = MongoJSONProvider(app)
+    patient = load_patient_document(args.scale)
+
+    print("📊 Full patient details serialization benchmark")
+    print(f"🔍 Scale: x{args.scale}, iterations: {args.iterations}, orjson available: {json_provider.ORJSON_AVAILABLE}")
+    print("=" * 80)
+
+    with app.app_context():
+        legacy = run('legacy (convert x2 + default provider)', lambda: legacy_path(app, patient), args.iterations)
+        fast = run('MongoJSONProvider', lambda: provider_path(app, patient), args.iterations)
+
+        stdlib = None
+        if json_provider.ORJSON_AVAILABLE:
+            json_provider.ORJSON_AVAILABLE = False
+            try:
+                stdlib = run('MongoJSONProvider (stdlib json fallback)', lambda: provider_path(app, patient), args.iterations)
+            finally:
+                json_provider.ORJSON_AVAILABLE = True
+
+    print("=" * 80)
+    print(f"✅ Speedup: {legacy / fast:.1f}x")
+    if stdlib:
+        print(f"✅ Speedup without orjson: {legacy / stdlib:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark request throughput with print debugging vs queued, leveled logging
+
+Serves a route shaped like /medication/save-medication-log (a medication log
+body with several dosages) through the Flask test client from several
+threads, and compares:
+
+    print      - the old behaviour: json.dumps(indent=2) of the body plus a
+                 handful of debug prints, written synchronously
+    logging    - utils.logging_config at INFO with payload dumps off (default)
+    debug      - LOG_LEVEL=DEBUG and LOG_DEBUG_PAYLOADS on: every record and
+                 payload is still written, but by the background writer
+
+Output goes to a temporary file (not the terminal) so both variants pay for
+real writes.
+
+Usage:
+    python benchmark_logging_throughput.py [--requests 4000] [--threads 8]
+"""
+
+import argparse
+import json
+import logging
+import tempfile
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+from utils import logging_config
+from utils.logging_config import configure_logging, dropped_records, get_logger, log_payload
+
+BODY = {
+    'patient_id': 'PAT1758200154557',
+    'medication_name': 'Folic acid',
+    'is_prescription_mode': False,
+    'notes': 'Take after breakfast. ' * 10,
+    'dosages': [
+        {'dosage': f'{i * 100} mg', 'time': f'0{i}:00', 'frequency': 'Daily',
+         'reminder_enabled': True, 'special_instructions': 'With water ' * 5}
+        for i in range(1, 6)
+    ],
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_app(mode: str, log_file) -> Flask:
+    app = Flask(__name__)
+    logger = get_logger('benchmark')
+
+    @app.route('/medication/save-medication-log', methods=['POST'])
+    def save_medication_log():
+        data = request.get_json()
+        dosages = data.get('dosages', [])
+        if mode == 'print':
+            print(f"🔍 Received medication log data: {json.dumps(data, indent=2)}", file=log_file, flush=True)
+            print(f"🔍 Data keys: {list(data.keys())}", file=log_file, flush=True)
+            print(f"🔍 Dosages field: {data.get('dosages', 'NOT_FOUND')}", file=log_file, flush=True)
+            print(f"🔍 - Dosages content: {dosages}", file=log_file, flush=True)
+            print(f"🔍 Looking for patient with ID: {data['patient_id']}", file=log_file, flush=True)
+        else:
+            log_payload(logger, "🔍 Received medication log data", data)
+            logger.debug("🔍 Medication log: prescription_mode=%s dosages=%d",
+                         data.get('is_prescription_mode'), len(dosages))
+        return jsonify({'success': True, 'message': 'Medication log saved successfully'})
+
+    return app
+
+
+def run(mode: str, log_file, requests: int, threads: int):
+    app = make_app(mode, log_file)
+    latencies = []
+    lock = threading.Lock()
+    per_thread = requests // threads
+    start_gate = threading.Event()
+
+    def worker():
+        client = app.test_client()
+        local = []
+        start_gate.wait()
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            client.post('/medication/save-medication-log', json=BODY)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    started = time.perf_counter()
+    start_gate.set()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    log_file = tempfile.TemporaryFile('w+', encoding='utf-8')
+    configure_logging(stream=log_file)
+    root = logging.getLogger(logging_config.ROOT_LOGGER_NAME)
+
+    print("🪵 Logging throughput benchmark")
+    print("=" * 60)
+    print(f"requests={args.requests} threads={args.threads} body={len(json.dumps(BODY))} bytes")
+
+    scenarios = [
+        ('print', 'print + json.dumps(indent=2) (before)', logging.INFO, False),
+        ('logging', 'queued logging, INFO, payloads off (default)', logging.INFO, False),
+        ('logging', 'queued logging, DEBUG, payloads on', logging.DEBUG, True),
+    ]
+    for mode, label, level, payloads in scenarios:
+        root.setLevel(level)
+        logging_config.LOG_DEBUG_PAYLOADS = payloads
+        elapsed, latencies = run(mode, log_file, args.requests, args.threads)
+        print(f"\n📊 {label}")
+        print(f"   {len(latencies) / elapsed:,.0f} req/s   "
+              f"p50 {percentile(latencies, 50) * 1000:6.2f} ms   "
+              f"p99 {percentile(latencies, 99) * 1000:6.2f} ms")
+
+    print(f"\nlog records dropped (queue full): {dropped_records()}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark login throughput with inline vs pooled bcrypt
+
+Simulates a burst of concurrent logins (one thread per in-flight request,
+like the threaded dev server / gunicorn gthread workers) and compares:
+
+    inline  - bcrypt.checkpw on the request thread (the old behaviour)
+    pooled  - utils.password_hashing: bounded worker pool, 429 when the
+              queue is full
+
+Shed logins back off and retry, like a client honouring Retry-After.
+Reports logins/s, p50/p95/p99 latency of the attempt that was served and of
+the whole login including retries, and how many 429s were returned.
+
+Usage:
+    python benchmark_login_throughput.py [--clients 64] [--logins 512] [--rounds 10]
+        [--workers N] [--max-queue N] [--retry-after-ms 250]
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import bcrypt
+
+from utils.password_hashing import PasswordHasher, PasswordHasherBusy
+
+PASSWORD = 'correct horse battery staple'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_burst(login, clients: int, logins: int, backoff: float):
+    """
+    Run `logins` logins of `login()` from `clients` threads. A shed login
+    (429) waits `backoff` seconds, like a client honouring Retry-After, and
+    retries.
+
+    Returns (elapsed, served latencies, end-to-end latencies, rejected attempts).
+    """
+    served, end_to_end = [], []
+    rejected = [0]
+    lock = threading.Lock()
+    remaining = [logins]
+    start_gate = threading.Event()
+
+    def worker():
+        start_gate.wait()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            first_attempt = time.perf_counter()
+            while True:
+                started = time.perf_counter()
+                try:
+                    ok = login()
+                    break
+                except PasswordHasherBusy:
+                    with lock:
+                        rejected[0] += 1
+                    time.sleep(backoff)
+            finished = time.perf_counter()
+            assert ok, 'login failed'
+            with lock:
+                served.append(finished - started)
+                end_to_end.append(finished - first_attempt)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start_gate.set()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, served, end_to_end, rejected[0]
+
+
+def _latency_line(name, values):
+    return (f"   {name:<11} p50 {percentile(values, 50) * 1000:8.1f} ms   "
+            f"p95 {percentile(values, 95) * 1000:8.1f} ms   "
+            f"p99 {percentile(values, 99) * 1000:8.1f} ms")
+
+
+def report(label, elapsed, served, end_to_end, rejected):
+    print(f"\n📊 {label}")
+    print(f"   logins: {len(served):,} in {elapsed:.2f}s -> {len(served) / elapsed:,.1f} logins/s")
+    print(_latency_line('served', served))
+    print(_latency_line('end-to-end', end_to_end))
+    print(f"   429 responses: {rejected:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64, help='concurrent login requests')
+    parser.add_argument('--logins', type=int, default=512, help='total login attempts per scenario')
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt cost used for the benchmark hashes')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--max-queue', type=int, default=None, help='default: 8 per worker')
+    parser.add_argument('--retry-after-ms', type=int, default=250, help='client back-off after a 429')
+    args = parser.parse_args()
+    max_queue = args.max_queue if args.max_queue is not None else args.workers * 8
+
+    stored_hash = bcrypt.hashpw(PASSWORD.encode('utf-8'), bcrypt.gensalt(args.rounds))
+
+    print("🔐 Login throughput benchmark")
+    print("=" * 60)
+    print(f"clients={args.clients} logins={args.logins} cost={args.rounds} "
+          f"workers={args.workers} max_queue={max_queue} cpus={os.cpu_count()}")
+
+    def inline_login():
+        return bcrypt.checkpw(PASSWORD.encode('utf-8'), stored_hash)
+
+    report('inline bcrypt (before)', *run_burst(inline_login, args.clients, args.logins, args.retry_after_ms / 1000))
+
+    hasher = PasswordHasher(workers=args.workers, max_queue=max_queue, rounds=args.rounds)
+
+    def pooled_login():
+        return hasher.verify(PASSWORD, stored_hash)
+
+    report('pooled bcrypt (after)', *run_burst(pooled_login, args.clients, args.logins, args.retry_after_ms / 1000))
+
+    # Cost upgrade: a login against an older, cheaper hash returns a new one
+    upgraded = PasswordHasher(workers=1, max_queue=0, rounds=args.rounds + 1)
+    ok, new_hash = upgraded.verify_and_rehash(PASSWORD, stored_hash)
+    assert ok and new_hash and new_hash.startswith(f"$2b${args.rounds + 1:02d}$")
+    print(f"\n✅ transparent rehash: cost {args.rounds} -> {args.rounds + 1} on successful login")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
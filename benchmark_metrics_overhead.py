@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark the overhead of the /metrics middleware and dependency timers
+
+Measures:
+    - Histogram.observe and timed() cost per call
+    - a trivial Flask route served through the test client with and without
+      utils.metrics.init_metrics, i.e. the per-request cost of the middleware
+    - rendering /metrics with realistic label cardinality
+
+Usage:
+    python benchmark_metrics_overhead.py [--requests 20000] [--observations 500000]
+"""
+
+import argparse
+import time
+
+from flask import Flask, jsonify
+
+from utils.metrics import LATENCY_BUCKETS, Histogram, MetricsRegistry, init_metrics, timed
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_observe(observations: int) -> None:
+    histogram = Histogram('bench_seconds', 'benchmark', ('endpoint', 'method'), LATENCY_BUCKETS)
+    labels = ('get_patient', 'GET')
+    started = time.perf_counter()
+    for i in range(observations):
+        histogram.observe(labels, (i % 1000) / 10000)
+    elapsed = time.perf_counter() - started
+    print(f"   Histogram.observe: {elapsed / observations * 1e9:8.0f} ns/call")
+
+    started = time.perf_counter()
+    for _ in range(observations):
+        with timed('bench', 'noop'):
+            pass
+    elapsed = time.perf_counter() - started
+    print(f"   with timed(...):   {elapsed / observations * 1e9:8.0f} ns/call")
+
+
+def make_app(with_metrics: bool) -> Flask:
+    app = Flask(__name__)
+    if with_metrics:
+        init_metrics(app)
+
+    @app.route('/patients/<patient_id>')
+    def get_patient(patient_id):
+        return jsonify({'success': True, 'patient_id': patient_id, 'name': 'Benchmark Patient'})
+
+    return app
+
+
+def bench_requests(with_metrics: bool, requests: int):
+    client = make_app(with_metrics).test_client()
+    for i in range(500):  # warm up
+        client.get(f'/patients/PAT{i}')
+    latencies = []
+    started = time.perf_counter()
+    for i in range(requests):
+        request_started = time.perf_counter()
+        client.get(f'/patients/PAT{i}')
+        latencies.append(time.perf_counter() - request_started)
+    return time.perf_counter() - started, latencies
+
+
+def bench_render() -> None:
+    registry = MetricsRegistry()
+    histogram = registry.histogram('http_request_duration_seconds', 'latency', ('endpoint', 'method'))
+    for endpoint in range(150):
+        for method in ('GET', 'POST'):
+            histogram.observe((f'endpoint_{endpoint}', method), 0.02)
+    started = time.perf_counter()
+    body = registry.render()
+    elapsed = time.perf_counter() - started
+    print(f"   render 300 histogram series: {elapsed * 1000:.2f} ms, {len(body) / 1024:.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--observations', type=int, default=500000)
+    args = parser.parse_args()
+
+    print("📈 Metrics overhead benchmark")
+    print("=" * 60)
+    bench_observe(args.observations)
+    bench_render()
+
+    results = {}
+    for with_metrics in (False, True):
+        elapsed, latencies = bench_requests(with_metrics, args.requests)
+        label = 'with metrics' if with_metrics else 'without metrics'
+        results[with_metrics] = elapsed / args.requests
+        print(f"\n📊 {label}")
+        print(f"   {args.requests / elapsed:,.0f} req/s   "
+              f"p50 {percentile(latencies, 50) * 1e6:6.1f} µs   "
+              f"p99 {percentile(latencies, 99) * 1e6:6.1f} µs")
+
+    overhead = results[True] - results[False]
+    print(f"\n✅ middleware overhead: {overhead * 1e6:.1f} µs/request "
+          f"({overhead / results[False] * 100:.1f}% of an in-process no-op request)")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,11 @@ Auth Controller - Handles authentication operations
 from flask import request, jsonify
 from typing import Dict, Any
 
+from utils.logging_config import get_logger
+from utils.password_hashing import PasswordHasherBusy, password_busy_response
+
+logger = get_logger(__name__)
+
 class AuthController:
     """Authentication controller"""
     
@@ -51,6 +56,10 @@ class AuthController:
             if self.doctor_model.check_mobile_exists(mobile):
                 return jsonify({'error': 'Mobile number already exists'}), 400
             
+            limited = self.otp_model.check_send_rate(email)
+            if limited:
+                return limited
+            
             # Prepare signup data for JWT
             signup_data = {
                 'username': username,
@@ -70,8 +79,7 @@ class AuthController:
             # AUTOMATICALLY GENERATE AND SEND OTP
             try:
                 otp, jwt_token = self.jwt_service.generate_otp_jwt(email, 'doctor_signup', signup_data)
-                print(f"🔐 Generated JWT OTP: {otp} for email: {email}")
-                print(f"🔐 JWT Token: {jwt_token[:50]}...")
+                logger.info("🔐 Generated JWT OTP for email: %s", email)
             except Exception as e:
                 return jsonify({
                     "error": f"Failed to generate OTP: {str(e)}"
@@ -91,7 +99,7 @@ class AuthController:
                 }), 200
             else:
                 # Email failed but OTP is available - return OTP anyway
-                print(f"⚠️ Email sending failed, but OTP is available: {otp}")
+                logger.warning("⚠️ OTP email to %s failed", email)
                 return jsonify({
                     "email": email,
                     "message": "Please check your email for OTP verification.",
@@ -249,6 +257,8 @@ class AuthController:
                     }
                 }), 200
                 
+        except PasswordHasherBusy as e:
+            return password_busy_response(e)
         except Exception as e:
             return jsonify({'error': f'Server error: {str(e)}'}), 500
     
@@ -316,6 +326,26 @@ class AuthController:
                 }
             }), 200
                 
+        except PasswordHasherBusy as e:
+            return password_busy_response(e)
+        except Exception as e:
+            return jsonify({'error': f'Server error: {str(e)}'}), 500
+    
+    def logout(self, request) -> tuple:
+        """Revoke the bearer token so it stops working immediately"""
+        try:
+            auth_header = request.headers.get('Authorization', '')
+            if not auth_header.startswith('Bearer '):
+                return jsonify({'error': 'Token is missing'}), 401
+            
+            if not self.jwt_service.revoke_token(auth_header[len('Bearer '):].strip()):
+                return jsonify({'error': 'Invalid or expired token'}), 401
+            
+            return jsonify({
+                'success': True,
+                'message': 'Logout successful'
+            }), 200
+            
         except Exception as e:
             return jsonify({'error': f'Server error: {str(e)}'}), 500
     
@@ -347,6 +377,8 @@ class AuthController:
             else:
                 return jsonify({'error': result['error']}), 400
                 
+        except PasswordHasherBusy as e:
+            return password_busy_response(e)
         except Exception as e:
             return jsonify({'error': f'Server error: {str(e)}'}), 500
     
@@ -364,10 +396,14 @@ class AuthController:
             if not doctor:
                 return jsonify({'error': 'Doctor not found'}), 404
             
+            limited = self.otp_model.check_send_rate(email)
+            if limited:
+                return limited
+            
             # Generate JWT-based OTP for password reset
             try:
                 otp, jwt_token = self.jwt_service.generate_otp_jwt(email, 'doctor_password_reset', {'email': email})
-                print(f"🔐 Generated JWT OTP for password reset: {otp} for email: {email}")
+                logger.info("🔐 Generated password reset OTP for email: %s", email)
             except Exception as e:
                 return jsonify({
                     'error': f'Failed to generate OTP: {str(e)}'
@@ -10,7 +10,31 @@ import os
 
 # Add the parent directory to the path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.objectid_converter import convert_objectid_to_string
+from utils.history_query import HistoryQueryError, parse_history_params, query_history
+from utils.section_projection import SectionProjectionError, parse_sections, fetch_sections
+from utils.search_index import normalized_prefix
+from utils.delta_sync import next_sync_seq, stamp, tombstone
+from utils.metrics import timed
+
+# Patient profile fields returned in patient_info by get_patient_full_details
+FULL_DETAILS_INFO_FIELDS = [
+    'full_name', 'email', 'mobile', 'age', 'blood_type', 'gender', 'is_pregnant', 'status',
+    'created_at', 'address', 'city', 'state', 'pincode', 'date_of_birth', 'emergency_contact',
+    'medical_history', 'allergies', 'current_medications'
+]
+
+# Health arrays returned by get_patient_full_details, mapped to their summary count key
+FULL_DETAILS_SECTIONS = {
+    'medication_logs': 'total_medications',
+    'symptom_analysis_reports': 'total_symptoms',
+    'food_data': 'total_food_entries',
+    'tablet_logs': 'total_tablet_logs',
+    'kick_logs': 'total_kick_logs',
+    'mental_health_logs': 'total_mental_health',
+    'prescription_documents': 'total_prescriptions',
+    'vital_signs_logs': 'total_vital_signs',
+    'appointments': 'total_appointments'
+}
 
 class DoctorController:
     """Doctor controller"""
@@ -95,42 +119,35 @@ class DoctorController:
             specialization = request.args.get('specialization', '').strip()
             city = request.args.get('city', '').strip()
             min_patients = request.args.get('min_patients', '').strip()
+            sort_by = request.args.get('sort', 'relevance' if search else 'newest').strip()
             
-            # Build query filter
+            # Build query filter (search terms are matched by the model against the
+            # indexed search_terms field; specialization/city use normalized prefixes)
             query_filter = {"status": {"$ne": "deleted"}}
             
-            if search:
-                query_filter["$or"] = [
-                    {"username": {"$regex": search, "$options": "i"}},
-                    {"first_name": {"$regex": search, "$options": "i"}},
-                    {"last_name": {"$regex": search, "$options": "i"}},
-                    {"email": {"$regex": search, "$options": "i"}},
-                    {"specialization": {"$regex": search, "$options": "i"}}
-                ]
-            
             if specialization:
-                query_filter["specialization"] = {"$regex": specialization, "$options": "i"}
+                query_filter["specialization_lc"] = normalized_prefix(specialization)
                 
             if city:
-                query_filter["city"] = {"$regex": city, "$options": "i"}
+                query_filter["city_lc"] = normalized_prefix(city)
+            
+            if sort_by not in self.doctor_model.DIRECTORY_SORTS:
+                return jsonify({'error': f"Invalid sort. Must be one of: {', '.join(self.doctor_model.DIRECTORY_SORTS)}"}), 400
             
-            # Get doctors from database
+            # Get doctors from database (min_patients is applied before paging)
             result = self.doctor_model.get_all_doctors(
                 query_filter=query_filter,
                 page=page,
-                limit=limit
+                limit=limit,
+                min_patients=int(min_patients) if min_patients.isdigit() else None,
+                sort_by=sort_by,
+                search=search
             )
             
             if result['success']:
-                # Filter by minimum patients if specified
-                doctors = result['doctors']
-                if min_patients and min_patients.isdigit():
-                    min_count = int(min_patients)
-                    doctors = [doc for doc in doctors if doc.get('patient_count', 0) >= min_count]
-                    
                 return jsonify({
                     'success': True,
-                    'doctors': doctors,
+                    'doctors': result['doctors'],
                     'total_count': result['total_count'],
                     'page': page,
                     'limit': limit,
@@ -139,7 +156,8 @@ class DoctorController:
                         'search': search,
                         'specialization': specialization,
                         'city': city,
-                        'min_patients': min_patients
+                        'min_patients': min_patients,
+                        'sort': sort_by
                     }
                 }), 200
             else:
@@ -148,6 +166,24 @@ class DoctorController:
         except Exception as e:
             return jsonify({'error': f'Server error: {str(e)}'}), 500
     
+    def autocomplete_doctors(self, request) -> tuple:
+        """Ranked prefix suggestions for the patient app's doctor picker"""
+        try:
+            query = request.args.get('q', '').strip()
+            limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+            
+            suggestions = self.doctor_model.autocomplete_doctors(query, limit) if query else []
+            return jsonify({
+                'success': True,
+                'query': query,
+                'suggestions': suggestions
+            }), 200
+            
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+        except Exception as e:
+            return jsonify({'error': f'Server error: {str(e)}'}), 500
+    
     def get_public_doctor_profile(self, doctor_id: str) -> tuple:
         """Get public doctor profile for patient selection"""
         try:
@@ -324,7 +360,11 @@ class DoctorController:
             return jsonify({'error': f'Server error: {str(e)}'}), 500
 
     def get_patient_full_details(self, request, patient_id: str) -> tuple:
-        """Get complete patient details with all health data in one call"""
+        """Get complete patient details with all health data in one call
+        
+        Optional ``include`` (or ``fields``) query parameter selects which
+        health arrays are returned; ``include=summary`` returns only counts.
+        """
         try:
             print(f"🔍 Getting FULL patient details for ID: {patient_id}")
             
@@ -333,13 +373,20 @@ class DoctorController:
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
+            try:
+                sections = parse_sections(request.args, FULL_DETAILS_SECTIONS)
+            except SectionProjectionError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            
+            # Find patient by Patient ID, projecting only the requested arrays
+            patient = fetch_sections(
+                patients_collection, {"patient_id": patient_id},
+                FULL_DETAILS_INFO_FIELDS, FULL_DETAILS_SECTIONS, sections
+            )
             if not patient:
                 return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Convert all ObjectIds to strings recursively
-            patient = convert_objectid_to_string(patient)
+            counts = patient.get('_counts', {})
             
             # Get all health data from patient document
             full_details = {
@@ -366,32 +413,16 @@ class DoctorController:
                     'current_medications': patient.get('current_medications', [])
                 },
                 'health_data': {
-                    'medication_logs': patient.get('medication_logs', []),
-                    'symptom_analysis_reports': patient.get('symptom_analysis_reports', []),
-                    'food_data': patient.get('food_data', []),
-                    'tablet_logs': patient.get('tablet_logs', []),
-                    'kick_logs': patient.get('kick_logs', []),
-                    'mental_health_logs': patient.get('mental_health_logs', []),
-                    'prescription_documents': patient.get('prescription_documents', []),
-                    'vital_signs_logs': patient.get('vital_signs_logs', []),
-                    'appointments': patient.get('appointments', [])
+                    section: patient.get(section, [])
+                    for section in FULL_DETAILS_SECTIONS if section in sections
                 },
                 'summary': {
-                    'total_medications': len(patient.get('medication_logs', [])),
-                    'total_symptoms': len(patient.get('symptom_analysis_reports', [])),
-                    'total_food_entries': len(patient.get('food_data', [])),
-                    'total_tablet_logs': len(patient.get('tablet_logs', [])),
-                    'total_kick_logs': len(patient.get('kick_logs', [])),
-                    'total_mental_health': len(patient.get('mental_health_logs', [])),
-                    'total_prescriptions': len(patient.get('prescription_documents', [])),
-                    'total_vital_signs': len(patient.get('vital_signs_logs', [])),
-                    'total_appointments': len(patient.get('appointments', []))
-                }
+                    summary_key: counts.get(section, 0)
+                    for section, summary_key in FULL_DETAILS_SECTIONS.items()
+                },
+                'included_sections': [section for section in FULL_DETAILS_SECTIONS if section in sections]
             }
             
-            # Convert all ObjectIds in the full_details recursively
-            full_details = convert_objectid_to_string(full_details)
-            
             print(f"✅ Retrieved FULL patient details for: {patient_id}")
             print(f"📊 Summary: {full_details['summary']}")
             
@@ -562,15 +593,16 @@ Please provide a clear, professional medical summary suitable for a doctor's rev
             # Call OpenAI API with simple method
             try:
                 print('📡 Making OpenAI API request...')
-                response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a medical AI assistant that analyzes patient data and provides professional medical summaries for doctors."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.3
-            )
+                with timed('openai', 'chat.completions'):
+                    response = openai.ChatCompletion.create(
+                        model="gpt-3.5-turbo",
+                        messages=[
+                            {"role": "system", "content": "You are a medical AI assistant that analyzes patient data and provides professional medical summaries for doctors."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=1000,
+                        temperature=0.3
+                    )
                 print('✅ OpenAI API call successful')
             
                 print(f'✅ OpenAI API response received: {response.usage.total_tokens} tokens used')
@@ -781,7 +813,7 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             # Add appointment to patient's appointments array
             result = patients_collection.update_one(
                 {"patient_id": data["patient_id"]},
-                {"$push": {"appointments": appointment}}
+                {"$push": {"appointments": stamp(appointment)}, "$inc": {"version": 1}}
             )
             
             if result.modified_count > 0:
@@ -877,11 +909,12 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 update_fields['appointments.$.notes'] = data['notes']
             
             update_fields['appointments.$.updated_at'] = datetime.now().isoformat()
+            update_fields['appointments.$.sync_seq'] = next_sync_seq()
             
             # Update the appointment
             result = patients_collection.update_one(
                 {"appointments.appointment_id": appointment_id},
-                {"$set": update_fields}
+                {"$set": update_fields, "$inc": {"version": 1}}
             )
             
             if result.modified_count > 0:
@@ -919,7 +952,11 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             # Remove the appointment from the array
             result = patients_collection.update_one(
                 {"appointments.appointment_id": appointment_id},
-                {"$pull": {"appointments": {"appointment_id": appointment_id}}}
+                {
+                    "$pull": {"appointments": {"appointment_id": appointment_id}},
+                    "$push": {"sync_tombstones": tombstone("appointments", appointment_id)},
+                    "$inc": {"version": 1}
+                }
             )
             
             if result.modified_count > 0:
@@ -984,21 +1021,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
-            
-            # Get medication logs from patient document
-            medication_logs = patient.get('medication_logs', [])
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Convert ObjectId to string for JSON serialization
-            for log in medication_logs:
-                if '_id' in log:
-                    log['_id'] = str(log['_id'])
+            # Get the requested page of medication_logs, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'medication_logs', ('created_at', 'timestamp'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by newest first (using created_at or timestamp)
-            medication_logs.sort(key=lambda x: x.get('created_at', x.get('timestamp', '')), reverse=True)
+            medication_logs = page['entries']
             
             print(f"✅ Retrieved {len(medication_logs)} medication logs for patient: {patient_id}")
             
@@ -1006,7 +1039,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'patientId': patient_id,
                 'medication_logs': medication_logs,
-                'totalEntries': len(medication_logs)
+                'totalEntries': len(medication_logs),
+                'totalMatching': page['total'],
+                'hasMore': page['has_more'],
+                'nextCursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -1023,16 +1059,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Get analysis reports from patient document
-            analysis_reports = patient.get('symptom_analysis_reports', [])
+            # Get the requested page of symptom_analysis_reports, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'symptom_analysis_reports', ('timestamp', 'created_at'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by timestamp (newest first)
-            analysis_reports.sort(key=lambda x: x.get('timestamp', x.get('created_at', '')), reverse=True)
+            analysis_reports = page['entries']
             
             print(f"✅ Retrieved {len(analysis_reports)} analysis reports for patient: {patient_id}")
             
@@ -1040,7 +1077,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'patientId': patient_id,
                 'analysis_reports': analysis_reports,
-                'totalReports': len(analysis_reports)
+                'totalReports': len(analysis_reports),
+                'totalMatching': page['total'],
+                'hasMore': page['has_more'],
+                'nextCursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -1057,19 +1097,23 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({
+                    'success': False,
+                    'message': str(e)
+                }), 400
+            
+            # Get the requested page of food_data, most recent first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'food_data', ('timestamp', 'created_at'), params)
+            if page is None:
                 return jsonify({
                     'success': False,
                     'message': f'Patient not found with ID: {patient_id}'
                 }), 404
             
-            # Get food_data array from patient document
-            food_data = patient.get('food_data', [])
-            
-            # Sort by timestamp (most recent first)
-            food_data.sort(key=lambda x: x.get('timestamp', x.get('created_at', '')), reverse=True)
+            food_data = page['entries']
             
             print(f"✅ Retrieved {len(food_data)} food entries for user: {patient_id}")
             
@@ -1077,7 +1121,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'user_id': patient_id,
                 'food_data': food_data,
-                'total_entries': len(food_data)
+                'total_entries': len(food_data),
+                'total_matching': page['total'],
+                'has_more': page['has_more'],
+                'next_cursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -1097,16 +1144,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Get tablet tracking logs from patient document
-            tablet_logs = patient.get('tablet_tracking_logs', [])
+            # Get the requested page of tablet_tracking_logs, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'tablet_tracking_logs', ('timestamp', 'created_at'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by newest first
-            tablet_logs.sort(key=lambda x: x.get('timestamp', x.get('created_at', '')), reverse=True)
+            tablet_logs = page['entries']
             
             print(f"✅ Retrieved {len(tablet_logs)} tablet tracking logs for patient: {patient_id}")
             
@@ -1114,7 +1162,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'patientId': patient_id,
                 'tablet_logs': tablet_logs,
-                'totalEntries': len(tablet_logs)
+                'totalEntries': len(tablet_logs),
+                'totalMatching': page['total'],
+                'hasMore': page['has_more'],
+                'nextCursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -1179,16 +1230,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Get kick count logs from patient document
-            kick_logs = patient.get('kick_count_logs', [])
+            # Get the requested page of kick_count_logs, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'kick_count_logs', ('timestamp', 'created_at'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by newest first
-            kick_logs.sort(key=lambda x: x.get('timestamp', x.get('created_at', '')), reverse=True)
+            kick_logs = page['entries']
             
             print(f"✅ Retrieved {len(kick_logs)} kick count logs for patient: {patient_id}")
             
@@ -1196,7 +1248,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'patientId': patient_id,
                 'kick_logs': kick_logs,
-                'totalEntries': len(kick_logs)
+                'totalEntries': len(kick_logs),
+                'totalMatching': page['total'],
+                'hasMore': page['has_more'],
+                'nextCursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -1213,21 +1268,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
-            
-            # Get mental health logs from patient document
-            mental_health_logs = patient.get('mental_health_logs', [])
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Convert ObjectId to string for JSON serialization
-            for log in mental_health_logs:
-                if '_id' in log:
-                    log['_id'] = str(log['_id'])
+            # Get the requested page of mental_health_logs, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'mental_health_logs', ('date', 'created_at'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by newest first
-            mental_health_logs.sort(key=lambda x: x.get('date', x.get('created_at', '')), reverse=True)
+            mental_health_logs = page['entries']
             
             print(f"✅ Retrieved {len(mental_health_logs)} mental health logs for patient: {patient_id}")
             
@@ -1238,7 +1289,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                     'mood_history': mental_health_logs,
                     'assessment_history': [],
                     'total_mood_entries': len(mental_health_logs),
-                    'total_assessment_entries': 0
+                    'total_assessment_entries': 0,
+                    'total_matching': page['total'],
+                    'has_more': page['has_more'],
+                    'next_cursor': page['next_cursor']
                 }
             }), 200
             
@@ -1259,16 +1313,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Get prescription documents from patient document
-            prescription_documents = patient.get('prescription_documents', [])
+            # Get the requested page of prescription_documents, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'prescription_documents', ('created_at', 'date'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by newest first
-            prescription_documents.sort(key=lambda x: x.get('created_at', x.get('date', '')), reverse=True)
+            prescription_documents = page['entries']
             
             print(f"✅ Retrieved {len(prescription_documents)} prescription documents for patient: {patient_id}")
             
@@ -1276,7 +1331,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'patientId': patient_id,
                 'prescription_documents': prescription_documents,
-                'totalDocuments': len(prescription_documents)
+                'totalDocuments': len(prescription_documents),
+                'totalMatching': page['total'],
+                'hasMore': page['has_more'],
+                'nextCursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -1293,16 +1351,17 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
             
             patients_collection = self.doctor_model.db.patients_collection
             
-            # Find patient by Patient ID
-            patient = patients_collection.find_one({"patient_id": patient_id})
-            if not patient:
-                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
+            try:
+                params = parse_history_params(request.args)
+            except HistoryQueryError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
             
-            # Get vital signs logs from patient document
-            vital_signs_logs = patient.get('vital_signs_logs', [])
+            # Get the requested page of vital_signs_logs, newest first, sliced in Mongo
+            page = query_history(patients_collection, {"patient_id": patient_id}, 'vital_signs_logs', ('created_at', 'date'), params)
+            if page is None:
+                return jsonify({'success': False, 'message': f'Patient not found with ID: {patient_id}'}), 404
             
-            # Sort by newest first
-            vital_signs_logs.sort(key=lambda x: x.get('created_at', x.get('date', '')), reverse=True)
+            vital_signs_logs = page['entries']
             
             print(f"✅ Retrieved {len(vital_signs_logs)} vital signs logs for patient: {patient_id}")
             
@@ -1310,7 +1369,10 @@ For more detailed analysis, the OpenAI integration needs to be restored."""
                 'success': True,
                 'patientId': patient_id,
                 'vital_signs_logs': vital_signs_logs,
-                'totalEntries': len(vital_signs_logs)
+                'totalEntries': len(vital_signs_logs),
+                'totalMatching': page['total'],
+                'hasMore': page['has_more'],
+                'nextCursor': page['next_cursor']
             }), 200
             
         except Exception as e:
@@ -5,6 +5,11 @@ OTP Controller - Handles OTP operations
 from flask import request, jsonify
 from typing import Dict, Any
 
+from utils.logging_config import get_logger
+from utils.password_hashing import PasswordHasherBusy, password_busy_response
+
+logger = get_logger(__name__)
+
 class OTPController:
     """OTP controller"""
     
@@ -24,6 +29,10 @@ class OTPController:
             if not email:
                 return jsonify({"error": "Email is required"}), 400
             
+            limited = self.otp_model.check_send_rate(email)
+            if limited:
+                return limited
+            
             if purpose == 'signup':
                 # Check if there's a pending signup for this email
                 pending_signup = self.otp_model.get_temp_signup_data(email)
@@ -42,8 +51,7 @@ class OTPController:
                 # Generate JWT-based OTP with original signup data
                 try:
                     otp, jwt_token = self.jwt_service.generate_otp_jwt(email, 'doctor_signup', signup_data)
-                    print(f"🔐 Generated JWT OTP: {otp} for email: {email}")
-                    print(f"🔐 JWT Token: {jwt_token[:50]}...")
+                    logger.info("🔐 Generated JWT OTP for email: %s", email)
                 except Exception as e:
                     return jsonify({
                         "error": f"Failed to generate OTP: {str(e)}"
@@ -159,6 +167,8 @@ class OTPController:
                 print(f"❌ Token generation error: {e}")
                 return jsonify({'error': f'Token generation failed: {str(e)}'}), 500
                 
+        except PasswordHasherBusy as e:
+            return password_busy_response(e)
         except Exception as e:
             return jsonify({'error': f'Server error: {str(e)}'}), 500
     
@@ -172,6 +182,10 @@ class OTPController:
             if not email:
                 return jsonify({"error": "Email is required"}), 400
             
+            limited = self.otp_model.check_send_rate(email)
+            if limited:
+                return limited
+            
             if role == 'doctor':
                 # Check if there's a pending signup for this email
                 pending_signup = self.otp_model.get_temp_signup_data(email)
@@ -190,7 +204,7 @@ class OTPController:
                 # Generate new JWT-based OTP
                 try:
                     otp, jwt_token = self.jwt_service.generate_otp_jwt(email, 'doctor_signup', signup_data)
-                    print(f"🔐 Generated new OTP: {otp} for email: {email}")
+                    logger.info("🔐 Generated new OTP for email: %s", email)
                 except Exception as e:
                     return jsonify({
                         "error": f"Failed to generate OTP: {str(e)}"
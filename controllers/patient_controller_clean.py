@@ -41,8 +41,7 @@ class PatientController:
                 return {'error': 'Contact number must be at least 10 digits'}, 400
             
             # Check if patient already exists with same email
-            existing_patients = self.patient_model.search_patients(email)
-            if existing_patients:
+            if self.patient_model.email_exists(email):
                 return {'error': 'Patient with this email already exists'}, 409
             
             # Prepare patient data
@@ -102,13 +101,15 @@ class PatientController:
             skip = (page - 1) * limit
             
             if search:
-                patients = self.patient_model.search_patients(search)
+                result = self.patient_model.search_patients(search, limit=limit, skip=skip)
+                patients, total = result['patients'], result['total']
             else:
                 patients = self.patient_model.get_all_patients(limit=limit, skip=skip)
+                total = len(patients)
             
             return {
                 'patients': patients,
-                'total': len(patients),
+                'total': total,
                 'page': page,
                 'limit': limit
             }, 200
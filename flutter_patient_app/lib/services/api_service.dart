@@ -598,6 +598,30 @@ class ApiService {
     }
   }
 
+  // Delta sync: pass the previous next_token (null for a full sync) and keep
+  // calling with the returned next_token while has_more is true
+  Future<Map<String, dynamic>> syncChanges({String? since, int limit = 100}) async {
+    try {
+      final query = <String, String>{'limit': '$limit'};
+      if (since != null) {
+        query['since'] = since;
+      }
+
+      final response = await http.get(
+        Uri.parse('${ApiConfig.baseUrl}/sync').replace(queryParameters: query),
+        headers: _getAuthHeaders(),
+      );
+
+      if (response.statusCode == 200) {
+        return json.decode(response.body);
+      } else {
+        return {'error': 'Sync failed: ${response.statusCode}'};
+      }
+    } catch (e) {
+      return {'error': 'Network error: $e'};
+    }
+  }
+
   Future<Map<String, dynamic>> getDoctorDashboardStats() async {
     try {
       final response = await http.get(
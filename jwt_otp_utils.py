@@ -11,13 +11,24 @@ import string
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
+from utils.jwt_keys import token_codec
+from utils.token_cache import VerifiedTokenCache, revoke_claims
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
 class JWTService:
     """JWT service for token operations using HMAC"""
     
     def __init__(self):
         # Use environment variable or generate a secret key
         self.secret_key = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this')
-        self.algorithm = 'HS256'  # HMAC instead of RSA
+        # HS256 with the secret key by default; JWT_ALGORITHM=RS256/ES256 signs with
+        # JWT_PRIVATE_KEY_FILE (see utils/jwt_keys.py)
+        self.codec = token_codec(self.secret_key)
+        self.algorithm = self.codec.algorithm
+        # Verified access-token claims, so repeat requests skip the signature check
+        self.token_cache = VerifiedTokenCache()
     
     def generate_otp_jwt(self, email: str, purpose: str, signup_data: Dict[str, Any]) -> tuple[str, str]:
         """Generate JWT token with OTP"""
@@ -40,28 +51,22 @@ class JWTService:
                 'signup_data': signup_data
             }
             
-            # Generate JWT token using HMAC
-            jwt_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+            # Sign JWT token
+            jwt_token = self.codec.encode(payload)
             
-            print(f"🔐 OTP JWT created for {email}: {otp}")
-            print(f"🔐 Generated new OTP: {otp} for email: {email}")
+            logger.debug("🔐 OTP JWT created for %s", email)
             
             return otp, jwt_token
             
         except Exception as e:
-            print(f"❌ Error generating OTP JWT: {e}")
+            logger.error("❌ Error generating OTP JWT: %s", e)
             raise
     
     def verify_otp_jwt(self, jwt_token: str, email: str, otp: str) -> Dict[str, Any]:
         """Verify OTP JWT token"""
         try:
-            # Decode JWT token using HMAC
-            payload = jwt.decode(jwt_token, self.secret_key, algorithms=[self.algorithm])
-            
-            print(f"🔍 JWT Verification Debug:")
-            print(f"  JWT Token: {jwt_token[:50]}...")
-            print(f"  Algorithm: {self.algorithm}")
-            print(f"  Decoded payload: {payload}")
+            # Decode and verify JWT token
+            payload = self.codec.decode(jwt_token)
             
             # Check token type
             if payload.get('type') != 'otp_token':
@@ -101,7 +106,7 @@ class JWTService:
                     'error': 'Maximum attempts exceeded'
                 }
             
-            print(f"🔍 JWT Verification Result: {{'success': True, 'data': {payload}, 'message': 'OTP verified successfully'}}")
+            logger.debug("✅ OTP JWT verified for %s", email)
             
             return {
                 'success': True,
@@ -142,14 +147,14 @@ class JWTService:
                 'type': 'access_token'
             }
             
-            # Generate JWT token using HMAC
-            access_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+            # Sign JWT token
+            access_token = self.codec.encode(payload)
             
-            print(f"🔑 Access token created for {email}")
+            logger.debug("🔑 Access token created for %s", email)
             return access_token
             
         except Exception as e:
-            print(f"❌ Error creating access token: {e}")
+            logger.error("❌ Error creating access token: %s", e)
             raise
     
     def create_refresh_token(self, user_id: str, user_type: str) -> str:
@@ -165,21 +170,21 @@ class JWTService:
                 'type': 'refresh_token'
             }
             
-            # Generate JWT token using HMAC
-            refresh_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+            # Sign JWT token
+            refresh_token = self.codec.encode(payload)
             
-            print(f"🔄 Refresh token created for {user_id}")
+            logger.debug("🔄 Refresh token created for %s", user_id)
             return refresh_token
             
         except Exception as e:
-            print(f"❌ Error creating refresh token: {e}")
+            logger.error("❌ Error creating refresh token: %s", e)
             raise
     
     def verify_access_token(self, token: str) -> Dict[str, Any]:
-        """Verify access token"""
+        """Verify access token (cached until it expires; revoked tokens are rejected)"""
         try:
-            # Decode JWT token using HMAC
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            # Decode and verify JWT token, or reuse the claims from an earlier verification
+            payload = self.token_cache.verify(token, self._decode)
             
             # Check token type
             if payload.get('type') != 'access_token':
@@ -209,6 +214,17 @@ class JWTService:
                 'error': f'Token verification error: {str(e)}'
             }
     
+    def revoke_token(self, token: str) -> bool:
+        """Revoke a valid token (logout); False if it is invalid or has no jti"""
+        try:
+            payload = self.token_cache.verify(token, self._decode)
+        except jwt.InvalidTokenError:
+            return False
+        return revoke_claims(payload)
+    
+    def _decode(self, token: str) -> Dict[str, Any]:
+        return self.codec.decode(token)
+    
     def _generate_otp(self, length: int = 6) -> str:
         """Generate random OTP"""
         return ''.join(secrets.choice(string.digits) for _ in range(length))
@@ -8,6 +8,9 @@ import os
 from datetime import datetime
 import logging
 
+from utils.rate_limit import ensure_rate_limit_indexes
+from utils.token_cache import ensure_revocation_indexes
+
 class Database:
     """Database connection and operations"""
     
@@ -19,6 +22,9 @@ class Database:
         self.mental_health_collection = None
         self.appointments_collection = None
         self.temp_otp_collection = None
+        self.counters_collection = None
+        self.revoked_tokens_collection = None
+        self.rate_limits_collection = None
         self.is_connected = False
         
     def connect(self, max_retries=3):
@@ -106,6 +112,15 @@ class Database:
             self.temp_otp_collection = self.db.temp_otp_collection
             print("🔍 Temp OTP collection: temp_otp_collection")
             
+            # Counters collection (ID generator node ids)
+            self.counters_collection = self.db.counters
+            
+            # Revoked JWT ids (logout)
+            self.revoked_tokens_collection = self.db.revoked_tokens
+            
+            # Token buckets for OTP sends
+            self.rate_limits_collection = self.db.rate_limits
+            
             print("✅ All collections initialized")
             
         except Exception as e:
@@ -136,6 +151,13 @@ class Database:
                     print("✅ mobile index created")
                 except Exception as e:
                     print(f"⚠️ mobile index creation failed: {e}")
+                
+                try:
+                    # Used by the doctor directory's grouped patient counts
+                    self.patients_collection.create_index([("assigned_doctor_id", 1), ("status", 1)])
+                    print("✅ assigned_doctor_id index created")
+                except Exception as e:
+                    print(f"⚠️ assigned_doctor_id index creation failed: {e}")
             
             # Mental health indexes
             if self.mental_health_collection is not None:
@@ -170,6 +192,23 @@ class Database:
                 except Exception as e:
                     print(f"⚠️ doctor email index creation failed: {e}")
             
+            # Revoked token TTL index
+            if self.revoked_tokens_collection is not None:
+                try:
+                    ensure_revocation_indexes(self.revoked_tokens_collection)
+                    print("✅ revoked_tokens TTL index created")
+                except Exception as e:
+                    print(f"⚠️ revoked_tokens TTL index creation failed: {e}")
+            
+            # OTP TTL indexes: pending signups and rate-limit buckets expire on their own
+            if self.temp_otp_collection is not None and self.rate_limits_collection is not None:
+                try:
+                    self.temp_otp_collection.create_index("expires_at", expireAfterSeconds=0)
+                    ensure_rate_limit_indexes(self.rate_limits_collection)
+                    print("✅ temp_otp / rate_limits TTL indexes created")
+                except Exception as e:
+                    print(f"⚠️ OTP TTL index creation failed: {e}")
+            
             print("✅ All indexes created successfully")
             
         except Exception as e:
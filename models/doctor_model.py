@@ -2,15 +2,15 @@
 Doctor Model - Handles doctor database operations
 """
 
-import bcrypt
 from datetime import datetime
 from typing import Dict, Any, List, Optional
-import sys
-import os
 
-# Add the parent directory to the path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.objectid_converter import convert_objectid_to_string
+from utils.id_generator import new_doctor_id
+from utils.password_hashing import PasswordHasherBusy, hash_password, verify_and_rehash
+from utils.search_index import (
+    SEARCH_TERMS_FIELD, backfill_doctor_search_fields, doctor_search_fields, ensure_doctor_search_indexes,
+    prefix_filter, rank_stage, refresh_doctor_search_fields
+)
 
 class DoctorModel:
     """Doctor model for database operations"""
@@ -43,14 +43,11 @@ class DoctorModel:
                 }
             
             # Generate unique doctor ID
-            import time
-            import random
-            doctor_id = f"D{int(time.time() * 1000)}{random.randint(1000, 9999)}"
+            doctor_id = new_doctor_id()
             
             # Hash password
             password = doctor_data.get('password', '')
-            salt = bcrypt.gensalt()
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
+            password_hash = hash_password(password)
             
             # Create doctor document
             doctor_doc = {
@@ -65,6 +62,7 @@ class DoctorModel:
                 'updated_at': datetime.utcnow(),
                 'is_profile_complete': False
             }
+            doctor_doc.update(doctor_search_fields(doctor_doc))
             
             # Insert doctor
             result = self.collection.insert_one(doctor_doc)
@@ -81,6 +79,8 @@ class DoctorModel:
                     'error': 'Failed to create doctor'
                 }
                 
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             return {
                 'success': False,
@@ -95,15 +95,11 @@ class DoctorModel:
             if self.collection is None:
                 return None
             
-            doctor = self.collection.find_one({'doctor_id': doctor_id})
-            if doctor:
-                # Convert ObjectId to string
-                doctor = convert_objectid_to_string(doctor)
-                # Remove sensitive data
-                if 'password_hash' in doctor:
-                    del doctor['password_hash']
-                return doctor
-            return None
+            # Exclude sensitive data and internal search fields
+            return self.collection.find_one(
+                {'doctor_id': doctor_id},
+                {'password_hash': 0, SEARCH_TERMS_FIELD: 0, 'specialization_lc': 0, 'city_lc': 0}
+            )
             
         except Exception as e:
             print(f"❌ Error getting doctor by ID: {e}")
@@ -119,7 +115,7 @@ class DoctorModel:
             
             doctor = self.collection.find_one({'email': email})
             if doctor:
-                return convert_objectid_to_string(doctor)
+                return doctor
             return None
             
         except Exception as e:
@@ -196,28 +192,16 @@ class DoctorModel:
                 print(f"❌ No password hash found for doctor: {identifier}")
                 return False
             
-            print(f"🔍 Password verification debug:")
-            print(f"   Identifier: {identifier}")
-            print(f"   Password hash type: {type(password_hash)}")
-            print(f"   Password hash length: {len(password_hash) if password_hash else 0}")
-            print(f"   Input password: {password}")
-            
-            # Convert password_hash to bytes if it's a string
-            if isinstance(password_hash, str):
-                password_hash = password_hash.encode('utf-8')
-            elif isinstance(password_hash, bytes):
-                # Already bytes, no conversion needed
-                pass
-            else:
-                print(f"❌ Unexpected password_hash type: {type(password_hash)}")
-                return False
-            
-            # Verify password
-            is_valid = bcrypt.checkpw(password.encode('utf-8'), password_hash)
-            print(f"   Password verification result: {is_valid}")
+            # Verify password, upgrading the stored hash if its bcrypt cost is outdated
+            is_valid, new_password_hash = verify_and_rehash(password, password_hash)
+            print(f"🔍 Password verification result for {identifier}: {is_valid}")
+            if new_password_hash:
+                self.collection.update_one({'_id': doctor['_id']}, {'$set': {'password_hash': new_password_hash}})
             
             return is_valid
             
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             print(f"❌ Error verifying password: {e}")
             import traceback
@@ -237,9 +221,7 @@ class DoctorModel:
                 }
             
             # Hash the new password using bcrypt (same as signup)
-            import bcrypt
-            salt = bcrypt.gensalt()
-            hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), salt)
+            hashed_password = hash_password(new_password)
             
             # Update password
             result = self.collection.update_one(
@@ -261,14 +243,50 @@ class DoctorModel:
                     'error': 'Doctor not found or no changes made'
                 }
                 
+        except PasswordHasherBusy:
+            raise
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Database error: {str(e)}'
             }
     
-    def get_all_doctors(self, query_filter: Dict[str, Any] = None, page: int = 1, limit: int = 20) -> Dict[str, Any]:
-        """Get all doctors with pagination and patient count"""
+    # Sort options for the doctor directory: name -> Mongo sort spec
+    DIRECTORY_SORTS = {
+        'relevance': [('_search_score', -1), ('first_name', 1), ('last_name', 1), ('doctor_id', 1)],
+        'newest': [('created_at', -1), ('doctor_id', 1)],
+        'patient_count': [('patient_count', -1), ('created_at', -1), ('doctor_id', 1)],
+        'name': [('first_name', 1), ('last_name', 1), ('doctor_id', 1)],
+    }
+    
+    # Internal fields never returned by the directory
+    DIRECTORY_HIDDEN_FIELDS = {
+        '_id': 0, 'password_hash': 0, SEARCH_TERMS_FIELD: 0, 'specialization_lc': 0, 'city_lc': 0
+    }
+    
+    def ensure_search_index(self) -> None:
+        """Create the doctor search indexes and backfill search fields on older doctors"""
+        try:
+            self._update_collection()
+            if self.collection is None:
+                return
+            ensure_doctor_search_indexes(self.collection)
+            updated = backfill_doctor_search_fields(self.collection)
+            print(f"✅ Doctor search index ready ({updated} doctors backfilled)")
+        except Exception as e:
+            print(f"⚠️ Doctor search index setup failed: {e}")
+    
+    def get_all_doctors(self, query_filter: Dict[str, Any] = None, page: int = 1, limit: int = 20,
+                        min_patients: Optional[int] = None, sort_by: str = 'newest', search: str = '') -> Dict[str, Any]:
+        """Get all doctors with pagination and patient count
+        
+        ``search`` is matched as token prefixes against the indexed
+        ``search_terms`` field (see utils.search_index) and can be ranked with
+        ``sort_by='relevance'``. Patient counts come from one grouped count
+        over ``assigned_doctor_id``; when filtering on ``min_patients`` or
+        sorting by ``patient_count`` the count is joined in the aggregation so
+        filtering, sorting and paging all happen in Mongo.
+        """
         try:
             self._update_collection()
             
@@ -282,34 +300,38 @@ class DoctorModel:
             if query_filter is None:
                 query_filter = {"status": {"$ne": "deleted"}}
             
+            search_match = prefix_filter(search) if search else None
+            if search_match:
+                query_filter = {**query_filter, **search_match}
+            if sort_by == 'relevance' and not search_match:
+                sort_by = 'newest'
+            sort_spec = self.DIRECTORY_SORTS.get(sort_by, self.DIRECTORY_SORTS['newest'])
+            
             # Calculate skip for pagination
             skip = (page - 1) * limit
             
-            # Get doctors with pagination
-            doctors_cursor = self.collection.find(
-                query_filter,
-                {
-                    'password_hash': 0,  # Exclude sensitive data
-                    '_id': 0
-                }
-            ).skip(skip).limit(limit).sort('created_at', -1)
-            
-            doctors = list(doctors_cursor)
+            if min_patients is None and sort_by not in ('patient_count', 'relevance'):
+                # Page the doctors first, then count patients for that page only
+                doctors = list(self.collection.find(
+                    query_filter,
+                    self.DIRECTORY_HIDDEN_FIELDS  # Exclude sensitive data
+                ).sort(sort_spec).skip(skip).limit(limit))
+                
+                total_count = self.collection.count_documents(query_filter)
+            else:
+                doctors, total_count = self._aggregate_directory(
+                    query_filter, sort_spec, skip, limit, min_patients,
+                    search if sort_by == 'relevance' else ''
+                )
             
-            # Count total doctors
-            total_count = self.collection.count_documents(query_filter)
+            if doctors and 'patient_count' not in doctors[0]:
+                counts = self._count_patients_for_doctors([doctor.get('doctor_id') for doctor in doctors])
+                for doctor in doctors:
+                    doctor['patient_count'] = counts.get(doctor.get('doctor_id'), 0)
             
             # Calculate total pages
             total_pages = (total_count + limit - 1) // limit
             
-            # Add patient count for each doctor
-            for doctor in doctors:
-                patient_count = self._count_patients_for_doctor(doctor.get('doctor_id'))
-                doctor['patient_count'] = patient_count
-            
-            # Convert ObjectIds to strings
-            doctors = [convert_objectid_to_string(doctor) for doctor in doctors]
-            
             return {
                 'success': True,
                 'doctors': doctors,
@@ -325,6 +347,103 @@ class DoctorModel:
                 'error': f'Database error: {str(e)}'
             }
     
+    def _aggregate_directory(self, query_filter: Dict[str, Any], sort_spec: List[tuple], skip: int, limit: int,
+                             min_patients: Optional[int], rank_query: str) -> tuple:
+        """Filter, rank, join patient counts (when needed), sort and page in one aggregation
+        
+        Returns (doctors, total_count).
+        """
+        pipeline = [{'$match': query_filter}]
+        if rank_query:
+            pipeline.append(rank_stage(rank_query))
+        
+        if min_patients is not None or any(field == 'patient_count' for field, _ in sort_spec):
+            patients_collection = getattr(self.db, 'patients_collection', None)
+            if patients_collection is None:
+                raise Exception("Patients collection not available")
+            # Count every doctor's patients in one grouped pass over the patients collection,
+            # append those counts to the doctor stream and fold them onto their doctors
+            pipeline += [
+                {'$unionWith': {
+                    'coll': patients_collection.name,
+                    'pipeline': [
+                        {'$match': {'status': {'$ne': 'deleted'}, 'assigned_doctor_id': {'$nin': [None, '']}}},
+                        {'$group': {'_id': '$assigned_doctor_id', 'count': {'$sum': 1}}},
+                        {'$project': {'_id': 0, '_count_for': '$_id', '_count': '$count'}}
+                    ]
+                }},
+                {'$group': {
+                    # Doctors without a doctor_id keep their own group (and a count of 0)
+                    '_id': {'$ifNull': ['$doctor_id', {'$ifNull': ['$_count_for', '$_id']}]},
+                    'doctor': {'$max': {'$cond': [{'$ifNull': ['$_count_for', False]}, None, '$$ROOT']}},
+                    'patient_count': {'$sum': {'$ifNull': ['$_count', 0]}}
+                }},
+                # Counts for doctors filtered out above have no doctor document
+                {'$match': {'doctor': {'$ne': None}}},
+                {'$replaceRoot': {'newRoot': {'$mergeObjects': ['$doctor', {'patient_count': '$patient_count'}]}}},
+            ]
+            if min_patients:
+                pipeline.append({'$match': {'patient_count': {'$gte': min_patients}}})
+        
+        pipeline.append({'$facet': {
+            'doctors': [
+                {'$sort': dict(sort_spec)},
+                {'$skip': skip},
+                {'$limit': limit},
+                {'$project': {**self.DIRECTORY_HIDDEN_FIELDS, '_search_score': 0}}
+            ],
+            'total': [{'$count': 'count'}]
+        }})
+        
+        result = next(self.collection.aggregate(pipeline, allowDiskUse=True), {'doctors': [], 'total': []})
+        total = result['total'][0]['count'] if result['total'] else 0
+        return result['doctors'], total
+    
+    def autocomplete_doctors(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Ranked prefix suggestions for the doctor picker (compact documents)"""
+        self._update_collection()
+        search_match = prefix_filter(query)
+        if self.collection is None or not search_match:
+            return []
+        
+        pipeline = [
+            {'$match': {'status': {'$ne': 'deleted'}, **search_match}},
+            # Bound the ranking work; prefix matches come straight off the index
+            {'$limit': 200},
+            rank_stage(query),
+            {'$sort': dict(self.DIRECTORY_SORTS['relevance'])},
+            {'$limit': limit},
+            {'$project': {
+                '_id': 0, 'doctor_id': 1, 'username': 1, 'first_name': 1, 'last_name': 1,
+                'specialization': 1, 'city': 1, 'hospital_name': 1
+            }}
+        ]
+        return list(self.collection.aggregate(pipeline))
+    
+    def _count_patients_for_doctors(self, doctor_ids: List[str]) -> Dict[str, int]:
+        """Count patients for several doctors with one grouped aggregation"""
+        try:
+            doctor_ids = [doctor_id for doctor_id in doctor_ids if doctor_id]
+            if not doctor_ids or not self.db or not hasattr(self.db, 'patients_collection'):
+                return {}
+            
+            patients_collection = self.db.patients_collection
+            if patients_collection is None:
+                return {}
+            
+            counts = patients_collection.aggregate([
+                {'$match': {
+                    'assigned_doctor_id': {'$in': doctor_ids},
+                    'status': {'$ne': 'deleted'}
+                }},
+                {'$group': {'_id': '$assigned_doctor_id', 'count': {'$sum': 1}}}
+            ])
+            return {item['_id']: item['count'] for item in counts}
+            
+        except Exception as e:
+            print(f"❌ Error counting patients for doctors: {e}")
+            return {}
+    
     def _count_patients_for_doctor(self, doctor_id: str) -> int:
         """Count patients for a specific doctor"""
         try:
@@ -370,6 +489,7 @@ class DoctorModel:
             )
             
             if result.modified_count > 0:
+                refresh_doctor_search_fields(self.collection, doctor_id)
                 return {
                     'success': True,
                     'message': 'Profile updated successfully'
@@ -413,6 +533,7 @@ class DoctorModel:
             )
             
             if result.modified_count > 0:
+                refresh_doctor_search_fields(self.collection, doctor_id)
                 return {
                     'success': True,
                     'message': 'Profile completed successfully'
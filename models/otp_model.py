@@ -7,12 +7,16 @@ from typing import Dict, Any, Optional
 import secrets
 import string
 
+from utils.otp_store import OTPRateLimiter
+
 class OTPModel:
     """OTP data model and operations"""
     
     def __init__(self, database):
         self.db = database
         self._update_collection()
+        # Per-email and per-IP token buckets for OTP sends
+        self.rate_limiter = OTPRateLimiter(lambda: getattr(self.db, 'rate_limits_collection', None))
     
     def _update_collection(self):
         """Update collection reference"""
@@ -101,8 +105,12 @@ class OTPModel:
                 'error': f'Database error: {str(e)}'
             }
     
+    def check_send_rate(self, email: str):
+        """None if an OTP may be sent to ``email`` now, otherwise a 429 response"""
+        return self.rate_limiter.check(email)
+    
     def cleanup_expired_data(self) -> Dict[str, Any]:
-        """Clean up expired temporary data"""
+        """Clean up expired temporary data (the expires_at TTL index normally does this)"""
         try:
             current_time = datetime.utcnow()
             result = self.temp_collection.delete_many({'expires_at': {'$lt': current_time}})
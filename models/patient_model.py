@@ -6,15 +6,19 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 from bson import ObjectId
 import logging
-import sys
-import os
 
-# Add the parent directory to the path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.objectid_converter import convert_objectid_to_string
+from utils.id_generator import new_patient_id
+from utils.search_index import (
+    PHONE_REV_FIELD, SEARCH_TERMS_FIELD, PATIENT_PHONE_FIELDS, PATIENT_SEARCH_SOURCE_FIELDS,
+    backfill_patient_search_fields, ensure_patient_search_indexes, patient_search_fields,
+    patient_search_filter, rank_stage, refresh_patient_search_fields
+)
 
 logger = logging.getLogger(__name__)
 
+# Internal search fields are never returned to callers
+SEARCH_FIELDS_HIDDEN = {SEARCH_TERMS_FIELD: 0, PHONE_REV_FIELD: 0}
+
 
 class PatientModel:
     """Model for patient CRUD operations."""
@@ -53,8 +57,9 @@ class PatientModel:
             patient_data['updated_at'] = datetime.now()
             
             # Generate patient ID
-            patient_id = f"PAT{int(datetime.now().timestamp())}{hash(patient_data.get('email', '')) % 10000:04d}"
+            patient_id = new_patient_id()
             patient_data['patient_id'] = patient_id
+            patient_data.update(patient_search_fields(patient_data))
             
             # Insert patient
             result = self.collection.insert_one(patient_data)
@@ -77,17 +82,14 @@ class PatientModel:
                 raise Exception("Database collection not available")
             
             # Try to find by patient_id first, then by ObjectId
-            patient = self.collection.find_one({"patient_id": patient_id})
+            patient = self.collection.find_one({"patient_id": patient_id}, SEARCH_FIELDS_HIDDEN)
             if not patient:
                 try:
-                    patient = self.collection.find_one({"_id": ObjectId(patient_id)})
+                    patient = self.collection.find_one({"_id": ObjectId(patient_id)}, SEARCH_FIELDS_HIDDEN)
                 except:
                     pass
             
-            if patient:
-                # Convert all ObjectIds to strings recursively
-                return convert_objectid_to_string(patient)
-            return None
+            return patient
             
         except Exception as e:
             logger.error(f"Error getting patient {patient_id}: {str(e)}")
@@ -100,10 +102,9 @@ class PatientModel:
             if self.collection is None:
                 raise Exception("Database collection not available")
             
-            patients = list(self.collection.find().skip(skip).limit(limit).sort("created_at", -1))
+            patients = list(self.collection.find({}, SEARCH_FIELDS_HIDDEN).skip(skip).limit(limit).sort("created_at", -1))
             
-            # Convert all ObjectIds to strings recursively for each patient
-            return [convert_objectid_to_string(patient) for patient in patients]
+            return patients
                 
         except Exception as e:
             logger.error(f"Error getting all patients: {str(e)}")
@@ -131,8 +132,10 @@ class PatientModel:
                     pass
             
             if patient:
-                result = self.collection.update_one(query, {"$set": update_data})
+                result = self.collection.update_one(query, {"$set": update_data, "$inc": {"version": 1}})
                 if result.modified_count > 0:
+                    if set(update_data) & set(PATIENT_SEARCH_SOURCE_FIELDS + PATIENT_PHONE_FIELDS):
+                        refresh_patient_search_fields(self.collection, query)
                     logger.info(f"Updated patient: {patient_id}")
                     return True
                 else:
@@ -180,31 +183,91 @@ class PatientModel:
             logger.error(f"Error deleting patient {patient_id}: {str(e)}")
             return False
     
-    def search_patients(self, search_term: str) -> List[Dict[str, Any]]:
-        """Search patients by name, email, or patient_id."""
+    def ensure_search_index(self) -> None:
+        """Create the patient search indexes and backfill search fields on older patients."""
+        try:
+            self._ensure_collection()
+            if self.collection is None:
+                return
+            ensure_patient_search_indexes(self.collection)
+            updated = backfill_patient_search_fields(self.collection)
+            logger.info(f"✅ Patient search index ready ({updated} patients backfilled)")
+        except Exception as e:
+            logger.error(f"Patient search index setup failed: {str(e)}")
+    
+    def get_patient_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Exact email lookup (served by the unique email index)."""
         try:
             self._ensure_collection()
             if self.collection is None:
                 raise Exception("Database collection not available")
             
-            # Create search query
-            query = {
-                "$or": [
-                    {"full_name": {"$regex": search_term, "$options": "i"}},
-                    {"email": {"$regex": search_term, "$options": "i"}},
-                    {"patient_id": {"$regex": search_term, "$options": "i"}},
-                    {"contact_number": {"$regex": search_term, "$options": "i"}}
-                ]
-            }
+            variants = self._email_variants(email)
+            if not variants:
+                return None
+            return self.collection.find_one({"email": {"$in": variants}}, SEARCH_FIELDS_HIDDEN)
+            
+        except Exception as e:
+            logger.error(f"Error getting patient by email: {str(e)}")
+            return None
+    
+    def email_exists(self, email: str) -> bool:
+        """Check whether a patient already uses this email (unique email index, no document fetch)."""
+        self._ensure_collection()
+        if self.collection is None:
+            raise Exception("Database collection not available")
+        
+        variants = self._email_variants(email)
+        return bool(variants) and self.collection.count_documents({"email": {"$in": variants}}, limit=1) > 0
+    
+    @staticmethod
+    def _email_variants(email: str) -> List[str]:
+        """Lowercased email plus the address as typed (older documents kept the original case)."""
+        email = (email or '').strip()
+        return list(dict.fromkeys([email.lower(), email])) if email else []
+    
+    def search_patients(self, search_term: str, limit: int = 20, skip: int = 0) -> Dict[str, Any]:
+        """Search patients by name, email, patient_id or the last digits of a phone number.
+        
+        Query tokens are prefix-matched against the indexed ``search_terms``
+        field and phone queries against ``phone_rev`` (see utils.search_index).
+        Results are ranked and paginated in Mongo.
+        
+        Returns:
+            Dict with ``patients`` (this page) and ``total`` (all matches)
+        """
+        try:
+            self._ensure_collection()
+            if self.collection is None:
+                raise Exception("Database collection not available")
             
-            patients = list(self.collection.find(query).sort("created_at", -1))
+            search_match = patient_search_filter(search_term)
+            if not search_match:
+                return {'patients': [], 'total': 0}
             
-            # Convert all ObjectIds to strings recursively for each patient
-            return [convert_objectid_to_string(patient) for patient in patients]
+            pipeline = [
+                {'$match': search_match},
+                rank_stage(search_term, name_fields=('full_name', 'first_name', 'last_name')),
+                {'$facet': {
+                    'patients': [
+                        {'$sort': {'_search_score': -1, 'created_at': -1, '_id': 1}},
+                        {'$skip': skip},
+                        {'$limit': limit},
+                        {'$project': {**SEARCH_FIELDS_HIDDEN, '_search_score': 0, 'password_hash': 0}}
+                    ],
+                    'total': [{'$count': 'count'}]
+                }}
+            ]
+            result = next(self.collection.aggregate(pipeline), {'patients': [], 'total': []})
+            
+            return {
+                'patients': result['patients'],
+                'total': result['total'][0]['count'] if result['total'] else 0
+            }
             
         except Exception as e:
             logger.error(f"Error searching patients: {str(e)}")
-            return []
+            return {'patients': [], 'total': 0}
     
     def get_patients_by_doctor(self, doctor_id: str) -> List[Dict[str, Any]]:
         """Get all patients assigned to a specific doctor."""
@@ -213,10 +276,9 @@ class PatientModel:
             if self.collection is None:
                 raise Exception("Database collection not available")
             
-            patients = list(self.collection.find({"assigned_doctor_id": doctor_id}).sort("created_at", -1))
+            patients = list(self.collection.find({"assigned_doctor_id": doctor_id}, SEARCH_FIELDS_HIDDEN).sort("created_at", -1))
             
-            # Convert all ObjectIds to strings recursively for each patient
-            return [convert_objectid_to_string(patient) for patient in patients]
+            return patients
             
         except Exception as e:
             logger.error(f"Error getting patients by doctor {doctor_id}: {str(e)}")
@@ -11,6 +11,11 @@ from email import encoders
 import base64
 from typing import Dict, Any, Optional
 
+from utils.logging_config import get_logger
+from utils.metrics import timed
+
+logger = get_logger(__name__)
+
 class EmailService:
     """Email service for sending emails"""
     
@@ -25,7 +30,7 @@ class EmailService:
         try:
             # Check if email configuration is available
             if not self.sender_email or not self.sender_password:
-                print("❌ Email configuration not found")
+                logger.error("❌ Email configuration not found")
                 return {
                     'success': False,
                     'error': 'Email configuration not found'
@@ -47,50 +52,38 @@ class EmailService:
                 msg.attach(MIMEText(body, 'plain', 'utf-8'))
             
             # Connect to server and send email
-            print(f"📧 Attempting to send email to: {to_email}")
-            print(f"📧 EMAIL DEBUG INFO:")
-            print(f"   To: {to_email}")
-            print(f"   From: {self.sender_email}")
-            print(f"   Subject: {subject}")
-            print(f"   Body length: {len(body)} characters")
+            logger.debug("📧 Sending email to=%s subject=%r body_length=%d", to_email, subject, len(body))
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                print("📧 Connecting to Gmail SMTP...")
+            with timed('smtp', 'send_message'), smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
                 server.starttls()
-                print("📧 Starting TLS...")
-                
-                print("📧 Logging in...")
                 server.login(self.sender_email, self.sender_password)
-                
-                print("📧 Sending email...")
                 server.send_message(msg)
-                
-                print("✅ Email sent successfully")
+                logger.info("✅ Email sent successfully to: %s", to_email)
                 return {
                     'success': True,
                     'message': 'Email sent successfully'
                 }
                 
         except smtplib.SMTPAuthenticationError as e:
-            print(f"❌ SMTP Authentication Error: {e}")
+            logger.error("❌ SMTP Authentication Error: %s", e)
             return {
                 'success': False,
                 'error': 'SMTP authentication failed. Please check email credentials.'
             }
         except smtplib.SMTPRecipientsRefused as e:
-            print(f"❌ SMTP Recipients Refused: {e}")
+            logger.error("❌ SMTP Recipients Refused: %s", e)
             return {
                 'success': False,
                 'error': 'Recipient email address is invalid or refused.'
             }
         except smtplib.SMTPServerDisconnected as e:
-            print(f"❌ SMTP Server Disconnected: {e}")
+            logger.error("❌ SMTP Server Disconnected: %s", e)
             return {
                 'success': False,
                 'error': 'SMTP server disconnected unexpectedly.'
             }
         except Exception as e:
-            print(f"❌ Email sending error: {e}")
+            logger.error("❌ Email sending error: %s", e)
             return {
                 'success': False,
                 'error': f'Failed to send email: {str(e)}'
@@ -116,18 +109,14 @@ class EmailService:
             result = self.send_email(email, subject, body)
             
             if result['success']:
-                print(f"✅ OTP email sent to: {email}")
-                print(f"📧 Check your email in 1-2 minutes")
-                print("✅ Primary email method successful")
+                logger.info("✅ OTP email sent to: %s", email)
             else:
-                print(f"❌ Failed to send OTP email: {result['error']}")
-                print(f"🔐 OTP for manual verification: {otp}")
-                print("📧 Alternative: Check your email manually")
+                logger.error("❌ Failed to send OTP email to %s: %s", email, result['error'])
             
             return result
             
         except Exception as e:
-            print(f"❌ OTP email error: {e}")
+            logger.error("❌ OTP email error: %s", e)
             return {
                 'success': False,
                 'error': f'Failed to send OTP email: {str(e)}'
@@ -153,7 +142,7 @@ class EmailService:
             return self.send_email(email, subject, body)
             
         except Exception as e:
-            print(f"❌ Welcome email error: {e}")
+            logger.error("❌ Welcome email error: %s", e)
             return {
                 'success': False,
                 'error': f'Failed to send welcome email: {str(e)}'
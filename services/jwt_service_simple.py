@@ -10,6 +10,10 @@ import string
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
 class JWTService:
     """Simplified JWT service for token operations using HMAC"""
     
@@ -42,11 +46,11 @@ class JWTService:
             # Generate JWT token using HMAC
             jwt_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
             
-            print(f"🔐 OTP JWT created for {email}: {otp}")
+            logger.debug("🔐 OTP JWT created for %s", email)
             return otp, jwt_token
             
         except Exception as e:
-            print(f"❌ Error generating OTP JWT: {e}")
+            logger.error("❌ Error generating OTP JWT: %s", e)
             raise
     
     def verify_otp_jwt(self, jwt_token: str, email: str, otp: str) -> Dict[str, Any]:
@@ -111,11 +115,11 @@ class JWTService:
             # Generate JWT token using HMAC
             access_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
             
-            print(f"🔑 Access token created for {email}")
+            logger.debug("🔑 Access token created for %s", email)
             return access_token
             
         except Exception as e:
-            print(f"❌ Error creating access token: {e}")
+            logger.error("❌ Error creating access token: %s", e)
             raise
     
     def create_refresh_token(self, user_id: str, user_type: str) -> str:
@@ -134,11 +138,11 @@ class JWTService:
             # Generate JWT token using HMAC
             refresh_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
             
-            print(f"🔄 Refresh token created for {user_id}")
+            logger.debug("🔄 Refresh token created for %s", user_id)
             return refresh_token
             
         except Exception as e:
-            print(f"❌ Error creating refresh token: {e}")
+            logger.error("❌ Error creating refresh token: %s", e)
             raise
     
     def verify_access_token(self, token: str) -> Dict[str, Any]:
@@ -182,11 +186,11 @@ class JWTService:
             # Generate JWT token using HMAC
             jwt_token = jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
             
-            print(f"🔑 JWT token generated for {token_data.get('email', 'unknown')}")
+            logger.debug("🔑 JWT token generated for %s", token_data.get('email', 'unknown'))
             return jwt_token
             
         except Exception as e:
-            print(f"❌ Error generating JWT token: {e}")
+            logger.error("❌ Error generating JWT token: %s", e)
             raise
     
     def _generate_jti(self) -> str:
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Stress test for utils.id_generator
+
+Generates millions of patient/doctor IDs across threads and processes and
+checks that every ID is unique, that each generator's IDs are strictly
+increasing, and that the base32 form round-trips.
+
+Usage:
+    python stress_test_id_generator.py [--count 2000000] [--processes 4] [--threads 4]
+"""
+
+import argparse
+import multiprocessing
+import threading
+import time
+from array import array
+
+from utils.id_generator import (
+    IdGenerator, PATIENT_ID_PREFIX, decode_base32, encode_base32, new_patient_id
+)
+
+
+def generate_sequential(node_id: int, count: int) -> array:
+    """Generate `count` IDs from one generator, asserting strict ordering."""
+    generator = IdGenerator(node_id=node_id)
+    ids = array('Q')
+    previous = -1
+    for _ in range(count):
+        value = generator.next_int()
+        if value <= previous:
+            raise AssertionError(f"node {node_id}: ID {value} not greater than {previous}")
+        previous = value
+        ids.append(value)
+    return ids
+
+
+def _process_worker(args):
+    node_id, count = args
+    return generate_sequential(node_id, count).tobytes()
+
+
+def generate_threaded(count: int, threads: int) -> array:
+    """Generate IDs from one shared generator on several threads."""
+    generator = IdGenerator(node_id=1)
+    per_thread = count // threads
+    results = [array('Q') for _ in range(threads)]
+
+    def worker(index):
+        out = results[index]
+        for _ in range(per_thread):
+            out.append(generator.next_int())
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    merged = array('Q')
+    for part in results:
+        merged.extend(part)
+    return merged
+
+
+def assert_unique(label: str, ids: array):
+    ordered = sorted(ids)
+    for previous, current in zip(ordered, ordered[1:]):
+        if previous == current:
+            raise AssertionError(f"{label}: duplicate ID {current}")
+    print(f"✅ {label}: {len(ids):,} IDs, no duplicates")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=2_000_000, help='IDs per scenario')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    print("🧪 ID generator stress test")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    single = generate_sequential(node_id=0, count=args.count)
+    elapsed = time.perf_counter() - start
+    assert_unique('single generator', single)
+    print(f"⏱️  {args.count / elapsed:,.0f} IDs/s on one thread (strictly increasing)")
+
+    start = time.perf_counter()
+    threaded = generate_threaded(args.count, args.threads)
+    elapsed = time.perf_counter() - start
+    assert_unique(f'{args.threads} threads, shared generator', threaded)
+    print(f"⏱️  {len(threaded) / elapsed:,.0f} IDs/s across {args.threads} threads")
+
+    per_process = args.count // args.processes
+    with multiprocessing.Pool(args.processes) as pool:
+        chunks = pool.map(_process_worker, [(node_id, per_process) for node_id in range(args.processes)])
+    combined = array('Q')
+    for chunk in chunks:
+        part = array('Q')
+        part.frombytes(chunk)
+        combined.extend(part)
+    assert_unique(f'{args.processes} processes, distinct node ids', combined)
+
+    for value in single[:1000]:
+        assert decode_base32(encode_base32(value)) == value
+    sample = new_patient_id()
+    assert sample.startswith(PATIENT_ID_PREFIX) and len(sample) == len(PATIENT_ID_PREFIX) + 13
+    print(f"✅ base32 round-trip OK, sample patient ID: {sample}")
+
+    print("=" * 60)
+    print("🎉 All ID generator checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Admission Control - bounded concurrency pools for expensive endpoints
+
+LLM, transcription and OCR routes hold a worker thread for seconds at a time.
+Without a limit, a spike on one of them occupies every thread and login and
+the dashboards stop answering too. Each expensive route is assigned to an
+endpoint class whose ``AdmissionPool`` bounds it:
+
+    - at most ``max_concurrent`` requests of the class run at once
+    - at most ``max_queue`` more wait for a slot, in arrival order
+    - a request is rejected up front when its expected wait (queue position x
+      recent service time / concurrency) exceeds its wait budget, instead of
+      queueing only to time out; the budget is the pool's ``max_wait`` or the
+      client's own ``X-Request-Timeout-Ms``, whichever is smaller
+
+Rejected requests get ``429`` with ``Retry-After`` set to the estimated wait.
+Queued requests hold a thread while they wait, so size ``max_concurrent +
+max_queue`` across pools below the worker's thread count.
+
+    @app.route('/nutrition/analyze-with-gpt4', methods=['POST'])
+    @admission_controlled('llm')
+    def analyze_food_with_gpt4(): ...
+
+Code that makes the expensive call on another thread (the LLM stages of the
+/symptoms/assist pipeline) takes a slot around the call itself, so the slot
+is held for as long as the call actually runs:
+
+    with get_pool('llm').slot(budget):
+        response = client.chat.completions.create(...)
+
+Limits are per worker process, so a pool only arbitrates between requests
+that share a process: under single-threaded sync workers it never sees more
+than one. Per pool, ``/metrics`` exports:
+
+    admission_in_flight{pool}                 gauge
+    admission_queue_depth{pool}               gauge
+    admission_requests_total{pool,outcome}    admitted, queue_full, deadline, timeout
+    admission_queue_wait_seconds{pool}        histogram (admitted requests)
+
+Pools (concurrency, queue, max wait in seconds) can be overridden per class:
+
+    ADMISSION_ENABLED               "false" to disable every pool (default on)
+    ADMISSION_LLM                   default "4,8,10"
+    ADMISSION_TRANSCRIBE            default "2,4,10"
+    ADMISSION_OCR                   default "2,4,15"
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from flask import request
+
+from utils.metrics import REGISTRY
+from utils.rate_limit import rate_limited_response
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+
+DEFAULT_POOLS: Dict[str, Tuple[int, int, float]] = {
+    'llm': (4, 8, 10.0),
+    'transcribe': (2, 4, 10.0),
+    'ocr': (2, 4, 15.0),
+}
+
+# Service time assumed for a class until its first request completes
+INITIAL_SERVICE_SECONDS = 2.0
+EWMA_WEIGHT = 0.2
+
+IN_FLIGHT = REGISTRY.gauge('admission_in_flight', 'Requests running per admission pool', ('pool',))
+QUEUE_DEPTH = REGISTRY.gauge('admission_queue_depth', 'Requests waiting per admission pool', ('pool',))
+ADMISSION_TOTAL = REGISTRY.counter(
+    'admission_requests_total', 'Admission decisions per pool and outcome', ('pool', 'outcome'))
+QUEUE_WAIT = REGISTRY.histogram(
+    'admission_queue_wait_seconds', 'Time admitted requests waited for a slot', ('pool',))
+
+
+class Ticket(NamedTuple):
+    admitted: bool
+    outcome: str
+    retry_after: int = 0
+    waited: float = 0.0
+
+
+class _Waiter:
+    __slots__ = ('event', 'admitted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+
+
+class AdmissionRejected(Exception):
+    """Raised by ``AdmissionPool.slot`` when no slot was granted."""
+
+    def __init__(self, ticket: Ticket):
+        super().__init__(f'admission rejected ({ticket.outcome})')
+        self.ticket = ticket
+
+
+class AdmissionPool:
+    """Bounded FIFO wait queue in front of ``max_concurrent`` slots."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue: deque = deque()  # of _Waiter, oldest first
+        self._service_seconds = INITIAL_SERVICE_SECONDS
+        self._publish()
+
+    def _publish(self) -> None:
+        IN_FLIGHT.set((self.name,), self._in_flight)
+        QUEUE_DEPTH.set((self.name,), len(self._queue))
+
+    def _expected_wait(self, position: int) -> float:
+        """Seconds until the request at ``position`` (1 = next) in the queue gets a slot."""
+        return self._service_seconds * position / self.max_concurrent
+
+    def _reject(self, outcome: str, expected_wait: float) -> Ticket:
+        ADMISSION_TOTAL.inc((self.name, outcome))
+        return Ticket(False, outcome, max(1, math.ceil(expected_wait)))
+
+    def acquire(self, budget: Optional[float] = None) -> Ticket:
+        """Take a slot, waiting up to ``budget`` seconds; the ticket says whether it was admitted."""
+        budget = self.max_wait if budget is None else min(budget, self.max_wait)
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._queue:
+                self._in_flight += 1
+                self._publish()
+                ADMISSION_TOTAL.inc((self.name, 'admitted'))
+                QUEUE_WAIT.observe((self.name,), 0.0)
+                return Ticket(True, 'admitted')
+
+            expected_wait = self._expected_wait(len(self._queue) + 1)
+            if len(self._queue) >= self.max_queue:
+                return self._reject('queue_full', expected_wait)
+            if expected_wait > budget:
+                return self._reject('deadline', expected_wait)
+
+            waiter = _Waiter()
+            self._queue.append(waiter)
+            self._publish()
+
+        started = time.perf_counter()
+        waiter.event.wait(budget)
+        waited = time.perf_counter() - started
+        with self._lock:
+            if waiter.admitted:
+                ADMISSION_TOTAL.inc((self.name, 'admitted'))
+                QUEUE_WAIT.observe((self.name,), waited)
+                return Ticket(True, 'admitted', waited=waited)
+            # Budget ran out while queued
+            self._queue.remove(waiter)
+            self._publish()
+            return self._reject('timeout', self._expected_wait(len(self._queue) + 1))
+
+    def release(self, service_seconds: float) -> None:
+        """Free a slot (handing it to the best waiter, if any) and update the service-time estimate."""
+        with self._lock:
+            self._service_seconds += EWMA_WEIGHT * (service_seconds - self._service_seconds)
+            if self._queue:
+                waiter = self._queue.popleft()
+                waiter.admitted = True
+                waiter.event.set()
+            else:
+                self._in_flight -= 1
+            self._publish()
+
+    @contextmanager
+    def slot(self, budget: Optional[float] = None):
+        """Hold a slot for the ``with`` block; raises ``AdmissionRejected`` if none is granted."""
+        ticket = self.acquire(budget)
+        if not ticket.admitted:
+            raise AdmissionRejected(ticket)
+        started = time.perf_counter()
+        try:
+            yield ticket
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'max_wait_s': self.max_wait,
+                'service_seconds_ewma': round(self._service_seconds, 3),
+            }
+
+
+_pools: Dict[str, AdmissionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_settings(name: str) -> Tuple[int, int, float]:
+    default = DEFAULT_POOLS.get(name, DEFAULT_POOLS['llm'])
+    raw = os.getenv(f'ADMISSION_{name.upper()}')
+    if not raw:
+        return default
+    try:
+        concurrency, queue_size, wait = (part.strip() for part in raw.split(','))
+        return max(1, int(concurrency)), max(0, int(queue_size)), float(wait)
+    except ValueError:
+        print(f"⚠️ Invalid ADMISSION_{name.upper()}={raw!r} (expected 'concurrency,queue,max_wait'); using {default}")
+        return default
+
+
+def get_pool(name: str) -> Optional[AdmissionPool]:
+    """The pool for an endpoint class (created on first use); None when admission control is off."""
+    if not ADMISSION_ENABLED:
+        return None
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = AdmissionPool(name, *_pool_settings(name))
+    return pool
+
+
+def request_budget(headers, pool: AdmissionPool) -> float:
+    """Wait budget for this request: the pool's max_wait, or less if the client times out sooner."""
+    try:
+        client_timeout = float(headers.get('X-Request-Timeout-Ms', '')) / 1000
+    except ValueError:
+        return pool.max_wait
+    # Leave the request roughly one service time to actually run
+    return max(0.0, min(pool.max_wait, client_timeout - pool.snapshot()['service_seconds_ewma']))
+
+
+def admission_controlled(pool_name: str):
+    """Decorator running a Flask route inside the named admission pool (429 + Retry-After when shed)."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            pool = get_pool(pool_name)
+            if pool is None:
+                return f(*args, **kwargs)
+            ticket = pool.acquire(request_budget(request.headers, pool))
+            if not ticket.admitted:
+                print(f"🚦 {pool_name} pool rejected {request.path} ({ticket.outcome}, retry in {ticket.retry_after}s)")
+                return rate_limited_response(ticket.retry_after, 'Server is busy with similar requests, please try again shortly')
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                pool.release(time.perf_counter() - started)
+        return decorated
+    return decorator
@@ -0,0 +1,79 @@
+"""
+Conditional GET - ETag / If-None-Match support for patient read endpoints
+
+Every write to a patient document increments its ``version`` field
+(``"$inc": {"version": 1}`` alongside the usual ``$set``/``$push``). Read
+routes wrapped with ``patient_conditional_get`` fetch only that field, emit
+it as a strong ETag and answer a matching ``If-None-Match`` with 304 without
+loading the rest of the document.
+
+The version is read before the route loads the body, so a write racing with
+the read can only make the ETag older than the body (the next request then
+gets a fresh 200), never newer.
+"""
+
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from flask import make_response, request
+
+VERSION_FIELD = 'version'
+
+
+def version_etag(version: Optional[int], suffix: str = '') -> str:
+    """Build the (unquoted) ETag value for a patient document version."""
+    etag = f"v{int(version or 0)}"
+    return f"{etag}-{suffix}" if suffix else etag
+
+
+def get_patient_version(collection, match: Dict[str, Any]) -> Optional[int]:
+    """Read only the version field; returns None if no patient matched."""
+    doc = collection.find_one(match, {'_id': 0, VERSION_FIELD: 1})
+    if doc is None:
+        return None
+    return int(doc.get(VERSION_FIELD, 0) or 0)
+
+
+def patient_conditional_get(get_collection: Callable[[], Any], match_from_kwargs: Callable[[Dict[str, Any]], Dict[str, Any]],
+                            etag_suffix: Optional[Callable[[], str]] = None):
+    """
+    Decorator adding ETag / 304 handling to a patient GET route.
+
+    Args:
+        get_collection: returns the patients collection (looked up per request
+            so reconnects are picked up)
+        match_from_kwargs: builds the patient filter from the route kwargs,
+            e.g. ``lambda kw: {"patient_id": kw["patient_id"]}``
+        etag_suffix: optional extra ETag component for routes whose output also
+            depends on something other than the document (e.g. "last 30 days")
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            collection = get_collection()
+            if collection is None:
+                return f(*args, **kwargs)
+
+            try:
+                version = get_patient_version(collection, match_from_kwargs(kwargs))
+            except Exception as e:
+                print(f"⚠️ Version lookup failed, serving without ETag: {e}")
+                version = None
+
+            if version is None:
+                # Unknown patient (or lookup failed): let the route answer as usual
+                return f(*args, **kwargs)
+
+            etag = version_etag(version, etag_suffix() if etag_suffix else '')
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated
+    return decorator
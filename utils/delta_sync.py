@@ -0,0 +1,204 @@
+"""
+Delta Sync Utility
+
+Lets the patient app refresh its screens with only what changed since its
+last sync instead of re-downloading every history array.
+
+Every write that adds or changes an embedded entry stamps it with a
+``sync_seq``: a per-process monotonic integer (microseconds since the epoch,
+never repeating). Profile writes stamp ``profile_sync_seq`` on the patient
+and deletions push a tombstone onto ``sync_tombstones``. One aggregation
+then collects every entry, profile change and tombstone with a sequence in
+the client's window, sorted ascending, and returns one page of it.
+
+Entries written before sync stamping existed have no ``sync_seq`` and are
+treated as sequence 0, so they are only returned by a full sync (no token).
+
+The sync token is opaque to clients:
+    {k: sequence, n: entries with that sequence already delivered}
+
+Requires MongoDB 5.2+ ($sortArray).
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.history_query import HistoryQueryError, MAX_HISTORY_LIMIT, decode_cursor, encode_cursor
+
+SYNC_SEQ_FIELD = 'sync_seq'
+PROFILE_SYNC_SEQ_FIELD = 'profile_sync_seq'
+TOMBSTONES_FIELD = 'sync_tombstones'
+
+DEFAULT_SYNC_LIMIT = 100
+
+# A sequence number is taken before the write reaches Mongo, so a slow write
+# can land after a faster one with a higher number. Changes newer than this
+# window are held back until the next sync so they are never skipped.
+SYNC_SAFETY_WINDOW_US = int(float(os.getenv('SYNC_SAFETY_WINDOW_SECONDS', '2')) * 1_000_000)
+
+_seq_lock = threading.Lock()
+_last_seq = 0
+
+
+def next_sync_seq() -> int:
+    """Return a strictly increasing sequence number (microsecond clock)."""
+    global _last_seq
+    with _seq_lock:
+        _last_seq = max(_last_seq + 1, time.time_ns() // 1000)
+        return _last_seq
+
+
+def stamp(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Stamp an embedded entry with a new sync sequence and return it."""
+    entry[SYNC_SEQ_FIELD] = next_sync_seq()
+    return entry
+
+
+def tombstone(section: str, entry_id: Any) -> Dict[str, Any]:
+    """Build the tombstone recorded when an embedded entry is deleted."""
+    return {'section': section, 'id': entry_id, SYNC_SEQ_FIELD: next_sync_seq()}
+
+
+def parse_sync_params(args) -> Dict[str, Any]:
+    """
+    Read the sync token (``since``) and page size (``limit``) from request args.
+
+    Raises:
+        HistoryQueryError: if a parameter is malformed
+    """
+    raw_since = (args.get('since') or '').strip()
+    raw_limit = (args.get('limit') or '').strip()
+
+    try:
+        limit = int(raw_limit) if raw_limit else DEFAULT_SYNC_LIMIT
+    except ValueError:
+        raise HistoryQueryError(f'Invalid limit: {raw_limit}')
+    if limit <= 0:
+        raise HistoryQueryError('limit must be > 0')
+
+    since = {'key': 0, 'skip': 0}
+    if raw_since:
+        since = decode_cursor(raw_since)
+        if not isinstance(since['key'], int):
+            raise HistoryQueryError('Invalid sync token')
+
+    return {'since': since, 'limit': min(limit, MAX_HISTORY_LIMIT)}
+
+
+def _seq_of(var: str) -> Dict[str, Any]:
+    return {'$ifNull': [f'$${var}.{SYNC_SEQ_FIELD}', 0]}
+
+
+def build_sync_pipeline(match: Dict[str, Any], sections: Iterable[str], profile_fields: Iterable[str],
+                        params: Dict[str, Any], upper: int) -> list:
+    """
+    Build the aggregation returning one page of changes for a patient:
+    ``{'version', 'total', 'changes': [{'s': seq, 'section': name, 'entry': doc}]}``.
+    """
+    since = params['since']
+    in_window = lambda seq: {'$and': [{'$gte': [seq, since['key']]}, {'$lte': [seq, upper]}]}
+
+    streams = []
+    for section in sections:
+        entries = {'$filter': {
+            'input': {'$cond': [{'$isArray': f'${section}'}, f'${section}', []]},
+            'as': 'e',
+            'cond': in_window(_seq_of('e')),
+        }}
+        streams.append({'$map': {
+            'input': entries, 'as': 'e',
+            'in': {'s': _seq_of('e'), 'section': section, 'entry': '$$e'},
+        }})
+
+    tombstones = {'$filter': {
+        'input': {'$ifNull': [f'${TOMBSTONES_FIELD}', []]},
+        'as': 't',
+        'cond': in_window(_seq_of('t')),
+    }}
+    streams.append({'$map': {
+        'input': tombstones, 'as': 't',
+        'in': {'s': _seq_of('t'), 'section': 'deleted', 'entry': '$$t'},
+    }})
+
+    profile_seq = {'$ifNull': [f'${PROFILE_SYNC_SEQ_FIELD}', 0]}
+    streams.append({'$cond': [
+        {'$and': [{'$gte': [profile_seq, since['key']]}, {'$lte': [profile_seq, upper]}]},
+        [{'s': profile_seq, 'section': 'profile', 'entry': {field: f'${field}' for field in profile_fields}}],
+        [],
+    ]})
+
+    return [
+        {'$match': match},
+        {'$limit': 1},
+        {'$project': {'_id': 0, 'version': 1, 'changes': {'$concatArrays': streams}}},
+        {'$project': {
+            'version': 1,
+            'total': {'$size': '$changes'},
+            # One extra change tells us whether another page exists
+            'changes': {'$slice': [
+                {'$sortArray': {'input': '$changes', 'sortBy': {'s': 1, 'section': 1}}},
+                since['skip'],
+                params['limit'] + 1,
+            ]},
+        }},
+    ]
+
+
+def query_changes(collection, match: Dict[str, Any], sections: List[str], profile_fields: List[str],
+                  params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Fetch one page of changes for the patient matching ``match``.
+
+    Returns:
+        None if no patient matched, otherwise a dict with ``changes`` (grouped
+        by section), ``deleted`` (tombstones), ``profile`` (or None),
+        ``has_more``, ``next_token`` and the patient ``version``.
+    """
+    upper = next_sync_seq() - SYNC_SAFETY_WINDOW_US
+    pipeline = build_sync_pipeline(match, sections, profile_fields, params, upper)
+    doc = next(collection.aggregate(pipeline), None)
+    if doc is None:
+        return None
+
+    page = doc.get('changes', [])
+    limit = params['limit']
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    since = params['since']
+    if has_more:
+        last_seq = page[-1]['s']
+        same_seq = sum(1 for item in page if item['s'] == last_seq)
+        if last_seq == since['key']:
+            # Still inside the run of changes sharing the token's sequence
+            same_seq += since['skip']
+        next_token = encode_cursor(last_seq, same_seq)
+    elif upper + 1 > since['key']:
+        # Caught up: everything up to the window's upper bound was delivered
+        next_token = encode_cursor(upper + 1, 0)
+    else:
+        # Token is newer than the window (clock skew between workers); keep it
+        next_token = encode_cursor(since['key'], since['skip'])
+
+    changes: Dict[str, List[Any]] = {section: [] for section in sections}
+    deleted: List[Any] = []
+    profile = None
+    for item in page:
+        if item['section'] == 'deleted':
+            deleted.append(item['entry'])
+        elif item['section'] == 'profile':
+            profile = item['entry']
+        else:
+            changes[item['section']].append(item['entry'])
+
+    return {
+        'changes': {section: entries for section, entries in changes.items() if entries},
+        'deleted': deleted,
+        'profile': profile,
+        'change_count': len(page),
+        'has_more': has_more,
+        'next_token': next_token,
+        'version': doc.get('version', 0),
+    }
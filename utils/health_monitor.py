@@ -0,0 +1,245 @@
+"""
+Health Monitor - background dependency probes with a cached status
+
+``/health`` used to query Mongo on every call, and login, the mood/mental
+health routes and ``/health/database`` each sent an admin ``ping`` inline
+before doing any work. A ``HealthMonitor`` instead probes every dependency
+(Mongo, Qdrant, the embedding model, OpenAI, ...) on a background thread and
+caches the outcome:
+
+    monitor = HealthMonitor()
+    monitor.add_check('mongodb', lambda: db.client.admin.command('ping'), critical=True)
+    monitor.add_check('openai', lambda: client.models.list(), interval=300)
+    monitor.start()
+
+    monitor.is_up('mongodb')   # dict lookup, no I/O
+    monitor.response()         # cached /health body, rebuilt after each round of probes
+
+A check passes when its probe returns without raising (a probe may return
+``None`` to mean "not configured", reported as ``disabled``). Each check has
+its own interval and a probe timeout; a probe that fails is retried on the
+fast HEALTH_RETRY_INTERVAL_S until it recovers. Request handlers that hit a
+dependency error can call ``report_failure(name, error)`` to mark it down and
+wake the monitor for an immediate re-probe.
+
+Overall status is ``healthy`` when every check is up (or disabled),
+``degraded`` when a non-critical check is down, and ``unhealthy`` (HTTP 503)
+when a critical one is. Until the first round of probes completes the status
+is ``starting`` and ``is_up`` is optimistic, so requests are never blocked on
+the first probe.
+
+The probe thread is started lazily per process (so it survives a forking
+server such as gunicorn, which would otherwise only run it in the master).
+
+    HEALTH_CHECK_INTERVAL_S   default probe interval (default 15)
+    HEALTH_RETRY_INTERVAL_S   interval while a check is failing (default 5)
+    HEALTH_PROBE_TIMEOUT_S    a probe running longer than this counts as down (default 5)
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as ProbeTimeout
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+HEALTH_CHECK_INTERVAL_S = float(os.getenv('HEALTH_CHECK_INTERVAL_S', '15'))
+HEALTH_RETRY_INTERVAL_S = float(os.getenv('HEALTH_RETRY_INTERVAL_S', '5'))
+HEALTH_PROBE_TIMEOUT_S = float(os.getenv('HEALTH_PROBE_TIMEOUT_S', '5'))
+
+UP = 'up'
+DOWN = 'down'
+DISABLED = 'disabled'
+UNKNOWN = 'unknown'
+
+
+class _Check:
+    __slots__ = ('name', 'probe', 'critical', 'interval', 'status', 'error', 'latency_ms',
+                 'checked_at', 'next_run', 'failures', 'inflight')
+
+    def __init__(self, name: str, probe: Callable[[], Any], critical: bool, interval: float):
+        self.name = name
+        self.probe = probe
+        self.critical = critical
+        self.interval = interval
+        self.status = UNKNOWN
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[str] = None
+        self.next_run = 0.0
+        self.failures = 0
+        self.inflight = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        entry = {'status': self.status, 'critical': self.critical, 'checked_at': self.checked_at}
+        if self.latency_ms is not None:
+            entry['latency_ms'] = self.latency_ms
+        if self.error:
+            entry['error'] = self.error
+            entry['consecutive_failures'] = self.failures
+        return entry
+
+
+class HealthMonitor:
+    """Runs dependency probes on a background thread and serves their cached results."""
+
+    def __init__(self, service: str = 'Pregnancy AI API',
+                 interval: float = HEALTH_CHECK_INTERVAL_S,
+                 retry_interval: float = HEALTH_RETRY_INTERVAL_S,
+                 probe_timeout: float = HEALTH_PROBE_TIMEOUT_S):
+        self.service = service
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.probe_timeout = probe_timeout
+        self._checks: Dict[str, _Check] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid: Optional[int] = None
+        self._started_at = datetime.now().isoformat()
+        self._first_round_done = False
+        self._cached: Tuple[str, int] = self._render()
+
+    def add_check(self, name: str, probe: Callable[[], Any], critical: bool = False,
+                  interval: Optional[float] = None) -> None:
+        with self._lock:
+            self._checks[name] = _Check(name, probe, critical, interval or self.interval)
+            self._cached = self._render()
+
+    # ---- background probing ----
+
+    def start(self) -> None:
+        """Start the probe thread for this process (no-op if it is already running here)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health-probe')
+            threading.Thread(target=self._run, name='health-monitor', daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            due = [check for check in list(self._checks.values()) if check.next_run <= now]
+            if due:
+                try:
+                    self._probe_all(due)
+                except RuntimeError:
+                    return  # executor shut down: the interpreter is exiting
+            upcoming = min((check.next_run for check in self._checks.values()), default=now + self.interval)
+            self._wake.wait(max(0.05, upcoming - time.monotonic()))
+            self._wake.clear()
+
+    def _probe_all(self, checks) -> None:
+        futures = []
+        for check in checks:
+            if check.inflight is not None and not check.inflight.done():
+                # A probe that hung past its timeout keeps its worker; do not stack more behind it
+                self._record(check, DOWN, 'previous probe still running', None)
+                continue
+            check.inflight = self._executor.submit(self._timed_probe, check.probe)
+            futures.append(check)
+        deadline = time.monotonic() + self.probe_timeout
+        for check in futures:
+            try:
+                status, error, latency = check.inflight.result(timeout=max(0.0, deadline - time.monotonic()))
+            except ProbeTimeout:
+                status, error, latency = DOWN, f'probe timed out after {self.probe_timeout:g}s', None
+            self._record(check, status, error, latency)
+        with self._lock:
+            self._first_round_done = self._first_round_done or all(
+                check.status != UNKNOWN for check in self._checks.values())
+            self._cached = self._render()
+
+    @staticmethod
+    def _timed_probe(probe: Callable[[], Any]) -> Tuple[str, Optional[str], Optional[float]]:
+        started = time.perf_counter()
+        try:
+            result = probe()
+        except Exception as e:
+            return DOWN, f'{type(e).__name__}: {e}', round((time.perf_counter() - started) * 1000, 2)
+        latency = round((time.perf_counter() - started) * 1000, 2)
+        if result is None:
+            return DISABLED, None, None
+        if result is False:
+            return DOWN, 'probe returned False', latency
+        return UP, None, latency
+
+    def _record(self, check: _Check, status: str, error: Optional[str], latency: Optional[float]) -> None:
+        previous = check.status
+        check.status, check.error, check.latency_ms = status, error, latency
+        check.checked_at = datetime.now().isoformat()
+        check.failures = check.failures + 1 if status == DOWN else 0
+        check.next_run = time.monotonic() + (self.retry_interval if status == DOWN else check.interval)
+        if previous != status and previous != UNKNOWN:
+            if status == DOWN:
+                print(f"❌ Health: {check.name} is down ({error})")
+            else:
+                print(f"✅ Health: {check.name} is {status}")
+        elif previous == UNKNOWN and status == DOWN:
+            print(f"⚠️ Health: {check.name} is down ({error})")
+
+    # ---- request-side API (no I/O) ----
+
+    def is_up(self, name: str) -> bool:
+        """Cached status of one check; unknown (not yet probed) counts as up."""
+        self.start()
+        check = self._checks.get(name)
+        return check is None or check.status != DOWN
+
+    def report_failure(self, name: str, error: Any) -> None:
+        """Mark a check down after a request saw it fail, and re-probe it right away."""
+        check = self._checks.get(name)
+        if check is None:
+            return
+        with self._lock:
+            self._record(check, DOWN, str(error), None)
+            check.next_run = 0.0
+            self._cached = self._render()
+        self._wake.set()
+
+    def refresh(self, name: str) -> bool:
+        """Probe one check synchronously (e.g. right after a reconnect) and return whether it is up."""
+        check = self._checks.get(name)
+        if check is None:
+            return True
+        status, error, latency = self._timed_probe(check.probe)
+        with self._lock:
+            self._record(check, status, error, latency)
+            self._cached = self._render()
+        return status != DOWN
+
+    def snapshot(self) -> Dict[str, Any]:
+        self.start()
+        return json.loads(self._cached[0])
+
+    def response(self):
+        """The cached /health response: JSON body and 200, or 503 when a critical check is down."""
+        from flask import current_app
+
+        self.start()
+        body, status_code = self._cached
+        return current_app.response_class(body, status=status_code, mimetype='application/json',
+                                          headers={'Cache-Control': 'no-store'})
+
+    def _render(self) -> Tuple[str, int]:
+        checks = self._checks.values()
+        if any(check.critical and check.status == DOWN for check in checks):
+            overall, code = 'unhealthy', 503
+        elif any(check.status == DOWN for check in checks):
+            overall, code = 'degraded', 200
+        elif not self._first_round_done and self._checks:
+            overall, code = 'starting', 200
+        else:
+            overall, code = 'healthy', 200
+        body = {
+            'status': overall,
+            'service': self.service,
+            'checked_at': max((check.checked_at for check in checks if check.checked_at), default=None),
+            'started_at': self._started_at,
+            'checks': {check.name: check.as_dict() for check in checks},
+        }
+        return json.dumps(body), code
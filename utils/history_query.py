@@ -0,0 +1,216 @@
+"""
+History Query Utility
+
+Builds MongoDB aggregation pipelines that filter, sort and slice a single
+embedded log array (kick_count_logs, food_logs, medication_logs, ...) on a
+patient document, so history routes only pull the requested page out of
+Mongo instead of loading the whole patient document with every array.
+
+All history routes share the same query parameters:
+    since   - only entries whose sort key is >= this value
+    until   - only entries whose sort key is <= this value
+    limit   - page size (0 / missing means "no limit", capped at MAX_HISTORY_LIMIT)
+    cursor  - opaque token returned as ``next_cursor`` by the previous page
+
+Requires MongoDB 5.2+ ($sortArray).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+MAX_HISTORY_LIMIT = 500
+
+
+class HistoryQueryError(ValueError):
+    """Raised when history query parameters are invalid."""
+
+
+def _parse_bound(value: str, key_type: str):
+    """Parse a since/until/cursor value for the given key type."""
+    if key_type == 'date':
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            raise HistoryQueryError(f'Invalid date value: {value}')
+        # Stored datetimes are naive local time
+        return parsed.replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(key: Any, skip: int) -> str:
+    """Encode the last sort key of a page (and how many entries shared it)."""
+    payload = {'k': key.isoformat() if isinstance(key, datetime) else key, 'n': skip}
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, key_type: str = 'string') -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = payload['k']
+        skip = int(payload.get('n', 0))
+    except Exception:
+        raise HistoryQueryError('Invalid cursor')
+    if key is not None:
+        key = _parse_bound(key, key_type)
+    return {'key': key, 'skip': max(skip, 0)}
+
+
+def parse_history_params(args, default_limit: int = 0, key_type: str = 'string') -> Dict[str, Any]:
+    """
+    Read since/until/limit/cursor from request args.
+
+    Args:
+        args: request.args (or any mapping)
+        default_limit: page size when the client does not send ``limit``
+        key_type: 'string' for ISO string sort keys, 'date' for BSON dates
+
+    Returns:
+        Dict with parsed since, until, limit and cursor values
+
+    Raises:
+        HistoryQueryError: if a parameter is malformed
+    """
+    since = (args.get('since') or '').strip()
+    until = (args.get('until') or '').strip()
+    raw_limit = (args.get('limit') or '').strip()
+    cursor = (args.get('cursor') or '').strip()
+
+    if raw_limit:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            raise HistoryQueryError(f'Invalid limit: {raw_limit}')
+    else:
+        limit = default_limit
+    if limit < 0:
+        raise HistoryQueryError('limit must be >= 0')
+    limit = min(limit, MAX_HISTORY_LIMIT) if limit else 0
+
+    return {
+        'since': _parse_bound(since, key_type) if since else None,
+        'until': _parse_bound(until, key_type) if until else None,
+        'limit': limit,
+        'cursor': decode_cursor(cursor, key_type) if cursor else None,
+    }
+
+
+def _key_expression(key) -> Any:
+    """
+    Build the per-entry sort key expression (in terms of ``$$e``).
+
+    ``key`` is either a field name, a tuple of field names to coalesce
+    (first non-null wins), or a raw aggregation expression.
+    """
+    if isinstance(key, str):
+        return f'$$e.{key}'
+    if isinstance(key, (list, tuple)):
+        if len(key) == 1:
+            return f'$$e.{key[0]}'
+        return {'$ifNull': [f'$$e.{field}' for field in key] + [None]}
+    return key
+
+
+def build_history_pipeline(match: Dict[str, Any], array_field: str, key, params: Dict[str, Any]) -> list:
+    """
+    Build the aggregation pipeline for one page of ``array_field``.
+
+    The pipeline returns a single document (or none if ``match`` finds no
+    patient) shaped as ``{'total': int, 'entries': [{'k': key, 'v': entry}]}``
+    where ``total`` counts the entries matching since/until.
+    """
+    key_expr = _key_expression(key)
+
+    range_conditions = []
+    if params.get('since') is not None:
+        range_conditions.append({'$gte': [key_expr, params['since']]})
+    if params.get('until') is not None:
+        range_conditions.append({'$lte': [key_expr, params['until']]})
+
+    source = {'$ifNull': [f'${array_field}', []]}
+    if range_conditions:
+        source = {'$filter': {'input': source, 'as': 'e', 'cond': {'$and': range_conditions}}}
+
+    keyed = {'$map': {'input': source, 'as': 'e', 'in': {'k': key_expr, 'v': '$$e'}}}
+
+    page_source = '$entries'
+    skip = 0
+    cursor = params.get('cursor')
+    if cursor:
+        skip = cursor['skip']
+        if cursor['key'] is None:
+            # Previous page ended inside the entries that have no sort key
+            page_source = {'$filter': {'input': '$entries', 'as': 'p', 'cond': {'$eq': [{'$ifNull': ['$$p.k', None]}, None]}}}
+        else:
+            page_source = {'$filter': {'input': '$entries', 'as': 'p', 'cond': {'$lte': ['$$p.k', cursor['key']]}}}
+
+    sorted_entries = {'$sortArray': {'input': page_source, 'sortBy': {'k': -1}}}
+
+    limit = params.get('limit') or 0
+    if limit:
+        # Fetch one extra entry to know whether another page exists
+        page = {'$slice': [sorted_entries, skip, limit + 1]}
+    elif skip:
+        page = {'$slice': [sorted_entries, skip, 2147483647]}
+    else:
+        page = sorted_entries
+
+    return [
+        {'$match': match},
+        {'$limit': 1},
+        {'$project': {'_id': 0, 'entries': keyed}},
+        {'$project': {'total': {'$size': '$entries'}, 'entries': page}},
+    ]
+
+
+def query_history(collection, match: Dict[str, Any], array_field: str, key, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Run a history page query against the patients collection.
+
+    Returns:
+        None if no patient matched, otherwise a dict with ``entries`` (newest
+        first), ``total`` (entries matching since/until), ``has_more`` and
+        ``next_cursor``.
+    """
+    pipeline = build_history_pipeline(match, array_field, key, params)
+    return history_page(next(collection.aggregate(pipeline), None), params)
+
+
+async def aquery_history(collection, match: Dict[str, Any], array_field: str, key, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """``query_history`` for a motor (asyncio) collection."""
+    pipeline = build_history_pipeline(match, array_field, key, params)
+    docs = await collection.aggregate(pipeline).to_list(1)
+    return history_page(docs[0] if docs else None, params)
+
+
+def history_page(doc: Optional[Dict[str, Any]], params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Turn the single document produced by the history pipeline into a page."""
+    if doc is None:
+        return None
+
+    keyed_entries = doc.get('entries', [])
+    limit = params.get('limit') or 0
+    has_more = bool(limit) and len(keyed_entries) > limit
+    if has_more:
+        keyed_entries = keyed_entries[:limit]
+
+    next_cursor = None
+    if has_more and keyed_entries:
+        last_key = keyed_entries[-1].get('k')
+        same_key = sum(1 for item in keyed_entries if item.get('k') == last_key)
+        cursor = params.get('cursor')
+        if cursor and cursor['key'] == last_key and same_key == len(keyed_entries):
+            # The whole page shared the cursor key; keep skipping past it
+            same_key += cursor['skip']
+        next_cursor = encode_cursor(last_key, same_key)
+
+    return {
+        'entries': [item.get('v') for item in keyed_entries],
+        'total': doc.get('total', 0),
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,253 @@
+"""
+ID Generator - collision-free, time-ordered public IDs without database reads
+
+Patient and doctor IDs are 64-bit Snowflake-style values rendered in
+Crockford base32 behind a prefix (``PAT0H3Z6Q1K7WX2A``, ``D0H3Z6Q1K7WX2B``):
+
+    42 bits  milliseconds since ID_EPOCH (good until ~2163)
+    10 bits  node id (one per process)
+    12 bits  per-millisecond sequence (4096 IDs/ms per process)
+
+IDs from one process are strictly increasing. IDs from different processes
+cannot collide as long as their node ids differ. The node id comes from, in
+order:
+
+    1. ``ID_NODE_ID`` (0-1023), for deployments that assign one per process
+    2. the node id source registered with ``set_node_id_source`` - the apps
+       use ``claim_node_id``, which leases a free node id in the counters
+       collection (see below), so up to 1024 live processes get distinct
+       node ids however often workers restart
+    3. a random node id (the unique ``patient_id`` / ``doctor_id`` indexes
+       are the backstop)
+
+A lease is a ``id_generator_node:<n>`` document naming its owner and an
+``expires_at``. Claiming one is a conditional upsert: it only succeeds on a
+node id that has no lease or whose lease expired, so two live processes can
+never hold the same node id. The owner renews it from a daemon thread every
+third of ID_NODE_LEASE_SECONDS (default 600) and deletes it at exit; a
+process that dies without exiting cleanly frees its node id when the lease
+expires. A process that finds its lease taken over (it stalled past the
+expiry) moves to a new node id as soon as its next renewal notices.
+
+Generating an ID never touches the database.
+
+Crockford base32 avoids I, L, O and U, so IDs are easy to read out and type.
+"""
+
+import atexit
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+ID_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+
+TIMESTAMP_BITS = 42
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+ENCODED_LENGTH = 13  # ceil(64 / 5)
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+PATIENT_ID_PREFIX = 'PAT'
+DOCTOR_ID_PREFIX = 'D'
+
+ID_NODE_LEASE_SECONDS = int(os.getenv('ID_NODE_LEASE_SECONDS', '600'))
+
+
+def encode_base32(value: int, length: int = ENCODED_LENGTH) -> str:
+    """Fixed-width Crockford base32 (so string order matches numeric order)."""
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(CROCKFORD_ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+
+def decode_base32(text: str) -> int:
+    """Inverse of encode_base32."""
+    value = 0
+    for char in text.upper():
+        value = value * 32 + CROCKFORD_ALPHABET.index(char)
+    return value
+
+
+NODE_LEASE_PREFIX = 'id_generator_node:'
+
+_node_id_source: Optional[Callable[[], int]] = None
+
+
+def set_node_id_source(source: Optional[Callable[[], int]]) -> None:
+    """Register a callable returning this process's node id (called once per process)."""
+    global _node_id_source
+    _node_id_source = source
+
+
+class NodeLease:
+    """A node id leased in the counters collection by this process."""
+
+    def __init__(self, collection, lease_seconds: int = ID_NODE_LEASE_SECONDS):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.node_id: Optional[int] = None
+        self._stopped = threading.Event()
+
+    def _key(self) -> str:
+        return f'{NODE_LEASE_PREFIX}{self.node_id}'
+
+    def acquire(self) -> int:
+        """Lease a free node id, starting the scan at a random one."""
+        from pymongo.errors import DuplicateKeyError
+
+        start = random.SystemRandom().randint(0, MAX_NODE_ID)
+        for offset in range(MAX_NODE_ID + 1):
+            node_id = (start + offset) % (MAX_NODE_ID + 1)
+            now = datetime.utcnow()
+            try:
+                # Matches only a free or expired lease; on a live one the upsert hits the _id
+                self.collection.update_one(
+                    {'_id': f'{NODE_LEASE_PREFIX}{node_id}',
+                     '$or': [{'expires_at': {'$lt': now}}, {'owner': self.owner}]},
+                    {'$set': {'owner': self.owner, 'node_id': node_id,
+                              'expires_at': now + timedelta(seconds=self.lease_seconds)}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                continue
+            self.node_id = node_id
+            return node_id
+        raise RuntimeError(f'All {MAX_NODE_ID + 1} ID node ids are leased by live processes')
+
+    def renew(self) -> bool:
+        """Extend the lease; False if another process has taken it over."""
+        result = self.collection.update_one(
+            {'_id': self._key(), 'owner': self.owner},
+            {'$set': {'expires_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+        return result.matched_count == 1
+
+    def release(self) -> None:
+        self._stopped.set()
+        try:
+            self.collection.delete_one({'_id': self._key(), 'owner': self.owner})
+        except Exception:
+            pass  # the lease expires on its own
+
+    def keep_alive(self, on_moved: Callable[[int], None]) -> None:
+        """Renew in a daemon thread and release at exit; ``on_moved`` gets the new node id if the lease is lost."""
+        def renew_forever():
+            while not self._stopped.wait(self.lease_seconds / 3):
+                try:
+                    if self.renew():
+                        continue
+                    lost = self.node_id
+                    on_moved(self.acquire())
+                    print(f"⚠️ ID node lease {lost} was taken over, now using node id {self.node_id}")
+                except Exception as e:
+                    print(f"⚠️ Could not renew ID node lease {self.node_id}: {e}")
+
+        threading.Thread(target=renew_forever, name='id-node-lease', daemon=True).start()
+        atexit.register(self.release)
+
+
+def claim_node_id(counters_collection) -> int:
+    """Lease a node id in the counters collection for as long as this process lives."""
+    lease = NodeLease(counters_collection)
+    node_id = lease.acquire()
+    pid = os.getpid()
+
+    def moved(new_node_id: int) -> None:
+        if _generator is not None and _generator_pid == pid:
+            _generator.set_node_id(new_node_id)
+
+    lease.keep_alive(moved)
+    return node_id
+
+
+def _default_node_id() -> int:
+    configured = os.getenv('ID_NODE_ID')
+    if configured is not None and configured.strip() != '':
+        node_id = int(configured)
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f'ID_NODE_ID must be between 0 and {MAX_NODE_ID}')
+        return node_id
+    if _node_id_source is not None:
+        try:
+            return _node_id_source()
+        except Exception as e:
+            print(f"⚠️ Could not claim an ID node id, using a random one: {e}")
+    return random.SystemRandom().randint(0, MAX_NODE_ID)
+
+
+class IdGenerator:
+    """Thread-safe Snowflake-style ID generator for one process."""
+
+    def __init__(self, node_id: Optional[int] = None, clock=None):
+        self.node_id = _default_node_id() if node_id is None else node_id
+        if not 0 <= self.node_id <= MAX_NODE_ID:
+            raise ValueError(f'node_id must be between 0 and {MAX_NODE_ID}')
+        self._clock = clock or (lambda: time.time_ns() // 1_000_000)
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def set_node_id(self, node_id: int) -> None:
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f'node_id must be between 0 and {MAX_NODE_ID}')
+        with self._lock:
+            self.node_id = node_id
+
+    def next_int(self) -> int:
+        """Return the next 64-bit ID."""
+        with self._lock:
+            now_ms = self._clock() - ID_EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock stepped backwards: keep counting
+                # from the last timestamp so IDs stay unique and ordered
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+    def next_id(self, prefix: str = '') -> str:
+        """Return the next ID as ``prefix`` + 13 Crockford base32 characters."""
+        return f"{prefix}{encode_base32(self.next_int())}"
+
+
+_generator: Optional[IdGenerator] = None
+_generator_lock = threading.Lock()
+_generator_pid: Optional[int] = None
+
+
+def get_id_generator() -> IdGenerator:
+    """Process-wide generator (re-created after fork so children get their own node id)."""
+    global _generator, _generator_pid
+    pid = os.getpid()
+    if _generator is None or _generator_pid != pid:
+        with _generator_lock:
+            if _generator is None or _generator_pid != pid:
+                _generator = IdGenerator()
+                _generator_pid = pid
+    return _generator
+
+
+def new_patient_id() -> str:
+    """New patient ID, e.g. ``PAT0H3Z6Q1K7WX2A``."""
+    return get_id_generator().next_id(PATIENT_ID_PREFIX)
+
+
+def new_doctor_id() -> str:
+    """New doctor ID, e.g. ``D0H3Z6Q1K7WX2B``."""
+    return get_id_generator().next_id(DOCTOR_ID_PREFIX)
@@ -0,0 +1,156 @@
+"""
+Idempotency Keys - replay-safe POST routes
+
+Routes wrapped with ``idempotent`` honor an ``Idempotency-Key`` request
+header. The first request with a given key (per route path) claims a record
+in the ``idempotency_keys`` collection, runs normally and stores its
+response there. Retries with the same key are answered from that record
+without running the route again (``Idempotent-Replayed: true``), so a
+flaky mobile connection cannot push the same log entry twice.
+
+    - same key, different body  -> 422
+    - same key, first request still running -> 409 with Retry-After
+    - 5xx responses are not stored, so the client can retry them
+
+A request holds its key on a lease (``started_at``). If the worker running it
+dies (gunicorn timeout, OOM, deploy) the record stays ``in_progress``; once
+the lease is older than IDEMPOTENCY_LEASE_SECONDS (default 120, above the
+worker timeout) the next retry takes it over and runs the route. Only the
+current lease holder can store or drop the record.
+
+Records expire through a TTL index on ``created_at``
+(IDEMPOTENCY_TTL_SECONDS, default 24 hours). Requests without the header
+are not affected.
+"""
+
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Any, Callable
+
+from flask import jsonify, make_response, request
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', '120'))
+MAX_KEY_LENGTH = 255
+
+
+def ensure_idempotency_indexes(collection):
+    """Create the TTL index that expires stored responses."""
+    collection.create_index('created_at', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+
+def _record_id(key: str, path: str) -> str:
+    return hashlib.sha256(f'{path}\n{key}'.encode('utf-8')).hexdigest()
+
+
+def _request_fingerprint() -> str:
+    return hashlib.sha256(request.get_data(cache=True) or b'').hexdigest()
+
+
+def _take_over_expired_lease(collection, record_id: str, fingerprint: str, lease_id: str):
+    """Claim an in-progress record whose lease expired (its worker died); None if it is still live."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+    return collection.find_one_and_update(
+        {
+            '_id': record_id,
+            'fingerprint': fingerprint,
+            'state': 'in_progress',
+            '$or': [
+                {'started_at': {'$lt': cutoff}},
+                # Records written before leases existed
+                {'started_at': {'$exists': False}, 'created_at': {'$lt': cutoff}},
+            ],
+        },
+        {'$set': {'started_at': now, 'lease_id': lease_id}},
+    )
+
+
+def _replay(record: dict):
+    response = make_response(bytes(record.get('body') or b''), record.get('status_code', 200))
+    response.headers['Content-Type'] = record.get('content_type') or 'application/json'
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(get_collection: Callable[[], Any]):
+    """
+    Decorator making a POST route safe to retry with an Idempotency-Key header.
+
+    Args:
+        get_collection: returns the idempotency_keys collection (or None when
+            the database is unavailable, in which case the route runs as usual)
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+            collection = get_collection()
+            if not key or collection is None:
+                return f(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({'success': False, 'message': f'{IDEMPOTENCY_HEADER} is too long'}), 400
+
+            record_id = _record_id(key, request.path)
+            fingerprint = _request_fingerprint()
+            lease_id = uuid.uuid4().hex
+            now = datetime.utcnow()
+            try:
+                collection.insert_one({
+                    '_id': record_id,
+                    'key': key,
+                    'path': request.path,
+                    'fingerprint': fingerprint,
+                    'state': 'in_progress',
+                    'lease_id': lease_id,
+                    'started_at': now,
+                    'created_at': now,
+                })
+            except DuplicateKeyError:
+                record = collection.find_one({'_id': record_id}) or {}
+                if record.get('fingerprint') != fingerprint:
+                    return jsonify({
+                        'success': False,
+                        'message': f'{IDEMPOTENCY_HEADER} was already used with a different request'
+                    }), 422
+                if record.get('state') == 'completed':
+                    print(f"🔁 Replaying stored response for {IDEMPOTENCY_HEADER} on {request.path}")
+                    return _replay(record)
+                if _take_over_expired_lease(collection, record_id, fingerprint, lease_id) is None:
+                    response = jsonify({
+                        'success': False,
+                        'message': 'A request with this Idempotency-Key is still being processed'
+                    })
+                    response.status_code = 409
+                    response.headers['Retry-After'] = '1'
+                    return response
+                print(f"♻️ Taking over expired {IDEMPOTENCY_HEADER} lease on {request.path}")
+
+            owned = {'_id': record_id, 'lease_id': lease_id}
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                collection.delete_one(owned)
+                raise
+
+            if response.status_code >= 500:
+                # Let the client retry server errors with the same key
+                collection.delete_one(owned)
+                return response
+
+            collection.update_one(owned, {'$set': {
+                'state': 'completed',
+                'status_code': response.status_code,
+                'content_type': response.headers.get('Content-Type'),
+                'body': response.get_data(),
+                'completed_at': datetime.utcnow(),
+            }})
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,77 @@
+"""
+JSON Provider - Fast Flask JSON serialization for MongoDB documents
+
+Encodes ObjectId, datetime and date natively in a single pass while the
+response is serialized, so routes and models can hand raw Mongo documents
+to jsonify() instead of pre-walking them with convert_objectid_to_string.
+
+Uses orjson when it is installed and falls back to the stdlib json module.
+Datetimes are emitted as ISO 8601 strings (same as convert_objectid_to_string),
+not the HTTP-date format of Flask's default provider.
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if ORJSON_AVAILABLE else 0
+
+
+def mongo_default(obj):
+    """Fallback encoder for types the JSON backend cannot serialize itself."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'to_decimal'):
+        # bson.Decimal128
+        return str(obj.to_decimal())
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize obj (which may contain ObjectId/datetime) to UTF-8 JSON bytes."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(obj, default=mongo_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; let the stdlib handle it
+            pass
+    return json.dumps(obj, default=mongo_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class MongoJSONProvider(JSONProvider):
+    """Flask JSON provider that understands MongoDB/BSON types."""
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs) -> str:
+        if not kwargs:
+            return dumps_bytes(obj).decode('utf-8')
+        kwargs.setdefault('default', mongo_default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if ORJSON_AVAILABLE and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
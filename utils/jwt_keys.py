@@ -0,0 +1,251 @@
+"""
+JWT Keys - HS256 or asymmetric (RS256/ES256) signing behind one codec
+
+By default tokens are HS256 with JWT_SECRET_KEY, as before. With
+``JWT_ALGORITHM=RS256`` (or ``ES256``) tokens are signed with a private key
+and verified with public keys only. Any worker or edge service can then
+validate tokens without holding the signing secret and without a database
+round trip.
+
+    JWT_ALGORITHM           HS256 (default), RS256 or ES256
+    JWT_PRIVATE_KEY_FILE    signing key, PEM (default: bundled jwt_private_key.pem, see below);
+                            set it to an empty string on verify-only workers
+    JWT_PUBLIC_KEY_FILES    comma-separated PEM public keys accepted for
+                            verification (default: bundled jwt_public_key.pem)
+    JWT_JWKS_URL            optional JWKS to load verification keys from
+                            (e.g. the auth service's /.well-known/jwks.json)
+    JWT_ALLOW_BUNDLED_KEYS  true to accept the bundled key pair (default false)
+
+The bundled jwt_private_key.pem is committed to the repository, so anyone
+can sign tokens with it. In RS256/ES256 mode the process refuses to start
+while the bundled key pair is configured for signing or verification;
+generate a new pair for any real deployment. JWT_ALLOW_BUNDLED_KEYS=true
+turns the refusal into an error log, for local development only.
+
+Every asymmetric token carries a ``kid`` header: the RFC 7638 thumbprint of
+its public key. Every process derives the same kid from the same key without
+any coordination. Verification picks the key by kid, and only with that
+key's own algorithm, so an HS256 token cannot be passed off as RS256.
+
+Key rotation:
+    1. add the new public key to JWT_PUBLIC_KEY_FILES everywhere (or let
+       verifiers pick it up from JWT_JWKS_URL)
+    2. switch JWT_PRIVATE_KEY_FILE on the auth process to the new key
+    3. once the longest-lived old token has expired, drop the old public key
+
+An unknown kid triggers a JWKS re-fetch, at most once per
+JWKS_REFRESH_INTERVAL_SECONDS, so verifiers learn about new keys on their
+own.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import jwt
+
+ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256')
+JWKS_REFRESH_INTERVAL_SECONDS = 60
+JWT_ALLOW_BUNDLED_KEYS = os.getenv('JWT_ALLOW_BUNDLED_KEYS', 'false').lower() in ('1', 'true', 'yes')
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PRIVATE_KEY_FILE = os.path.join(_BASE_DIR, 'jwt_private_key.pem')
+DEFAULT_PUBLIC_KEY_FILE = os.path.join(_BASE_DIR, 'jwt_public_key.pem')
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _algorithm_for_key(key) -> str:
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if isinstance(key, (rsa.RSAPublicKey, rsa.RSAPrivateKey)):
+        return 'RS256'
+    if isinstance(key, (ec.EllipticCurvePublicKey, ec.EllipticCurvePrivateKey)):
+        if key.curve.name != 'secp256r1':
+            raise ValueError(f'ES256 needs a P-256 key, got {key.curve.name}')
+        return 'ES256'
+    raise ValueError(f'Unsupported JWT key type: {type(key).__name__}')
+
+
+def public_jwk(public_key) -> Dict[str, Any]:
+    """JWK for a public key, with ``kid`` (RFC 7638 thumbprint), ``alg`` and ``use``."""
+    from jwt.algorithms import ECAlgorithm, RSAAlgorithm
+
+    algorithm = _algorithm_for_key(public_key)
+    if algorithm == 'RS256':
+        jwk = RSAAlgorithm.to_jwk(public_key, as_dict=True)
+        required = ('e', 'kty', 'n')
+    else:
+        jwk = ECAlgorithm.to_jwk(public_key, as_dict=True)
+        required = ('crv', 'kty', 'x', 'y')
+    jwk.pop('key_ops', None)
+    canonical = json.dumps({name: jwk[name] for name in required}, separators=(',', ':'), sort_keys=True)
+    jwk['kid'] = _b64url(hashlib.sha256(canonical.encode('utf-8')).digest())
+    jwk['alg'] = algorithm
+    jwk['use'] = 'sig'
+    return jwk
+
+
+def _load_pem(path: str, private: bool):
+    from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    return load_pem_private_key(data, password=None) if private else load_pem_public_key(data)
+
+
+def _bundled_kid() -> Optional[str]:
+    """kid of the key pair committed to the repository, None if it is not on disk."""
+    if not os.path.exists(DEFAULT_PUBLIC_KEY_FILE):
+        return None
+    return public_jwk(_load_pem(DEFAULT_PUBLIC_KEY_FILE, private=False))['kid']
+
+
+class KeyRing:
+    """Signing key (optional) plus the public keys accepted for verification, by kid."""
+
+    def __init__(self, algorithm: str, private_key=None, public_keys: Optional[List[Any]] = None,
+                 jwks_url: Optional[str] = None):
+        self.algorithm = algorithm
+        self.private_key = private_key
+        self.jwks_url = jwks_url
+        self._lock = threading.Lock()
+        self._keys: Dict[str, Dict[str, Any]] = {}  # kid -> {'key', 'alg', 'jwk'}
+        self._last_jwks_fetch = 0.0
+        self.signing_kid = None
+
+        if private_key is not None:
+            if _algorithm_for_key(private_key) != algorithm:
+                raise ValueError(f'JWT_PRIVATE_KEY_FILE does not hold a {algorithm} key')
+            self.signing_kid = self._add_public_key(private_key.public_key())
+        for public_key in public_keys or []:
+            self._add_public_key(public_key)
+
+    @classmethod
+    def from_env(cls, algorithm: str) -> 'KeyRing':
+        private_path = os.getenv('JWT_PRIVATE_KEY_FILE', DEFAULT_PRIVATE_KEY_FILE)
+        public_paths = os.getenv('JWT_PUBLIC_KEY_FILES', DEFAULT_PUBLIC_KEY_FILE)
+        private_key = _load_pem(private_path, private=True) if private_path else None
+        public_keys = [_load_pem(path.strip(), private=False) for path in public_paths.split(',') if path.strip()]
+        key_ring = cls(algorithm, private_key, public_keys, os.getenv('JWT_JWKS_URL') or None)
+        key_ring._check_not_bundled()
+        return key_ring
+
+    def _check_not_bundled(self) -> None:
+        """Refuse the committed key pair: its private half is public, so tokens signed with it prove nothing."""
+        bundled_kid = _bundled_kid()
+        if bundled_kid is None or bundled_kid not in self._keys:
+            return
+        message = ('JWT key pair bundled with the repository is configured; anyone can forge tokens with it. '
+                   'Generate a new key pair and set JWT_PRIVATE_KEY_FILE / JWT_PUBLIC_KEY_FILES')
+        if not JWT_ALLOW_BUNDLED_KEYS:
+            raise RuntimeError(message)
+        print(f"❌ {message} (allowed by JWT_ALLOW_BUNDLED_KEYS, local development only)")
+
+    def _add_public_key(self, public_key) -> str:
+        jwk = public_jwk(public_key)
+        self._keys[jwk['kid']] = {'key': public_key, 'alg': jwk['alg'], 'jwk': jwk}
+        return jwk['kid']
+
+    def _refresh_from_jwks(self) -> None:
+        if not self.jwks_url:
+            return
+        with self._lock:
+            if time.time() - self._last_jwks_fetch < JWKS_REFRESH_INTERVAL_SECONDS:
+                return
+            self._last_jwks_fetch = time.time()
+        import requests
+        from jwt import PyJWK
+
+        try:
+            response = requests.get(self.jwks_url, timeout=5)
+            response.raise_for_status()
+            for jwk in response.json().get('keys', []):
+                if jwk.get('alg') in ASYMMETRIC_ALGORITHMS and jwk.get('kid'):
+                    self._keys[jwk['kid']] = {'key': PyJWK(jwk).key, 'alg': jwk['alg'], 'jwk': jwk}
+            print(f"🔑 Loaded JWT verification keys from {self.jwks_url}")
+        except Exception as e:
+            print(f"⚠️ Could not fetch JWKS from {self.jwks_url}: {e}")
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        if self.private_key is None:
+            raise RuntimeError('This process has no JWT signing key (JWT_PRIVATE_KEY_FILE)')
+        return jwt.encode(payload, self.private_key, algorithm=self.algorithm, headers={'kid': self.signing_kid})
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        kid = jwt.get_unverified_header(token).get('kid')
+        if not kid:
+            raise jwt.InvalidTokenError('Token has no key id')
+        entry = self._keys.get(kid)
+        if entry is None:
+            self._refresh_from_jwks()
+            entry = self._keys.get(kid)
+        if entry is None:
+            raise jwt.InvalidTokenError('Unknown signing key')
+        return jwt.decode(token, entry['key'], algorithms=[entry['alg']])
+
+    def jwks(self) -> Dict[str, Any]:
+        return {'keys': [entry['jwk'] for entry in self._keys.values()]}
+
+
+class TokenCodec:
+    """Encodes and verifies JWTs with either a shared secret or a KeyRing."""
+
+    def __init__(self, secret_key: str, algorithm: str = 'HS256', key_ring: Optional[KeyRing] = None):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.key_ring = key_ring
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.key_ring is not None
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        if self.key_ring is not None:
+            return self.key_ring.encode(payload)
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        if self.key_ring is not None:
+            return self.key_ring.decode(token)
+        return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+
+    def jwks(self) -> Dict[str, Any]:
+        """Public verification keys (empty in HS256 mode: there is nothing public to share)."""
+        return self.key_ring.jwks() if self.key_ring is not None else {'keys': []}
+
+
+_key_ring: Optional[KeyRing] = None
+_key_ring_lock = threading.Lock()
+
+
+def configured_algorithm() -> str:
+    return (os.getenv('JWT_ALGORITHM') or 'HS256').upper()
+
+
+def get_key_ring() -> Optional[KeyRing]:
+    """Process-wide KeyRing in RS256/ES256 mode, None in HS256 mode."""
+    global _key_ring
+    algorithm = configured_algorithm()
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        return None
+    if _key_ring is None:
+        with _key_ring_lock:
+            if _key_ring is None:
+                _key_ring = KeyRing.from_env(algorithm)
+                print(f"🔑 JWT {algorithm} mode, signing kid: {_key_ring.signing_kid or 'none (verify only)'}")
+    return _key_ring
+
+
+def token_codec(secret_key: str) -> TokenCodec:
+    """Codec for the configured JWT_ALGORITHM (HS256 falls back to ``secret_key``)."""
+    key_ring = get_key_ring()
+    if key_ring is not None:
+        return TokenCodec(secret_key, key_ring.algorithm, key_ring)
+    return TokenCodec(secret_key, 'HS256')
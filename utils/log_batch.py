@@ -0,0 +1,317 @@
+"""
+Log Batch Utility
+
+Applies a mixed batch of patient log entries (sleep logs, kick sessions,
+food entries, tablet checks, mood check-ins) in one atomic update of the
+patient document, for the patient app's offline replay.
+
+Each item is ``{"type": ..., "idempotency_key": ..., "data": {...}}`` where
+``data`` carries the same fields as the matching single-entry route. Entries
+are stored with their ``idempotency_key``; replaying a batch (or an item
+that was already saved) reports it as ``duplicate`` instead of pushing it
+again. Items without a key get one derived from their type and data.
+
+Flow:
+    1. validate every item and build its entry (invalid items are reported,
+       the rest are still applied)
+    2. read the keys already stored in the target arrays (one projected find)
+    3. push all new entries with one update_one whose filter requires none
+       of the keys to be present yet; if a concurrent replay won the race the
+       filter misses and steps 2-3 are retried
+"""
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.delta_sync import stamp
+
+MAX_BATCH_SIZE = 200
+MAX_APPLY_ATTEMPTS = 3
+IDEMPOTENCY_FIELD = 'idempotency_key'
+
+
+class LogBatchError(ValueError):
+    """Raised when the batch as a whole is malformed."""
+
+
+class LogItemError(ValueError):
+    """Raised when a single batch item is invalid."""
+
+
+def _require(data: Dict[str, Any], fields: List[str]):
+    for field in fields:
+        if data.get(field) in (None, ''):
+            raise LogItemError(f'Missing required field: {field}')
+
+
+def build_sleep_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Same shape as /save-sleep-log."""
+    _require(data, ['startTime', 'endTime', 'totalSleep', 'sleepRating'])
+    return {
+        'startTime': data['startTime'],
+        'endTime': data['endTime'],
+        'totalSleep': data['totalSleep'],
+        'smartAlarmEnabled': data.get('smartAlarmEnabled', False),
+        'optimalWakeUpTime': data.get('optimalWakeUpTime', ''),
+        'sleepRating': data['sleepRating'],
+        'notes': data.get('notes', ''),
+        'timestamp': data.get('timestamp', datetime.now().isoformat()),
+        'createdAt': datetime.now(),
+    }
+
+
+def build_kick_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Same shape as /save-kick-session."""
+    _require(data, ['kickCount', 'sessionDuration'])
+    return {
+        'kickCount': data['kickCount'],
+        'sessionDuration': data['sessionDuration'],
+        'sessionStartTime': data.get('sessionStartTime'),
+        'sessionEndTime': data.get('sessionEndTime'),
+        'averageKicksPerMinute': data.get('averageKicksPerMinute', 0),
+        'notes': data.get('notes', ''),
+        'timestamp': data.get('timestamp', datetime.now().isoformat()),
+        'createdAt': datetime.now(),
+    }
+
+
+def build_food_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Same shape as /nutrition/save-food-entry."""
+    food_input = data.get('food_input') or data.get('food_details', '')
+    if not food_input:
+        raise LogItemError('Food input is required')
+    return {
+        'type': 'basic_entry',
+        'food_input': food_input,
+        'food_details': food_input,
+        'pregnancy_week': data.get('pregnancy_week', 1),
+        'meal_type': data.get('meal_type', ''),
+        'notes': data.get('notes', ''),
+        'transcribed_text': data.get('transcribed_text', ''),
+        'nutritional_breakdown': data.get('nutritional_breakdown', {}),
+        'gpt4_analysis': data.get('gpt4_analysis', {}),
+        'timestamp': data.get('timestamp', datetime.now().isoformat()),
+        'created_at': datetime.now()
+    }
+
+
+def build_tablet_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Same shape as /medication/save-tablet-tracking."""
+    _require(data, ['tablet_name', 'tablet_taken_today'])
+    return {
+        'tablet_name': data['tablet_name'],
+        'tablet_taken_today': data['tablet_taken_today'],
+        'is_prescribed': data.get('is_prescribed', False),
+        'notes': data.get('notes', ''),
+        'date_taken': data.get('date_taken', ''),
+        'time_taken': data.get('time_taken', ''),
+        'type': data.get('type', 'daily_tracking'),
+        'timestamp': data.get('timestamp', datetime.now().isoformat())
+    }
+
+
+def build_mood_entry(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Same shape as /mental-health/mood-checkin (patient_id is added later)."""
+    _require(data, ['mood'])
+    date_str = data.get('date')
+    if date_str:
+        try:
+            checkin_date = datetime.strptime(date_str, '%d/%m/%Y').date()
+        except ValueError:
+            raise LogItemError('Invalid date format. Use DD/MM/YYYY')
+    else:
+        checkin_date = datetime.now().date()
+    return {
+        "mood": data['mood'],
+        "note": data.get('note', ''),
+        "date": checkin_date.isoformat(),
+        "timestamp": datetime.now().isoformat(),
+        "type": "mood_checkin",
+        "created_at": datetime.now().isoformat()
+    }
+
+
+# type -> (target array, entry builder)
+LOG_TYPES: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    'sleep': ('sleep_logs', build_sleep_entry),
+    'kick': ('kick_count_logs', build_kick_entry),
+    'food': ('food_data', build_food_entry),
+    'tablet': ('medication_daily_tracking', build_tablet_entry),
+    'mood': ('mental_health_logs', build_mood_entry),
+}
+
+
+def derive_idempotency_key(item_type: str, data: Dict[str, Any]) -> str:
+    """Stable key for items sent without one, so identical replays collapse."""
+    raw = json.dumps({'type': item_type, 'data': data}, sort_keys=True, default=str)
+    return 'auto-' + hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def validate_batch(items: Any) -> List[Dict[str, Any]]:
+    """
+    Validate every item and build its entry.
+
+    Returns:
+        One dict per item with index, type, idempotency_key, and either
+        ``array``/``entry`` or ``error``
+
+    Raises:
+        LogBatchError: if ``items`` is not a non-empty list within MAX_BATCH_SIZE
+    """
+    if not isinstance(items, list) or not items:
+        raise LogBatchError('items must be a non-empty list')
+    if len(items) > MAX_BATCH_SIZE:
+        raise LogBatchError(f'A batch can contain at most {MAX_BATCH_SIZE} items')
+
+    prepared = []
+    for index, item in enumerate(items):
+        result = {'index': index}
+        prepared.append(result)
+        if not isinstance(item, dict):
+            result['error'] = 'Item must be an object'
+            continue
+
+        item_type = item.get('type')
+        data = item.get('data') or {}
+        result['type'] = item_type
+        key = item.get(IDEMPOTENCY_FIELD)
+        if key is not None and not isinstance(key, str):
+            key = str(key)
+        result[IDEMPOTENCY_FIELD] = key or derive_idempotency_key(str(item_type), data)
+
+        if item_type not in LOG_TYPES:
+            result['error'] = f"Unknown type: {item_type}. Expected one of: {', '.join(LOG_TYPES)}"
+            continue
+        if not isinstance(data, dict):
+            result['error'] = 'data must be an object'
+            continue
+
+        array, build = LOG_TYPES[item_type]
+        try:
+            entry = build(data)
+        except LogItemError as e:
+            result['error'] = str(e)
+            continue
+        entry[IDEMPOTENCY_FIELD] = result[IDEMPOTENCY_FIELD]
+        result['array'] = array
+        result['entry'] = entry
+    return prepared
+
+
+def _existing_state(collection, patient_id: str, arrays: List[str]) -> Optional[Dict[str, Any]]:
+    """Read the stored idempotency keys (and mood check-in dates) for the target arrays."""
+    projection = {'_id': 0, 'email': 1}
+    for array in arrays:
+        projection[f'{array}.{IDEMPOTENCY_FIELD}'] = 1
+    if 'mental_health_logs' in arrays:
+        projection['mental_health_logs.type'] = 1
+        projection['mental_health_logs.date'] = 1
+    patient = collection.find_one({'patient_id': patient_id}, projection)
+    if patient is None:
+        return None
+
+    keys = {}
+    for array in arrays:
+        keys[array] = {entry.get(IDEMPOTENCY_FIELD) for entry in patient.get(array) or [] if isinstance(entry, dict)}
+    mood_dates = {
+        entry.get('date') for entry in patient.get('mental_health_logs') or []
+        if isinstance(entry, dict) and entry.get('type') == 'mood_checkin'
+    }
+    return {'email': patient.get('email'), 'keys': keys, 'mood_dates': mood_dates}
+
+
+def apply_log_batch(collection, mental_health_collection, patient_id: str,
+                    prepared: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Apply validated items to the patient document.
+
+    Returns:
+        None if the patient does not exist, otherwise
+        ``{'results': [...], 'created': int, 'email': str}`` where every
+        result has index, type, idempotency_key and a status of
+        created / duplicate / conflict / invalid.
+    """
+    statuses: Dict[int, Tuple[str, Optional[str]]] = {}
+    for item in prepared:
+        if 'error' in item:
+            statuses[item['index']] = ('invalid', item['error'])
+
+    valid = [item for item in prepared if 'entry' in item]
+    arrays = sorted({item['array'] for item in valid})
+    email = None
+
+    for _ in range(MAX_APPLY_ATTEMPTS):
+        state = _existing_state(collection, patient_id, arrays)
+        if state is None:
+            return None
+        email = state['email']
+
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        seen_keys = {array: set(keys) for array, keys in state['keys'].items()}
+        mood_dates = set(state['mood_dates'])
+        for item in valid:
+            if item['index'] in statuses:
+                continue
+            array, key = item['array'], item[IDEMPOTENCY_FIELD]
+            if key in seen_keys[array]:
+                statuses[item['index']] = ('duplicate', 'Already saved')
+                continue
+            if array == 'mental_health_logs':
+                if item['entry']['date'] in mood_dates:
+                    statuses[item['index']] = ('conflict', 'Already checked in for this date')
+                    continue
+                mood_dates.add(item['entry']['date'])
+                item['entry']['patient_id'] = patient_id
+            seen_keys[array].add(key)
+            pending.setdefault(array, []).append(item)
+
+        if not pending:
+            break
+
+        # Entries are pushed only if none of their keys landed in the meantime
+        query: Dict[str, Any] = {'patient_id': patient_id}
+        for array, items in pending.items():
+            query[f'{array}.{IDEMPOTENCY_FIELD}'] = {'$nin': [item[IDEMPOTENCY_FIELD] for item in items]}
+        increments = {'version': 1}
+        if 'mental_health_logs' in pending:
+            increments['mental_health_logs_count'] = len(pending['mental_health_logs'])
+        update = {
+            '$push': {array: {'$each': [stamp(item['entry']) for item in items]} for array, items in pending.items()},
+            '$set': {'last_updated': datetime.now()},
+            '$inc': increments,
+        }
+
+        result = collection.update_one(query, update)
+        if result.matched_count:
+            for items in pending.values():
+                for item in items:
+                    statuses[item['index']] = ('created', None)
+            moods = pending.get('mental_health_logs')
+            if moods and mental_health_collection is not None:
+                # Keep the standalone collection in step, as the single-entry route does
+                mental_health_collection.insert_many([dict(item['entry']) for item in moods])
+                # Bump again so no ETag taken between the push and the insert outlives it
+                collection.update_one({'patient_id': patient_id}, {'$inc': {'version': 1}})
+            break
+        # A concurrent request pushed some of these keys first; re-read and retry
+
+    results = []
+    for item in prepared:
+        status, message = statuses.get(item['index'], ('conflict', 'Could not apply after concurrent updates, retry'))
+        result = {
+            'index': item['index'],
+            'type': item.get('type'),
+            IDEMPOTENCY_FIELD: item.get(IDEMPOTENCY_FIELD),
+            'status': status,
+        }
+        if message:
+            result['message'] = message
+        results.append(result)
+
+    return {
+        'results': results,
+        'created': sum(1 for result in results if result['status'] == 'created'),
+        'email': email,
+    }
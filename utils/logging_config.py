@@ -0,0 +1,178 @@
+"""
+Logging - leveled, sampled, asynchronous application logs
+
+Request handlers used to ``print`` full request bodies, OCR text and JWT
+payloads (often through ``json.dumps(indent=2)``) on every call. That is
+synchronous stdout I/O and serialization on the request thread. Hot paths now
+log through ``get_logger``:
+
+    - records go through a ``QueueHandler`` into an in-memory queue; one
+      background ``QueueListener`` thread formats and writes them, so a slow
+      stdout (or a full pipe) never blocks a request
+    - when the queue is full, records are dropped and counted instead of
+      blocking (``dropped_records()``)
+    - DEBUG records can be sampled (LOG_SAMPLE_RATE); INFO and above are
+      always kept
+    - request/OCR/token payload dumps go through ``log_payload``, which is a
+      no-op unless LOG_DEBUG_PAYLOADS is on, so the payload is not even
+      serialized by default
+
+    LOG_LEVEL              DEBUG, INFO (default), WARNING, ERROR
+    LOG_FORMAT             text (default) or json (one object per line)
+    LOG_SAMPLE_RATE        fraction of DEBUG records kept (default 1.0)
+    LOG_DEBUG_PAYLOADS     "true" to dump payloads at DEBUG (default off;
+                           may contain personal data)
+    LOG_PAYLOAD_MAX_CHARS  truncate dumped payloads (default 2000)
+    LOG_QUEUE_SIZE         records buffered for the writer (default 10000)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+LOG_LEVEL = 'INFO'
+LOG_FORMAT = 'text'
+LOG_SAMPLE_RATE = 1.0
+LOG_DEBUG_PAYLOADS = False
+LOG_PAYLOAD_MAX_CHARS = 2000
+LOG_QUEUE_SIZE = 10000
+
+
+def _load_settings() -> None:
+    # Read on the first get_logger() call, which can happen at import time (jwt_otp_utils),
+    # so the apps load .env before importing any project module
+    global LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE, LOG_DEBUG_PAYLOADS, LOG_PAYLOAD_MAX_CHARS, LOG_QUEUE_SIZE
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+    LOG_DEBUG_PAYLOADS = os.getenv('LOG_DEBUG_PAYLOADS', 'false').lower() in ('1', 'true', 'yes')
+    LOG_PAYLOAD_MAX_CHARS = int(os.getenv('LOG_PAYLOAD_MAX_CHARS', '2000'))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+
+ROOT_LOGGER_NAME = 'patient_alert'
+
+_STANDARD_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every INFO+ record and a ``rate`` fraction of DEBUG records."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, plus any ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: 'queue.Queue'):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(stream=None) -> logging.Logger:
+    """Set up the queue handler and background writer once per process; returns the app root logger."""
+    global _listener, _queue_handler
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    with _configure_lock:
+        if _listener is not None:
+            return root
+        _load_settings()
+
+        writer = logging.StreamHandler(stream or sys.stdout)
+        if LOG_FORMAT == 'json':
+            writer.setFormatter(JSONFormatter())
+        else:
+            writer.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+        _listener = QueueListener(_queue_handler.queue, writer, respect_handler_level=True)
+        _listener.start()
+        # Flush whatever is still queued when the process exits
+        atexit.register(_listener.stop)
+
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.addHandler(_queue_handler)
+        root.propagate = False
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the application root (configured on first use)."""
+    configure_logging()
+    if name.startswith(ROOT_LOGGER_NAME):
+        return logging.getLogger(name)
+    return logging.getLogger(f'{ROOT_LOGGER_NAME}.{name}')
+
+
+def dropped_records() -> int:
+    """Records dropped because the writer could not keep up."""
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def payload_logging_enabled(logger: logging.Logger) -> bool:
+    return LOG_DEBUG_PAYLOADS and logger.isEnabledFor(logging.DEBUG)
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any) -> None:
+    """
+    Dump a request body, OCR text or token payload at DEBUG.
+
+    Does nothing (and does not serialize ``payload``) unless LOG_DEBUG_PAYLOADS is on.
+    """
+    if not payload_logging_enabled(logger):
+        return
+    if isinstance(payload, str):
+        text = payload
+    else:
+        text = json.dumps(payload, default=str, ensure_ascii=False)
+    if len(text) > LOG_PAYLOAD_MAX_CHARS:
+        text = f'{text[:LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)'
+    logger.debug('%s: %s', message, text)
@@ -0,0 +1,308 @@
+"""
+Metrics - per-route latency histograms and dependency timers
+
+Everything is kept in process memory and exposed in the Prometheus text
+format on ``/metrics``:
+
+    http_requests_total{endpoint,method,status}
+    http_request_duration_seconds{endpoint,method}          histogram
+    http_response_size_bytes{endpoint,method}               histogram
+    dependency_call_duration_seconds{dependency,operation,outcome}   histogram
+
+``endpoint`` is the Flask endpoint name (never the raw path), so patient IDs
+and other URL parameters cannot blow up the number of series.
+
+Dependencies are timed with ``timed(dependency, operation)``, usable as a
+context manager or a decorator, around OpenAI, Qdrant, SMTP and OCR calls.
+Mongo commands are timed by a pymongo ``CommandListener`` registered with
+``register_mongo_listener()`` before the ``MongoClient`` is created.
+
+A recording is a bisect and a few integer additions under one lock per
+metric; ``benchmark_metrics_overhead.py`` measures the cost per request.
+
+    METRICS_ENABLED   set to "false" to turn the middleware off
+    METRICS_TOKEN     if set, /metrics requires "Authorization: Bearer <token>"
+"""
+
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}'
+                for labels, value in sorted(values)]
+
+
+class Gauge:
+    """Value that can go up and down (queue depth, requests in flight), with labels."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, labels: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}'
+                for labels, value in sorted(values)]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str], buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last slot is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, labels: Tuple[str, ...]) -> Optional[Dict[str, object]]:
+        """Counts for one series (used by the benchmark and the admin views)."""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                return None
+            return {'buckets': list(series[0]), 'sum': series[1], 'count': series[2]}
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        lines = []
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}')
+            inf = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_format_labels(self.label_names, labels, inf)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, labels)} {repr(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Iterable[str]) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name: str, help_text: str, label_names: Iterable[str]) -> Gauge:
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Iterable[str],
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS_TOTAL = REGISTRY.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('endpoint', 'method'))
+RESPONSE_SIZE = REGISTRY.histogram(
+    'http_response_size_bytes', 'HTTP response body size', ('endpoint', 'method'), SIZE_BUCKETS)
+DEPENDENCY_DURATION = REGISTRY.histogram(
+    'dependency_call_duration_seconds', 'Latency of calls to Mongo, OpenAI, Qdrant, SMTP and OCR',
+    ('dependency', 'operation', 'outcome'))
+
+
+def observe_dependency(dependency: str, operation: str, seconds: float, ok: bool = True) -> None:
+    DEPENDENCY_DURATION.observe((dependency, operation, 'ok' if ok else 'error'), seconds)
+
+
+class timed(ContextDecorator):
+    """
+    Time a dependency call:
+
+        with timed('openai', 'chat.completions'):
+            response = client.chat.completions.create(...)
+
+        @timed('smtp', 'send_message')
+        def send(...): ...
+
+    An exception escaping the block is recorded with outcome="error" and re-raised.
+    """
+
+    def __init__(self, dependency: str, operation: str):
+        self.dependency = dependency
+        self.operation = operation
+        self._started = 0.0
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own timer, so calls may overlap across threads
+        return timed(self.dependency, self.operation)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe_dependency(self.dependency, self.operation, time.perf_counter() - self._started, exc_type is None)
+        return False
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Records every Mongo command in dependency_call_duration_seconds{dependency="mongo"}."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe_dependency('mongo', event.command_name, event.duration_micros / 1e6, True)
+
+    def failed(self, event):
+        observe_dependency('mongo', event.command_name, event.duration_micros / 1e6, False)
+
+
+_mongo_listener_registered = False
+
+
+def register_mongo_listener() -> None:
+    """Register the Mongo command timer (affects MongoClients created afterwards)."""
+    global _mongo_listener_registered
+    if _mongo_listener_registered or not METRICS_ENABLED:
+        return
+    monitoring.register(MongoCommandTimer())
+    _mongo_listener_registered = True
+
+
+def _metrics_authorized() -> bool:
+    if not METRICS_TOKEN:
+        return True
+    header = request.headers.get('Authorization', '')
+    return hmac.compare_digest(header, f'Bearer {METRICS_TOKEN}')
+
+
+def init_metrics(app, path: str = '/metrics') -> None:
+    """Install the request-timing middleware and the ``/metrics`` route on ``app``."""
+    if not METRICS_ENABLED:
+        print("⚠️ Metrics disabled (METRICS_ENABLED=false)")
+        return
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        REQUEST_DURATION.observe((endpoint, method), time.perf_counter() - started)
+        REQUESTS_TOTAL.inc((endpoint, method, str(response.status_code)))
+        size = response.content_length
+        if size is not None:
+            RESPONSE_SIZE.observe((endpoint, method), size)
+        return response
+
+    def metrics_endpoint():
+        if not _metrics_authorized():
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+        return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    app.add_url_rule(path, 'metrics', metrics_endpoint, methods=['GET'])
+    print(f"📈 Metrics enabled on {path}")
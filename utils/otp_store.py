@@ -0,0 +1,177 @@
+"""
+OTP Store - hashed, self-expiring OTP challenges
+
+OTPs used to be written onto patient documents (``otp``, ``reset_otp``), as
+``is_otp_document`` rows in the doctor collection, and checked for expiry at
+read time. They now live in a dedicated ``otp_challenges`` collection:
+
+    _id          "<purpose>:<email>"  (one live challenge per email and purpose)
+    otp_hash     HMAC-SHA256 of the OTP (keyed with OTP_HASH_KEY, falling back
+                 to JWT_SECRET_KEY) - the OTP itself is never stored
+    attempts     guesses so far (reserved atomically before comparing); the
+                 challenge is burned at OTP_MAX_ATTEMPTS
+    data         optional payload released on success (e.g. pending signup)
+    expires_at   TTL index - Mongo deletes the challenge, no sweeps needed
+
+Issuing a new OTP replaces the previous challenge. A correct OTP is consumed
+atomically (``find_one_and_delete``), so the same OTP cannot be used twice.
+
+Sending is rate limited per email and per client IP with token buckets (see
+utils/rate_limit.py):
+
+    OTP_EMAIL_BURST / OTP_EMAIL_REFILL_SECONDS   default 3 sends, then 1 per minute
+    OTP_IP_BURST / OTP_IP_REFILL_SECONDS         default 20 sends, then 1 per 6 seconds
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import string
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from utils.rate_limit import TokenBucketLimiter, client_ip, rate_limited_response
+
+OTP_LENGTH = 6
+OTP_TTL_MINUTES = int(os.getenv('OTP_TTL_MINUTES', '10'))
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', '5'))
+
+OTP_EMAIL_BURST = int(os.getenv('OTP_EMAIL_BURST', '3'))
+OTP_EMAIL_REFILL_SECONDS = float(os.getenv('OTP_EMAIL_REFILL_SECONDS', '60'))
+OTP_IP_BURST = int(os.getenv('OTP_IP_BURST', '20'))
+OTP_IP_REFILL_SECONDS = float(os.getenv('OTP_IP_REFILL_SECONDS', '6'))
+
+# Purposes
+PATIENT_SIGNUP = 'patient_signup'
+PATIENT_PASSWORD_RESET = 'patient_password_reset'
+DOCTOR_PASSWORD_RESET = 'doctor_password_reset'
+
+
+def _hash_key() -> bytes:
+    key = os.getenv('OTP_HASH_KEY') or os.getenv('JWT_SECRET_KEY') or 'otp-hash-key-change-this'
+    return key.encode('utf-8')
+
+
+def hash_otp(otp: str, challenge_id: str) -> str:
+    """HMAC of the OTP bound to its challenge, so hashes cannot be replayed across challenges."""
+    message = f'{challenge_id}\n{otp}'.encode('utf-8')
+    return hmac.new(_hash_key(), message, hashlib.sha256).hexdigest()
+
+
+def ensure_otp_indexes(collection) -> None:
+    """TTL index removing challenges when they expire."""
+    collection.create_index('expires_at', expireAfterSeconds=0)
+
+
+class OTPStore:
+    """Issue and verify OTP challenges."""
+
+    def __init__(self, get_collection: Callable[[], Any]):
+        self._get_collection = get_collection
+
+    @staticmethod
+    def challenge_id(email: str, purpose: str) -> str:
+        return f'{purpose}:{email.strip().lower()}'
+
+    def issue(self, email: str, purpose: str, data: Optional[Dict[str, Any]] = None,
+              ttl_minutes: int = OTP_TTL_MINUTES) -> str:
+        """Create (or replace) the challenge for ``email``/``purpose``; returns the plain OTP to send."""
+        collection = self._get_collection()
+        if collection is None:
+            raise RuntimeError('Database not connected')
+        otp = ''.join(secrets.choice(string.digits) for _ in range(OTP_LENGTH))
+        challenge_id = self.challenge_id(email, purpose)
+        now = datetime.utcnow()
+        collection.replace_one({'_id': challenge_id}, {
+            'email': email.strip().lower(),
+            'purpose': purpose,
+            'otp_hash': hash_otp(otp, challenge_id),
+            'attempts': 0,
+            'data': data,
+            'created_at': now,
+            'expires_at': now + timedelta(minutes=ttl_minutes),
+        }, upsert=True)
+        return otp
+
+    def reissue(self, email: str, purpose: str) -> Optional[str]:
+        """New OTP for a live challenge, keeping its data; None if there is none."""
+        pending = self.get(email, purpose)
+        if pending is None:
+            return None
+        return self.issue(email, purpose, pending.get('data'))
+
+    def discard(self, email: str, purpose: str) -> None:
+        """Drop the challenge (e.g. when the OTP email could not be sent)."""
+        collection = self._get_collection()
+        if collection is not None:
+            collection.delete_one({'_id': self.challenge_id(email, purpose)})
+
+    def get(self, email: str, purpose: str) -> Optional[Dict[str, Any]]:
+        """The live challenge (without consuming it), or None."""
+        collection = self._get_collection()
+        if collection is None:
+            return None
+        challenge = collection.find_one({'_id': self.challenge_id(email, purpose)})
+        if challenge is None or challenge['expires_at'] <= datetime.utcnow():
+            # The TTL monitor runs about once a minute; treat lapsed challenges as gone
+            return None
+        return challenge
+
+    def verify(self, email: str, purpose: str, otp: str) -> Dict[str, Any]:
+        """
+        Check an OTP and consume the challenge when it matches.
+
+        Returns:
+            {'success': True, 'data': ...} or {'success': False, 'error': ..., 'code': ...}
+            with code one of NOT_FOUND, EXPIRED, TOO_MANY_ATTEMPTS, INVALID_OTP
+        """
+        collection = self._get_collection()
+        if collection is None:
+            return {'success': False, 'error': 'Database not connected', 'code': 'NOT_FOUND'}
+        challenge_id = self.challenge_id(email, purpose)
+        # Reserve the attempt before comparing, so concurrent guesses cannot all
+        # pass the attempts check before any of them is counted
+        challenge = collection.find_one_and_update(
+            {'_id': challenge_id, 'attempts': {'$lt': OTP_MAX_ATTEMPTS}},
+            {'$inc': {'attempts': 1}},
+        )
+        if challenge is None:
+            challenge = collection.find_one({'_id': challenge_id}, {'expires_at': 1})
+            if challenge is None:
+                return {'success': False, 'error': 'No pending OTP for this email', 'code': 'NOT_FOUND'}
+            if challenge['expires_at'] <= datetime.utcnow():
+                return {'success': False, 'error': 'OTP has expired', 'code': 'EXPIRED'}
+            return {'success': False, 'error': 'Too many incorrect attempts, request a new OTP',
+                    'code': 'TOO_MANY_ATTEMPTS'}
+        if challenge['expires_at'] <= datetime.utcnow():
+            return {'success': False, 'error': 'OTP has expired', 'code': 'EXPIRED'}
+
+        if not hmac.compare_digest(hash_otp(str(otp or ''), challenge_id), challenge['otp_hash']):
+            return {'success': False, 'error': 'Invalid OTP', 'code': 'INVALID_OTP'}
+
+        consumed = collection.find_one_and_delete({'_id': challenge_id, 'otp_hash': challenge['otp_hash']})
+        if consumed is None:
+            # Used by a concurrent request or replaced in the meantime
+            return {'success': False, 'error': 'OTP is no longer valid, request a new one', 'code': 'NOT_FOUND'}
+        return {'success': True, 'data': consumed.get('data')}
+
+
+class OTPRateLimiter:
+    """Per-email and per-IP token buckets for OTP sends."""
+
+    def __init__(self, get_collection: Optional[Callable[[], Any]] = None):
+        self.by_email = TokenBucketLimiter('otp_email', OTP_EMAIL_BURST, OTP_EMAIL_REFILL_SECONDS, get_collection)
+        self.by_ip = TokenBucketLimiter('otp_ip', OTP_IP_BURST, OTP_IP_REFILL_SECONDS, get_collection)
+
+    def check(self, email: str):
+        """None if this request may send an OTP to ``email``, otherwise a 429 response."""
+        allowed, retry_after = self.by_ip.take(client_ip())
+        if not allowed:
+            print(f"🚫 OTP rate limit hit for IP {client_ip()}")
+            return rate_limited_response(retry_after, 'Too many OTP requests from this network, please try again later')
+        allowed, retry_after = self.by_email.take((email or '').strip().lower())
+        if not allowed:
+            print(f"🚫 OTP rate limit hit for {email}")
+            return rate_limited_response(retry_after, 'Too many OTP requests for this email, please try again later')
+        return None
@@ -0,0 +1,181 @@
+"""
+Password Hashing - bcrypt on a bounded worker pool
+
+bcrypt is deliberately slow (~250 ms at cost 12) and releases the GIL while
+it runs. Running it inline on every request thread lets a burst of logins
+oversubscribe the CPU so that every login slows down together. Instead,
+hashing and verification run on a small thread pool sized to the CPU count,
+and admission is bounded:
+
+    PASSWORD_HASH_WORKERS    pool threads (default: CPU count)
+    PASSWORD_HASH_MAX_QUEUE  calls allowed to wait for a worker (default: 8 per worker)
+    BCRYPT_ROUNDS            cost for new hashes (default 12, bcrypt's own default)
+
+When every worker is busy and the queue is full, calls raise
+``PasswordHasherBusy`` straight away. Routes answer with 429 and a
+Retry-After header (``password_busy_response``) instead of queueing
+requests until they time out.
+
+Hashes whose cost differs from BCRYPT_ROUNDS keep working. After a
+successful login, ``verify_and_rehash`` returns a new hash at the
+configured cost so the caller can store it, which moves accounts to the
+new cost transparently.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Union
+
+import bcrypt
+from flask import jsonify
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv('PASSWORD_HASH_MAX_QUEUE', str(PASSWORD_HASH_WORKERS * 8)))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', '1'))
+
+if not 4 <= BCRYPT_ROUNDS <= 31:
+    raise ValueError('BCRYPT_ROUNDS must be between 4 and 31')
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing pool and its queue are full."""
+
+    def __init__(self, retry_after: int = PASSWORD_HASH_RETRY_AFTER):
+        super().__init__('Too many password checks in progress, please retry shortly')
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """Runs bcrypt on a fixed-size pool with a bounded number of waiting calls."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        # Running + waiting calls; a non-blocking acquire is the admission check
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """bcrypt hash of ``password`` at the configured cost."""
+        return self._run(_hash, _to_bytes(password), self.rounds)
+
+    def verify(self, password: str, hashed: Union[str, bytes]) -> bool:
+        """True if ``password`` matches ``hashed`` (False for malformed hashes)."""
+        if not password or not hashed:
+            return False
+        return self._run(_check, _to_bytes(password), _to_bytes(hashed))
+
+    def needs_rehash(self, hashed: Union[str, bytes]) -> bool:
+        """True if ``hashed`` was made with a different cost than the configured one."""
+        cost = hash_cost(hashed)
+        return cost is not None and cost != self.rounds
+
+    def verify_and_rehash(self, password: str, hashed: Union[str, bytes]) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a login and, if its hash uses an outdated cost, compute a new one.
+
+        Returns:
+            (is_valid, new_hash) - new_hash is None unless the caller should store it
+        """
+        if not self.verify(password, hashed):
+            return False, None
+        if not self.needs_rehash(hashed):
+            return True, None
+        try:
+            return True, self.hash(password)
+        except PasswordHasherBusy:
+            # The login itself succeeded; upgrade the hash on a quieter login
+            return True, None
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'rounds': self.rounds,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+        }
+
+
+def _to_bytes(value: Union[str, bytes]) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+
+def _hash(password: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError as e:
+        print(f"Password verification error: {e}")
+        return False
+
+
+def hash_cost(hashed: Union[str, bytes]) -> Optional[int]:
+    """Cost factor of a bcrypt hash (``$2b$12$...`` -> 12), or None if it is not one."""
+    if isinstance(hashed, bytes):
+        hashed = hashed.decode('utf-8', 'replace')
+    parts = str(hashed or '').split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide hasher (created on first use)."""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
+
+
+def hash_password(password: str) -> str:
+    """Hash a password on the shared pool. Raises PasswordHasherBusy when saturated."""
+    return get_password_hasher().hash(password)
+
+
+def verify_password(password: str, hashed: Union[str, bytes]) -> bool:
+    """Check a password on the shared pool. Raises PasswordHasherBusy when saturated."""
+    return get_password_hasher().verify(password, hashed)
+
+
+def verify_and_rehash(password: str, hashed: Union[str, bytes]) -> Tuple[bool, Optional[str]]:
+    """See PasswordHasher.verify_and_rehash."""
+    return get_password_hasher().verify_and_rehash(password, hashed)
+
+
+def password_busy_response(error: PasswordHasherBusy):
+    """429 response for a saturated hashing pool."""
+    response = jsonify({'success': False, 'error': str(error)})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
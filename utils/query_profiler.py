@@ -0,0 +1,401 @@
+"""
+Query Profiler - slow Mongo operations and query plans per query shape
+
+A pymongo ``CommandListener`` that sees every command the apps send and
+aggregates them by *query shape*: the command, namespace and the filter with
+every value replaced by ``"?"``, e.g.
+
+    find patients_db.Patient_test {"filter": {"patient_id": "?"}}
+
+For each shape it keeps count, total/avg/max/p95 latency and how many
+executions crossed QUERY_PROFILER_SLOW_MS. Slow executions are also kept in
+a short list of recent slow operations.
+
+Latency alone does not say *why* a query is slow, so a sample of commands
+(QUERY_PROFILER_EXPLAIN_RATE, plus the first execution of every shape and
+every slow one) is re-run through ``explain`` with ``executionStats`` to record
+``docsExamined``, ``keysExamined``, ``nReturned`` and the winning plan
+(``COLLSCAN`` vs ``IXSCAN`` on which index). Explains run on a background
+thread, never on the request thread, and the listener ignores its own
+explain commands.
+
+The apps call ``init_query_profiler(app, get_client)``, which registers the
+listener (before the MongoClient is created) and serves the report on
+
+    GET    /admin/query-profile     shapes sorted by total time, recent slow ops
+    DELETE /admin/query-profile     reset the counters
+
+guarded by ``Authorization: Bearer <ADMIN_TOKEN>``; without ADMIN_TOKEN the
+endpoint only answers requests from localhost.
+
+In tests against a local mongod, attach a profiler to a client directly:
+
+    profiler = QueryProfiler(slow_ms=0, explain_rate=1.0)
+    client = MongoClient('mongodb://localhost:27017', event_listeners=[profiler])
+    profiler.set_client(lambda: client)
+    client.test.patients.find_one({'patient_id': 'PAT1'})
+    profiler.flush()
+    assert not profiler.report()['shapes'][0]['collscan']
+
+    QUERY_PROFILER_ENABLED        "false" to skip registration (default on)
+    QUERY_PROFILER_SLOW_MS        slow threshold in ms (default 100)
+    QUERY_PROFILER_EXPLAIN_RATE   fraction of commands explained (default 0.01)
+"""
+
+import hmac
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import jsonify, request
+from pymongo import monitoring
+
+QUERY_PROFILER_ENABLED = os.getenv('QUERY_PROFILER_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+QUERY_PROFILER_SLOW_MS = float(os.getenv('QUERY_PROFILER_SLOW_MS', '100'))
+QUERY_PROFILER_EXPLAIN_RATE = float(os.getenv('QUERY_PROFILER_EXPLAIN_RATE', '0.01'))
+
+MAX_SHAPES = 1000
+RECENT_SLOW_OPS = 200
+LATENCY_SAMPLES_PER_SHAPE = 200
+EXPLAIN_QUEUE_SIZE = 100
+
+# Commands with a filter worth profiling, and where the filter lives
+_FILTER_FIELDS = {
+    'find': 'filter',
+    'count': 'query',
+    'distinct': 'query',
+    'findAndModify': 'query',
+    'aggregate': None,
+    'update': None,
+    'delete': None,
+}
+_EXPLAINABLE = {'find', 'count', 'distinct', 'findAndModify', 'aggregate', 'update', 'delete'}
+# Session / cluster fields pymongo adds; explain rejects or ignores them
+_DRIVER_FIELDS = {'lsid', '$db', '$clusterTime', 'txnNumber', 'startTransaction', 'autocommit',
+                  '$readPreference', 'readConcern', 'writeConcern', 'apiVersion', 'apiStrict',
+                  'apiDeprecationErrors'}
+
+
+def query_shape(value: Any) -> Any:
+    """The filter with every literal replaced by "?" (operators and field names kept)."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $and / $or / $in lists: keep the structure of sub-documents, collapse literals
+        shapes = [query_shape(item) for item in value if isinstance(item, dict)]
+        return shapes if shapes else '?'
+    return '?'
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape of a command: filter shape plus sort keys / pipeline stage names."""
+    if command_name == 'aggregate':
+        pipeline = command.get('pipeline') or []
+        shape: Dict[str, Any] = {'stages': [next(iter(stage), '?') for stage in pipeline if isinstance(stage, dict)]}
+        if pipeline and isinstance(pipeline[0], dict) and '$match' in pipeline[0]:
+            shape['filter'] = query_shape(pipeline[0]['$match'])
+        return shape
+    if command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        return {'filter': query_shape(statements[0].get('q', {}))}
+    shape = {'filter': query_shape(command.get(_FILTER_FIELDS.get(command_name) or 'filter') or {})}
+    if command.get('sort'):
+        shape['sort'] = dict(command['sort'])
+    return shape
+
+
+def _explainable_command(command_name: str, command: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if command_name not in _EXPLAINABLE:
+        return None
+    cleaned = {key: value for key, value in command.items() if key not in _DRIVER_FIELDS}
+    if command_name in ('update', 'delete'):
+        # explain takes a single statement
+        field = 'updates' if command_name == 'update' else 'deletes'
+        statements = cleaned.get(field) or []
+        if len(statements) != 1:
+            return None
+        cleaned[field] = list(statements)
+    return cleaned
+
+
+def _walk_plan(plan: Any, stages: List[str], indexes: List[str]) -> None:
+    if isinstance(plan, dict):
+        stage = plan.get('stage')
+        if stage:
+            stages.append(stage)
+        if plan.get('indexName'):
+            indexes.append(plan['indexName'])
+        for key in ('inputStage', 'queryPlan'):
+            if key in plan:
+                _walk_plan(plan[key], stages, indexes)
+        for child in plan.get('inputStages', []):
+            _walk_plan(child, stages, indexes)
+    elif isinstance(plan, list):
+        for item in plan:
+            _walk_plan(item, stages, indexes)
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """docsExamined / keysExamined / nReturned and the winning plan from an explain result."""
+    # find/count/update explains are top-level; aggregate puts them in the first $cursor stage
+    section = explain
+    if 'stages' in explain and explain['stages']:
+        section = explain['stages'][0].get('$cursor', explain)
+    planner = section.get('queryPlanner', {})
+    stats = section.get('executionStats', {})
+    stages: List[str] = []
+    indexes: List[str] = []
+    _walk_plan(planner.get('winningPlan', {}), stages, indexes)
+    return {
+        'docs_examined': stats.get('totalDocsExamined'),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'n_returned': stats.get('nReturned'),
+        'plan': ' <- '.join(stages),
+        'indexes': sorted(set(indexes)),
+        'collscan': 'COLLSCAN' in stages,
+    }
+
+
+class _ShapeStats:
+    __slots__ = ('command', 'namespace', 'shape', 'count', 'total_ms', 'max_ms', 'slow', 'errors',
+                 'latencies', 'explain', 'explained_at')
+
+    def __init__(self, command: str, namespace: str, shape: str):
+        self.command = command
+        self.namespace = namespace
+        self.shape = shape
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.errors = 0
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES_PER_SHAPE)
+        self.explain: Optional[Dict[str, Any]] = None
+        self.explained_at: Optional[datetime] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        entry = {
+            'command': self.command,
+            'namespace': self.namespace,
+            'shape': self.shape,
+            'count': self.count,
+            'errors': self.errors,
+            'slow_count': self.slow,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p95_ms': round(p95, 3),
+            'max_ms': round(self.max_ms, 3),
+            'collscan': None,
+        }
+        if self.explain:
+            entry.update(self.explain)
+            docs, returned = self.explain.get('docs_examined'), self.explain.get('n_returned')
+            if docs is not None and returned is not None:
+                entry['examined_per_returned'] = round(docs / max(returned, 1), 2)
+            entry['explained_at'] = self.explained_at
+        return entry
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """CommandListener aggregating latency and sampled query plans per query shape."""
+
+    def __init__(self, slow_ms: float = QUERY_PROFILER_SLOW_MS, explain_rate: float = QUERY_PROFILER_EXPLAIN_RATE,
+                 get_client: Optional[Callable[[], Any]] = None):
+        self.slow_ms = slow_ms
+        self.explain_rate = explain_rate
+        self._get_client = get_client
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, str, str, Optional[Dict[str, Any]]]] = {}
+        self._shapes: Dict[Tuple[str, str, str], _ShapeStats] = {}
+        self._slow_ops: deque = deque(maxlen=RECENT_SLOW_OPS)
+        self._explains: 'queue.Queue' = queue.Queue(EXPLAIN_QUEUE_SIZE)
+        self._worker: Optional[threading.Thread] = None
+        self.started_at = datetime.utcnow()
+
+    def set_client(self, get_client: Optional[Callable[[], Any]]) -> None:
+        """Client used to run explains (the listener itself only sees events)."""
+        self._get_client = get_client
+
+    # -- listener callbacks (run on the thread issuing the command) --
+
+    def started(self, event):
+        try:
+            # The profiler's own explain commands are named "explain" and never match
+            if event.command_name not in _FILTER_FIELDS:
+                return
+            command = event.command
+            namespace = f'{event.database_name}.{command.get(event.command_name)}'
+            shape = json.dumps(command_shape(event.command_name, command), sort_keys=True, default=str)
+            with self._lock:
+                self._pending[(event.connection_id, event.request_id)] = (
+                    event.command_name, event.database_name, namespace, shape,
+                    command if event.command_name in _EXPLAINABLE else None
+                )
+        except Exception:
+            pass
+
+    def _finish(self, event, ok: bool) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        command_name, database_name, namespace, shape, command = pending
+        duration_ms = event.duration_micros / 1000
+        slow = duration_ms >= self.slow_ms
+        key = (command_name, namespace, shape)
+        with self._lock:
+            stats = self._shapes.get(key)
+            first_seen = stats is None
+            if stats is None:
+                if len(self._shapes) >= MAX_SHAPES:
+                    return
+                stats = self._shapes[key] = _ShapeStats(command_name, namespace, shape)
+            stats.count += 1
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+            stats.latencies.append(duration_ms)
+            if not ok:
+                stats.errors += 1
+            if slow:
+                stats.slow += 1
+                self._slow_ops.append({
+                    'command': command_name,
+                    'namespace': namespace,
+                    'shape': shape,
+                    'duration_ms': round(duration_ms, 3),
+                    'at': datetime.utcnow(),
+                })
+        if ok and command is not None and (first_seen or slow or random.random() < self.explain_rate):
+            self._schedule_explain(key, database_name, command_name, command)
+
+    def succeeded(self, event):
+        try:
+            self._finish(event, True)
+        except Exception:
+            pass
+
+    def failed(self, event):
+        try:
+            self._finish(event, False)
+        except Exception:
+            pass
+
+    # -- background explains --
+
+    def _schedule_explain(self, key, database_name: str, command_name: str, command: Dict[str, Any]) -> None:
+        if self._get_client is None:
+            return
+        explainable = _explainable_command(command_name, command)
+        if explainable is None:
+            return
+        try:
+            self._explains.put_nowait((key, database_name, explainable))
+        except queue.Full:
+            return
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._explain_loop, name='query-profiler-explain', daemon=True)
+                    self._worker.start()
+
+    def _explain_loop(self) -> None:
+        while True:
+            key, database_name, command = self._explains.get()
+            try:
+                client = self._get_client() if self._get_client else None
+                if client is not None:
+                    result = client[database_name].command('explain', command, verbosity='executionStats')
+                    summary = summarize_explain(result)
+                    with self._lock:
+                        stats = self._shapes.get(key)
+                        already_flagged = bool(stats and stats.explain and stats.explain['collscan'])
+                        if stats is not None:
+                            stats.explain = summary
+                            stats.explained_at = datetime.utcnow()
+                    if summary['collscan'] and not already_flagged:
+                        print(f"🐢 COLLSCAN: {key[0]} {key[1]} {key[2]} "
+                              f"(examined {summary['docs_examined']}, returned {summary['n_returned']})")
+            except Exception as e:
+                print(f"⚠️ Query profiler explain failed for {key[1]}: {e}")
+            finally:
+                self._explains.task_done()
+
+    def flush(self, timeout: float = 10.0) -> None:
+        """Wait for queued explains to finish (for tests and benchmarks)."""
+        deadline = time.monotonic() + timeout
+        while self._explains.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    # -- reporting --
+
+    def report(self, limit: int = 100) -> Dict[str, Any]:
+        """Shapes sorted by total time, plus the most recent slow operations."""
+        with self._lock:
+            shapes = [stats.as_dict() for stats in self._shapes.values()]
+            slow_ops = list(self._slow_ops)
+        shapes.sort(key=lambda entry: entry['total_ms'], reverse=True)
+        return {
+            'since': self.started_at,
+            'slow_threshold_ms': self.slow_ms,
+            'explain_rate': self.explain_rate,
+            'shape_count': len(shapes),
+            'collscan_shapes': sum(1 for entry in shapes if entry.get('collscan')),
+            'shapes': shapes[:limit],
+            'recent_slow_ops': list(reversed(slow_ops))[:limit],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self._slow_ops.clear()
+            self.started_at = datetime.utcnow()
+
+
+_profiler: Optional[QueryProfiler] = None
+
+
+def get_query_profiler() -> Optional[QueryProfiler]:
+    return _profiler
+
+
+def admin_authorized() -> bool:
+    """ADMIN_TOKEN bearer check shared by the /admin/* diagnostics endpoints."""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if admin_token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {admin_token}')
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+def init_query_profiler(app, get_client: Callable[[], Any], path: str = '/admin/query-profile') -> Optional[QueryProfiler]:
+    """Register the profiler (before the MongoClient is created) and its admin endpoint."""
+    global _profiler
+    if not QUERY_PROFILER_ENABLED:
+        print("⚠️ Query profiler disabled (QUERY_PROFILER_ENABLED=false)")
+        return None
+    if _profiler is None:
+        _profiler = QueryProfiler(get_client=get_client)
+        monitoring.register(_profiler)
+
+    def query_profile():
+        if not admin_authorized():
+            return jsonify({'success': False, 'error': 'Admin token required'}), 401
+        if request.method == 'DELETE':
+            _profiler.reset()
+            return jsonify({'success': True, 'message': 'Query profile reset'}), 200
+        try:
+            limit = int(request.args.get('limit', 100))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+        return jsonify({'success': True, 'profile': _profiler.report(limit=limit)}), 200
+
+    app.add_url_rule(path, 'query_profile', query_profile, methods=['GET', 'DELETE'])
+    print(f"🐢 Query profiler enabled on {path} (slow >= {QUERY_PROFILER_SLOW_MS:g} ms)")
+    return _profiler
@@ -0,0 +1,123 @@
+"""
+Rate Limiting - token buckets shared through Mongo
+
+A bucket holds up to ``capacity`` tokens and regains one every
+``refill_seconds``. Each allowed call takes one token, so a client can burst
+``capacity`` calls and then continue at the refill rate.
+
+Buckets live in the ``rate_limits`` collection, keyed by ``scope:key`` (for
+example ``otp_email:jane@example.com``). One ``find_one_and_update`` with an
+update pipeline refills the bucket and takes a token atomically, so every
+worker process sees the same limit. Idle buckets are dropped by a TTL index
+once they would be full again. Without a collection the buckets are kept in
+process memory instead.
+"""
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import jsonify, request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+MAX_LOCAL_BUCKETS = 100000
+
+
+def ensure_rate_limit_indexes(collection) -> None:
+    """TTL index dropping buckets that have refilled completely."""
+    collection.create_index('expires_at', expireAfterSeconds=0)
+
+
+def client_ip() -> str:
+    """Address of the client (the last hop added by the platform's proxy, if any)."""
+    if request.access_route:
+        return request.access_route[-1]
+    return request.remote_addr or 'unknown'
+
+
+class TokenBucketLimiter:
+    """Named token bucket applied per key (email, IP, ...)."""
+
+    def __init__(self, scope: str, capacity: int, refill_seconds: float,
+                 get_collection: Optional[Callable[[], Any]] = None):
+        self.scope = scope
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self._get_collection = get_collection
+        self._local: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def _retry_after(self, tokens: float) -> int:
+        return max(1, math.ceil((1 - tokens) * self.refill_seconds))
+
+    def _take_local(self, bucket_id: str) -> Tuple[bool, int]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._local.get(bucket_id, (float(self.capacity), now))
+            tokens = min(float(self.capacity), tokens + (now - updated_at) / self.refill_seconds)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._local) >= MAX_LOCAL_BUCKETS and bucket_id not in self._local:
+                self._local.clear()
+            self._local[bucket_id] = (tokens, now)
+        return allowed, 0 if allowed else self._retry_after(tokens)
+
+    def _take_shared(self, collection, bucket_id: str) -> Tuple[bool, int]:
+        now = datetime.utcnow()
+        elapsed_seconds = {'$divide': [{'$subtract': [now, {'$ifNull': ['$updated_at', now]}]}, 1000]}
+        refilled = {'$min': [
+            self.capacity,
+            {'$add': [{'$ifNull': ['$tokens', self.capacity]}, {'$divide': [elapsed_seconds, self.refill_seconds]}]}
+        ]}
+        has_token = {'$gte': ['$tokens', 1]}
+        pipeline = [
+            {'$set': {'tokens': refilled, 'updated_at': now}},
+            # Fields in one $set all see the refilled value from the stage above
+            {'$set': {
+                'allowed': has_token,
+                'tokens': {'$cond': [has_token, {'$subtract': ['$tokens', 1]}, '$tokens']},
+                'expires_at': now + timedelta(seconds=self.capacity * self.refill_seconds),
+            }},
+        ]
+        for _ in range(2):
+            try:
+                bucket = collection.find_one_and_update(
+                    {'_id': bucket_id}, pipeline, upsert=True, return_document=ReturnDocument.AFTER
+                )
+                break
+            except DuplicateKeyError:
+                # Two first requests raced to create the bucket; the retry updates it
+                continue
+        else:
+            return True, 0
+        if bucket.get('allowed'):
+            return True, 0
+        return False, self._retry_after(bucket.get('tokens', 0))
+
+    def take(self, key: str) -> Tuple[bool, int]:
+        """
+        Take one token for ``key``.
+
+        Returns:
+            (allowed, retry_after_seconds)
+        """
+        bucket_id = f'{self.scope}:{key}'
+        collection = self._get_collection() if self._get_collection else None
+        if collection is not None:
+            try:
+                return self._take_shared(collection, bucket_id)
+            except Exception as e:
+                print(f"⚠️ Shared rate limit unavailable, using local bucket: {e}")
+        return self._take_local(bucket_id)
+
+
+def rate_limited_response(retry_after: int, message: str = 'Too many requests, please try again later'):
+    """429 response with Retry-After."""
+    response = jsonify({'success': False, 'error': message, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
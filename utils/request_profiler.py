@@ -0,0 +1,301 @@
+"""
+Request Profiler - on-demand sampling profiler scoped to single requests
+
+When one route (e.g. ``/doctor/patient/<patient_id>/full-details``) gets slow
+in production, latency histograms and the query profiler say *that* it is
+slow but not *where* the time goes in Python. This module runs a sampling
+profiler for the lifetime of selected requests only:
+
+    - a background thread reads the request thread's stack every
+      REQUEST_PROFILER_INTERVAL_MS via ``sys._current_frames()``; the request
+      itself runs uninstrumented (no ``sys.setprofile`` tracing)
+    - samples are written as collapsed stacks ("root;caller;callee count"),
+      the input format of flamegraph.pl, speedscope and inferno
+    - files go to REQUEST_PROFILER_DIR; the oldest are pruned beyond
+      REQUEST_PROFILER_MAX_FILES or REQUEST_PROFILER_MAX_AGE_HOURS
+
+A request is profiled when either
+
+    - it carries ``X-Profile-Request: 1`` and the admin bearer token
+      (``Authorization: Bearer <ADMIN_TOKEN>``, or localhost without one), or
+    - its route has been armed through the admin endpoint for N requests,
+      optionally sampled:
+
+    POST   /admin/request-profile   {"route": "/doctor/patient/<patient_id>/full-details",
+                                     "count": 5, "sample_rate": 0.2}
+    GET    /admin/request-profile   armed routes and stored profiles
+    DELETE /admin/request-profile   disarm every route (or ?route=...)
+    GET    /admin/request-profile/<name>   download one collapsed-stack file
+
+Profiled responses carry ``X-Profile-Id: <name>``. At most
+REQUEST_PROFILER_MAX_CONCURRENT requests are profiled at once.
+
+The profiler is off by default: unless REQUEST_PROFILER_ENABLED is set,
+``init_request_profiler`` registers no hooks and no routes, so requests pay
+nothing for it.
+
+    REQUEST_PROFILER_ENABLED         "true" to register the hooks (default off)
+    REQUEST_PROFILER_DIR             output directory (default ./profiles)
+    REQUEST_PROFILER_INTERVAL_MS     sampling interval (default 5)
+    REQUEST_PROFILER_MAX_FILES       files kept (default 200)
+    REQUEST_PROFILER_MAX_AGE_HOURS   files older than this are removed (default 72)
+    REQUEST_PROFILER_MAX_CONCURRENT  simultaneous profiled requests (default 2)
+"""
+
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from flask import g, jsonify, request, send_from_directory
+
+from utils.query_profiler import admin_authorized
+
+REQUEST_PROFILER_ENABLED = os.getenv('REQUEST_PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+REQUEST_PROFILER_DIR = os.getenv('REQUEST_PROFILER_DIR', os.path.join(os.getcwd(), 'profiles'))
+REQUEST_PROFILER_INTERVAL_MS = float(os.getenv('REQUEST_PROFILER_INTERVAL_MS', '5'))
+REQUEST_PROFILER_MAX_FILES = int(os.getenv('REQUEST_PROFILER_MAX_FILES', '200'))
+REQUEST_PROFILER_MAX_AGE_HOURS = float(os.getenv('REQUEST_PROFILER_MAX_AGE_HOURS', '72'))
+REQUEST_PROFILER_MAX_CONCURRENT = int(os.getenv('REQUEST_PROFILER_MAX_CONCURRENT', '2'))
+
+PROFILE_HEADER = 'X-Profile-Request'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_SUFFIX = '.folded'
+_PROFILE_NAME = re.compile(r'^[\w.-]+\.folded$')
+_UNSAFE_NAME_CHARS = re.compile(r'[^\w.-]')
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread and counts collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename.replace(os.sep, '/')
+            short = '/'.join(path.rsplit('/', 2)[-2:])
+            label = f'{code.co_name} ({short}:{code.co_firstlineno})'.replace(';', ',')
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def start(self) -> 'StackSampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """Decides which requests to profile, runs the sampler and stores the output."""
+
+    def __init__(self, directory: str = REQUEST_PROFILER_DIR,
+                 interval_ms: float = REQUEST_PROFILER_INTERVAL_MS,
+                 max_files: int = REQUEST_PROFILER_MAX_FILES,
+                 max_age_hours: float = REQUEST_PROFILER_MAX_AGE_HOURS,
+                 max_concurrent: int = REQUEST_PROFILER_MAX_CONCURRENT):
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self.max_files = max_files
+        self.max_age = max_age_hours * 3600
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._armed: Dict[str, List] = {}  # endpoint -> [remaining, sample_rate]
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # ---- arming ----
+
+    def arm(self, endpoint: str, count: int, sample_rate: float = 1.0) -> None:
+        with self._lock:
+            self._armed[endpoint] = [count, sample_rate]
+
+    def disarm(self, endpoint: Optional[str] = None) -> None:
+        with self._lock:
+            if endpoint is None:
+                self._armed.clear()
+            else:
+                self._armed.pop(endpoint, None)
+
+    def armed(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {endpoint: {'remaining': remaining, 'sample_rate': rate}
+                    for endpoint, (remaining, rate) in self._armed.items()}
+
+    def _take_armed(self, endpoint: Optional[str]) -> bool:
+        if endpoint not in self._armed:
+            return False
+        with self._lock:
+            entry = self._armed.get(endpoint)
+            if entry is None or random.random() >= entry[1]:
+                return False
+            entry[0] -= 1
+            if entry[0] <= 0:
+                del self._armed[endpoint]
+            return True
+
+    # ---- per request ----
+
+    def before_request(self) -> None:
+        requested = request.headers.get(PROFILE_HEADER) == '1' and admin_authorized()
+        if not requested and not self._take_armed(request.endpoint):
+            return
+        if not self._slots.acquire(blocking=False):
+            print(f"⚠️ Request profiler busy, not profiling {request.path}")
+            return
+        endpoint = _UNSAFE_NAME_CHARS.sub('_', request.endpoint or 'unmatched')
+        g._request_profile = (
+            StackSampler(threading.get_ident(), self.interval).start(),
+            time.perf_counter(),
+            f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{endpoint}",
+        )
+
+    def after_request(self, response):
+        profile = g.get('_request_profile')
+        if profile is not None:
+            response.headers[PROFILE_ID_HEADER] = profile[2] + PROFILE_SUFFIX
+        return response
+
+    def teardown_request(self, exc) -> None:
+        profile = g.pop('_request_profile', None)
+        if profile is None:
+            return
+        sampler, started, name = profile
+        try:
+            sampler.stop()
+            self._write(name, sampler, time.perf_counter() - started)
+        except OSError as e:
+            print(f"❌ Could not store request profile {name}: {e}")
+        finally:
+            self._slots.release()
+
+    # ---- storage ----
+
+    def _write(self, name: str, sampler: StackSampler, elapsed: float) -> None:
+        path = os.path.join(self.directory, name + PROFILE_SUFFIX)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(sampler.collapsed())
+        print(f"🔥 Request profile {name}{PROFILE_SUFFIX}: {sampler.samples} samples over {elapsed * 1000:.0f} ms")
+        self.prune()
+
+    def profiles(self) -> List[Dict]:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+                stat = entry.stat()
+                entries.append({
+                    'name': entry.name,
+                    'bytes': stat.st_size,
+                    'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                })
+        entries.sort(key=lambda item: item['created_at'], reverse=True)
+        return entries
+
+    def prune(self) -> int:
+        """Remove profiles beyond the file limit or older than the age limit; returns how many."""
+        now = time.time()
+        files: List[Tuple[float, str]] = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+                files.append((entry.stat().st_mtime, entry.path))
+        files.sort(reverse=True)
+        removed = 0
+        for index, (mtime, path) in enumerate(files):
+            if index >= self.max_files or now - mtime > self.max_age:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+_profiler: Optional[RequestProfiler] = None
+
+
+def _resolve_endpoint(app, route: str) -> Optional[str]:
+    """Accept an endpoint name or a URL rule such as /doctor/patient/<patient_id>/full-details."""
+    if route in app.view_functions:
+        return route
+    for rule in app.url_map.iter_rules():
+        if rule.rule == route:
+            return rule.endpoint
+    return None
+
+
+def init_request_profiler(app, path: str = '/admin/request-profile') -> Optional[RequestProfiler]:
+    """Register the profiling hooks and admin endpoints when REQUEST_PROFILER_ENABLED is on."""
+    global _profiler
+    if not REQUEST_PROFILER_ENABLED:
+        return None
+    if _profiler is None:
+        _profiler = RequestProfiler()
+    app.before_request(_profiler.before_request)
+    app.after_request(_profiler.after_request)
+    app.teardown_request(_profiler.teardown_request)
+
+    def request_profile():
+        if not admin_authorized():
+            return jsonify({'success': False, 'error': 'Admin token required'}), 401
+        if request.method == 'GET':
+            return jsonify({'success': True, 'armed': _profiler.armed(), 'profiles': _profiler.profiles()}), 200
+        if request.method == 'DELETE':
+            route = request.args.get('route')
+            _profiler.disarm(_resolve_endpoint(app, route) if route else None)
+            return jsonify({'success': True, 'message': 'Request profiling disarmed'}), 200
+
+        data = request.get_json(silent=True) or {}
+        route = data.get('route') or data.get('endpoint')
+        endpoint = _resolve_endpoint(app, route) if route else None
+        if endpoint is None:
+            return jsonify({'success': False, 'error': f'Unknown route: {route}'}), 400
+        try:
+            count = int(data.get('count', 1))
+            sample_rate = float(data.get('sample_rate', 1.0))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'count and sample_rate must be numbers'}), 400
+        if count < 1 or not 0 < sample_rate <= 1:
+            return jsonify({'success': False, 'error': 'count must be >= 1 and sample_rate in (0, 1]'}), 400
+        _profiler.arm(endpoint, count, sample_rate)
+        return jsonify({'success': True, 'endpoint': endpoint, 'count': count, 'sample_rate': sample_rate}), 200
+
+    def request_profile_file(name):
+        if not admin_authorized():
+            return jsonify({'success': False, 'error': 'Admin token required'}), 401
+        if not _PROFILE_NAME.match(name):
+            return jsonify({'success': False, 'error': 'Invalid profile name'}), 400
+        return send_from_directory(_profiler.directory, name, mimetype='text/plain')
+
+    app.add_url_rule(path, 'request_profile', request_profile, methods=['GET', 'POST', 'DELETE'])
+    app.add_url_rule(f'{path}/<name>', 'request_profile_file', request_profile_file, methods=['GET'])
+    print(f"🔥 Request profiler enabled on {path} (profiles in {_profiler.directory})")
+    return _profiler
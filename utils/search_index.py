@@ -0,0 +1,214 @@
+"""
+Search Index Utility
+
+Index-friendly prefix search for directory lookups (doctor picker, patient
+search). Instead of unanchored case-insensitive ``$regex`` over several
+fields, which always scans the collection, each document keeps normalized
+lowercase copies of its searchable text:
+
+    search_terms       - unique lowercase tokens from name/username/email/...
+    specialization_lc  - lowercase specialization (doctors)
+    city_lc            - lowercase city (doctors)
+    phone_rev          - phone numbers' digits reversed (patients), so a
+                         "last digits" query is an anchored prefix match too
+
+A query is tokenized the same way and every query token must prefix-match
+one of ``search_terms``. Anchored, case-sensitive regexes on a lowercase
+field become index range scans on the multikey ``search_terms`` index.
+Results are ranked by exact token hits, then prefix hits, with a bonus when
+the first or last name starts with the query.
+"""
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+SEARCH_TERMS_FIELD = 'search_terms'
+DOCTOR_SEARCH_SOURCE_FIELDS = ['username', 'first_name', 'last_name', 'email', 'specialization']
+PHONE_REV_FIELD = 'phone_rev'
+PATIENT_SEARCH_SOURCE_FIELDS = ['full_name', 'first_name', 'last_name', 'username', 'email', 'patient_id']
+PATIENT_PHONE_FIELDS = ['contact_number', 'mobile']
+MAX_QUERY_TOKENS = 5
+MIN_PHONE_QUERY_DIGITS = 3
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text: Any) -> str:
+    """Lowercase and strip accents (``"José"`` -> ``"jose"``)."""
+    if text is None:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().strip()
+
+
+def tokenize(text: Any) -> List[str]:
+    """Split normalized text into alphanumeric tokens."""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def build_search_terms(values: Iterable[Any]) -> List[str]:
+    """Build the sorted, de-duplicated ``search_terms`` array for a document."""
+    terms = set()
+    for value in values:
+        if not value:
+            continue
+        text = normalize(value)
+        if '@' in text:
+            # Local part only (domains like "gmail"/"com" would match everyone),
+            # plus the whole address for exact email lookups
+            terms.update(tokenize(text.split('@', 1)[0]))
+            terms.add(text)
+        else:
+            terms.update(tokenize(text))
+    return sorted(terms)
+
+
+def doctor_search_fields(doctor: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized search fields to ``$set`` on a doctor document."""
+    return {
+        SEARCH_TERMS_FIELD: build_search_terms(doctor.get(field) for field in DOCTOR_SEARCH_SOURCE_FIELDS),
+        'specialization_lc': normalize(doctor.get('specialization')),
+        'city_lc': normalize(doctor.get('city')),
+    }
+
+
+def refresh_doctor_search_fields(collection, doctor_id: str) -> None:
+    """Recompute the search fields after a doctor's profile changed."""
+    projection = {field: 1 for field in DOCTOR_SEARCH_SOURCE_FIELDS + ['city']}
+    doctor = collection.find_one({'doctor_id': doctor_id}, projection)
+    if doctor:
+        collection.update_one({'doctor_id': doctor_id}, {'$set': doctor_search_fields(doctor)})
+
+
+def ensure_doctor_search_indexes(collection) -> None:
+    """Create the indexes behind doctor search."""
+    collection.create_index(SEARCH_TERMS_FIELD)
+    collection.create_index('specialization_lc')
+    collection.create_index('city_lc')
+
+
+def backfill_doctor_search_fields(collection, batch_size: int = 500) -> int:
+    """Add search fields to doctors created before they existed; returns how many were updated."""
+    from pymongo import UpdateOne
+
+    projection = {field: 1 for field in DOCTOR_SEARCH_SOURCE_FIELDS + ['city']}
+    updated = 0
+    operations = []
+    for doctor in collection.find({SEARCH_TERMS_FIELD: {'$exists': False}}, projection):
+        operations.append(UpdateOne({'_id': doctor['_id']}, {'$set': doctor_search_fields(doctor)}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+
+def phone_digits(value: Any) -> str:
+    """Digits of a phone number ("+91 98765-43210" -> "919876543210")."""
+    return ''.join(ch for ch in str(value or '') if ch.isdigit())
+
+
+def patient_search_fields(patient: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized search fields to ``$set`` on a patient document."""
+    phones = {phone_digits(patient.get(field)) for field in PATIENT_PHONE_FIELDS}
+    return {
+        SEARCH_TERMS_FIELD: build_search_terms(patient.get(field) for field in PATIENT_SEARCH_SOURCE_FIELDS),
+        PHONE_REV_FIELD: sorted(digits[::-1] for digits in phones if digits),
+    }
+
+
+def refresh_patient_search_fields(collection, match: Dict[str, Any]) -> None:
+    """Recompute the search fields after a patient's searchable fields changed."""
+    projection = {field: 1 for field in PATIENT_SEARCH_SOURCE_FIELDS + PATIENT_PHONE_FIELDS}
+    patient = collection.find_one(match, projection)
+    if patient:
+        collection.update_one({'_id': patient['_id']}, {'$set': patient_search_fields(patient)})
+
+
+def ensure_patient_search_indexes(collection) -> None:
+    """Create the indexes behind patient search."""
+    collection.create_index(SEARCH_TERMS_FIELD)
+    collection.create_index(PHONE_REV_FIELD)
+
+
+def backfill_patient_search_fields(collection, batch_size: int = 500) -> int:
+    """Add search fields to patients created before they existed; returns how many were updated."""
+    from pymongo import UpdateOne
+
+    projection = {field: 1 for field in PATIENT_SEARCH_SOURCE_FIELDS + PATIENT_PHONE_FIELDS}
+    updated = 0
+    operations = []
+    for patient in collection.find({SEARCH_TERMS_FIELD: {'$exists': False}}, projection):
+        operations.append(UpdateOne({'_id': patient['_id']}, {'$set': patient_search_fields(patient)}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    return updated
+
+
+def patient_search_filter(query: str) -> Optional[Dict[str, Any]]:
+    """
+    Token-prefix filter, widened with a phone-suffix match when the query
+    looks like (the end of) a phone number.
+    """
+    token_match = prefix_filter(query)
+    digits = phone_digits(query)
+    stripped = re.sub(r'[\s+()-]', '', query or '')
+    if len(digits) >= MIN_PHONE_QUERY_DIGITS and digits == stripped:
+        phone_match = {PHONE_REV_FIELD: re.compile('^' + digits[::-1])}
+        return {'$or': [token_match, phone_match]} if token_match else phone_match
+    return token_match
+
+
+def query_tokens(query: str) -> List[str]:
+    """Tokens of a search query (at most MAX_QUERY_TOKENS)."""
+    text = normalize(query)
+    if '@' in text:
+        # Email lookups match the whole stored address
+        return [text]
+    return tokenize(text)[:MAX_QUERY_TOKENS]
+
+
+def prefix_filter(query: str, field: str = SEARCH_TERMS_FIELD) -> Optional[Dict[str, Any]]:
+    """
+    Filter requiring every query token to prefix-match an element of ``field``.
+
+    Returns None when the query has no searchable tokens.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return None
+    patterns = [re.compile('^' + re.escape(token)) for token in tokens]
+    if len(patterns) == 1:
+        return {field: patterns[0]}
+    return {field: {'$all': patterns}}
+
+
+def normalized_prefix(value: str) -> Optional[Dict[str, Any]]:
+    """Anchored match on a ``*_lc`` field, e.g. ``{'city_lc': normalized_prefix('Pune')}``."""
+    text = normalize(value)
+    if not text:
+        return None
+    return {'$regex': '^' + re.escape(text)}
+
+
+def rank_stage(query: str, name_fields: Iterable[str] = ('first_name', 'last_name'),
+               field: str = SEARCH_TERMS_FIELD) -> Dict[str, Any]:
+    """
+    ``$addFields`` stage computing ``_search_score`` for documents that already
+    matched ``prefix_filter(query)``: 3 per exact token hit, 1 per prefix-only
+    hit, +2 when a name field starts with the query.
+    """
+    tokens = query_tokens(query)
+    whole = ' '.join(tokens)
+    terms = {'$ifNull': [f'${field}', []]}
+    score = [{'$cond': [{'$in': [token, terms]}, 3, 1]} for token in tokens]
+    for name_field in name_fields:
+        score.append({'$cond': [
+            {'$eq': [{'$indexOfCP': [{'$toLower': {'$ifNull': [f'${name_field}', '']}}, whole]}, 0]}, 2, 0
+        ]})
+    return {'$addFields': {'_search_score': {'$add': score or [0]}}}
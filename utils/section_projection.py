@@ -0,0 +1,92 @@
+"""
+Section Projection Utility
+
+Maps an ``include=`` / ``fields=`` query parameter onto a MongoDB projection
+for endpoints that return a patient's health arrays in one response
+(/patient-complete-profile/<email>, /doctor/patient/<id>/full-details).
+
+Only the requested arrays are projected; the count of every array is
+computed in Mongo with $size, so ``include=summary`` returns the counts
+without shipping any array over the wire.
+
+    include=food_data,appointments   -> those two arrays + all counts
+    include=summary                  -> counts only
+    (no parameter) / include=all     -> every array + all counts
+"""
+
+from typing import Any, Dict, Iterable, Optional, Set
+
+SUMMARY_ONLY_VALUES = {'summary', 'counts', 'none'}
+
+
+class SectionProjectionError(ValueError):
+    """Raised when an unknown section is requested."""
+
+
+def parse_sections(args, available: Iterable[str]) -> Set[str]:
+    """
+    Read the requested sections from request args.
+
+    Args:
+        args: request.args (or any mapping)
+        available: names of the array sections the endpoint can return
+
+    Returns:
+        Set of section names to include
+
+    Raises:
+        SectionProjectionError: if an unknown section name is requested
+    """
+    available = list(available)
+    raw = args.get('include')
+    if raw is None:
+        raw = args.get('fields')
+    if raw is None:
+        return set(available)
+
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    if 'all' in names:
+        return set(available)
+
+    names -= SUMMARY_ONLY_VALUES
+    unknown = names - set(available)
+    if unknown:
+        raise SectionProjectionError(
+            f"Unknown section(s): {', '.join(sorted(unknown))}. "
+            f"Available: {', '.join(available)}, summary, all"
+        )
+    return names
+
+
+def build_sections_pipeline(match: Dict[str, Any], scalar_fields: Iterable[str],
+                            array_fields: Iterable[str], sections: Set[str]) -> list:
+    """
+    Build a pipeline returning the scalar fields, the requested arrays and a
+    ``_counts`` sub-document with the $size of every array.
+    """
+    projection: Dict[str, Any] = {'_id': 0}
+    for field in scalar_fields:
+        projection[field] = 1
+    for field in array_fields:
+        if field in sections:
+            projection[field] = 1
+    projection['_counts'] = {
+        field: {'$size': {'$cond': [{'$isArray': f'${field}'}, f'${field}', []]}}
+        for field in array_fields
+    }
+    return [
+        {'$match': match},
+        {'$limit': 1},
+        {'$project': projection},
+    ]
+
+
+def fetch_sections(collection, match: Dict[str, Any], scalar_fields: Iterable[str],
+                   array_fields: Iterable[str], sections: Set[str]) -> Optional[Dict[str, Any]]:
+    """
+    Run the section projection and return the patient document (with a
+    ``_counts`` dict), or None if no patient matched.
+    """
+    array_fields = list(array_fields)
+    pipeline = build_sections_pipeline(match, scalar_fields, array_fields, sections)
+    return next(collection.aggregate(pipeline), None)
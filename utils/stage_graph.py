@@ -0,0 +1,249 @@
+"""
+Stage Graph - small DAG executor for request pipelines with per-stage timeouts
+
+A request pipeline (e.g. /symptoms/assist: patient lookup, embedding, vector
+search, LLM synthesis, red flags, recommendations) is declared as named
+stages with dependencies. Independent stages run concurrently on a shared
+thread pool; the calling thread is the scheduler and the only one that waits,
+so worker threads never block on each other:
+
+    graph = StageGraph('symptom_assist')
+    graph.stage('patient', lookup_patient, timeout=2)
+    graph.stage('embedding', embed, timeout=5)
+    graph.stage('search', search, deps=('embedding', 'patient'), timeout=5, default=[])
+    graph.stage('synthesis', summarize, deps=('search',), skip=lambda r: not r['search'])
+    graph.stage('fallback', fallback, deps=('patient',), delay=1.5,
+                trigger=lambda r: r.settled('search') and not r['search'],
+                skip=lambda r: r.ok('synthesis'))
+    results = graph.run(until=lambda r: r.ok('synthesis') or r.ok('fallback'), deadline=20)
+
+Each stage function receives the values of its dependencies, in order. A
+stage settles as one of
+
+    ok        returned a value
+    error     raised (its value is ``default``)
+    timeout   ran longer than ``timeout`` seconds (its value is ``default``;
+              the late result is discarded)
+    skipped   ``skip(results)`` was true when it became ready
+    pending   still waiting or running when ``run`` returned
+
+Dependents of a failed or timed-out stage still run, with the ``default``.
+
+``delay`` makes a stage speculative: it starts ``delay`` seconds after the run
+began (its dependencies permitting), or earlier as soon as ``trigger(results)``
+is true, unless ``skip(results)`` says it is no longer needed. ``run`` returns
+when ``until(results)`` is true, when every stage has settled, or at the
+deadline, whichever comes first. Stages that have not started by then are
+cancelled; stages already running are abandoned and finish in the background
+(their results are discarded). ``graph.finished`` is set when ``run`` returns,
+so a stage that first waits for something (e.g. an admission slot) can check
+it and skip work nobody will read.
+
+Per-stage durations are kept on the results (``timings()``, plus a
+``Server-Timing`` header value) and observed in
+``pipeline_stage_duration_seconds{pipeline,stage,status}`` on /metrics.
+
+    STAGE_GRAPH_THREADS   size of the shared worker pool (default 32)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utils.metrics import REGISTRY
+
+STAGE_GRAPH_THREADS = int(os.getenv('STAGE_GRAPH_THREADS', '32'))
+
+OK = 'ok'
+ERROR = 'error'
+TIMEOUT = 'timeout'
+SKIPPED = 'skipped'
+PENDING = 'pending'
+
+STAGE_DURATION = REGISTRY.histogram(
+    'pipeline_stage_duration_seconds', 'Duration of request pipeline stages', ('pipeline', 'stage', 'status'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _shared_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(STAGE_GRAPH_THREADS, thread_name_prefix='stage')
+    return _executor
+
+
+class _Stage:
+    __slots__ = ('name', 'fn', 'deps', 'timeout', 'default', 'delay', 'trigger', 'skip',
+                 'status', 'value', 'started', 'finished', 'order')
+
+    def __init__(self, name, fn, deps, timeout, default, delay, trigger, skip):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+        self.delay = delay
+        self.trigger = trigger
+        self.skip = skip
+        self.status = PENDING
+        self.value = default
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.order: Optional[int] = None
+
+
+class StageResults:
+    """Read-only view of stage outcomes, passed to ``until``/``trigger``/``skip`` and returned by ``run``."""
+
+    def __init__(self, stages: Dict[str, _Stage], run_started: float):
+        self._stages = stages
+        self._run_started = run_started
+
+    def __getitem__(self, name: str) -> Any:
+        return self._stages[name].value
+
+    def status(self, name: str) -> str:
+        return self._stages[name].status
+
+    def settled(self, name: str) -> bool:
+        return self._stages[name].status != PENDING
+
+    def ok(self, name: str) -> bool:
+        return self._stages[name].status == OK
+
+    def finished_before(self, first: str, second: str) -> bool:
+        """Whether ``first`` settled before ``second`` (a settled stage beats a pending one)."""
+        a, b = self._stages[first].order, self._stages[second].order
+        return a is not None and (b is None or a < b)
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: status, start offset from the run start and duration, in milliseconds."""
+        timings = {}
+        for stage in self._stages.values():
+            entry = {'status': stage.status}
+            if stage.started is not None:
+                entry['start_ms'] = round((stage.started - self._run_started) * 1000, 1)
+                end = stage.finished if stage.finished is not None else time.perf_counter()
+                entry['duration_ms'] = round((end - stage.started) * 1000, 1)
+            timings[stage.name] = entry
+        return timings
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value for the stages that ran."""
+        return ', '.join(
+            f"{name};dur={entry['duration_ms']};desc=\"{entry['status']}\""
+            for name, entry in self.timings().items() if 'duration_ms' in entry
+        )
+
+
+class StageGraph:
+    """Named stages with dependencies, timeouts and speculative starts; see the module docstring."""
+
+    def __init__(self, name: str, executor: Optional[ThreadPoolExecutor] = None):
+        self.name = name
+        self._executor = executor
+        self._stages: Dict[str, _Stage] = {}
+        self.finished = threading.Event()
+
+    def stage(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = (),
+              timeout: Optional[float] = None, default: Any = None, delay: Optional[float] = None,
+              trigger: Optional[Callable[[StageResults], bool]] = None,
+              skip: Optional[Callable[[StageResults], bool]] = None) -> 'StageGraph':
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}' (declare dependencies first)")
+        self._stages[name] = _Stage(name, fn, deps, timeout, default, delay, trigger, skip)
+        return self
+
+    def run(self, until: Optional[Callable[[StageResults], bool]] = None,
+            deadline: Optional[float] = None) -> StageResults:
+        executor = self._executor or _shared_executor()
+        run_started = time.perf_counter()
+        results = StageResults(self._stages, run_started)
+        completed: List = []  # (stage, status, value, finished) appended by workers
+        wake = threading.Condition()
+        running: Dict[str, _Stage] = {}
+        futures: Dict[str, Any] = {}
+        settle_order = iter(range(len(self._stages)))
+
+        def settle(stage: _Stage, status: str, value: Any, finished: float) -> None:
+            stage.status, stage.value, stage.finished = status, value, finished
+            stage.order = next(settle_order)
+            if stage.started is not None:
+                STAGE_DURATION.observe((self.name, stage.name, status), finished - stage.started)
+
+        def execute(stage: _Stage, args: tuple) -> None:
+            try:
+                outcome = (OK, stage.fn(*args))
+            except Exception as e:
+                print(f"⚠️ Stage {self.name}.{stage.name} failed: {e}")
+                outcome = (ERROR, stage.default)
+            with wake:
+                completed.append((stage, outcome[0], outcome[1], time.perf_counter()))
+                wake.notify()
+
+        while True:
+            now = time.perf_counter()
+
+            # Collect finished work (late results of timed-out stages are dropped)
+            with wake:
+                finished, completed[:] = list(completed), []
+            for stage, status, value, finished_at in finished:
+                if running.pop(stage.name, None) is not None:
+                    settle(stage, status, value, finished_at)
+
+            # Time out overdue stages
+            for stage in list(running.values()):
+                if stage.timeout is not None and now - stage.started >= stage.timeout:
+                    running.pop(stage.name)
+                    print(f"⏱️ Stage {self.name}.{stage.name} timed out after {stage.timeout:g}s")
+                    settle(stage, TIMEOUT, stage.default, now)
+
+            # Start every stage whose dependencies have settled (and whose delay/trigger allows it)
+            next_wakeup = None
+            for stage in self._stages.values():
+                if stage.status != PENDING or stage.name in running:
+                    continue
+                if not all(self._stages[dep].status != PENDING for dep in stage.deps):
+                    continue
+                if stage.skip is not None and stage.skip(results):
+                    settle(stage, SKIPPED, stage.default, now)
+                    continue
+                if stage.delay is not None and now - run_started < stage.delay:
+                    if stage.trigger is None or not stage.trigger(results):
+                        wakeup_at = run_started + stage.delay
+                        next_wakeup = wakeup_at if next_wakeup is None else min(next_wakeup, wakeup_at)
+                        continue
+                stage.started = now
+                running[stage.name] = stage
+                futures[stage.name] = executor.submit(
+                    execute, stage, tuple(self._stages[dep].value for dep in stage.deps))
+
+            if until is not None and until(results):
+                break
+            if not running and all(stage.status != PENDING for stage in self._stages.values()):
+                break
+            if deadline is not None and now - run_started >= deadline:
+                print(f"⏱️ {self.name} pipeline hit its {deadline:g}s deadline")
+                break
+
+            # Sleep until a stage finishes, a timeout or delay falls due, or the deadline
+            wait_until = [stage.started + stage.timeout for stage in running.values() if stage.timeout is not None]
+            if next_wakeup is not None:
+                wait_until.append(next_wakeup)
+            if deadline is not None:
+                wait_until.append(run_started + deadline)
+            with wake:
+                if not completed:
+                    wake.wait(max(0.0, min(wait_until) - time.perf_counter()) if wait_until else None)
+
+        self.finished.set()
+        for future in futures.values():
+            future.cancel()  # only succeeds for stages still queued on the pool
+        return results
@@ -0,0 +1,200 @@
+"""
+Text Rules - keyword rules for symptom and prescription text, matched in one pass
+
+Red flags, symptom categories, medication names and prescription line
+patterns live in a versioned JSON file (``utils/text_rules.json``)::
+
+    {
+      "version": 1,
+      "rule_sets": {
+        "red_flags": [
+          {"id": "fever", "keywords": ["fever", "temperature", "high temp"]},
+          ...
+        ],
+        "symptom_categories": [
+          {"id": "nausea", "keywords": [...], "recommendations": [...]},
+          ...
+        ]
+      }
+    }
+
+Every keyword of every rule set is compiled into a single regex built from a
+character trie, so a text is scanned once, in C, however many rules there
+are: at each position the regex walks the trie and returns the longest
+keyword starting there, and the shorter keywords that are its prefixes are
+looked up from a table built at load time. Matching is case-insensitive and
+by substring, like the ``keyword in text.lower()`` checks it replaces.
+
+    matches = get_text_rules().scan(symptom_text)
+    matches.ids('red_flags')            # ['vaginal bleeding', 'fever'] in file order
+    matches.first('medications')        # first matching rule (dict) or None
+    matches.by_line('prescription_lines')
+
+Extra keys on a rule (``recommendations``, ``fields``) are passed through
+untouched for the caller.
+
+    TEXT_RULES_PATH   rules file to load (default utils/text_rules.json)
+"""
+
+import json
+import os
+import re
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+TEXT_RULES_PATH = os.getenv(
+    'TEXT_RULES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'text_rules.json'))
+
+_END = ''  # trie key marking the end of a keyword
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex for a trie node; greedy, so it matches the longest keyword below the node."""
+    branches, leaves = [], []
+    for char in sorted(key for key in node if key != _END):
+        child = _trie_pattern(node[char])
+        if child:
+            branches.append(re.escape(char) + child)
+        else:
+            leaves.append(re.escape(char))
+    if leaves:
+        branches.append(leaves[0] if len(leaves) == 1 else '[' + ''.join(leaves) + ']')
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if _END in node:
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+class RuleMatches:
+    """Rules matched in one text, by rule set."""
+
+    def __init__(self, rules: 'TextRules', text: str, hits: List[Tuple[int, int, int]]):
+        self._rules = rules
+        self._text = text
+        self._hits = hits  # (position, rule set index, rule index), in text order
+        self._matched: Dict[int, set] = {}
+        for _, set_index, rule_index in hits:
+            self._matched.setdefault(set_index, set()).add(rule_index)
+
+    def rules(self, rule_set: str) -> List[Dict[str, Any]]:
+        """Matched rules of a rule set, in the order they appear in the rules file."""
+        set_index = self._rules.set_index(rule_set)
+        matched = self._matched.get(set_index, ())
+        return [self._rules.rule(set_index, index) for index in sorted(matched)]
+
+    def ids(self, rule_set: str) -> List[str]:
+        return [rule['id'] for rule in self.rules(rule_set)]
+
+    def first(self, rule_set: str) -> Optional[Dict[str, Any]]:
+        matched = self.rules(rule_set)
+        return matched[0] if matched else None
+
+    def has(self, rule_set: str, rule_id: str) -> bool:
+        return any(rule['id'] == rule_id for rule in self.rules(rule_set))
+
+    def by_line(self, rule_set: str) -> Dict[int, List[Dict[str, Any]]]:
+        """Matched rules per line number (0-based, ``text.split('\\n')`` numbering), in file order."""
+        set_index = self._rules.set_index(rule_set)
+        line_starts = [0] + [match.end() for match in re.finditer('\n', self._text)]
+        per_line: Dict[int, set] = {}
+        for position, hit_set, rule_index in self._hits:
+            if hit_set == set_index:
+                per_line.setdefault(bisect_right(line_starts, position) - 1, set()).add(rule_index)
+        return {line: [self._rules.rule(set_index, index) for index in sorted(indexes)]
+                for line, indexes in per_line.items()}
+
+
+class TextRules:
+    """Compiled rule sets from one rules file."""
+
+    def __init__(self, document: Dict[str, Any], source: str = '<memory>'):
+        version = document.get('version')
+        rule_sets = document.get('rule_sets')
+        if not isinstance(version, int) or not isinstance(rule_sets, dict):
+            raise ValueError(f"{source}: expected an integer 'version' and a 'rule_sets' object")
+        self.version = version
+        self.source = source
+        self._set_names: List[str] = []
+        self._sets: List[List[Dict[str, Any]]] = []
+        # keyword -> [(rule set index, rule index)]
+        targets: Dict[str, List[Tuple[int, int]]] = {}
+        for set_name, rules in rule_sets.items():
+            set_index = len(self._sets)
+            self._set_names.append(set_name)
+            self._sets.append(rules)
+            for rule_index, rule in enumerate(rules):
+                if not rule.get('id') or not rule.get('keywords'):
+                    raise ValueError(f"{source}: rule {rule_index} in '{set_name}' needs an 'id' and 'keywords'")
+                for keyword in rule['keywords']:
+                    keyword = keyword.lower()
+                    if not keyword:
+                        raise ValueError(f"{source}: empty keyword in rule '{rule['id']}' of '{set_name}'")
+                    targets.setdefault(keyword, []).append((set_index, rule_index))
+        self._set_lookup = {name: index for index, name in enumerate(self._set_names)}
+
+        trie: Dict[str, dict] = {}
+        for keyword in targets:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[_END] = {}
+
+        # The regex reports the longest keyword at a position; every keyword that is a
+        # prefix of it also starts there, so each keyword maps to all rules it implies.
+        self._implied: Dict[str, List[Tuple[int, int]]] = {}
+        for keyword in targets:
+            implied, node = [], trie
+            for length, char in enumerate(keyword, 1):
+                node = node[char]
+                if _END in node:
+                    implied.extend(targets[keyword[:length]])
+            self._implied[keyword] = implied
+
+        self.keyword_count = len(targets)
+        self._pattern = re.compile('(?=(' + _trie_pattern(trie) + '))') if targets else None
+
+    def set_index(self, rule_set: str) -> int:
+        try:
+            return self._set_lookup[rule_set]
+        except KeyError:
+            raise KeyError(f"Unknown rule set '{rule_set}' in {self.source}") from None
+
+    def rule(self, set_index: int, rule_index: int) -> Dict[str, Any]:
+        return self._sets[set_index][rule_index]
+
+    def scan(self, text: str) -> RuleMatches:
+        """Match every rule set against ``text`` in a single pass."""
+        lowered = text.lower() if text else ''
+        hits = []
+        if self._pattern is not None:
+            implied = self._implied
+            for match in self._pattern.finditer(lowered):
+                position = match.start()
+                hits.extend((position, set_index, rule_index) for set_index, rule_index in implied[match.group(1)])
+        # Positions refer to the lowercased text, so lines are counted there too
+        return RuleMatches(self, lowered, hits)
+
+
+def load_text_rules(path: str = TEXT_RULES_PATH) -> TextRules:
+    with open(path, 'r', encoding='utf-8') as handle:
+        document = json.load(handle)
+    rules = TextRules(document, source=path)
+    print(f"📚 Loaded text rules v{rules.version} ({rules.keyword_count} keywords) from {path}")
+    return rules
+
+
+_text_rules: Optional[TextRules] = None
+_text_rules_lock = threading.Lock()
+
+
+def get_text_rules() -> TextRules:
+    """The process-wide rules, loaded from ``TEXT_RULES_PATH`` on first use."""
+    global _text_rules
+    if _text_rules is None:
+        with _text_rules_lock:
+            if _text_rules is None:
+                _text_rules = load_text_rules()
+    return _text_rules
@@ -0,0 +1,291 @@
+"""
+Token Cache - verified-JWT cache with a jti revocation list
+
+Every protected request used to decode and HMAC-verify its bearer token
+from scratch. ``VerifiedTokenCache`` maps a SHA-256 of the token to its
+verified claims. An entry lives until the token's own ``exp`` and never
+longer, so repeat requests from the same session skip the signature check.
+Tokens without ``exp`` are never cached.
+Each verifier (app_simple's token_required, JWTService) owns its own cache,
+so a token verified under one key is never accepted under another.
+
+Revocation is checked on every request, cached or not:
+
+    - ``RevocationList`` keeps revoked ``jti`` values in the
+      ``revoked_tokens`` collection (TTL index on the token's expiry) and
+      mirrors them into an in-memory Bloom filter
+    - a jti that is not in the filter is treated as not revoked (no I/O);
+      a filter hit is confirmed with one ``find_one``
+    - revocations made by other processes are pulled in every
+      TOKEN_REVOCATION_REFRESH_SECONDS (default 5), and the filter is rebuilt
+      from Mongo every TOKEN_REVOCATION_REBUILD_SECONDS (default 1 hour) so
+      expired jtis drop out
+
+Revocation lag: a logout is enforced at once by the process that handled it,
+but other workers only learn about it on their next refresh, so there the
+token keeps working for up to TOKEN_REVOCATION_REFRESH_SECONDS. Set it to 0
+to refresh before every check (one indexed ``find`` on ``revoked_at`` per
+request) when that window is not acceptable.
+
+The apps register the collection with ``set_revocation_collection``. Without
+it, revocations stay in this process.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import jwt
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv('TOKEN_REVOCATION_REFRESH_SECONDS', '5'))
+TOKEN_REVOCATION_REBUILD_SECONDS = float(os.getenv('TOKEN_REVOCATION_REBUILD_SECONDS', '3600'))
+BLOOM_CAPACITY = int(os.getenv('TOKEN_REVOCATION_BLOOM_CAPACITY', '100000'))
+BLOOM_ERROR_RATE = 0.001
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    """Raised for a validly signed token whose jti has been revoked."""
+
+
+def token_digest(token: str) -> bytes:
+    """Cache key for a raw token (the token itself is never stored)."""
+    return hashlib.sha256(token.encode('utf-8') if isinstance(token, str) else token).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one SHA-256)."""
+
+    def __init__(self, capacity: int = BLOOM_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.sha256(value.encode('utf-8')).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:16], 'big') | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationList:
+    """jti denylist: Bloom filter in memory, ``revoked_tokens`` in Mongo."""
+
+    def __init__(self, get_collection: Optional[Callable[[], Any]] = None, clock=time.time):
+        self._get_collection = get_collection
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter()
+        self._local: Dict[str, float] = {}  # jti -> exp, revoked in this process
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        self._refreshed_until: Optional[datetime] = None
+
+    def set_collection(self, get_collection: Optional[Callable[[], Any]]) -> None:
+        with self._lock:
+            self._get_collection = get_collection
+            self._last_refresh = self._last_rebuild = 0.0
+            self._refreshed_until = None
+
+    def _collection(self):
+        if self._get_collection is None:
+            return None
+        try:
+            return self._get_collection()
+        except Exception:
+            return None
+
+    def revoke(self, jti: str, exp: Optional[float] = None) -> None:
+        """Revoke a token id until ``exp`` (epoch seconds)."""
+        if not jti:
+            return
+        expires_at = float(exp) if exp else self._clock() + 24 * 3600
+        with self._lock:
+            self._bloom.add(jti)
+            self._local[jti] = expires_at
+        collection = self._collection()
+        if collection is not None:
+            try:
+                collection.update_one(
+                    {'_id': jti},
+                    {'$set': {
+                        'expires_at': datetime.utcfromtimestamp(expires_at),
+                        'revoked_at': datetime.utcnow(),
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠️ Could not persist token revocation: {e}")
+
+    def _maybe_refresh(self) -> None:
+        now = self._clock()
+        if now - self._last_refresh < TOKEN_REVOCATION_REFRESH_SECONDS:
+            return
+        with self._lock:
+            if now - self._last_refresh < TOKEN_REVOCATION_REFRESH_SECONDS:
+                return
+            # Claim this refresh so concurrent requests keep using the current filter
+            self._last_refresh = now
+            last_rebuild = self._last_rebuild
+            rebuild = now - last_rebuild >= TOKEN_REVOCATION_REBUILD_SECONDS
+            if rebuild:
+                self._last_rebuild = now
+            refreshed_until = self._refreshed_until
+        collection = self._collection()
+        if collection is None:
+            return
+
+        # Query Mongo without holding the lock; the results are swapped in below
+        query: Dict[str, Any] = {'expires_at': {'$gt': datetime.utcnow()}}
+        if not rebuild and refreshed_until is not None:
+            # Overlap a little so clock skew between processes cannot hide a revocation
+            query['revoked_at'] = {'$gt': refreshed_until - timedelta(seconds=30)}
+        try:
+            documents = list(collection.find(query, {'_id': 1, 'revoked_at': 1}))
+        except Exception as e:
+            print(f"⚠️ Could not refresh token revocations: {e}")
+            if rebuild:
+                with self._lock:
+                    self._last_rebuild = last_rebuild
+            return
+        bloom = BloomFilter() if rebuild else None
+        if bloom is not None:
+            for document in documents:
+                bloom.add(document['_id'])
+
+        with self._lock:
+            if bloom is not None:
+                self._local = {jti: exp for jti, exp in self._local.items() if exp > now}
+                for jti in self._local:
+                    bloom.add(jti)
+                self._bloom = bloom
+            else:
+                for document in documents:
+                    self._bloom.add(document['_id'])
+            for document in documents:
+                revoked_at = document.get('revoked_at')
+                if revoked_at and (self._refreshed_until is None or revoked_at > self._refreshed_until):
+                    self._refreshed_until = revoked_at
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if not jti:
+            return False
+        self._maybe_refresh()
+        if jti not in self._bloom:
+            return False
+        with self._lock:
+            if jti in self._local:
+                return True
+        collection = self._collection()
+        if collection is None:
+            return False
+        try:
+            return collection.find_one({'_id': jti}, {'_id': 1}) is not None
+        except Exception as e:
+            print(f"⚠️ Could not check token revocation: {e}")
+            return False
+
+
+def ensure_revocation_indexes(collection) -> None:
+    """TTL index dropping revoked jtis once their tokens have expired."""
+    collection.create_index('expires_at', expireAfterSeconds=0)
+    collection.create_index('revoked_at')
+
+
+_revocations = RevocationList()
+
+
+def get_revocation_list() -> RevocationList:
+    return _revocations
+
+
+def set_revocation_collection(get_collection: Optional[Callable[[], Any]]) -> None:
+    """Register the ``revoked_tokens`` collection shared by all processes."""
+    _revocations.set_collection(get_collection)
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified claims, each entry expiring with its token."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE, clock=time.time,
+                 revocations: Optional[RevocationList] = None):
+        self.max_size = max_size
+        self._clock = clock
+        self._revocations = revocations or _revocations
+        self._entries: 'OrderedDict[bytes, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                self.misses += 1
+                return None
+            if claims['exp'] <= self._clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def _put(self, key: bytes, claims: Dict[str, Any]) -> None:
+        exp = claims.get('exp')
+        if not isinstance(exp, (int, float)) or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def verify(self, token: str, decode: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the token's claims, calling ``decode`` (which verifies the
+        signature and raises jwt errors) only on a cache miss.
+
+        Raises:
+            TokenRevokedError: if the token's jti has been revoked
+        """
+        key = token_digest(token)
+        claims = self._get(key)
+        if claims is None:
+            claims = decode(token)
+            self._put(key, claims)
+        if self._revocations.is_revoked(claims.get('jti')):
+            with self._lock:
+                self._entries.pop(key, None)
+            raise TokenRevokedError('Token has been revoked')
+        # Callers may annotate the claims; keep the cached copy pristine
+        return dict(claims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+def revoke_claims(claims: Dict[str, Any]) -> bool:
+    """Revoke the token these claims came from; False if it has no jti."""
+    jti = claims.get('jti') if claims else None
+    if not jti:
+        return False
+    _revocations.revoke(jti, claims.get('exp'))
+    return True
@@ -91,23 +91,3 @@ class Validators:
         
         # OTP should be 6 digits
         return len(otp) == 6 and otp.isdigit()
-    
-    @staticmethod
-    def validate_doctor_id(doctor_id: str) -> bool:
-        """Validate doctor ID format"""
-        if not doctor_id:
-            return False
-        
-        # Doctor ID should start with 'D' followed by digits
-        pattern = r'^D\d+$'
-        return bool(re.match(pattern, doctor_id))
-    
-    @staticmethod
-    def validate_patient_id(patient_id: str) -> bool:
-        """Validate patient ID format"""
-        if not patient_id:
-            return False
-        
-        # Patient ID should start with 'P' followed by digits
-        pattern = r'^P\d+$'
-        return bool(re.match(pattern, patient_id))